@@ -2,12 +2,18 @@
 
 Production installations can invoke the equivalent ``mako-bot`` console
 command declared in ``pyproject.toml``.
-"""
-
-from src.app import bootstrap_application, main
-
 
-driver = bootstrap_application()
+Worker processes spawned from ``python bot.py`` / ``nb run`` re-import this
+file as ``__mp_main__``; they must stay bare (no NoneBot, services or
+plugins), so nothing is imported or booted for them.
+"""
 
 if __name__ == "__main__":
+    from src.app import main
+
     main()
+elif __name__ != "__mp_main__":
+    # Imported as a module (``bot:driver``).
+    from src.app import bootstrap_application
+
+    driver = bootstrap_application()
@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+import argparse
+import time
+from typing import Optional, Sequence
+
 import nonebot
 from nonebot.adapters.onebot.v11 import Adapter as OneBotV11Adapter
 
@@ -10,6 +14,8 @@ from src.core.logging import setup_logging
 
 
 _bootstrapped = False
+# Reference point for the time-to-ready figure the health plugin logs.
+PROCESS_STARTED_AT = time.monotonic()
 
 
 def bootstrap_application():
@@ -22,11 +28,107 @@ def bootstrap_application():
     nonebot.init()
     driver = nonebot.get_driver()
     driver.register_adapter(OneBotV11Adapter)
+    from src.core.container import get_services
+
+    # Shared services exist before any plugin module builds on them.
+    get_services()
     load_application_plugins()
     _bootstrapped = True
     return driver
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="mako-bot", description="Run Mako-Bot or its maintenance commands.")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="boot the application without serving and report per-module import times",
+    )
+    parser.add_argument("--profile-top", type=int, default=20, help="rows per table in the startup profile")
+    commands = parser.add_subparsers(dest="command")
+    storage = commands.add_parser("storage", help="Redis storage maintenance")
+    storage_commands = storage.add_subparsers(dest="storage_command", required=True)
+    migrate = storage_commands.add_parser("migrate", help="rewrite stored values into the current compact encodings")
+    migrate.add_argument("--dry-run", action="store_true", help="only count what would be rewritten")
+    report = storage_commands.add_parser("report", help="show approximate Redis memory use per key family")
+    report.add_argument("--sample", type=int, default=200, help="keys sampled per family for MEMORY USAGE")
+    intent = commands.add_parser("intent", help="local intent classifier")
+    intent_commands = intent.add_subparsers(dest="intent_command", required=True)
+    train = intent_commands.add_parser("train", help="fit the classifier on the seed corpus and recorded LLM labels")
+    train.add_argument("--seed", default="eval/intent_cases.yaml", help="labelled seed corpus")
+    train.add_argument("--output", default=None, help="model path (default: INTENT_CLASSIFIER_PATH)")
+    train.add_argument("--no-teacher", action="store_true", help="ignore LLM labels recorded in Redis")
+    bench = intent_commands.add_parser("bench", help="compare routing latency and accuracy on the search eval corpus")
+    bench.add_argument("--cases", default="eval/search_cases.yaml", help="search eval corpus")
+    bench.add_argument("--model", default=None, help="model path (default: INTENT_CLASSIFIER_PATH)")
+    return parser
+
+
+def run_storage_command(args: argparse.Namespace) -> int:
+    from src.services.storage_maintenance import StorageMaintenance
+
+    setup_logging()
+    maintenance = StorageMaintenance()
+    if args.storage_command == "migrate":
+        lines = maintenance.migrate(dry_run=args.dry_run).lines()
+    else:
+        lines = maintenance.memory_report(sample=max(1, args.sample))
+    print("\n".join(lines))
+    return 0
+
+
+def run_intent_command(args: argparse.Namespace) -> int:
+    import yaml
+
+    from src.core.config import get_settings
+    from src.services import intent_classifier as classifier
+    from src.services.redis import get_redis
+
+    setup_logging()
+    settings = get_settings()
+    if args.intent_command == "train":
+        output = args.output or settings.intent_classifier_path
+        if not output:
+            print("请通过 --output 或 INTENT_CLASSIFIER_PATH 指定模型路径")
+            return 2
+        examples = classifier.load_seed_examples(args.seed)
+        client = None if args.no_teacher else get_redis()
+        teacher = classifier.load_teacher_labels(client) if client is not None else []
+        model = classifier.IntentClassifier.train([*examples, *teacher])
+        model.save(output)
+        print(f"intent train seed={len(examples)} teacher={len(teacher)} tasks={','.join(model.tasks)} -> {output}")
+        for task, stats in classifier.evaluate(
+            model, examples, threshold=settings.intent_classifier_threshold
+        ).items():
+            print(f"  {task:<12} train_accuracy={stats['accuracy']:.2f} coverage={stats['local_coverage']:.2f}")
+        return 0
+    path = args.model or settings.intent_classifier_path
+    model = classifier.IntentClassifier.load(path) if path else None
+    with open(args.cases, encoding="utf-8") as handle:
+        cases = (yaml.safe_load(handle) or {}).get("cases") or []
+    print("\n".join(
+        classifier.benchmark_search_cases(model, cases, threshold=settings.intent_classifier_threshold)
+    ))
+    return 0
+
+
+def run_startup_profile(args: argparse.Namespace) -> int:
+    from src.core.config import get_settings
+    from src.core.startup_profile import profile_startup
+
+    lines = profile_startup(target_seconds=get_settings().startup_target_seconds, top=max(1, args.profile_top))
+    print("\n".join(lines))
+    return 1 if lines and lines[0].startswith("boot failed") else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.profile_startup:
+        return run_startup_profile(args)
+    if args.command == "storage":
+        return run_storage_command(args)
+    if args.command == "intent":
+        return run_intent_command(args)
     bootstrap_application()
     nonebot.run()
+    return 0
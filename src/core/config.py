@@ -27,6 +27,24 @@ class Settings(BaseSettings):
     log_file: str = Field(default="logs/mako-bot.log", validation_alias=AliasChoices("LOG_FILE", "NB_LOG_FILE"))
     log_rotation: str = Field(default="10 MB", validation_alias=AliasChoices("LOG_ROTATION", "NB_LOG_ROTATION"))
     log_retention: str = Field(default="7 days", validation_alias=AliasChoices("LOG_RETENTION", "NB_LOG_RETENTION"))
+    # Event-loop lag is sampled at this interval; a stall above the threshold marks /readyz as lagging.
+    loop_lag_sample_seconds: float = Field(default=0.5, validation_alias=AliasChoices("LOOP_LAG_SAMPLE_SECONDS"))
+    loop_stall_threshold_seconds: float = Field(
+        default=0.25, validation_alias=AliasChoices("LOOP_STALL_THRESHOLD_SECONDS")
+    )
+    # Log the stack of whatever holds the loop past the threshold; also on with LOG_LEVEL=DEBUG.
+    loop_stall_trace: bool = Field(default=False, validation_alias=AliasChoices("LOOP_STALL_TRACE"))
+    # Seconds from process start until /healthz answers; slower boots are logged as warnings.
+    startup_target_seconds: float = Field(default=5.0, validation_alias=AliasChoices("STARTUP_TARGET_SECONDS"))
+
+    # Scale-out: several workers share one OneBot account; each session and scheduled job runs on one of them.
+    cluster_enabled: bool = Field(default=False, validation_alias=AliasChoices("CLUSTER_ENABLED"))
+    cluster_session_lease_seconds: float = Field(
+        default=30.0, validation_alias=AliasChoices("CLUSTER_SESSION_LEASE_SECONDS")
+    )
+    cluster_heartbeat_seconds: float = Field(
+        default=5.0, validation_alias=AliasChoices("CLUSTER_HEARTBEAT_SECONDS")
+    )
 
     # Redis
     redis_url: Optional[str] = Field(default=None, validation_alias=AliasChoices("REDIS_URL"))
@@ -42,6 +60,20 @@ class Settings(BaseSettings):
     global_memory_max_records: int = Field(
         default=50_000, validation_alias=AliasChoices("GLOBAL_MEMORY_MAX_RECORDS")
     )
+    # The global chat log is stored in hourly buckets; whole buckets older
+    # than this are dropped, and the oldest rows go first once all buckets
+    # together exceed GLOBAL_MEMORY_MAX_RECORDS.
+    global_memory_retention_hours: int = Field(
+        default=168, validation_alias=AliasChoices("GLOBAL_MEMORY_RETENTION_HOURS")
+    )
+    # Large Redis values (histories, profiles, thought traces) are compressed
+    # above this size: auto|zstd|zlib|off. auto prefers zstd when installed.
+    storage_compression: str = Field(default="auto", validation_alias=AliasChoices("STORAGE_COMPRESSION"))
+    storage_compression_min_bytes: int = Field(
+        default=512, validation_alias=AliasChoices("STORAGE_COMPRESSION_MIN_BYTES")
+    )
+    read_cache_ttl_seconds: float = Field(default=30.0, validation_alias=AliasChoices("READ_CACHE_TTL_SECONDS"))
+    read_cache_max_entries: int = Field(default=2048, validation_alias=AliasChoices("READ_CACHE_MAX_ENTRIES"))
     redis_required: bool = Field(default=True, validation_alias=AliasChoices("REDIS_REQUIRED"))
     llm_required: bool = Field(default=True, validation_alias=AliasChoices("LLM_REQUIRED"))
 
@@ -62,8 +94,13 @@ class Settings(BaseSettings):
 
     # RAG / Embedding
     embedding_model: str = Field(default="moka-ai/m3e-base", validation_alias=AliasChoices("EMBEDDING_MODEL"))
+    # Load the embedding model in the background right after startup instead of on the first note or recall.
+    embedding_warmup: bool = Field(default=True, validation_alias=AliasChoices("EMBEDDING_WARMUP"))
     vector_index_name: str = Field(default="Long_term_memory", validation_alias=AliasChoices("VECTOR_INDEX_NAME"))
     vector_prefix: str = Field(default="memory:", validation_alias=AliasChoices("VECTOR_PREFIX"))
+    # Notes are embedded by a background indexer, several texts per model call.
+    vector_index_batch_size: int = Field(default=16, validation_alias=AliasChoices("VECTOR_INDEX_BATCH_SIZE"))
+    vector_index_queue_size: int = Field(default=1000, validation_alias=AliasChoices("VECTOR_INDEX_QUEUE_SIZE"))
 
     # QWeather
     qweather_host: Optional[str] = Field(default=None, validation_alias=AliasChoices("your_api_host", "QWEATHER_HOST"))
@@ -136,6 +173,34 @@ class Settings(BaseSettings):
         default=30,
         validation_alias=AliasChoices("IMAGE_RATE_LIMIT_SECONDS"),
     )
+    # Image decoding and large HTML extraction run in a worker-process pool.
+    # Work beyond workers+queue is rejected; a task past its time limit or a
+    # worker past its memory limit (MB, 0 disables) is killed.
+    cpu_pool_workers: int = Field(
+        default=1,
+        validation_alias=AliasChoices("CPU_POOL_WORKERS", "IMAGE_PROCESS_WORKERS"),
+    )
+    cpu_pool_max_queue: int = Field(
+        default=8,
+        validation_alias=AliasChoices("CPU_POOL_MAX_QUEUE", "IMAGE_PROCESS_QUEUE"),
+    )
+    cpu_pool_task_timeout_seconds: float = Field(
+        default=20.0,
+        validation_alias=AliasChoices("CPU_POOL_TASK_TIMEOUT_SECONDS"),
+    )
+    cpu_pool_worker_memory_mb: int = Field(
+        default=256,
+        validation_alias=AliasChoices("CPU_POOL_WORKER_MEMORY_MB"),
+    )
+    cpu_pool_max_tasks_per_worker: int = Field(
+        default=200,
+        validation_alias=AliasChoices("CPU_POOL_MAX_TASKS_PER_WORKER"),
+    )
+    # Vision descriptions are cached by QQ file id/URL and perceptual hash; 0 disables.
+    image_description_cache_ttl_seconds: int = Field(
+        default=7 * 24 * 3600,
+        validation_alias=AliasChoices("IMAGE_DESCRIPTION_CACHE_TTL_SECONDS"),
+    )
 
     # Language
     deepl_key: Optional[str] = Field(default=None, validation_alias=AliasChoices("DEEPL_KEY", "DEEPL_API_KEY"))
@@ -188,11 +253,21 @@ class Settings(BaseSettings):
         validation_alias=AliasChoices("ADMIN_ONLY_TOOL_LIST"),
     )
     plugin_enable_list: Optional[str] = Field(default=None, validation_alias=AliasChoices("PLUGIN_ENABLE_LIST"))
+    # Group member lists back @-rendering; member notices keep them current
+    # and this bounds how long a roster is trusted before a background reload.
+    group_member_cache_ttl_seconds: float = Field(
+        default=3600.0,
+        validation_alias=AliasChoices("GROUP_MEMBER_CACHE_TTL_SECONDS"),
+    )
 
     # Governance / Permission
     admin_user_ids: Optional[str] = Field(default=None, validation_alias=AliasChoices("ADMIN_USER_IDS"))
     blacklist_user_ids: Optional[str] = Field(default=None, validation_alias=AliasChoices("BLACKLIST_USER_IDS"))
     blacklist_group_ids: Optional[str] = Field(default=None, validation_alias=AliasChoices("BLACKLIST_GROUP_IDS"))
+    # Blacklist changes are pushed over pub/sub; this poll of the version key catches missed messages. 0 = push only.
+    blacklist_refresh_seconds: float = Field(
+        default=30.0, validation_alias=AliasChoices("BLACKLIST_REFRESH_SECONDS")
+    )
     group_reply_max_chars_undirected: int = Field(
         default=400, validation_alias=AliasChoices("GROUP_REPLY_MAX_CHARS_UNDIRECTED")
     )
@@ -214,6 +289,14 @@ class Settings(BaseSettings):
     chat_rhythm_max_cooldown_seconds: int = Field(
         default=900, validation_alias=AliasChoices("CHAT_RHYTHM_MAX_COOLDOWN_SECONDS")
     )
+    # Rhythm state lives in memory and is written behind to Redis at this interval.
+    chat_rhythm_flush_seconds: float = Field(
+        default=2.0, validation_alias=AliasChoices("CHAT_RHYTHM_FLUSH_SECONDS")
+    )
+    # Most group sessions kept in the in-process rhythm LRU.
+    chat_rhythm_max_sessions: int = Field(
+        default=4096, validation_alias=AliasChoices("CHAT_RHYTHM_MAX_SESSIONS")
+    )
     chat_reply_debounce_seconds: float = Field(
         default=1.2, validation_alias=AliasChoices("CHAT_REPLY_DEBOUNCE_SECONDS")
     )
@@ -253,12 +336,40 @@ class Settings(BaseSettings):
         default=0.0020, validation_alias=AliasChoices("LLM_COST_PER_1K_CHARS_OUTPUT")
     )
     tool_cost_overrides: Optional[str] = Field(default=None, validation_alias=AliasChoices("TOOL_COST_OVERRIDES"))
+    # Budget a process pre-charges per user so small reservations skip Redis; 0 = every reservation goes to Redis.
+    budget_local_lease: float = Field(default=0.02, validation_alias=AliasChoices("BUDGET_LOCAL_LEASE"))
+    # Cap on lease credit one process holds across all users, so leases cannot crowd out the global limit.
+    budget_lease_max_outstanding: float = Field(
+        default=0.2, validation_alias=AliasChoices("BUDGET_LEASE_MAX_OUTSTANDING")
+    )
+    # Seconds a user's unused lease credit is kept after their last reservation before it is returned.
+    budget_lease_idle_seconds: float = Field(default=60.0, validation_alias=AliasChoices("BUDGET_LEASE_IDLE_SECONDS"))
 
     # Proactive follow-up
     proactive_enabled: bool = Field(default=False, validation_alias=AliasChoices("PROACTIVE_ENABLED"))
     proactive_scan_minutes: int = Field(default=20, validation_alias=AliasChoices("PROACTIVE_SCAN_MINUTES"))
     proactive_default_hours: int = Field(default=24, validation_alias=AliasChoices("PROACTIVE_DEFAULT_HOURS"))
 
+    relationship_queue_size: int = Field(default=1000, validation_alias=AliasChoices("RELATIONSHIP_QUEUE_SIZE"))
+    relationship_queue_workers: int = Field(default=2, validation_alias=AliasChoices("RELATIONSHIP_QUEUE_WORKERS"))
+    relationship_settle_seconds: float = Field(
+        default=1.0, validation_alias=AliasChoices("RELATIONSHIP_SETTLE_SECONDS")
+    )
+
+    # Reminders
+    reminder_restore_horizon_hours: int = Field(
+        default=24, validation_alias=AliasChoices("REMINDER_RESTORE_HORIZON_HOURS")
+    )
+
+    # Local intent classifier (trained with `mako-bot intent train`). Unset
+    # path = disabled; below the threshold the LLM still decides.
+    intent_classifier_path: Optional[str] = Field(
+        default=None, validation_alias=AliasChoices("INTENT_CLASSIFIER_PATH")
+    )
+    intent_classifier_threshold: float = Field(
+        default=0.9, validation_alias=AliasChoices("INTENT_CLASSIFIER_THRESHOLD")
+    )
+
     # Autonomy
     autonomy_enabled: bool = Field(default=False, validation_alias=AliasChoices("AUTONOMY_ENABLED"))
     autonomy_owner_id: Optional[int] = Field(default=None, validation_alias=AliasChoices("AUTONOMY_OWNER_ID"))
@@ -270,6 +381,21 @@ class Settings(BaseSettings):
     autonomy_pending_ttl_seconds: int = Field(default=1800, validation_alias=AliasChoices("AUTONOMY_PENDING_TTL_SECONDS"))
     autonomy_context_hours: int = Field(default=2, validation_alias=AliasChoices("AUTONOMY_CONTEXT_HOURS"))
     autonomy_context_limit: int = Field(default=30, validation_alias=AliasChoices("AUTONOMY_CONTEXT_LIMIT"))
+    # Scheduled scans skip the LLM when nothing changed since the last
+    # decision; this forces a fresh look after a long quiet period. 0 = never.
+    autonomy_max_idle_minutes: int = Field(default=180, validation_alias=AliasChoices("AUTONOMY_MAX_IDLE_MINUTES"))
+
+    # Audit emission is buffered in-process and drained into a Redis Stream
+    # by a background task; a full buffer drops the oldest entries.
+    audit_buffer_size: int = Field(default=5000, validation_alias=AliasChoices("AUDIT_BUFFER_SIZE"))
+    audit_batch_size: int = Field(default=200, validation_alias=AliasChoices("AUDIT_BATCH_SIZE"))
+    audit_stream_maxlen: int = Field(default=20000, validation_alias=AliasChoices("AUDIT_STREAM_MAXLEN"))
+    audit_flush_seconds: float = Field(default=1.0, validation_alias=AliasChoices("AUDIT_FLUSH_SECONDS"))
+    # Stream entries left unacknowledged this long (e.g. by a restarted
+    # process) are claimed and materialized by a live consumer.
+    audit_claim_idle_seconds: float = Field(
+        default=60.0, validation_alias=AliasChoices("AUDIT_CLAIM_IDLE_SECONDS")
+    )
 
     # Successful outbound-message ledger. Frequency cooldown and semantic
     # repetition are separate controls: a message may be outside the short
@@ -303,6 +429,14 @@ class Settings(BaseSettings):
             raise ValueError("Chat rhythm cooldowns must be positive")
         if self.chat_rhythm_cooldown_seconds > self.chat_rhythm_max_cooldown_seconds:
             raise ValueError("CHAT_RHYTHM_COOLDOWN_SECONDS cannot exceed max cooldown")
+        if self.cluster_session_lease_seconds < 1 or self.cluster_heartbeat_seconds <= 0:
+            raise ValueError("CLUSTER_SESSION_LEASE_SECONDS and CLUSTER_HEARTBEAT_SECONDS must be positive")
+        if self.startup_target_seconds <= 0:
+            raise ValueError("STARTUP_TARGET_SECONDS must be positive")
+        if self.loop_lag_sample_seconds <= 0 or self.loop_stall_threshold_seconds <= 0:
+            raise ValueError("LOOP_LAG_SAMPLE_SECONDS and LOOP_STALL_THRESHOLD_SECONDS must be positive")
+        if self.chat_rhythm_flush_seconds <= 0 or self.chat_rhythm_max_sessions < 1:
+            raise ValueError("CHAT_RHYTHM_FLUSH_SECONDS and CHAT_RHYTHM_MAX_SESSIONS must be positive")
         if self.chat_reply_debounce_seconds < 0:
             raise ValueError("CHAT_REPLY_DEBOUNCE_SECONDS cannot be negative")
         for value in (
@@ -319,6 +453,16 @@ class Settings(BaseSettings):
                 raise ValueError("Chat reply limits must be positive")
         if self.global_memory_max_records < 1000:
             raise ValueError("GLOBAL_MEMORY_MAX_RECORDS must be at least 1000")
+        if self.storage_compression.strip().lower() not in {"auto", "zstd", "zlib", "off"}:
+            raise ValueError("STORAGE_COMPRESSION must be one of auto, zstd, zlib, off")
+        if self.storage_compression_min_bytes < 64:
+            raise ValueError("STORAGE_COMPRESSION_MIN_BYTES must be at least 64")
+        if self.read_cache_ttl_seconds < 0:
+            raise ValueError("READ_CACHE_TTL_SECONDS must be non-negative")
+        if self.read_cache_max_entries < 1:
+            raise ValueError("READ_CACHE_MAX_ENTRIES must be positive")
+        if self.global_memory_retention_hours < 24:
+            raise ValueError("GLOBAL_MEMORY_RETENTION_HOURS must be at least 24")
         if self.search_cost_per_call < 0:
             raise ValueError("SEARCH_COST_PER_CALL cannot be negative")
         if not 1 <= self.ollama_search_result_count <= 10:
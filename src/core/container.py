@@ -0,0 +1,78 @@
+"""Process-wide service instances shared by every plugin.
+
+Plugins used to build their own ``StorageService``/``GovernanceService``
+graphs at import and the chat pipeline built a fresh ``ToolExecutor`` (with
+its own note, affinity and governance services) for every message.
+:func:`get_services` returns one :class:`AppServices` per process instead; it
+is created by ``bootstrap_application`` before plugins load, and lazily on
+first use when a plugin is loaded some other way (tests, ``nb run``).
+
+LLM clients are already process-wide (``src.services.llm``) and are not
+duplicated here.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from nonebot.log import logger
+
+from src.services.affinity import AffinityService
+from src.services.cluster import ClusterCoordinator
+from src.services.governance import GovernanceService
+from src.services.notes import NoteService
+from src.services.storage import StorageService
+from src.services.tool_executor import ToolExecutor
+from src.services.vector_indexer import VectorIndexer
+from src.services.vector_store import VectorStore
+
+
+@dataclass
+class AppServices:
+    storage: StorageService
+    vector_store: VectorStore
+    vector_indexer: VectorIndexer
+    governance: GovernanceService
+    notes: NoteService
+    affinity: AffinityService
+    tools: ToolExecutor
+    cluster: ClusterCoordinator
+
+    @classmethod
+    def build(cls) -> "AppServices":
+        storage = StorageService()
+        vector_store = VectorStore()
+        vector_indexer = VectorIndexer(vector_store)
+        governance = GovernanceService(storage=storage)
+        notes = NoteService(storage=storage, vector_store=vector_store, indexer=vector_indexer)
+        affinity = AffinityService(storage=storage)
+        tools = ToolExecutor(note_service=notes, affinity_service=affinity, governance=governance)
+        cluster = ClusterCoordinator()
+        return cls(
+            storage=storage,
+            vector_store=vector_store,
+            vector_indexer=vector_indexer,
+            governance=governance,
+            notes=notes,
+            affinity=affinity,
+            tools=tools,
+            cluster=cluster,
+        )
+
+
+_services: Optional[AppServices] = None
+
+
+def get_services() -> AppServices:
+    global _services
+    if _services is None:
+        _services = AppServices.build()
+        logger.debug("共享服务实例已创建")
+    return _services
+
+
+def reset_services() -> None:
+    """Drop the shared instances; the next :func:`get_services` rebuilds them."""
+    global _services
+    _services = None
@@ -20,3 +20,11 @@ class ImageTooLargeError(AppError):
 
 class UnsafeUrlError(AppError):
     """Raised when a server-side fetch targets a non-public or invalid URL."""
+
+
+class WorkerPoolBusyError(AppError):
+    """Raised when a worker pool's queue is full and new work is rejected."""
+
+
+class WorkerTaskLimitError(AppError):
+    """Raised when a worker task exceeds its time or memory limit and is killed."""
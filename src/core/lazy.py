@@ -0,0 +1,74 @@
+"""Deferred imports for heavy optional dependencies.
+
+``sentence_transformers`` pulls in ``torch`` and takes seconds to import,
+which used to happen while plugins loaded, before the bot could answer
+anything.  :func:`lazy_module` returns a stand-in that imports the real
+module on first attribute access, and :func:`warm_up` runs a loader in a
+daemon thread so the cost is usually paid in the background after startup
+instead of on the first message that needs it.
+"""
+
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Optional
+
+from nonebot.log import logger
+
+
+class LazyModule(ModuleType):
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module: Optional[ModuleType] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._lazy_module is not None
+
+    def load(self) -> ModuleType:
+        module = self._lazy_module
+        if module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    started = time.perf_counter()
+                    self._lazy_module = importlib.import_module(self.__name__)
+                    logger.debug(f"延迟导入 {self.__name__} 耗时 {time.perf_counter() - started:.2f}s")
+                module = self._lazy_module
+        return module
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.load(), attribute)
+
+
+_lazy_modules: Dict[str, LazyModule] = {}
+_lazy_lock = threading.Lock()
+
+
+def lazy_module(name: str) -> LazyModule:
+    """A module stand-in for ``name`` that imports it on first use."""
+    with _lazy_lock:
+        module = _lazy_modules.get(name)
+        if module is None:
+            module = _lazy_modules[name] = LazyModule(name)
+        return module
+
+
+def warm_up(label: str, loader: Callable[[], Any]) -> threading.Thread:
+    """Run ``loader`` in a daemon thread; failures are logged and retried on first real use."""
+
+    def run() -> None:
+        started = time.perf_counter()
+        try:
+            loader()
+        except Exception as exc:
+            logger.warning(f"{label} 预热失败，将在首次使用时重试: {exc}")
+            return
+        logger.info(f"{label} 预热完成，耗时 {time.perf_counter() - started:.1f}s")
+
+    thread = threading.Thread(target=run, name=f"warm-up-{label}", daemon=True)
+    thread.start()
+    return thread
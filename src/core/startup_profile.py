@@ -0,0 +1,113 @@
+"""``mako-bot --profile-startup``: where application boot time goes.
+
+Boots the application (NoneBot init, shared services, every enabled plugin)
+in a child interpreter started with ``-X importtime``, then reports the wall
+time against ``STARTUP_TARGET_SECONDS`` and the slowest imports, both per
+module and per top-level package.  The server is not started.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+_BOOT_SNIPPET = (
+    "import time\n"
+    "started = time.perf_counter()\n"
+    "from src.app import bootstrap_application\n"
+    "bootstrap_application()\n"
+    "print(f'BOOT_SECONDS={time.perf_counter() - started:.3f}')\n"
+)
+
+
+@dataclass(frozen=True)
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split(".", 1)[0]
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Parse the ``import time: self | cumulative | name`` lines written by ``-X importtime``."""
+    timings: List[ImportTiming] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|", 2)
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # The header row.
+            continue
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        # Nested imports are indented by two spaces per level after the separator's own space.
+        depth = max(0, (len(name) - len(stripped) - 1) // 2)
+        timings.append(ImportTiming(stripped, self_us, cumulative_us, depth))
+    return timings
+
+
+def package_totals(timings: Sequence[ImportTiming]) -> Dict[str, int]:
+    """Self time summed per top-level package, in microseconds."""
+    totals: Dict[str, int] = {}
+    for timing in timings:
+        totals[timing.package] = totals.get(timing.package, 0) + timing.self_us
+    return totals
+
+
+def format_report(
+    timings: Sequence[ImportTiming],
+    *,
+    boot_seconds: Optional[float],
+    target_seconds: float,
+    top: int = 20,
+) -> List[str]:
+    lines: List[str] = []
+    if boot_seconds is not None:
+        verdict = "ok" if boot_seconds <= target_seconds else "over target"
+        lines.append(f"startup boot={boot_seconds:.2f}s target={target_seconds:.2f}s ({verdict})")
+    imports_us = sum(timing.self_us for timing in timings)
+    lines.append(f"imports modules={len(timings)} total={imports_us / 1e6:.2f}s")
+    lines.append("")
+    lines.append("slowest packages (self time):")
+    for package, total in sorted(package_totals(timings).items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {total / 1000:9.1f} ms  {package}")
+    lines.append("")
+    lines.append("slowest modules (cumulative):")
+    for timing in sorted(timings, key=lambda item: -item.cumulative_us)[:top]:
+        lines.append(f"  {timing.cumulative_us / 1000:9.1f} ms  {timing.module}")
+    return lines
+
+
+def profile_startup(*, target_seconds: float, top: int = 20) -> List[str]:
+    root = Path(__file__).resolve().parents[2]
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _BOOT_SNIPPET],
+        cwd=root,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    boot_seconds = None
+    for line in completed.stdout.splitlines():
+        if line.startswith("BOOT_SECONDS="):
+            boot_seconds = float(line.split("=", 1)[1])
+    timings = parse_importtime(completed.stderr)
+    lines = format_report(timings, boot_seconds=boot_seconds, target_seconds=target_seconds, top=top)
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        lines.insert(0, f"boot failed (exit {completed.returncode}):")
+        lines[1:1] = errors[-10:]
+    return lines
@@ -0,0 +1,191 @@
+"""Compact storage codec for hot record types.
+
+Stored rows are positional JSON arrays whose first element is the schema
+version: ``[1, field_1, field_2, ...]``.  Rows we wrote ourselves are decoded
+to plain values and only turned into models for the rows a caller returns,
+without pydantic validation; legacy rows, which are JSON objects produced by
+``model_dump_json``, still go through full validation.
+New fields may only be appended to a codec's field list; shorter rows decode
+with the model defaults for the missing tail.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Generic, Iterable, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+from src.models.schemas import ChatRecord, OutboundMessageRecord, RelationshipMemory, ThoughtTrace
+
+try:  # optional speed-up; the stdlib path produces identical rows
+    import orjson
+except ImportError:  # pragma: no cover - exercised when the extra is absent
+    orjson = None
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def dumps(value: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def loads(raw: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class RecordCodec(Generic[M]):
+    def __init__(self, model: Type[M], fields: tuple[str, ...], *, version: int = 1) -> None:
+        self.model = model
+        self.fields = fields
+        self.version = version
+        self.slots = {name: index for index, name in enumerate(fields)}
+        self.datetime_slots = tuple(
+            index
+            for index, name in enumerate(fields)
+            if "datetime" in str(model.model_fields[name].annotation)
+        )
+        self._defaults = tuple(
+            (name, info) for name, info in model.model_fields.items() if name not in self.slots
+        )
+
+    def encode(self, record: M) -> str:
+        row: List[Any] = [self.version]
+        for name in self.fields:
+            value = getattr(record, name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            row.append(value)
+        try:
+            return dumps(row)
+        except (TypeError, ValueError):
+            # Unusual payload contents: fall back to the legacy object format,
+            # which every reader still understands.
+            return record.model_dump_json()
+
+    def row(self, raw: str | bytes | dict) -> List[Any]:
+        """Decode a stored value to a positional row without building the model.
+
+        Datetimes stay ISO strings, so listing paths can filter and sort on
+        ``row[codec.slots[name]]`` and :meth:`build` only the rows they return.
+        """
+        if isinstance(raw, dict) or raw[:1] not in ("[", b"["):
+            record = self.model.model_validate(raw) if isinstance(raw, dict) else self.model.model_validate_json(raw)
+            return [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in (getattr(record, name) for name in self.fields)
+            ]
+        row = loads(raw)
+        if not row or row[0] != self.version:
+            raise ValueError(f"unsupported {self.model.__name__} row version: {row[:1]}")
+        row = row[1:]
+        if len(row) < len(self.fields):
+            row.extend(
+                self.model.model_fields[name].get_default(call_default_factory=True)
+                for name in self.fields[len(row) :]
+            )
+        return row
+
+    def rows(self, raws: Iterable[str | bytes | dict]) -> List[List[Any]]:
+        result: List[List[Any]] = []
+        for raw in raws:
+            if not raw:
+                continue
+            try:
+                result.append(self.row(raw))
+            except Exception:
+                continue
+        return result
+
+    def build(self, row: List[Any]) -> M:
+        """Construct the model from a trusted row, like ``model_construct`` but cheaper."""
+        data = dict(zip(self.fields, row))
+        for index in self.datetime_slots:
+            value = row[index]
+            if isinstance(value, str):
+                data[self.fields[index]] = datetime.fromisoformat(value)
+        for name, info in self._defaults:
+            data[name] = info.get_default(call_default_factory=True)
+        record = self.model.__new__(self.model)
+        object.__setattr__(record, "__dict__", data)
+        object.__setattr__(record, "__pydantic_fields_set__", set(self.fields))
+        object.__setattr__(record, "__pydantic_extra__", None)
+        object.__setattr__(record, "__pydantic_private__", None)
+        return record
+
+    def decode(self, raw: str | bytes | dict) -> M:
+        return self.build(self.row(raw))
+
+    def decode_or_none(self, raw: Optional[str | bytes | dict]) -> Optional[M]:
+        if not raw:
+            return None
+        try:
+            return self.decode(raw)
+        except Exception:
+            return None
+
+    def decode_many(self, raws: Iterable[str | bytes | dict]) -> List[M]:
+        return [self.build(row) for row in self.rows(raws)]
+
+
+chat_record_codec = RecordCodec(
+    ChatRecord,
+    ("role", "content", "nickname", "user_id", "group_id", "time"),
+)
+relationship_memory_codec = RecordCodec(
+    RelationshipMemory,
+    (
+        "memory_id",
+        "user_id",
+        "memory_type",
+        "content",
+        "source",
+        "status",
+        "confidence",
+        "created_at",
+        "updated_at",
+        "due_at",
+        "last_used_at",
+    ),
+)
+thought_trace_codec = RecordCodec(
+    ThoughtTrace,
+    (
+        "trace_id",
+        "trace_kind",
+        "source",
+        "trace_type",
+        "summary",
+        "input_summary",
+        "context_summary",
+        "retrieved_summary",
+        "decision_summary",
+        "output_summary",
+        "safety_notes",
+        "payload",
+        "user_id",
+        "group_id",
+        "session_id",
+        "related_goal_id",
+        "related_task_id",
+        "created_at",
+    ),
+)
+outbound_message_codec = RecordCodec(
+    OutboundMessageRecord,
+    (
+        "message_id",
+        "target_type",
+        "target_id",
+        "intent",
+        "content",
+        "normalized_content",
+        "source",
+        "created_at",
+    ),
+)
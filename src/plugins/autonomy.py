@@ -6,8 +6,8 @@ import re
 import time
 import uuid
 from dataclasses import asdict, dataclass
-from datetime import datetime
-from typing import Dict, List, Literal, Optional
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Literal, Optional
 
 from nonebot import get_bot, on_message
 from nonebot.adapters.onebot.v11 import Bot, Message, MessageEvent, PrivateMessageEvent
@@ -16,10 +16,13 @@ from nonebot.matcher import Matcher
 from nonebot_plugin_apscheduler import scheduler
 
 from src.core.config import get_settings
+from src.core.container import get_services
 from src.core.prompts import MAKO_SYSTEM_PROMPT
 from src.models.schemas import ChatRecord
+from src.services.autonomy_activity import AutonomyActivityTracker
 from src.services.chat_context import build_time_context
-from src.services.governance import GovernanceService
+from src.services.intent_classifier import classify_locally, record_teacher_label
+from src.services.keyword_matcher import extract_features
 from src.services.llm import get_deepseek_client, get_deepseek_model, has_deepseek
 from src.services.mako_context import MakoRuntimeContext
 from src.services.outbound_dedup import (
@@ -28,7 +31,6 @@ from src.services.outbound_dedup import (
     canonical_intent,
 )
 from src.services.redis import get_redis
-from src.services.storage import StorageService
 
 Action = Literal["speak", "ask_owner", "silent"]
 TargetType = Literal["group", "private", "none"]
@@ -74,16 +76,20 @@ class WhitelistCommand:
 
 
 settings = get_settings()
-storage = StorageService()
-governance = GovernanceService()
+services = get_services()
+storage = services.storage
+governance = services.governance
 outbound_dedup = OutboundDedupService(storage)
 runtime_context = MakoRuntimeContext(storage)
+activity_tracker = AutonomyActivityTracker(
+    storage,
+    max_idle_seconds=max(0, settings.autonomy_max_idle_minutes) * 60,
+)
 redis_client = get_redis()
 
 pending_memory: Dict[str, PendingAction] = {}
 cooldown_memory: Dict[str, float] = {}
 allowlist_memory: Dict[str, set[int]] = {"group": set(), "private": set()}
-last_scan_at = 0.0
 QQ_ID_PATTERN = re.compile(r"(?<!\d)([1-9]\d{4,11})(?!\d)")
 
 def now_ts() -> float:
@@ -457,29 +463,10 @@ def looks_like_suggestion(text: str) -> bool:
     stripped = text.strip()
     if not stripped:
         return False
-    keywords = (
-        "建议",
-        "可以去",
-        "要不要去",
-        "如果合适",
-        "你想不想",
-        "你可以",
-        "去群里",
-        "在群里",
-        "群里",
-        "跟他说",
-        "跟她说",
-        "私聊",
-        "主动",
-    )
-    if any(keyword in stripped for keyword in keywords):
+    features = extract_features(stripped)
+    if features.has("suggestion.keyword"):
         return True
-
-    target_words = ("群", "大家", "朋友", "好友", "同学", "他们", "她们")
-    action_words = ("说", "发", "问", "提醒", "告诉", "安慰", "关心", "问候", "晚安", "早安", "吐槽")
-    return any(target in stripped for target in target_words) and any(
-        action in stripped for action in action_words
-    )
+    return features.has("suggestion.target") and features.has("suggestion.action")
 
 
 async def is_autonomy_suggestion(text: str) -> bool:
@@ -488,6 +475,9 @@ async def is_autonomy_suggestion(text: str) -> bool:
         return False
     if not has_deepseek():
         return looks_like_suggestion(stripped)
+    local = classify_locally("autonomy", stripped)
+    if local is not None:
+        return local == "yes"
 
     prompt = f"""
 判断下面这条 owner 私聊是否是在邀请常陆茉子采取“对外社交行动”。
@@ -510,10 +500,11 @@ owner 私聊内容：
 {stripped}
 """
     estimated_cost = governance.estimate_llm_cost(len(prompt), 120)
-    budget = governance.can_consume_cost(settings.autonomy_owner_id, estimated_cost)
+    budget = governance.reserve_cost(settings.autonomy_owner_id, estimated_cost)
     if not budget.allowed:
         return looks_like_suggestion(stripped)
 
+    spent = 0.0
     try:
         client = get_deepseek_client()
         response = await asyncio.wait_for(
@@ -526,15 +517,16 @@ owner 私聊内容：
             timeout=15.0,
         )
         content = (response.choices[0].message.content or "").strip()
-        governance.consume_cost(
-            settings.autonomy_owner_id,
-            governance.estimate_llm_cost(len(prompt), len(content)),
-        )
+        spent = governance.estimate_llm_cost(len(prompt), len(content))
         data = extract_json_object(content)
-        return bool(data.get("is_autonomy"))
+        verdict = bool(data.get("is_autonomy"))
+        await asyncio.to_thread(record_teacher_label, "autonomy", stripped, "yes" if verdict else "no")
+        return verdict
     except Exception as exc:
         logger.warning(f"自主行动意图识别失败，使用关键词兜底: {exc}")
         return looks_like_suggestion(stripped)
+    finally:
+        governance.settle_cost(budget, spent)
 
 
 def approval_command(text: str) -> Optional[tuple[str, Optional[str]]]:
@@ -565,18 +557,34 @@ async def autonomy_rule(event: MessageEvent) -> bool:
 autonomy_handler = on_message(rule=autonomy_rule, priority=9, block=True)
 
 
-def format_records(records) -> str:
-    rows: List[str] = []
+def record_scope() -> Callable[[ChatRecord], bool]:
     allowed_groups = set(group_ids())
     allowed_private_users = set(private_user_ids())
+
+    def in_scope(record: ChatRecord) -> bool:
+        if record.group_id is not None:
+            return record.group_id in allowed_groups
+        return record.user_id in allowed_private_users or record.user_id == settings.autonomy_owner_id
+
+    return in_scope
+
+
+def new_activity_filter() -> Callable[[ChatRecord], bool]:
+    in_scope = record_scope()
+    # Mako's own outbound messages are results of earlier decisions, not
+    # something a new decision should react to.
+    return lambda record: record.role == "user" and in_scope(record)
+
+
+def format_records(records) -> str:
+    rows: List[str] = []
+    in_scope = record_scope()
     for record in records[-settings.autonomy_context_limit :]:
+        if not in_scope(record):
+            continue
         if record.group_id is not None:
-            if record.group_id not in allowed_groups:
-                continue
             scene = f"群{record.group_id}"
         else:
-            if record.user_id not in allowed_private_users and record.user_id != settings.autonomy_owner_id:
-                continue
             scene = f"私聊{record.user_id or 'unknown'}"
         nickname = record.nickname or str(record.user_id or "茉子")
         rows.append(f"[{record.time.strftime('%m-%d %H:%M')}][{scene}][{record.role}][{nickname}] {record.content}")
@@ -644,10 +652,11 @@ owner 原始建议：
 {{"message": "改写后的消息"}}
 """
     estimated_cost = governance.estimate_llm_cost(len(prompt), 180)
-    budget = governance.can_consume_cost(settings.autonomy_owner_id, estimated_cost)
+    budget = governance.reserve_cost(settings.autonomy_owner_id, estimated_cost)
     if not budget.allowed:
         return decision
 
+    spent = 0.0
     try:
         client = get_deepseek_client()
         response = await asyncio.wait_for(
@@ -660,16 +669,15 @@ owner 原始建议：
             timeout=15.0,
         )
         content = (response.choices[0].message.content or "").strip()
-        governance.consume_cost(
-            settings.autonomy_owner_id,
-            governance.estimate_llm_cost(len(prompt), len(content)),
-        )
+        spent = governance.estimate_llm_cost(len(prompt), len(content))
         data = extract_json_object(content)
         polished = sanitize_message_text(str(data.get("message") or ""))
         if polished:
             decision.message = polished
     except Exception as exc:
         logger.warning(f"自主行动文案润色失败，使用原候选消息: {exc}")
+    finally:
+        governance.settle_cost(budget, spent)
     return decision
 
 
@@ -678,7 +686,7 @@ async def decide(suggestion: Optional[str] = None) -> AutonomyDecision:
         return AutonomyDecision("silent", "none", None, 0.0, "high", "", "DeepSeek 未配置")
 
     target_hint = extract_target_hint(suggestion or "")
-    recent_records = storage.get_recent_global_records(hours=settings.autonomy_context_hours)
+    recent_records = storage.records_between(datetime.now() - timedelta(hours=settings.autonomy_context_hours))
     context = format_records(recent_records)
     participant_ids = [record.user_id for record in recent_records if record.user_id is not None]
     persistent_context = runtime_context.build_for_autonomy(participant_ids)
@@ -734,7 +742,7 @@ owner 建议：
 {MAKO_SYSTEM_PROMPT}
 """
     estimated_cost = governance.estimate_llm_cost(len(prompt), 800)
-    budget = governance.can_consume_cost(settings.autonomy_owner_id, estimated_cost)
+    budget = governance.reserve_cost(settings.autonomy_owner_id, estimated_cost)
     if not budget.allowed:
         return AutonomyDecision("silent", "none", None, 0.0, "high", "", budget.reason)
 
@@ -750,10 +758,7 @@ owner 建议：
             timeout=30.0,
         )
         content = (response.choices[0].message.content or "").strip()
-        governance.consume_cost(
-            settings.autonomy_owner_id,
-            governance.estimate_llm_cost(len(prompt), len(content)),
-        )
+        governance.settle_cost(budget, governance.estimate_llm_cost(len(prompt), len(content)))
         decision = parse_decision(extract_json_object(content))
         decision = apply_target_hint(decision, target_hint)
         decision = await polish_decision_message(decision, suggestion)
@@ -781,6 +786,9 @@ owner 建议：
     except Exception as exc:
         logger.warning(f"自主行动决策失败: {exc}")
         return AutonomyDecision("silent", "none", None, 0.0, "high", "", "决策失败")
+    finally:
+        # Releases the reservation when the model call itself failed.
+        governance.settle_cost(budget, 0.0)
 
 
 async def ask_owner(bot: Bot, decision: AutonomyDecision) -> None:
@@ -876,17 +884,20 @@ async def send_action(
         append_log("send_rejected", {"reason": access.reason, "target_type": target_type, "target_id": target_id})
         return False
     cost = governance.estimate_llm_cost(len(message), 0)
-    budget = governance.can_consume_cost(settings.autonomy_owner_id, cost)
+    budget = governance.reserve_cost(settings.autonomy_owner_id, cost)
     if not budget.allowed:
         append_log("send_rejected", {"reason": budget.reason, "target_type": target_type, "target_id": target_id})
         return False
-    if target_type == "group":
-        await bot.send_group_msg(group_id=target_id, message=Message(message))
-    elif target_type == "private":
-        await bot.send_private_msg(user_id=target_id, message=Message(message))
-    else:
-        return False
-    governance.consume_cost(settings.autonomy_owner_id, cost)
+    try:
+        if target_type == "group":
+            await bot.send_group_msg(group_id=target_id, message=Message(message))
+        elif target_type == "private":
+            await bot.send_private_msg(user_id=target_id, message=Message(message))
+        else:
+            return False
+        governance.settle_cost(budget, cost)
+    finally:
+        governance.settle_cost(budget, 0.0)
     set_cooldown(target_type, target_id)
     outbound_dedup.record(
         target_type=target_type,
@@ -1050,15 +1061,21 @@ async def handle_autonomy_message(matcher: Matcher, event: MessageEvent, bot: Bo
 
 @scheduler.scheduled_job("interval", minutes=max(1, settings.autonomy_scan_minutes), id="mako_autonomy_scan")
 async def autonomy_scan():
-    global last_scan_at
     if not is_enabled():
         return
-    if now_ts() - last_scan_at < max(60, settings.autonomy_scan_minutes * 60 - 5):
+    # One scan per interval across all workers (and per process without cluster mode).
+    if not await services.cluster.acquire_job(
+        "autonomy_scan", max(60, settings.autonomy_scan_minutes * 60 - 5)
+    ):
         return
-    last_scan_at = now_ts()
     try:
         bot = get_bot()
+        activity = await asyncio.to_thread(lambda: activity_tracker.check(new_activity_filter()))
+        if not activity.changed:
+            logger.debug("自主行动扫描跳过：自上次决策以来没有新动态")
+            return
         decision = await decide()
+        await asyncio.to_thread(activity_tracker.commit, activity.snapshot)
         await handle_decision(bot, decision)
     except Exception as exc:
         logger.warning(f"自主行动定时扫描失败: {exc}")
@@ -12,18 +12,31 @@ import time
 from dataclasses import dataclass
 from datetime import datetime
 
-from nonebot import on_command, on_message
-from nonebot.adapters.onebot.v11 import Bot, Message, MessageEvent, PrivateMessageEvent
+from nonebot import get_driver, on_command, on_message, on_notice
+from nonebot.adapters.onebot.v11 import (
+    Bot,
+    GroupDecreaseNoticeEvent,
+    GroupIncreaseNoticeEvent,
+    Message,
+    MessageEvent,
+    NoticeEvent,
+    PrivateMessageEvent,
+)
+from nonebot.exception import IgnoredException
 from nonebot.log import logger
 from nonebot.matcher import Matcher
+from nonebot.message import event_preprocessor
 from nonebot.params import CommandArg
 
 from src.core.config import get_settings
+from src.core.container import get_services
+from src.core.lazy import warm_up
 from src.models.schemas import ChatRecord
-from src.plugins.chat_delivery import message_text, send_reply
+from src.plugins.chat_delivery import member_directory, message_text, send_reply
 from src.plugins.chat_reminders import format_reminders, handle_reminder
+from src.services.audit_pipeline import AuditPipeline
 from src.services.chat_audit import ChatAudit
-from src.services.chat_context import ChatContextBuilder
+from src.services.chat_context import ChatContextBuilder, ImageRateLimiter
 from src.services.chat_engine import ChatEngine, ChatRequest
 from src.services.chat_policy import (
     ChatAddress,
@@ -33,22 +46,79 @@ from src.services.chat_policy import (
     should_reply,
 )
 from src.services.chat_rhythm import ChatRhythmService
-from src.services.governance import GovernanceService
+from src.services.cluster import ACQUIRED
+from src.services.image_cache import ImageDescriptionCache
 from src.services.intent import decide_intents
+from src.services.keyword_matcher import extract_features
 from src.services.llm import has_deepseek, has_openai
+from src.services.process_pool import shutdown_cpu_pool
+from src.services.read_cache import CacheInvalidationListener
+from src.services.redis import get_redis
 from src.services.relationship import RelationshipService
-from src.services.storage import StorageService
-from src.services.tool_executor import ToolExecutor
+from src.services.relationship_queue import RelationshipAbsorber
+from src.services.tool_executor import ToolRequestContext
+from src.services.vector_store import get_embedding_model
 from src.utils.message import normalize_message
 
 
 settings = get_settings()
-storage = StorageService()
-audit = ChatAudit(storage)
-context_builder = ChatContextBuilder()
+services = get_services()
+storage = services.storage
+audit_pipeline = AuditPipeline(storage)
+audit = ChatAudit(storage, pipeline=audit_pipeline)
+cache_listener = CacheInvalidationListener(get_redis)
+context_builder = ChatContextBuilder(
+    image_cache=ImageDescriptionCache(),
+    image_limiter=ImageRateLimiter(shared=services.cluster),
+)
 relationship = RelationshipService(storage=storage)
-governance = GovernanceService(storage=storage)
+relationship_absorber = RelationshipAbsorber(relationship)
+governance = services.governance
 chat_rhythm = ChatRhythmService(storage=storage)
+driver = get_driver()
+
+
+@driver.on_startup
+async def start_audit_pipeline() -> None:
+    await services.cluster.start()
+    audit_pipeline.start()
+    cache_listener.start()
+    governance.blacklist.start()
+    governance.budget.start()
+    await chat_rhythm.start()
+    relationship_absorber.start()
+    services.vector_indexer.start()
+    if settings.embedding_warmup:
+        warm_up("向量模型", get_embedding_model)
+
+
+@driver.on_shutdown
+async def flush_audit_pipeline() -> None:
+    cache_listener.stop()
+    await governance.blacklist.stop()
+    await governance.budget.stop()
+    await chat_rhythm.stop()
+    await relationship_absorber.stop()
+    await services.vector_indexer.stop()
+    governance.budget.flush()
+    await audit_pipeline.stop()
+    await services.cluster.stop()
+    shutdown_cpu_pool()
+
+
+@event_preprocessor
+async def route_to_session_owner(event: MessageEvent) -> None:
+    """In cluster mode, drop messages whose session another worker owns."""
+
+    if not services.cluster.enabled:
+        return
+    session_id = _address(event).session_id
+    claim = await services.cluster.claim_session(session_id)
+    if claim is None:
+        raise IgnoredException("session owned by another worker")
+    if claim == ACQUIRED:
+        # The session may have moved here; pick up its persisted rhythm state.
+        await asyncio.to_thread(chat_rhythm.adopt, session_id)
 
 
 @dataclass
@@ -98,6 +168,7 @@ relationship_list_handler = on_command(
 )
 relationship_correct_handler = on_command("纠正记忆", priority=8, block=True)
 relationship_delete_handler = on_command("删除记忆", priority=8, block=True)
+member_notice_handler = on_notice(priority=1, block=False)
 
 
 def _address(event: MessageEvent) -> ChatAddress:
@@ -196,7 +267,8 @@ async def _handle_chat_locked(
 ) -> None:
     """Run the ordered chat phases for one incoming OneBot event."""
 
-    tool_executor = ToolExecutor()
+    tool_request = ToolRequestContext()
+    budget = None
 
     # ingress / observe
     nickname = event.sender.card or event.sender.nickname or str(event.user_id)
@@ -265,12 +337,14 @@ async def _handle_chat_locked(
     # access / route
     if not will_reply:
         return
+    features = extract_features(user_text)
     if rhythm and rhythm.boundary:
         boundary_plan = select_reply_plan(
             user_text,
             message_type=event.message_type,
             directed=directed,
             fast_exchange=True,
+            features=features,
         )
         delay = remaining_reply_delay(
             boundary_plan,
@@ -300,15 +374,11 @@ async def _handle_chat_locked(
     if await handle_reminder(matcher, event, address, user_text):
         return
 
-    try:
-        await asyncio.to_thread(
-            relationship.absorb_user_message,
-            event.user_id,
-            nickname,
-            user_text,
-        )
-    except Exception as exc:
-        logger.warning(f"关系记忆吸收失败，继续普通聊天: {exc}")
+    # Memories from this user's earlier messages must be visible to this
+    # turn; this message itself is absorbed in the background.
+    if not await relationship_absorber.settle(event.user_id, settings.relationship_settle_seconds):
+        logger.info(f"关系记忆仍在后台吸收，本轮先使用已有记忆 user_id={event.user_id}")
+    relationship_absorber.submit(event.user_id, nickname, user_text)
 
     try:
         # enrich
@@ -322,6 +392,7 @@ async def _handle_chat_locked(
             has_image=bool(normalized.image_urls),
             has_audio=bool(normalized.audio_urls),
             face_ids=normalized.face_ids,
+            features=features,
         )
         # Search and basic image description are already part of the context
         # builder. Other capabilities are executed through the governed tool
@@ -331,7 +402,7 @@ async def _handle_chat_locked(
             for item in decisions
             if item.name not in {"search.web", "search.summarize_url", "image.describe"}
         ]
-        tool_result = await tool_executor.run(
+        tool_result = await services.tools.run(
             tool_decisions,
             event.user_id,
             user_text,
@@ -341,12 +412,15 @@ async def _handle_chat_locked(
             message_type=event.message_type,
             group_id=address.group_id,
             is_group_admin=getattr(event.sender, "role", "member") in {"admin", "owner"},
+            request=tool_request,
         )
         enriched = await context_builder.build(
             user_id=event.user_id,
             user_text=user_text,
             image_urls=normalized.image_urls,
             history=history,
+            decisions=decisions,
+            features=features,
         )
         llm_text = enriched.llm_text
         if tool_result.context_text():
@@ -359,6 +433,7 @@ async def _handle_chat_locked(
             has_audio=bool(normalized.audio_urls),
             has_tool_result=bool(tool_result.context_text()),
             fast_exchange=bool(rhythm and rhythm.force_short),
+            features=features,
         )
         request = ChatRequest(
             session_id=address.session_id,
@@ -384,7 +459,7 @@ async def _handle_chat_locked(
             else governance.estimate_llm_cost(input_chars, reply_plan.max_chars)
         )
         budget = await asyncio.to_thread(
-            governance.can_consume_cost,
+            governance.reserve_cost,
             event.user_id,
             estimated_cost,
         )
@@ -405,6 +480,7 @@ async def _handle_chat_locked(
             if reply.model == "search-fail-closed"
             else governance.estimate_llm_cost(input_chars, len(reply.text))
         )
+        await asyncio.to_thread(governance.settle_cost, budget, actual_cost)
         audit.thought(
             "chat_reply_generated",
             "模型生成普通聊天回复；仅保存输入输出摘要，不保存隐藏推理链。",
@@ -447,7 +523,6 @@ async def _handle_chat_locked(
             await matcher.send(extra_message)
         try:
             await asyncio.to_thread(chat_engine.commit, request, reply)
-            await asyncio.to_thread(governance.consume_cost, event.user_id, actual_cost)
         except Exception as exc:
             logger.warning(f"回复已发送但状态提交失败: {exc}")
         audit.progress(
@@ -469,7 +544,27 @@ async def _handle_chat_locked(
         logger.exception(f"聊天请求处理失败: {exc}")
         await matcher.send(Message("哼哼，茉子大人今天有点累了，不想理你~ (´-ω-`)"))
     finally:
-        tool_executor.cleanup_temp_files()
+        tool_request.cleanup_temp_files()
+        if budget is not None:
+            # No-op once settled; releases the estimate when generation failed.
+            governance.settle_cost(budget, 0.0)
+
+
+@member_notice_handler.handle()
+async def handle_member_notice(event: NoticeEvent, bot: Bot) -> None:
+    """Keep the member directory used for @-rendering in step with the group."""
+
+    if isinstance(event, GroupIncreaseNoticeEvent):
+        await member_directory.member_joined(bot, event.group_id, event.user_id)
+    elif isinstance(event, GroupDecreaseNoticeEvent):
+        member_directory.member_left(event.group_id, event.user_id, self_id=event.self_id)
+    elif event.notice_type == "group_card":
+        # Not modelled by the V11 adapter; NapCat/go-cqhttp send card_new/card_old.
+        member_directory.card_changed(
+            getattr(event, "group_id", 0),
+            getattr(event, "user_id", 0),
+            str(getattr(event, "card_new", "") or ""),
+        )
 
 
 @list_reminders_handler.handle()
@@ -12,6 +12,8 @@ from nonebot.adapters.onebot.v11 import (
 from nonebot.log import logger
 from nonebot.matcher import Matcher
 
+from src.services.keyword_matcher import KeywordAutomaton
+from src.services.member_directory import GroupMemberDirectory, GroupRoster
 from src.utils.message import normalize_message
 
 
@@ -32,11 +34,7 @@ async def message_text(event: MessageEvent, bot: Bot) -> str:
             continue
         try:
             user_id = int(segment.data["qq"])
-            member = await bot.get_group_member_info(
-                group_id=event.group_id,
-                user_id=user_id,
-            )
-            nickname = member.get("card") or member.get("nickname")
+            nickname = await member_directory.display_name(bot, event.group_id, user_id)
             if nickname:
                 parts.append(f"{nickname} ")
         except Exception as exc:
@@ -44,20 +42,44 @@ async def message_text(event: MessageEvent, bot: Bot) -> str:
     return "".join(parts).strip()
 
 
+class MentionRenderer:
+    """Per-group automata over member display names.
+
+    A group's automaton is rebuilt only when its roster is replaced or
+    changes version, so a reply is rendered in one pass over its text.
+    """
+
+    def __init__(self) -> None:
+        self._automata: dict[int, tuple[GroupRoster, int, KeywordAutomaton]] = {}
+
+    def render(self, group_id: int, roster: GroupRoster, text: str) -> Message:
+        cached = self._automata.get(group_id)
+        if cached is None or cached[0] is not roster or cached[1] != roster.version:
+            cached = (roster, roster.version, KeywordAutomaton(roster.users))
+            self._automata[group_id] = cached
+        return _render_mentions(text, cached[2], roster.users)
+
+
+member_directory = GroupMemberDirectory()
+mention_renderer = MentionRenderer()
+
+
 def render_group_text(text: str, name_to_user: dict[str, int]) -> Message:
     """Convert display-name occurrences to @ segments, preferring long names."""
 
-    names = sorted(name_to_user, key=len, reverse=True)
+    return _render_mentions(text, KeywordAutomaton(name_to_user), name_to_user)
+
+
+def _render_mentions(text: str, automaton: KeywordAutomaton, name_to_user: dict[str, int]) -> Message:
     segments: list[MessageSegment] = []
     position = 0
-    while position < len(text):
-        name = next((item for item in names if text.startswith(item, position)), None)
-        if name:
-            segments.append(MessageSegment.at(name_to_user[name]))
-            position += len(name)
-        else:
-            segments.append(MessageSegment.text(text[position]))
-            position += 1
+    for start, end, name in automaton.leftmost_longest(text):
+        if start > position:
+            segments.append(MessageSegment.text(text[position:start]))
+        segments.append(MessageSegment.at(name_to_user[name]))
+        position = end
+    if position < len(text):
+        segments.append(MessageSegment.text(text[position:]))
     return Message(segments)
 
 
@@ -73,14 +95,10 @@ async def send_reply(
         await matcher.send(Message(text))
         return
     try:
-        members = await bot.get_group_member_list(group_id=event.group_id)
-        name_to_user = {
-            member.get("card") or member.get("nickname"): member["user_id"]
-            for member in members
-            if member.get("card") or member.get("nickname")
-        }
+        roster = await member_directory.roster(bot, event.group_id)
         await matcher.send(
-            MessageSegment.reply(event.message_id) + render_group_text(text, name_to_user)
+            MessageSegment.reply(event.message_id)
+            + mention_renderer.render(event.group_id, roster, text)
         )
     except Exception as exc:
         logger.warning(f"群成员提及渲染失败，回退为纯文本: {exc}")
@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 from typing import Optional
 
 from nonebot import get_bot, get_driver
@@ -11,6 +12,9 @@ from nonebot.log import logger
 from nonebot.matcher import Matcher
 from nonebot_plugin_apscheduler import scheduler
 
+from src.core.config import get_settings
+from src.core.container import get_services
+from src.plugins.due_scheduling import due_wheel
 from src.services.chat_policy import ChatAddress
 from src.services.reminder import (
     Reminder,
@@ -18,11 +22,13 @@ from src.services.reminder import (
     ReminderIntentParser,
     generate_job_id,
 )
-from src.services.storage import StorageService
 
 
 reminder_parser = ReminderIntentParser()
-reminder_book = ReminderBook(storage=StorageService())
+reminder_book = ReminderBook(storage=get_services().storage)
+# Restore registers jobs only up to this moment; the due wheel extends the
+# window before the next later reminder comes due.
+_scheduled_until: Optional[datetime] = None
 
 
 async def send_group_reminder(
@@ -32,6 +38,14 @@ async def send_group_reminder(
     message: str,
     at_all: bool = False,
 ) -> None:
+    services = get_services()
+    if services.cluster.enabled:
+        # Every worker restores every reminder; only one may send it, and not after
+        # another worker cancelled it.
+        if not await services.cluster.acquire_job(f"reminder:{job_id}", 3600):
+            return
+        if await asyncio.to_thread(services.storage.get_reminder, job_id) is None:
+            return
     try:
         bot = get_bot()
         outgoing = Message([])
@@ -86,37 +100,68 @@ def _schedule_reminder(
     return reminder
 
 
+def _restore_horizon() -> timedelta:
+    return timedelta(hours=max(1, get_settings().reminder_restore_horizon_hours))
+
+
+def _register_restored_job(reminder: Reminder) -> None:
+    scheduler.add_job(
+        send_group_reminder,
+        "date",
+        run_date=reminder.remind_time,
+        args=[
+            reminder.group_id,
+            reminder.session_id,
+            reminder.job_id,
+            reminder.content,
+            False,
+        ],
+        id=reminder.job_id,
+        misfire_grace_time=300,
+        replace_existing=True,
+    )
+
+
+def _extend_reminder_horizon(now: datetime) -> int:
+    """Register jobs for reminders due before ``now + horizon`` that have none yet."""
+    global _scheduled_until
+    until = now + _restore_horizon()
+    batch = reminder_book.upcoming(_scheduled_until, until)
+    for reminder in batch:
+        _register_restored_job(reminder)
+    _scheduled_until = until
+    return len(batch)
+
+
+def _next_horizon_extension() -> Optional[datetime]:
+    if _scheduled_until is None:
+        return None
+    next_time = reminder_book.next_after(_scheduled_until)
+    return next_time - _restore_horizon() if next_time else None
+
+
+async def _run_horizon_extension(now: datetime) -> None:
+    registered = await asyncio.to_thread(_extend_reminder_horizon, now)
+    logger.info("提醒调度窗口已延长 registered={} until={}", registered, _scheduled_until)
+
+
+due_wheel.register("reminder_horizon", _next_horizon_extension, _run_horizon_extension)
+
+
 @get_driver().on_startup
 async def restore_persisted_reminders() -> None:
-    """Re-register future reminders after a process restart."""
+    """Drop expired reminders in one batch and re-register only the next horizon."""
 
     now = datetime.now()
-    restored = 0
-    expired = 0
-    for reminder in reminder_book.list_all():
-        if reminder.remind_time <= now:
-            reminder_book.remove(reminder.session_id, reminder.job_id)
-            expired += 1
-            continue
-        if scheduler.get_job(reminder.job_id) is not None:
-            continue
-        scheduler.add_job(
-            send_group_reminder,
-            "date",
-            run_date=reminder.remind_time,
-            args=[
-                reminder.group_id,
-                reminder.session_id,
-                reminder.job_id,
-                reminder.content,
-                False,
-            ],
-            id=reminder.job_id,
-            misfire_grace_time=300,
-            replace_existing=True,
-        )
-        restored += 1
-    logger.info("提醒恢复完成 restored={} expired_removed={}", restored, expired)
+    expired = await asyncio.to_thread(reminder_book.expire, now)
+    restored = await asyncio.to_thread(_extend_reminder_horizon, now)
+    due_wheel.notify(await asyncio.to_thread(_next_horizon_extension))
+    logger.info(
+        "提醒恢复完成 restored={} expired_removed={} horizon_until={}",
+        restored,
+        len(expired),
+        _scheduled_until,
+    )
 
 
 async def handle_reminder(
@@ -166,7 +211,8 @@ async def handle_reminder(
 
     if intent == "DELETE":
         try:
-            scheduler.remove_job(current.job_id)
+            if scheduler.get_job(current.job_id) is not None:
+                scheduler.remove_job(current.job_id)
         except Exception as exc:
             logger.warning(f"移除提醒任务失败: {exc}")
         reminder_book.remove(address.session_id, current.job_id)
@@ -185,7 +231,8 @@ async def handle_reminder(
                 replace_existing=True,
             )
             if updated.job_id != current.job_id:
-                scheduler.remove_job(current.job_id)
+                if scheduler.get_job(current.job_id) is not None:
+                    scheduler.remove_job(current.job_id)
                 reminder_book.remove(address.session_id, current.job_id)
         except Exception as exc:
             logger.exception(f"更新提醒失败: {exc}")
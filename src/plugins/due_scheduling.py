@@ -0,0 +1,35 @@
+"""Binds the shared due-time wheel to APScheduler.
+
+Reminders and relationship follow-ups both register sources on the wheel and
+import it from here, so it is attached exactly once on startup whichever of
+them is enabled, before their own startup hooks notify it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from nonebot import get_driver
+from nonebot.log import logger
+from nonebot_plugin_apscheduler import scheduler
+
+from src.core.config import get_settings
+from src.core.container import get_services
+from src.services.due_wheel import due_wheel
+
+__all__ = ["due_wheel"]
+
+
+@get_driver().on_startup
+async def attach_due_wheel() -> None:
+    next_at = await asyncio.to_thread(
+        due_wheel.attach,
+        scheduler,
+        retry_seconds=max(1, get_settings().proactive_scan_minutes) * 60,
+        coordinator=get_services().cluster,
+    )
+    logger.info(
+        "到期定时已挂载 sources={} next_due={}",
+        ",".join(sorted(due_wheel.sources)),
+        next_at.isoformat() if next_at else "none",
+    )
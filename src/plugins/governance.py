@@ -4,13 +4,13 @@ from nonebot import on_command
 from nonebot.adapters.onebot.v11 import MessageEvent
 from nonebot.matcher import Matcher
 
-from src.services.governance import GovernanceService
-from src.services.storage import StorageService
+from src.core.container import get_services
 
 admin_cmd = on_command("mako-admin", aliases={"茉子管理"}, priority=8, block=True)
 
-governance = GovernanceService()
-storage = StorageService()
+services = get_services()
+governance = services.governance
+storage = services.storage
 
 
 @admin_cmd.handle()
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import time
 
 from fastapi.responses import JSONResponse
 from nonebot import get_driver
@@ -10,6 +11,8 @@ from nonebot.log import logger
 
 from src.core.config import get_settings
 from src.services.llm import has_deepseek, has_openai
+from src.services.loop_monitor import loop_monitor, loop_monitor_snapshot
+from src.services.process_pool import cpu_pool_snapshot
 from src.services.redis import get_redis
 
 
@@ -30,12 +33,32 @@ def readiness_snapshot() -> tuple[bool, dict]:
         "redis": "ok" if redis_ok else "unavailable",
         "llm": "configured" if llm_ok else "not_configured",
     }
+    pool = cpu_pool_snapshot()
+    if pool is not None:
+        # Informational only: a saturated pool sheds work but the bot stays ready.
+        full = pool["inflight"] >= pool["workers"] + get_settings().cpu_pool_max_queue
+        checks["cpu_pool"] = "saturated" if full else "ok"
+    loop = loop_monitor_snapshot()
+    if loop is not None:
+        # Informational like cpu_pool: a slow loop still answers, just late.
+        lagging = loop["lag_p95_ms"] > settings.loop_stall_threshold_seconds * 1000
+        checks["event_loop"] = "lagging" if lagging else "ok"
     ready = (redis_ok or not settings.redis_required) and (
         llm_ok or not settings.llm_required
     )
     return ready, checks
 
 
+@driver.on_startup
+async def start_loop_monitor() -> None:
+    loop_monitor().start()
+
+
+@driver.on_shutdown
+async def stop_loop_monitor() -> None:
+    await loop_monitor().stop()
+
+
 @driver.on_startup
 async def mount_health_routes() -> None:
     app = getattr(driver, "server_app", None)
@@ -50,7 +73,20 @@ async def mount_health_routes() -> None:
     @app.get("/readyz", include_in_schema=False)
     async def readyz() -> JSONResponse:
         ready, checks = await asyncio.to_thread(readiness_snapshot)
+        payload = {"status": "ready" if ready else "not_ready", "checks": checks}
+        loop = loop_monitor_snapshot()
+        if loop is not None:
+            payload["event_loop"] = loop
         return JSONResponse(
-            {"status": "ready" if ready else "not_ready", "checks": checks},
+            payload,
             status_code=200 if ready else 503,
         )
+
+    from src.app import PROCESS_STARTED_AT
+
+    elapsed = time.monotonic() - PROCESS_STARTED_AT
+    target = get_settings().startup_target_seconds
+    if elapsed > target:
+        logger.warning(f"启动耗时 {elapsed:.1f}s，超过目标 {target:.1f}s；可用 mako-bot --profile-startup 排查")
+    else:
+        logger.info(f"健康检查已就绪，启动耗时 {elapsed:.1f}s")
@@ -9,17 +9,20 @@ from nonebot.params import ArgPlainText, CommandArg
 from nonebot.adapters.onebot.v11 import Message
 from nonebot_plugin_apscheduler import scheduler
 
+from src.core.container import get_services
 from src.services.knowledge_precipitation import KnowledgePrecipitationService
-from src.services.storage import StorageService
 
 
-service = KnowledgePrecipitationService()
-storage = StorageService()
+services = get_services()
+storage = services.storage
+service = KnowledgePrecipitationService(storage=storage, vector_store=services.vector_store)
 memory_handler = on_command("可塑性记忆", aliases={"memory"}, priority=10, block=True)
 
 
 @scheduler.scheduled_job("cron", hour=22, minute=0, id="mako_daily_knowledge")
 async def precipitate_knowledge() -> None:
+    if not await services.cluster.acquire_job("daily_knowledge", 3600):
+        return
     try:
         result = await service.run(hours=24)
         if result.skipped_reason:
@@ -1,67 +1,88 @@
-"""Scheduled delivery of due relationship promises."""
+"""Delivery of due relationship promises, armed by the due-time wheel."""
 
 from __future__ import annotations
 
 import asyncio
+from datetime import datetime
 
 from nonebot import get_bot
 from nonebot.adapters.onebot.v11 import Message
 from nonebot.log import logger
-from nonebot_plugin_apscheduler import scheduler
 
 from src.core.config import get_settings
+from src.core.container import get_services
+from src.plugins.due_scheduling import due_wheel
 from src.services.outbound_dedup import OutboundDedupService
 from src.services.relationship import RelationshipService
-from src.services.storage import StorageService
 
 
 settings = get_settings()
-storage = StorageService()
+storage = get_services().storage
 relationship = RelationshipService(storage=storage)
 dedup = OutboundDedupService(storage)
 
 
-@scheduler.scheduled_job(
-    "interval",
-    minutes=max(1, settings.proactive_scan_minutes),
-    id="mako_relationship_followups",
-)
-async def deliver_due_followups() -> None:
+FOLLOWUP_BATCH = 20
+
+
+async def deliver_due_followups(now: datetime | None = None) -> None:
     if not settings.proactive_enabled:
         return
-    due = await asyncio.to_thread(relationship.get_due_followups, 20)
-    if not due:
-        return
+    while True:
+        due = await asyncio.to_thread(relationship.get_due_followups, FOLLOWUP_BATCH)
+        if not due:
+            return
+        delivered = 0
+        for memory in due:
+            if await _deliver_followup(memory):
+                delivered += 1
+        # A full batch that all went out may have more behind it; anything
+        # left undelivered is retried by the wheel later.
+        if len(due) < FOLLOWUP_BATCH or delivered < len(due):
+            return
+
+
+async def _deliver_followup(memory) -> bool:
     bot = get_bot()
-    for memory in due:
-        message = f"之前说过要跟进这件事：{memory.content}\n现在进展怎么样啦？"
-        decision = await asyncio.to_thread(
-            dedup.check,
+    message = f"之前说过要跟进这件事：{memory.content}\n现在进展怎么样啦？"
+    decision = await asyncio.to_thread(
+        dedup.check,
+        target_type="private",
+        target_id=memory.user_id,
+        intent="reminder",
+        content=message,
+    )
+    if not decision.allowed:
+        return False
+    try:
+        await bot.send_private_msg(user_id=memory.user_id, message=Message(message))
+        await asyncio.to_thread(
+            dedup.record,
             target_type="private",
             target_id=memory.user_id,
             intent="reminder",
             content=message,
+            source="relationship.followup",
+        )
+        await asyncio.to_thread(
+            relationship.mark_done,
+            memory.user_id,
+            memory.memory_id,
         )
-        if not decision.allowed:
-            continue
-        try:
-            await bot.send_private_msg(user_id=memory.user_id, message=Message(message))
-            await asyncio.to_thread(
-                dedup.record,
-                target_type="private",
-                target_id=memory.user_id,
-                intent="reminder",
-                content=message,
-                source="relationship.followup",
-            )
-            await asyncio.to_thread(
-                relationship.mark_done,
-                memory.user_id,
-                memory.memory_id,
-            )
-        except Exception:
-            logger.exception(
-                "关系跟进发送失败 user_id={} memory_id={}",
-                memory.user_id,
-                memory.memory_id,
-            )
+    except Exception:
+        logger.exception(
+            "关系跟进发送失败 user_id={} memory_id={}",
+            memory.user_id,
+            memory.memory_id,
+        )
+        return False
+    return True
+
+
+def _next_followup_due() -> datetime | None:
+    if not settings.proactive_enabled:
+        return None
+    return storage.next_followup_due()
+
+
+due_wheel.register("relationship_followups", _next_followup_due, deliver_due_followups)
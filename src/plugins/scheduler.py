@@ -13,13 +13,16 @@ from nonebot.matcher import Matcher
 from nonebot_plugin_apscheduler import scheduler
 
 from src.core.config import get_settings
+from src.core.container import get_services
 from src.models.schemas import ChatRecord
 from src.services.news import fetch_juejin, fetch_tianxin, yesterday
 from src.services.outbound_dedup import OutboundDedupService
-from src.services.storage import StorageService
 
 
-_storage = StorageService()
+_services = get_services()
+_storage = _services.storage
+# Daily jobs keep their cluster lock this long so a worker firing a little late skips them.
+_DAILY_JOB_LOCK_SECONDS = 3600
 _outbound_dedup = OutboundDedupService(_storage)
 daily_news_matcher = on_command(
     "精选文章", aliases={"news", "今日新闻", "日报"}, priority=5, block=True
@@ -140,6 +143,8 @@ def _digest_fingerprints(sections: list[tuple[str, list[dict]]]) -> list[str]:
 
 @scheduler.scheduled_job("cron", hour=7, minute=0, id="mako_good_morning")
 async def good_morning_mako() -> None:
+    if not await _services.cluster.acquire_job("good_morning", _DAILY_JOB_LOCK_SECONDS):
+        return
     choices = [
         "早上好哦，各位！今天也是元气满满的一天~",
         "早上好！新的一天也要好好照顾自己哦。",
@@ -160,6 +165,8 @@ async def good_morning_mako() -> None:
 
 @scheduler.scheduled_job("cron", hour=7, minute=10, id="mako_daily_digest")
 async def send_daily_digest() -> None:
+    if not await _services.cluster.acquire_job("daily_digest", _DAILY_JOB_LOCK_SECONDS):
+        return
     try:
         digest_date, sections = await _fetch_digest_sections()
         message = _render_digest(digest_date, sections)
@@ -2,10 +2,10 @@ from typing import List
 
 from nonebot.log import logger
 
-from src.services.vector_store import VectorStore
+from src.core.container import get_services
 
 
-_vector_store = VectorStore()
+_vector_store = get_services().vector_store
 
 
 def create_db():
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from src.services.storage import StorageService
 
 
 class AffinityService:
-    def __init__(self) -> None:
-        self.storage = StorageService()
+    def __init__(self, storage: Optional[StorageService] = None) -> None:
+        self.storage = storage or StorageService()
 
     def get_score(self, user_id: int) -> int:
         return self.storage.get_affinity(user_id)
@@ -0,0 +1,247 @@
+"""Non-blocking audit emission.
+
+Request handlers only append to an in-process ring buffer.  A background task
+drains the buffer into a Redis Stream (``XADD ... MAXLEN ~``) and a consumer
+group materializes the thought-trace / progress-event views in batches.  A
+slow or unavailable Redis therefore costs audit entries, never reply latency.
+
+Every process reads under its own consumer name, so entries a previous
+process read but never acknowledged would stay pending forever; they are
+taken over with ``XAUTOCLAIM`` once idle for ``AUDIT_CLAIM_IDLE_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.storage import StorageService
+
+AUDIT_STREAM_KEY = "audit:stream"
+AUDIT_CONSUMER_GROUP = "audit-materializer"
+AUDIT_METHODS = {"append_progress_event", "append_thought_trace"}
+
+
+class AuditPipeline:
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        *,
+        buffer_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        stream_maxlen: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+        claim_idle_seconds: Optional[float] = None,
+    ) -> None:
+        settings = get_settings()
+        self.storage = storage or StorageService()
+        self.buffer_size = max(1, buffer_size or settings.audit_buffer_size)
+        self.batch_size = max(1, batch_size or settings.audit_batch_size)
+        self.stream_maxlen = max(self.batch_size, stream_maxlen or settings.audit_stream_maxlen)
+        self.flush_seconds = max(0.05, flush_seconds or settings.audit_flush_seconds)
+        self.claim_idle_seconds = max(
+            1.0, settings.audit_claim_idle_seconds if claim_idle_seconds is None else claim_idle_seconds
+        )
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
+        self._buffer: Deque[tuple[str, Dict[str, Any]]] = deque(maxlen=self.buffer_size)
+        self._lock = Lock()
+        self._group_ready = False
+        self._recover_pending = True
+        self._next_claim_at = 0.0
+        self._claim_cursor = "0-0"
+        self._task: Optional[asyncio.Task] = None
+        self.emitted = 0
+        self.dropped = 0
+        self.streamed = 0
+        self.materialized = 0
+        self.claimed = 0
+        self.failures = 0
+
+    def emit(self, method_name: str, payload: Dict[str, Any]) -> None:
+        """Queue an audit entry. Never blocks and never raises."""
+        if method_name not in AUDIT_METHODS:
+            return
+        with self._lock:
+            if len(self._buffer) >= self.buffer_size:
+                # deque(maxlen) evicts the oldest entry; newer audit wins.
+                self.dropped += 1
+            self._buffer.append((method_name, payload))
+            self.emitted += 1
+
+    def drain(self) -> int:
+        """Move buffered entries to Redis and materialize what is ready. Runs off the event loop."""
+        entries = self._take(self.batch_size * 4)
+        redis_client = self.storage.redis
+        if not redis_client:
+            return self._materialize(entries)
+        if entries:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for method_name, payload in entries:
+                    pipe.xadd(
+                        AUDIT_STREAM_KEY,
+                        {"method": method_name, "payload": json.dumps(payload, ensure_ascii=False, default=str)},
+                        maxlen=self.stream_maxlen,
+                        approximate=True,
+                    )
+                pipe.execute()
+                self.streamed += len(entries)
+            except Exception as exc:
+                self.failures += 1
+                self.dropped += len(entries)
+                logger.warning(f"审计流写入失败，丢弃 {len(entries)} 条审计: {exc}")
+                return 0
+        written = 0
+        if time.monotonic() >= self._next_claim_at:
+            self._next_claim_at = time.monotonic() + self.claim_idle_seconds
+            written += self.claim_abandoned(redis_client)
+        for _ in range(4):
+            batch = self.consume(redis_client)
+            written += batch
+            if batch < self.batch_size:
+                break
+        return written
+
+    def consume(self, redis_client) -> int:
+        try:
+            self._ensure_group(redis_client)
+            # After a restart, entries delivered but never acknowledged are
+            # replayed first; afterwards only new entries are read.
+            start_id = "0" if self._recover_pending else ">"
+            response = redis_client.xreadgroup(
+                AUDIT_CONSUMER_GROUP,
+                self.consumer_name,
+                {AUDIT_STREAM_KEY: start_id},
+                count=self.batch_size,
+            )
+        except Exception as exc:
+            self.failures += 1
+            logger.warning(f"审计流读取失败: {exc}")
+            return 0
+        messages = [message for _stream, items in response or [] for message in items]
+        if self._recover_pending and not messages:
+            self._recover_pending = False
+            return self.consume(redis_client)
+        return self._process(redis_client, messages)
+
+    def claim_abandoned(self, redis_client) -> int:
+        """Take over entries another consumer read but left unacknowledged, e.g. before a restart."""
+        written = 0
+        for _ in range(4):
+            try:
+                self._ensure_group(redis_client)
+                response = redis_client.xautoclaim(
+                    AUDIT_STREAM_KEY,
+                    AUDIT_CONSUMER_GROUP,
+                    self.consumer_name,
+                    min_idle_time=int(self.claim_idle_seconds * 1000),
+                    start_id=self._claim_cursor,
+                    count=self.batch_size,
+                )
+            except Exception as exc:
+                self.failures += 1
+                logger.warning(f"审计流认领失败: {exc}")
+                break
+            next_id, messages = (response or ["0-0", []])[:2]
+            self._claim_cursor = str(next_id)
+            self.claimed += len(messages)
+            written += self._process(redis_client, messages)
+            if self._claim_cursor in {"0-0", "0"}:
+                self._claim_cursor = "0-0"
+                break
+        return written
+
+    def _process(self, redis_client, messages: List[tuple]) -> int:
+        entries: List[tuple[str, Dict[str, Any]]] = []
+        ids: List[str] = []
+        for message_id, fields in messages:
+            ids.append(message_id)
+            try:
+                entries.append((str(fields["method"]), json.loads(fields["payload"])))
+            except Exception:
+                continue
+        written = self._materialize(entries)
+        if ids:
+            try:
+                redis_client.xack(AUDIT_STREAM_KEY, AUDIT_CONSUMER_GROUP, *ids)
+            except Exception as exc:
+                self.failures += 1
+                logger.warning(f"审计流确认失败: {exc}")
+        return written
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await asyncio.to_thread(self.drain)
+            except Exception as exc:
+                self.failures += 1
+                logger.warning(f"审计后台写入失败: {exc}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.pending:
+            if not await asyncio.to_thread(self.drain):
+                break
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._buffer),
+                "emitted": self.emitted,
+                "dropped": self.dropped,
+                "streamed": self.streamed,
+                "materialized": self.materialized,
+                "claimed": self.claimed,
+                "failures": self.failures,
+            }
+
+    def _take(self, limit: int) -> List[tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            count = min(limit, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _materialize(self, entries: List[tuple[str, Dict[str, Any]]]) -> int:
+        if not entries:
+            return 0
+        try:
+            written = self.storage.append_audit_batch(entries)
+        except Exception as exc:
+            self.failures += 1
+            logger.warning(f"审计批量落库失败: {exc}")
+            return 0
+        self.materialized += written
+        return written
+
+    def _ensure_group(self, redis_client) -> None:
+        if self._group_ready:
+            return
+        try:
+            redis_client.xgroup_create(AUDIT_STREAM_KEY, AUDIT_CONSUMER_GROUP, id="0", mkstream=True)
+        except Exception as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._group_ready = True
@@ -0,0 +1,126 @@
+"""Change detection for scheduled autonomy decisions.
+
+A scheduled scan only needs the LLM when something it could react to has
+happened since the previous decision: a new user message in scope, a change to
+active goals/tasks, or a commitment that just became due.
+
+The last decision's snapshot and time live in storage (Redis when available),
+so in cluster mode every worker that wins the scan compares against the same
+cursor instead of its own stale or empty one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from src.models.schemas import ChatRecord
+from src.services.storage import StorageService
+
+
+@dataclass(frozen=True)
+class ActivitySnapshot:
+    record_cursor: int
+    goal_signature: str
+    due_commitments: frozenset[str] = field(default_factory=frozenset)
+
+
+@dataclass(frozen=True)
+class ActivityCheck:
+    changed: bool
+    reason: str
+    snapshot: ActivitySnapshot
+    new_record_count: int = 0
+
+
+class AutonomyActivityTracker:
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        *,
+        max_idle_seconds: float = 0.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.storage = storage or StorageService()
+        self.max_idle_seconds = max(0.0, max_idle_seconds)
+        self.clock = clock
+        self.last: Optional[ActivitySnapshot] = None
+        self.last_decided_at = 0.0
+
+    def check(self, is_relevant: Callable[[ChatRecord], bool] = lambda _record: True) -> ActivityCheck:
+        self._load()
+        previous = self.last
+        cursor = previous.record_cursor if previous else 0
+        record_cursor, records = self.storage.list_global_records_since(cursor)
+        snapshot = ActivitySnapshot(
+            record_cursor=record_cursor,
+            goal_signature=self._goal_signature(),
+            due_commitments=self._due_commitments(),
+        )
+        if previous is None:
+            return ActivityCheck(True, "first_scan", snapshot)
+        relevant = [record for record in records if is_relevant(record)]
+        if relevant:
+            return ActivityCheck(True, "new_activity", snapshot, len(relevant))
+        if snapshot.goal_signature != previous.goal_signature:
+            return ActivityCheck(True, "goal_changed", snapshot)
+        if snapshot.due_commitments - previous.due_commitments:
+            return ActivityCheck(True, "commitment_due", snapshot)
+        if self.max_idle_seconds and self.clock() - self.last_decided_at >= self.max_idle_seconds:
+            return ActivityCheck(True, "idle_timeout", snapshot)
+        return ActivityCheck(False, "no_change", snapshot)
+
+    def commit(self, snapshot: ActivitySnapshot) -> None:
+        self.last = snapshot
+        self.last_decided_at = self.clock()
+        try:
+            self.storage.save_autonomy_activity(
+                {
+                    "record_cursor": snapshot.record_cursor,
+                    "goal_signature": snapshot.goal_signature,
+                    "due_commitments": sorted(snapshot.due_commitments),
+                    "decided_at": self.last_decided_at,
+                }
+            )
+        except Exception:
+            # The local copy still spares this worker's next scan.
+            pass
+
+    def _load(self) -> None:
+        """Adopt the last decision committed by any worker, if storage has one."""
+        try:
+            state = self.storage.get_autonomy_activity()
+        except Exception:
+            return
+        if not state:
+            return
+        try:
+            self.last = ActivitySnapshot(
+                record_cursor=int(state["record_cursor"]),
+                goal_signature=str(state["goal_signature"]),
+                due_commitments=frozenset(str(item) for item in state.get("due_commitments", ())),
+            )
+            self.last_decided_at = float(state.get("decided_at", 0.0))
+        except (KeyError, TypeError, ValueError):
+            return
+
+    def _goal_signature(self) -> str:
+        parts: list[str] = []
+        try:
+            for goal in self.storage.list_autonomy_goals(status="active", limit=6):
+                parts.append(f"g:{goal.goal_id}:{goal.updated_at.isoformat()}")
+            for status in ("doing", "todo"):
+                for task in self.storage.list_autonomy_tasks(status=status, limit=6):
+                    parts.append(f"t:{task.task_id}:{task.status}:{task.updated_at.isoformat()}")
+        except Exception:
+            return ""
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _due_commitments(self) -> frozenset[str]:
+        try:
+            memories = self.storage.list_due_followups(limit=20)
+        except Exception:
+            return frozenset()
+        return frozenset(f"{memory.user_id}:{memory.memory_id}" for memory in memories)
@@ -0,0 +1,147 @@
+"""In-process mirror of the Redis blacklist sets.
+
+``GovernanceService.can_chat`` runs for every incoming message and again for
+every tool decision, and each call used to issue one or two ``SISMEMBER``
+round-trips from the event loop.  The sets change only when an admin runs
+``mako-admin block/unblock``, so :class:`BlacklistMirror` keeps an immutable
+snapshot of both and answers admission checks with local set lookups.
+
+A snapshot is reloaded when
+
+* a blacklist write in this or another process publishes
+  ``BLACKLIST_CACHE_KEY`` on the cache invalidation channel;
+* the periodic poll sees ``blacklist:version`` differ from the snapshot's
+  (a missed pub/sub message is caught within ``BLACKLIST_REFRESH_SECONDS``);
+* the storage backend changes (Redis reconnect).
+
+Without Redis the in-memory sets are already local and are read directly.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.read_cache import on_invalidation
+from src.services.storage import BLACKLIST_CACHE_KEY, StorageService
+
+_UNLOADED = object()
+
+
+@dataclass(frozen=True)
+class BlacklistSnapshot:
+    version: int = -1
+    users: FrozenSet[int] = field(default_factory=frozenset)
+    groups: FrozenSet[int] = field(default_factory=frozenset)
+
+
+class BlacklistMirror:
+    def __init__(self, storage: StorageService, *, refresh_seconds: Optional[float] = None) -> None:
+        self.storage = storage
+        self.refresh_seconds = (
+            get_settings().blacklist_refresh_seconds if refresh_seconds is None else refresh_seconds
+        )
+        self._snapshot = BlacklistSnapshot()
+        self._source: Any = _UNLOADED
+        self._stale = False
+        self._reload_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.failures = 0
+        on_invalidation(BLACKLIST_CACHE_KEY, self.invalidate)
+
+    def is_user_blocked(self, user_id: int, *, redis_client: Any = _UNLOADED) -> bool:
+        client = self.storage.redis if redis_client is _UNLOADED else redis_client
+        if not client:
+            return self.storage.is_user_blacklisted(user_id)
+        return user_id in self._current(client).users
+
+    def is_group_blocked(self, group_id: int, *, redis_client: Any = _UNLOADED) -> bool:
+        client = self.storage.redis if redis_client is _UNLOADED else redis_client
+        if not client:
+            return self.storage.is_group_blacklisted(group_id)
+        return group_id in self._current(client).groups
+
+    def invalidate(self) -> None:
+        """Reload now; called for local writes and for messages from other processes."""
+        client = self.storage.redis
+        if client:
+            self.reload(client)
+
+    def reload(self, client: Any) -> bool:
+        with self._reload_lock:
+            try:
+                version, users, groups = self.storage.get_blacklist_snapshot()
+            except Exception as exc:
+                # Keep answering from the old snapshot; the poll retries.
+                self.failures += 1
+                self._source = client
+                self._stale = True
+                logger.warning(f"黑名单快照加载失败，继续使用旧快照: {exc}")
+                return False
+            self._snapshot = BlacklistSnapshot(version, frozenset(users), frozenset(groups))
+            self._source = client
+            self._stale = False
+            self.reloads += 1
+            return True
+
+    def poll(self) -> None:
+        """Reload if the shared version moved; cheap enough to run every few seconds."""
+        client = self.storage.redis
+        if not client:
+            return
+        if self._stale or client is not self._source:
+            self.reload(client)
+            return
+        try:
+            version = self.storage.get_blacklist_version()
+        except Exception as exc:
+            logger.debug(f"黑名单版本检查失败: {exc}")
+            return
+        if version != self._snapshot.version:
+            self.reload(client)
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if self.refresh_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def snapshot(self) -> Dict[str, int]:
+        current = self._snapshot
+        return {
+            "version": current.version,
+            "users": len(current.users),
+            "groups": len(current.groups),
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+    def _current(self, client: Any) -> BlacklistSnapshot:
+        if client is not self._source:
+            # First use or a new connection: one blocking load, then local again.
+            self.reload(client)
+        return self._snapshot
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await asyncio.to_thread(self.poll)
+            except Exception as exc:
+                logger.debug(f"黑名单轮询失败: {exc}")
@@ -0,0 +1,213 @@
+"""Daily cost budget with atomic reservations and a local lease.
+
+The old check-then-charge flow read both daily counters, compared in Python
+and charged them later: six Redis round-trips per tool call or reply, and
+parallel tools could all pass the check before any of them was charged.
+
+:class:`CostBudget` reserves the estimated cost up front with one Lua script
+that checks both limits and charges both counters atomically, then settles
+the actual cost once it is known.  When a reservation goes to Redis it also
+pre-charges up to ``BUDGET_LOCAL_LEASE`` of extra budget for that user; later
+reservations are served from this local credit without touching Redis until
+it runs out.  Credit is already counted in Redis, so the budget can never be
+overspent, only over-reported by the credit processes are holding.
+
+That over-report is bounded: a process never holds more than
+``BUDGET_LEASE_MAX_OUTSTANDING`` of credit across all users (further
+reservations go to Redis without a lease), and a user's credit goes back to
+the shared counters once they have been idle for ``BUDGET_LEASE_IDLE_SECONDS``
+(returned by the background loop), when a settlement pushes it past one
+lease, and on :meth:`CostBudget.flush` (shutdown).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.storage import StorageService
+
+# Costs are small floats; a lease split into equal parts must cover the last one.
+_EPSILON = 1e-9
+_EXHAUSTED = {
+    "global": "global daily budget exhausted",
+    "user": "user daily budget exhausted",
+}
+
+
+@dataclass
+class CostReservation:
+    user_id: int
+    amount: float
+    at: datetime
+    allowed: bool = True
+    reason: str = ""
+    settled: bool = field(default=False, compare=False)
+
+
+class CostBudget:
+    def __init__(
+        self,
+        storage: StorageService,
+        *,
+        lease: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.settings = get_settings()
+        self.storage = storage
+        self.lease = max(0.0, self.settings.budget_local_lease if lease is None else lease)
+        self.max_outstanding = max(0.0, self.settings.budget_lease_max_outstanding)
+        self.idle_seconds = self.settings.budget_lease_idle_seconds
+        self.clock = clock
+        # (day, user_id) -> budget already charged in Redis but not yet used.
+        self._credit: Dict[Tuple[str, int], float] = {}
+        # (day, user_id) -> clock() of the last reservation or settlement.
+        self._touched: Dict[Tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.local_reservations = 0
+        self.remote_reservations = 0
+        self.rejections = 0
+        self.idle_returns = 0
+
+    def reserve(self, user_id: int, amount: float, *, now: Optional[datetime] = None) -> CostReservation:
+        now = now or datetime.now()
+        amount = max(0.0, amount)
+        if not self.settings.cost_control_enabled:
+            # Nothing to enforce; the actual cost is still recorded on settle.
+            return CostReservation(user_id, 0.0, now)
+        key = (now.strftime("%Y%m%d"), user_id)
+        with self._lock:
+            self._touched[key] = self.clock()
+            credit = self._credit.get(key, 0.0)
+            if credit + _EPSILON >= amount:
+                self._credit[key] = max(0.0, credit - amount)
+                self.local_reservations += 1
+                return CostReservation(user_id, amount, now)
+            # Only lease what keeps this process under its outstanding-credit cap.
+            lease = min(self.lease, max(0.0, self.max_outstanding - sum(self._credit.values())))
+        allowed, scope, extra = self.storage.reserve_cost(
+            user_id,
+            amount,
+            lease=lease,
+            global_limit=self.settings.daily_cost_limit_global,
+            user_limit=self.settings.daily_cost_limit_user,
+            at=now,
+        )
+        self.remote_reservations += 1
+        if not allowed:
+            self.rejections += 1
+            return CostReservation(user_id, 0.0, now, allowed=False, reason=_EXHAUSTED.get(scope, scope))
+        if extra:
+            with self._lock:
+                self._credit[key] = self._credit.get(key, 0.0) + extra
+        return CostReservation(user_id, amount, now)
+
+    def settle(self, reservation: CostReservation, actual: float) -> None:
+        """Replace the reserved estimate with ``actual``; later calls are no-ops."""
+        if reservation.settled or not reservation.allowed:
+            return
+        reservation.settled = True
+        delta = max(0.0, actual) - reservation.amount
+        key = (reservation.at.strftime("%Y%m%d"), reservation.user_id)
+        with self._lock:
+            self._touched[key] = self.clock()
+            credit = self._credit.get(key, 0.0) - delta
+            surplus = max(0.0, credit - self.lease)
+            self._credit[key] = max(0.0, credit) - surplus
+            # Overspend beyond the local credit, or credit beyond one lease, goes back to Redis.
+            remote = -credit if credit < 0 else -surplus
+        if remote:
+            self._adjust(reservation.user_id, remote, reservation.at)
+
+    def release(self, reservation: CostReservation) -> None:
+        self.settle(reservation, 0.0)
+
+    def check(self, user_id: int, amount: float, *, now: Optional[datetime] = None) -> Tuple[bool, str]:
+        """Read-only affordability check; answered locally when the lease covers it."""
+        now = now or datetime.now()
+        if not self.settings.cost_control_enabled:
+            return True, ""
+        with self._lock:
+            if self._credit.get((now.strftime("%Y%m%d"), user_id), 0.0) + _EPSILON >= amount:
+                return True, ""
+        if self.storage.get_daily_cost(None, at=now) + amount > self.settings.daily_cost_limit_global:
+            return False, _EXHAUSTED["global"]
+        if self.storage.get_daily_cost(user_id, at=now) + amount > self.settings.daily_cost_limit_user:
+            return False, _EXHAUSTED["user"]
+        return True, ""
+
+    def flush(self) -> None:
+        """Return all unused local credit to the shared counters."""
+        with self._lock:
+            credits, self._credit = self._credit, {}
+            self._touched.clear()
+        self._return(credits)
+
+    def return_idle(self) -> int:
+        """Return the credit of users idle for ``idle_seconds``; how many were returned."""
+        cutoff = self.clock() - self.idle_seconds
+        with self._lock:
+            idle = [key for key, touched in self._touched.items() if touched <= cutoff]
+            credits = {key: self._credit.pop(key, 0.0) for key in idle}
+            for key in idle:
+                self._touched.pop(key, None)
+        returned = self._return(credits)
+        self.idle_returns += returned
+        return returned
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if self.idle_seconds > 0 and self.lease > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            outstanding = round(sum(self._credit.values()), 6)
+        return {
+            "local_reservations": self.local_reservations,
+            "remote_reservations": self.remote_reservations,
+            "rejections": self.rejections,
+            "idle_returns": self.idle_returns,
+            "local_credit": outstanding,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_seconds)
+            try:
+                await asyncio.to_thread(self.return_idle)
+            except Exception as exc:
+                logger.debug(f"闲置预算归还失败: {exc}")
+
+    def _return(self, credits: Dict[Tuple[str, int], float]) -> int:
+        returned = 0
+        for (day, user_id), credit in credits.items():
+            if credit > 0:
+                self._adjust(user_id, -credit, datetime.strptime(day, "%Y%m%d"))
+                returned += 1
+        return returned
+
+    def _adjust(self, user_id: int, delta: float, at: datetime) -> None:
+        try:
+            self.storage.adjust_cost(user_id, delta, at=at)
+        except Exception as exc:
+            logger.warning(f"成本预算结算失败 user_id={user_id} delta={delta:.4f}: {exc}")
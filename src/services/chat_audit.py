@@ -1,4 +1,9 @@
-"""Best-effort audit boundary for the chat pipeline."""
+"""Best-effort audit boundary for the chat pipeline.
+
+With an :class:`AuditPipeline` attached, audit calls only enqueue; the
+pipeline persists them in the background so a slow audit path never delays a
+reply.
+"""
 
 from __future__ import annotations
 
@@ -7,12 +12,19 @@ from typing import Any, Dict, Optional
 
 from nonebot.log import logger
 
+from src.services.audit_pipeline import AuditPipeline
 from src.services.storage import StorageService
 
 
 class ChatAudit:
-    def __init__(self, storage: Optional[StorageService] = None) -> None:
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        *,
+        pipeline: Optional[AuditPipeline] = None,
+    ) -> None:
         self.storage = storage or StorageService()
+        self.pipeline = pipeline
 
     def progress(self, event_type: str, summary: str, payload: Dict[str, Any]) -> None:
         self._append(
@@ -41,6 +53,9 @@ class ChatAudit:
         )
 
     def _append(self, method_name: str, payload: Dict[str, Any]) -> None:
+        if self.pipeline is not None:
+            self.pipeline.emit(method_name, payload)
+            return
         method = getattr(self.storage, method_name, None)
         if not callable(method):
             logger.warning(f"StorageService.{method_name} is unavailable; audit event skipped.")
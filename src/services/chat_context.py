@@ -7,7 +7,7 @@ import re
 import time
 from dataclasses import dataclass, field, replace
 from datetime import date, datetime, timedelta, timezone
-from typing import Awaitable, Callable, List, Optional
+from typing import Any, Awaitable, Callable, List, Optional
 from urllib.parse import urlsplit
 
 from nonebot.log import logger
@@ -15,7 +15,15 @@ from nonebot.log import logger
 from src.core.config import get_settings
 from src.services.chat_policy import compact_text
 from src.services.image import describe_image_url
-from src.services.intent import decide_intents, is_correction_request, is_dynamic_fact_query
+from src.services.image_cache import ImageDescriptionCache
+from src.services.intent import (
+    IntentDecision,
+    decide_intents,
+    is_correction_request,
+    is_dynamic_fact_query,
+)
+from src.services.intent_classifier import classify_locally
+from src.services.keyword_matcher import MessageFeatures, extract_features
 from src.services.llm import get_deepseek_client, get_deepseek_model, has_deepseek
 from src.services.reminder import extract_json_object
 from src.services.search import SearchResult, fetch_page_text, web_search
@@ -118,22 +126,47 @@ class EnrichedChatInput:
 
 
 class ImageRateLimiter:
-    def __init__(self, interval_seconds: Optional[int] = None) -> None:
+    """Per-user image interval; with a cluster coordinator the interval holds across workers.
+
+    A user's group and private sessions can live on different workers, so in
+    cluster mode a locally allowed image still has to take the shared
+    ``rate:image:<uid>`` lock.  That is a Redis round trip, so request paths
+    use :meth:`allow_async`; :meth:`allow` only checks this process.
+    """
+
+    def __init__(self, interval_seconds: Optional[int] = None, *, shared: Any = None) -> None:
         self.interval_seconds = (
             get_settings().image_rate_limit_seconds
             if interval_seconds is None
             else interval_seconds
         )
+        self.shared = shared
         self._last_seen: dict[int, float] = {}
 
     def allow(self, user_id: int, *, now: Optional[float] = None) -> bool:
         current = time.time() if now is None else now
-        last = self._last_seen.get(user_id, 0.0)
-        if current - last < self.interval_seconds:
+        if not self._locally_allowed(user_id, current):
+            return False
+        self._last_seen[user_id] = current
+        return True
+
+    async def allow_async(self, user_id: int, *, now: Optional[float] = None) -> bool:
+        current = time.time() if now is None else now
+        if not self._locally_allowed(user_id, current):
+            return False
+        if (
+            self.shared is not None
+            and self.shared.enabled
+            and self.interval_seconds > 0
+            and not await self.shared.acquire_job(f"rate:image:{user_id}", self.interval_seconds)
+        ):
             return False
         self._last_seen[user_id] = current
         return True
 
+    def _locally_allowed(self, user_id: int, current: float) -> bool:
+        return current - self._last_seen.get(user_id, 0.0) >= self.interval_seconds
+
 
 def build_time_context(now: Optional[datetime] = None) -> str:
     current = now or datetime.now(LOCAL_TZ)
@@ -296,6 +329,9 @@ class SearchContextBuilder:
     ) -> List[str]:
         if not has_deepseek():
             return []
+        if not correction_mode and classify_locally("search_plan", user_text) == "direct":
+            logger.info("本地意图分类判定为独立查询，跳过联网检索规划")
+            return []
         correction_contract = (
             "这是纠错检索：不得沿用上一轮事实结论；扩大实体、赛事届次、日期和官方来源范围。"
             if correction_mode
@@ -365,20 +401,34 @@ class SearchContextBuilder:
         image_context: str = "",
         recent_history: Optional[List[dict]] = None,
         now: Optional[datetime] = None,
+        decisions: Optional[List[IntentDecision]] = None,
+        features: Optional[MessageFeatures] = None,
     ) -> SearchOutcome:
+        """Run search when the turn routes to it.
+
+        ``decisions`` and ``features`` are the ones the chat handler already
+        computed for this turn; search routing does not depend on the image
+        or audio flags, so they are reused instead of routing twice.
+        """
         history = recent_history or []
         current = now or datetime.now(LOCAL_TZ)
-        correction_mode = is_correction_request(user_text)
-        decisions = decide_intents(
-            user_text, has_image=bool(image_context), has_audio=False, face_ids=[]
-        )
+        features = features or extract_features(user_text)
+        correction_mode = is_correction_request(user_text, features)
+        if decisions is None:
+            decisions = decide_intents(
+                user_text,
+                has_image=bool(image_context),
+                has_audio=False,
+                face_ids=[],
+                features=features,
+            )
         relevant = [
             item
             for item in decisions
             if item.name in {"search.web", "search.summarize_url"}
         ][:2]
         search_metrics.record_routing(
-            expected_search=is_dynamic_fact_query(user_text) or correction_mode,
+            expected_search=is_dynamic_fact_query(user_text, features) or correction_mode,
             routed_to_search=bool(relevant or correction_mode),
         )
         if not relevant and not correction_mode:
@@ -759,10 +809,12 @@ class ChatContextBuilder:
         search_builder: Optional[SearchContextBuilder] = None,
         image_limiter: Optional[ImageRateLimiter] = None,
         describe: Callable[[str], Awaitable[str]] = describe_image_url,
+        image_cache: Optional[ImageDescriptionCache] = None,
     ) -> None:
         self.search_builder = search_builder or SearchContextBuilder()
         self.image_limiter = image_limiter or ImageRateLimiter()
         self.describe = describe
+        self.image_cache = image_cache
 
     async def build(
         self,
@@ -771,9 +823,11 @@ class ChatContextBuilder:
         user_text: str,
         image_urls: List[str],
         history: List[dict],
+        decisions: Optional[List[IntentDecision]] = None,
+        features: Optional[MessageFeatures] = None,
     ) -> EnrichedChatInput:
         image_context = ""
-        if image_urls and self.image_limiter.allow(user_id):
+        if image_urls and await self.image_limiter.allow_async(user_id):
             image_context = await self._describe_images(image_urls)
         elif image_urls:
             logger.info(
@@ -786,10 +840,16 @@ class ChatContextBuilder:
         if image_urls:
             image_evidence = image_context or "图片识别未返回可用结果。"
             llm_text = f"{user_text or '用户发送了图片。'}\n\n[图片识别结果]\n{image_evidence}"
+        routing = {
+            key: value
+            for key, value in (("decisions", decisions), ("features", features))
+            if value is not None
+        }
         raw_search_outcome = await self.search_builder.build(
             user_text,
             image_context=image_context,
             recent_history=history,
+            **routing,
         )
         if isinstance(raw_search_outcome, SearchOutcome):
             search_outcome = raw_search_outcome
@@ -817,7 +877,10 @@ class ChatContextBuilder:
     async def _describe_images(self, image_urls: List[str]) -> str:
         async def describe_one(index: int, url: str) -> str:
             try:
-                description = await self.describe(url)
+                if self.image_cache is not None:
+                    description = await self.image_cache.describe(url, self.describe)
+                else:
+                    description = await self.describe(url)
                 return f"第{index}张图片：{description or '图片识别没有返回可用描述。'}"
             except Exception as exc:
                 logger.warning(f"图片识别失败({index}): {exc}")
@@ -827,6 +890,8 @@ class ChatContextBuilder:
         lines = await asyncio.gather(
             *(describe_one(index, url) for index, url in enumerate(urls, start=1))
         )
+        if self.image_cache is not None:
+            logger.info("图片描述缓存指标 {}", self.image_cache.snapshot())
         remaining = len(image_urls) - len(urls)
         if remaining:
             lines.append(f"还有{remaining}张图片未识别。")
@@ -12,6 +12,7 @@ from random import random
 from typing import Literal, Optional
 
 from src.core.config import Settings, get_settings
+from src.services.keyword_matcher import MessageFeatures, extract_features
 
 
 ReplyMode = Literal["micro", "short", "normal", "deep"]
@@ -48,26 +49,20 @@ def select_reply_plan(
     has_tool_result: bool = False,
     fast_exchange: bool = False,
     settings: Optional[Settings] = None,
+    features: Optional[MessageFeatures] = None,
 ) -> ReplyPlan:
     """Choose response granularity without changing Mako's emotional stance."""
 
     settings = settings or get_settings()
+    features = features or extract_features(text)
     compact = "".join(str(text or "").split())
-    deep_markers = (
-        "为什么", "怎么做", "如何", "分析", "比较", "区别", "解释", "计划",
-        "建议", "原因", "详细", "认真说", "难过", "焦虑", "害怕", "崩溃",
-        "好累", "很累", "委屈", "生气", "失眠", "压力", "烦死", "撑不住",
-    )
-    lightweight = (
-        len(compact) <= 24
-        and not any(marker in compact for marker in deep_markers)
-        and not any(mark in compact for mark in ("？", "?"))
-    )
+    deep = features.has("reply.deep")
+    lightweight = len(compact) <= 24 and not deep and not features.has("reply.question")
 
     if fast_exchange:
         mode: ReplyMode = "short"
         social_state = "rapid_exchange"
-    elif has_image or has_audio or has_tool_result or any(marker in compact for marker in deep_markers):
+    elif has_image or has_audio or has_tool_result or deep:
         mode = "deep"
         social_state = "normal"
     elif lightweight:
@@ -1,15 +1,36 @@
-"""Conversation pacing and loop protection for ordinary chat replies."""
+"""Conversation pacing and loop protection for ordinary chat replies.
+
+Rhythm state is consulted on every group message and updated again when a
+reply is sent.  It used to live only in Redis (``GET`` + ``SET`` +
+``EXPIRE`` per call, on the event loop); now the in-process LRU is
+authoritative and changed sessions are written behind, batched into one
+``HSET`` on the ``chat:rhythm`` hash every ``CHAT_RHYTHM_FLUSH_SECONDS``.
+:meth:`ChatRhythmService.restore` reloads the hash on startup so a restart
+keeps active cooldowns.  The ``chat:rhythm:active`` sorted set scores each
+session by its last activity; every flush drops the fields idle for longer
+than any cooldown can last, so the hash stays bounded on a long-running
+instance.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import json
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Any, Optional
 
+from nonebot.log import logger
+
 from src.core.config import Settings, get_settings
 from src.services.storage import StorageService
 
+RHYTHM_HASH_KEY = "chat:rhythm"
+RHYTHM_ACTIVE_KEY = "chat:rhythm:active"
+# Idle sessions pruned per flush; the rest go on the next one.
+_PRUNE_BATCH = 500
+
 
 @dataclass
 class RhythmState:
@@ -39,6 +60,10 @@ class RhythmState:
             last_boundary_reason=str(payload.get("last_boundary_reason", "") or ""),
         )
 
+    @property
+    def last_active(self) -> float:
+        return max(self.last_reply_at, self.last_incoming_at, self.cooldown_until)
+
     def to_dict(self) -> dict[str, Any]:
         return {
             "last_reply_at": self.last_reply_at,
@@ -77,39 +102,183 @@ class ChatRhythmService:
         self.storage = storage or StorageService()
         self.settings = settings or get_settings()
         self.clock = clock
-        self._memory: dict[str, RhythmState] = {}
+        self.max_sessions = max(1, self.settings.chat_rhythm_max_sessions)
+        self._memory: "OrderedDict[str, RhythmState]" = OrderedDict()
+        # Sessions changed since the last flush; kept even if evicted from the LRU.
+        self._dirty: dict[str, RhythmState] = {}
         self._known_bot_ids = set(self.settings.parse_int_list(self.settings.known_bot_user_ids))
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flush_failures = 0
+        self.pruned = 0
 
-    @staticmethod
-    def _key(session_id: str) -> str:
-        return f"chat:rhythm:{session_id}"
+    @property
+    def retention_seconds(self) -> float:
+        return max(self.settings.chat_rhythm_max_cooldown_seconds * 2, 1800)
 
     def _load(self, session_id: str) -> RhythmState:
-        try:
-            redis = self.storage.redis
-            if redis:
-                raw = redis.get(self._key(session_id))
-                if raw:
-                    if isinstance(raw, bytes):
-                        raw = raw.decode("utf-8")
-                    return RhythmState.from_dict(json.loads(raw))
-        except Exception:
-            # A transient rhythm-state failure should never prevent ordinary chat.
-            pass
-        return self._memory.get(session_id, RhythmState())
+        state = self._memory.get(session_id)
+        if state is None:
+            return RhythmState()
+        self._memory.move_to_end(session_id)
+        return state
 
     def _save(self, session_id: str, state: RhythmState) -> None:
         self._memory[session_id] = state
+        self._memory.move_to_end(session_id)
+        self._dirty[session_id] = state
+        while len(self._memory) > self.max_sessions:
+            self._memory.popitem(last=False)
+
+    def restore(self) -> int:
+        """Load persisted sessions into memory; returns how many were restored."""
+        redis = self.storage.redis
+        if not redis:
+            return 0
+        try:
+            rows = redis.hgetall(RHYTHM_HASH_KEY) or {}
+        except Exception as exc:
+            logger.warning(f"聊天节奏状态恢复失败，从空状态开始: {exc}")
+            return 0
+        horizon = self.clock() - self.retention_seconds
+        restored, stale = 0, []
+        for session_id, raw in rows.items():
+            try:
+                state = RhythmState.from_dict(json.loads(raw))
+            except Exception:
+                stale.append(session_id)
+                continue
+            if state.last_active < horizon:
+                stale.append(session_id)
+                continue
+            if session_id not in self._memory:
+                self._memory[session_id] = state
+                restored += 1
+        while len(self._memory) > self.max_sessions:
+            self._memory.popitem(last=False)
+        if stale:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                pipe.hdel(RHYTHM_HASH_KEY, *stale)
+                pipe.zrem(RHYTHM_ACTIVE_KEY, *stale)
+                pipe.execute()
+            except Exception:
+                pass
+        return restored
+
+    def adopt(self, session_id: str) -> bool:
+        """Load one session persisted by another worker, unless it is already in memory."""
+        redis = self.storage.redis
+        if not redis or session_id in self._memory:
+            return False
+        try:
+            raw = redis.hget(RHYTHM_HASH_KEY, session_id)
+            state = RhythmState.from_dict(json.loads(raw)) if raw else None
+        except Exception as exc:
+            logger.debug(f"聊天节奏状态接管失败 session={session_id}: {exc}")
+            return False
+        if state is None or session_id in self._memory:
+            return False
+        self._memory[session_id] = state
+        while len(self._memory) > self.max_sessions:
+            self._memory.popitem(last=False)
+        return True
+
+    def flush(self) -> int:
+        """Write changed sessions in one pipeline; returns how many were written."""
+        dirty, payloads, scores = self._drain()
+        return self._settle(dirty, self._write(payloads, scores) if payloads else True)
+
+    async def flush_async(self) -> int:
+        # Serialise on the loop, where the states are mutated; only the write runs in a thread.
+        dirty, payloads, scores = self._drain()
+        return self._settle(
+            dirty, await asyncio.to_thread(self._write, payloads, scores) if payloads else True
+        )
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        restored = await asyncio.to_thread(self.restore)
+        if restored:
+            logger.info(f"已恢复 {restored} 个会话的聊天节奏状态")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush_async()
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "sessions": len(self._memory),
+            "dirty": len(self._dirty),
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "pruned": self.pruned,
+        }
+
+    async def _run(self) -> None:
+        interval = max(0.1, self.settings.chat_rhythm_flush_seconds)
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_async()
+
+    def _drain(self) -> tuple[dict[str, RhythmState], dict[str, str], dict[str, float]]:
+        dirty, self._dirty = self._dirty, {}
+        payloads = {
+            session_id: json.dumps(state.to_dict(), ensure_ascii=False)
+            for session_id, state in dirty.items()
+        }
+        return dirty, payloads, {session_id: state.last_active for session_id, state in dirty.items()}
+
+    def _settle(self, dirty: dict[str, RhythmState], written: bool) -> int:
+        if written:
+            return len(dirty)
+        for session_id, state in dirty.items():
+            # Newer changes made while the write was in flight win.
+            self._dirty.setdefault(session_id, state)
+        return 0
+
+    def _write(self, payloads: dict[str, str], scores: dict[str, float]) -> bool:
+        redis = self.storage.redis
+        if not redis:
+            # Memory mode: the LRU is the only copy.
+            return True
+        horizon = self.clock() - self.retention_seconds
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.hset(RHYTHM_HASH_KEY, mapping=payloads)
+            pipe.zadd(RHYTHM_ACTIVE_KEY, scores)
+            pipe.expire(RHYTHM_HASH_KEY, int(self.retention_seconds))
+            pipe.expire(RHYTHM_ACTIVE_KEY, int(self.retention_seconds))
+            pipe.zrangebyscore(RHYTHM_ACTIVE_KEY, "-inf", horizon, start=0, num=_PRUNE_BATCH)
+            idle = pipe.execute()[-1]
+        except Exception as exc:
+            # A transient rhythm-state failure should never prevent ordinary chat.
+            self.flush_failures += 1
+            logger.debug(f"聊天节奏状态写回失败，稍后重试: {exc}")
+            return False
+        self.flushes += 1
+        if idle:
+            self._prune(redis, list(idle))
+        return True
+
+    def _prune(self, redis, idle: list[str]) -> None:
         try:
-            redis = self.storage.redis
-            if redis:
-                redis.set(self._key(session_id), json.dumps(state.to_dict(), ensure_ascii=False))
-                redis.expire(
-                    self._key(session_id),
-                    max(self.settings.chat_rhythm_max_cooldown_seconds * 2, 1800),
-                )
-        except Exception:
-            pass
+            pipe = redis.pipeline(transaction=False)
+            pipe.hdel(RHYTHM_HASH_KEY, *idle)
+            pipe.zrem(RHYTHM_ACTIVE_KEY, *idle)
+            pipe.execute()
+        except Exception as exc:
+            logger.debug(f"聊天节奏过期会话清理失败: {exc}")
+            return
+        self.pruned += len(idle)
 
     def admit(
         self,
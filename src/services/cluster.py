@@ -0,0 +1,367 @@
+"""Coordination for running several bot workers against one OneBot account.
+
+With ``CLUSTER_ENABLED`` every worker receives every event (NapCat fans out
+to all reverse-WebSocket connections) and this module decides who acts:
+
+* **Session ownership.**  Live workers heartbeat into the ``cluster:workers``
+  sorted set.  A consistent-hash ring over them maps each session to one
+  owner, and the owner also takes a Redis lease
+  (``cluster:session:<id>``) so two workers with briefly different views of
+  the membership cannot both answer.  Leases are renewed at most once per
+  half lease, so a busy session costs no Redis traffic per message.
+* **Handover.**  Where the two cannot both be avoided, a message is dropped
+  rather than answered twice.  When the ring moves a session, the old owner
+  keeps answering until shortly before its lease expires in Redis.  The new
+  owner is refused until then.  A message that arrives after the old owner
+  stopped is held by the new owner until the lease lapses, then answered, so
+  a planned handover drops nothing.  A worker that leaves cleanly releases
+  its leases at once.  A lease whose holder has stopped heartbeating is void,
+  so after a crash the new owner claims it as soon as the ring drops the dead
+  worker.  Until then, about ``3 x CLUSTER_HEARTBEAT_SECONDS``, messages for
+  the dead worker's sessions are dropped.
+* **Job locks.**  Scheduled jobs run where :meth:`ClusterCoordinator.acquire`
+  succeeds: ``SET NX PX`` on ``cluster:lock:<name>``.  Without Redis a job
+  runs on the ring owner of its name.
+* **Shared rate limits** use the same primitive.
+
+Disabled (the default), ownership is always granted and locks are plain
+in-process expiries, so single-process behaviour is unchanged.  Per-process
+state such as the session locks, debounce batches and rhythm LRU stays
+correct because a session is only ever handled by its owner.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.read_cache import PROCESS_ORIGIN
+from src.services.redis import get_redis
+
+WORKERS_KEY = "cluster:workers"
+SESSION_LEASE_PREFIX = "cluster:session:"
+LOCK_PREFIX = "cluster:lock:"
+
+# Take or renew a lease held by nobody, by us, or by a worker whose heartbeat
+# (its score in KEYS[2]) has lapsed.  2 = newly acquired, 1 = renewed,
+# negative = held by a live worker, for that many more milliseconds.
+_CLAIM_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then
+    local alive_until = redis.call('ZSCORE', KEYS[2], current)
+    if alive_until and tonumber(alive_until) > tonumber(ARGV[3]) then
+        return -math.max(redis.call('PTTL', KEYS[1]), 1)
+    end
+    current = false
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+if current then
+    return 1
+end
+return 2
+"""
+
+# Delete a key only while it still holds our token.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+ACQUIRED = "acquired"
+HELD = "held"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes; a leaving worker only moves its own sessions."""
+
+    def __init__(self, nodes: Iterable[str] = (), *, replicas: int = 64) -> None:
+        self.replicas = max(1, replicas)
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted(
+            (_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(self.replicas)
+        )
+        self._hashes = [point for point, _node in points]
+        self._owners = [node for _point, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ClusterCoordinator:
+    def __init__(
+        self,
+        *,
+        enabled: Optional[bool] = None,
+        worker_id: str = PROCESS_ORIGIN,
+        redis_factory: Callable[[], Any] = get_redis,
+        lease_seconds: Optional[float] = None,
+        heartbeat_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        settings = get_settings()
+        self.enabled = settings.cluster_enabled if enabled is None else enabled
+        self.worker_id = worker_id
+        self.redis_factory = redis_factory
+        self.lease_seconds = max(1.0, lease_seconds or settings.cluster_session_lease_seconds)
+        self.heartbeat_seconds = max(0.1, heartbeat_seconds or settings.cluster_heartbeat_seconds)
+        self.clock = clock
+        self.sleep = sleep
+        self.ring = HashRing([worker_id])
+        # session_id -> local expiry of the lease we hold.
+        self._leases: Dict[str, float] = {}
+        # name -> expiry, for locks taken without Redis.
+        self._local_locks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.claims = 0
+        self.renewals = 0
+        self.lapses = 0
+        self.rejections = 0
+        self.handover_waits = 0
+
+    @property
+    def worker_ttl(self) -> float:
+        return self.heartbeat_seconds * 3
+
+    @property
+    def trust_margin(self) -> float:
+        """How long before Redis drops a lease its holder stops answering on it."""
+        return min(1.0, self.lease_seconds * 0.1)
+
+    # --- membership -----------------------------------------------------
+
+    def heartbeat(self) -> Tuple[str, ...]:
+        """Refresh our membership and rebuild the ring from live workers. Blocking."""
+        redis = self.redis_factory()
+        if not redis:
+            return self.ring.nodes
+        now = self.clock()
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.zadd(WORKERS_KEY, {self.worker_id: now + self.worker_ttl})
+            pipe.zremrangebyscore(WORKERS_KEY, "-inf", now)
+            pipe.zrange(WORKERS_KEY, 0, -1)
+            pipe.expire(WORKERS_KEY, int(self.worker_ttl * 4) + 1)
+            members = pipe.execute()[2]
+        except Exception as exc:
+            logger.warning(f"集群心跳失败，沿用上次的成员列表: {exc}")
+            return self.ring.nodes
+        nodes = {str(member) for member in members} | {self.worker_id}
+        if tuple(sorted(nodes)) != self.ring.nodes:
+            logger.info(f"集群成员变化: {sorted(nodes)}")
+            self.ring = HashRing(nodes)
+        return self.ring.nodes
+
+    def leave(self) -> None:
+        """Drop out of the ring and give up our leases so survivors take over at once."""
+        redis = self.redis_factory()
+        with self._lock:
+            leases, self._leases = list(self._leases), {}
+        if not redis:
+            return
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.zrem(WORKERS_KEY, self.worker_id)
+            for session_id in leases:
+                pipe.eval(_RELEASE_SCRIPT, 1, SESSION_LEASE_PREFIX + session_id, self.worker_id)
+            pipe.execute()
+        except Exception as exc:
+            logger.debug(f"退出集群时清理失败，等待租约过期: {exc}")
+
+    async def start(self) -> None:
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        await asyncio.to_thread(self.heartbeat)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"集群模式已启用 worker={self.worker_id} members={len(self.ring.nodes)}")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self.enabled:
+            await asyncio.to_thread(self.leave)
+
+    # --- sessions ---------------------------------------------------------
+
+    def owner_of(self, session_id: str) -> Optional[str]:
+        return self.ring.owner(session_id) if self.enabled else self.worker_id
+
+    async def claim_session(self, session_id: str) -> Optional[str]:
+        """``ACQUIRED``/``HELD`` when this worker should handle the session, ``None`` when another should."""
+        if not self.enabled:
+            return HELD
+        now = self.clock()
+        with self._lock:
+            expires_at = self._leases.get(session_id)
+        if self.ring.owner(session_id) != self.worker_id:
+            # The ring moved the session elsewhere: keep serving it until our lease
+            # runs out (the new owner is refused until then), but never renew.
+            if expires_at is not None and expires_at > now:
+                return HELD
+            with self._lock:
+                self._leases.pop(session_id, None)
+            return None
+        if expires_at is not None and expires_at - now > self.lease_seconds / 2:
+            return HELD
+        claim, retry_in = await asyncio.to_thread(self._claim, session_id, expires_at is not None)
+        if claim is None and retry_in is not None:
+            # The previous owner has already stopped answering on its lease:
+            # hold this message until the lease lapses instead of dropping it.
+            self.handover_waits += 1
+            await self.sleep(retry_in)
+            claim, _ = await asyncio.to_thread(self._claim, session_id, False)
+        return claim
+
+    def _claim(self, session_id: str, renewing: bool) -> Tuple[Optional[str], Optional[float]]:
+        """The claim, plus how long to wait before retrying when the previous owner has let go."""
+        redis = self.redis_factory()
+        # Trust the lease locally for a little less than Redis does, so a handover
+        # never has two workers answering at once.
+        local_expiry = self.clock() + self.lease_seconds - self.trust_margin
+        if not redis:
+            # Ring ownership alone; the lease only guards membership disagreements.
+            with self._lock:
+                self._leases[session_id] = local_expiry
+            return (HELD if renewing else ACQUIRED), None
+        try:
+            result = int(
+                redis.eval(
+                    _CLAIM_SCRIPT,
+                    2,
+                    SESSION_LEASE_PREFIX + session_id,
+                    WORKERS_KEY,
+                    self.worker_id,
+                    int(self.lease_seconds * 1000),
+                    self.clock(),
+                )
+            )
+        except Exception as exc:
+            logger.warning(f"会话租约获取失败，按哈希环归属处理 session={session_id}: {exc}")
+            result = 1 if renewing else 2
+        if result <= 0:
+            # A live worker still holds the lease.
+            self.rejections += 1
+            with self._lock:
+                self._leases.pop(session_id, None)
+            remaining = -result / 1000
+            if 0 < remaining <= self.trust_margin:
+                return None, remaining + 0.05
+            return None, None
+        with self._lock:
+            self._leases[session_id] = local_expiry
+        if result == 2:
+            self.claims += 1
+            if renewing:
+                # Our lease had expired in Redis before we renewed it.
+                self.lapses += 1
+            return ACQUIRED, None
+        self.renewals += 1
+        return HELD, None
+
+    # --- locks ------------------------------------------------------------
+
+    def acquire(self, name: str, ttl_seconds: float) -> Optional[str]:
+        """Take ``name`` for ``ttl_seconds``; returns a token for :meth:`release`, or ``None``. Blocking."""
+        ttl_seconds = max(0.001, ttl_seconds)
+        if self.enabled:
+            redis = self.redis_factory()
+            if redis:
+                token = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+                try:
+                    if redis.set(LOCK_PREFIX + name, token, nx=True, px=int(ttl_seconds * 1000)):
+                        return token
+                    return None
+                except Exception as exc:
+                    logger.warning(f"分布式锁获取失败，按哈希环归属处理 lock={name}: {exc}")
+            if self.ring.owner(name) != self.worker_id:
+                return None
+        now = self.clock()
+        with self._lock:
+            if self._local_locks.get(name, 0.0) > now:
+                return None
+            self._local_locks[name] = now + ttl_seconds
+        return "local"
+
+    def release(self, name: str, token: Optional[str]) -> None:
+        if token is None:
+            return
+        if token == "local":
+            with self._lock:
+                self._local_locks.pop(name, None)
+            return
+        redis = self.redis_factory()
+        if not redis:
+            return
+        try:
+            redis.eval(_RELEASE_SCRIPT, 1, LOCK_PREFIX + name, token)
+        except Exception as exc:
+            logger.debug(f"分布式锁释放失败，等待过期 lock={name}: {exc}")
+
+    async def acquire_job(self, name: str, ttl_seconds: float) -> bool:
+        """Whether this worker runs this firing of ``name``.
+
+        The lock is kept until it expires, so a worker whose clock fires a
+        little later does not run the same job again.
+        """
+        return await asyncio.to_thread(self.acquire, name, ttl_seconds) is not None
+
+    @asynccontextmanager
+    async def exclusive(self, name: str, ttl_seconds: float) -> AsyncIterator[bool]:
+        """Hold ``name`` for the duration of the block; yields whether it was acquired."""
+        token = await asyncio.to_thread(self.acquire, name, ttl_seconds)
+        try:
+            yield token is not None
+        finally:
+            if token is not None:
+                await asyncio.to_thread(self.release, name, token)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            leases = len(self._leases)
+        return {
+            "enabled": self.enabled,
+            "worker": self.worker_id,
+            "members": len(self.ring.nodes),
+            "leases": leases,
+            "claims": self.claims,
+            "renewals": self.renewals,
+            "lapses": self.lapses,
+            "rejections": self.rejections,
+            "handover_waits": self.handover_waits,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await asyncio.to_thread(self.heartbeat)
+            self._prune_leases()
+
+    def _prune_leases(self) -> None:
+        now = self.clock()
+        with self._lock:
+            for session_id in [sid for sid, expires_at in self._leases.items() if expires_at <= now]:
+                self._leases.pop(session_id, None)
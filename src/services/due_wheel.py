@@ -0,0 +1,172 @@
+"""One-timer scheduling for sparse due work.
+
+Sources (relationship follow-ups, ...) report when their next item is due.
+The wheel keeps exactly one APScheduler ``date`` job armed for the earliest of
+them; when it fires, every source with due work runs and the job is re-armed
+for whatever comes next.  Nothing wakes up while no work exists, and items run
+at their due time instead of on the next polling tick.
+
+Services that create a due item call :func:`notify_due` so an earlier item
+pulls the timer forward without any storage reads.  The wheel is bound to
+APScheduler by :mod:`src.plugins.due_scheduling`, which every feature that
+registers a source imports.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from nonebot.log import logger
+
+DUE_WHEEL_JOB_ID = "mako_due_wheel"
+
+
+@dataclass
+class DueSource:
+    name: str
+    next_due: Callable[[], Optional[datetime]]
+    run_due: Callable[[datetime], Awaitable[None]]
+
+
+class DueWheel:
+    def __init__(
+        self,
+        *,
+        job_id: str = DUE_WHEEL_JOB_ID,
+        retry_seconds: float = 1200.0,
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.job_id = job_id
+        self.retry_seconds = max(1.0, retry_seconds)
+        self.clock = clock
+        self.scheduler: Any = None
+        # Optional ClusterCoordinator; set by attach() so one worker runs each firing.
+        self.coordinator: Any = None
+        self.sources: Dict[str, DueSource] = {}
+        self.armed_at: Optional[datetime] = None
+        self.fired = 0
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        next_due: Callable[[], Optional[datetime]],
+        run_due: Callable[[datetime], Awaitable[None]],
+    ) -> None:
+        self.sources[name] = DueSource(name, next_due, run_due)
+
+    def attach(
+        self,
+        scheduler: Any,
+        *,
+        retry_seconds: Optional[float] = None,
+        coordinator: Any = None,
+    ) -> Optional[datetime]:
+        """Bind the scheduler and arm for the earliest item already in storage."""
+        self.scheduler = scheduler
+        if coordinator is not None:
+            self.coordinator = coordinator
+        if retry_seconds is not None:
+            self.retry_seconds = max(1.0, retry_seconds)
+        return self.rearm()
+
+    def notify(self, due_at: Optional[datetime]) -> None:
+        """A new item is due at ``due_at``; pull the timer forward if needed. Thread-safe."""
+        if due_at is None or self.scheduler is None:
+            return
+        with self._lock:
+            if self.armed_at is not None and self.armed_at <= due_at:
+                return
+            self._arm(due_at)
+
+    def rearm(self, *, after_run: bool = False) -> Optional[datetime]:
+        """Arm for the earliest due item across sources, or disarm when there is none.
+
+        After a run, items that are still due could not be consumed (send
+        failure, dedup, disabled feature); they are retried after
+        ``retry_seconds`` instead of spinning.
+        """
+        candidates: List[datetime] = []
+        for source in list(self.sources.values()):
+            try:
+                due_at = source.next_due()
+            except Exception as exc:
+                logger.warning(f"到期轮询源读取失败 {source.name}: {exc}")
+                due_at = self.clock() + timedelta(seconds=self.retry_seconds)
+            if due_at is not None:
+                candidates.append(due_at)
+        if after_run:
+            retry_at = self.clock() + timedelta(seconds=self.retry_seconds)
+            now = self.clock()
+            candidates = [retry_at if due_at <= now else due_at for due_at in candidates]
+        with self._lock:
+            if not candidates:
+                self._disarm()
+                return None
+            next_at = min(candidates)
+            self._arm(next_at)
+            return next_at
+
+    async def fire(self) -> None:
+        with self._lock:
+            self.armed_at = None
+        self.fired += 1
+        if self.coordinator is None:
+            await self._run_sources()
+        else:
+            # Every worker arms the same timer; one of them runs the due work.
+            async with self.coordinator.exclusive(self.job_id, self.retry_seconds) as acquired:
+                if acquired:
+                    await self._run_sources()
+        await asyncio.to_thread(self.rearm, after_run=True)
+
+    async def _run_sources(self) -> None:
+        now = self.clock()
+        for source in list(self.sources.values()):
+            try:
+                due_at = await asyncio.to_thread(source.next_due)
+                if due_at is not None and due_at <= now:
+                    await source.run_due(now)
+            except Exception:
+                logger.exception(f"到期任务执行失败 source={source.name}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "armed_at": self.armed_at.isoformat() if self.armed_at else None,
+            "sources": sorted(self.sources),
+            "fired": self.fired,
+        }
+
+    def _arm(self, at: datetime) -> None:
+        if self.scheduler is None:
+            return
+        self.scheduler.add_job(
+            self.fire,
+            "date",
+            run_date=max(at, self.clock()),
+            id=self.job_id,
+            replace_existing=True,
+            misfire_grace_time=300,
+            coalesce=True,
+        )
+        self.armed_at = at
+
+    def _disarm(self) -> None:
+        if self.scheduler is None:
+            return
+        try:
+            self.scheduler.remove_job(self.job_id)
+        except Exception:
+            pass
+        self.armed_at = None
+
+
+due_wheel = DueWheel()
+
+
+def notify_due(due_at: Optional[datetime]) -> None:
+    due_wheel.notify(due_at)
@@ -5,6 +5,8 @@ from datetime import datetime
 from typing import Optional
 
 from src.core.config import get_settings
+from src.services.blacklist import BlacklistMirror
+from src.services.budget import CostBudget, CostReservation
 from src.services.storage import StorageService
 
 
@@ -18,6 +20,8 @@ class GovernanceService:
     def __init__(self, storage: Optional[StorageService] = None) -> None:
         self.settings = get_settings()
         self.storage = storage or StorageService()
+        self.budget = CostBudget(self.storage)
+        self.blacklist = BlacklistMirror(self.storage)
         self._admin_ids = set(self.settings.parse_int_list(self.settings.admin_user_ids))
         self._config_blacklist_users = set(self.settings.parse_int_list(self.settings.blacklist_user_ids))
         self._config_blacklist_groups = set(self.settings.parse_int_list(self.settings.blacklist_group_ids))
@@ -32,11 +36,17 @@ class GovernanceService:
         return user_id in self._admin_ids or is_group_admin
 
     def can_chat(self, user_id: int, group_id: Optional[int] = None) -> AccessDecision:
-        if self.settings.redis_required and self.storage.redis is None:
+        redis_client = self.storage.redis
+        if self.settings.redis_required and redis_client is None:
             return AccessDecision(False, "durable storage is unavailable")
-        if user_id in self._config_blacklist_users or self.storage.is_user_blacklisted(user_id):
+        if user_id in self._config_blacklist_users or self.blacklist.is_user_blocked(
+            user_id, redis_client=redis_client
+        ):
             return AccessDecision(False, "user is blacklisted")
-        if group_id and (group_id in self._config_blacklist_groups or self.storage.is_group_blacklisted(group_id)):
+        if group_id and (
+            group_id in self._config_blacklist_groups
+            or self.blacklist.is_group_blocked(group_id, redis_client=redis_client)
+        ):
             return AccessDecision(False, "group is blacklisted")
         return AccessDecision(True)
 
@@ -87,17 +97,16 @@ class GovernanceService:
             + output_chars / 1000.0 * self.settings.llm_cost_per_1k_chars_output
         )
 
+    def reserve_cost(self, user_id: int, amount: float, *, now: Optional[datetime] = None) -> CostReservation:
+        """Check and hold ``amount`` of today's budget; pair with :meth:`settle_cost`."""
+        return self.budget.reserve(user_id, amount, now=now)
+
+    def settle_cost(self, reservation: CostReservation, actual: float) -> None:
+        self.budget.settle(reservation, actual)
+
     def can_consume_cost(self, user_id: int, amount: float, *, now: Optional[datetime] = None) -> AccessDecision:
-        if not self.settings.cost_control_enabled:
-            return AccessDecision(True)
-        now = now or datetime.now()
-        global_used = self.storage.get_daily_cost(None, at=now)
-        user_used = self.storage.get_daily_cost(user_id, at=now)
-        if global_used + amount > self.settings.daily_cost_limit_global:
-            return AccessDecision(False, "global daily budget exhausted")
-        if user_used + amount > self.settings.daily_cost_limit_user:
-            return AccessDecision(False, "user daily budget exhausted")
-        return AccessDecision(True)
+        allowed, reason = self.budget.check(user_id, amount, now=now)
+        return AccessDecision(allowed, reason)
 
     def consume_cost(self, user_id: int, amount: float, *, now: Optional[datetime] = None) -> None:
         self.storage.consume_cost(user_id, amount, at=now or datetime.now())
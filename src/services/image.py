@@ -1,18 +1,31 @@
 from __future__ import annotations
 
 import asyncio
-import warnings
-from io import BytesIO
+import base64
+import time
+from collections import OrderedDict
 from typing import Optional, Tuple
 
 import httpx
 from nonebot.log import logger
-from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
 
 from src.core.config import get_settings
 from src.core.errors import ImageTooLargeError, NotConfiguredError
 from src.services.gemini import describe_image_with_gemini, has_gemini
+from src.services.image_ops import (
+    VISION_JPEG_QUALITY,
+    VISION_MAX_SIDES,
+    VISION_PASSTHROUGH_BYTES,
+    _detect_mime,
+    _parse_resize_value,
+    _prepare_vision_image_sync,
+    _process_image_sync,
+    _validate_pil_dimensions,
+    image_signature,
+    perceptual_hash,
+)
 from src.services.llm import get_openai_client, get_qwen_client, has_openai, has_qwen
+from src.services.process_pool import cpu_pool
 from src.services.search import validate_public_url
 
 USER_AGENT = (
@@ -21,23 +34,8 @@ USER_AGENT = (
     "Chrome/120.0.0.0 Safari/537.36"
 )
 
-
-def _detect_mime(image_bytes: bytes) -> str:
-    """Detect common image types without the removed stdlib ``imghdr`` module."""
-
-    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
-        return "image/png"
-    if image_bytes.startswith(b"\xff\xd8\xff"):
-        return "image/jpeg"
-    if image_bytes.startswith((b"GIF87a", b"GIF89a")):
-        return "image/gif"
-    if (
-        len(image_bytes) >= 12
-        and image_bytes.startswith(b"RIFF")
-        and image_bytes[8:12] == b"WEBP"
-    ):
-        return "image/webp"
-    return "application/octet-stream"
+_PREPARED_TTL_SECONDS = 120.0
+_PREPARED_MAX_ENTRIES = 16
 
 
 async def download_image_data(url: str, max_size: Optional[int] = None) -> tuple[bytes, str]:
@@ -79,6 +77,62 @@ async def download_image_bytes(url: str, max_size: Optional[int] = None) -> byte
     return content
 
 
+_prepared: "OrderedDict[Tuple[str, str], Tuple[float, bytes, str]]" = OrderedDict()
+
+
+def vision_provider() -> Optional[str]:
+    """The provider :func:`describe_image_url` will use, mirroring its fallback order."""
+    settings = get_settings()
+    if settings.image_provider in {"qwen", "gemini"}:
+        return settings.image_provider
+    if has_openai():
+        return "openai"
+    if has_qwen():
+        return "qwen"
+    if has_gemini():
+        return "gemini"
+    return None
+
+
+async def prepare_vision_image(url: str, provider: Optional[str] = None) -> Tuple[bytes, str]:
+    """Download ``url`` and shrink it for ``provider``; recent results are reused.
+
+    The description cache hashes the same prepared bytes the provider is
+    sent, so one image is downloaded and decoded once per turn.
+    """
+    provider = provider or vision_provider() or "openai"
+    key = (url, provider)
+    now = time.monotonic()
+    cached = _prepared.get(key)
+    if cached is not None and now - cached[0] <= _PREPARED_TTL_SECONDS:
+        _prepared.move_to_end(key)
+        return cached[1], cached[2]
+    image_bytes, _mime = await download_image_data(url)
+    short_side, long_side = VISION_MAX_SIDES.get(provider, VISION_MAX_SIDES["openai"])
+    data, mime = await cpu_pool().run(_prepare_vision_image_sync, image_bytes, short_side, long_side)
+    _prepared[key] = (now, data, mime)
+    _prepared.move_to_end(key)
+    while len(_prepared) > _PREPARED_MAX_ENTRIES:
+        _prepared.popitem(last=False)
+    return data, mime
+
+
+async def prepared_image_bytes(url: str) -> bytes:
+    data, _mime = await prepare_vision_image(url)
+    return data
+
+
+async def _vision_image_url(image_url: str, provider: str) -> str:
+    """An inline ``data:`` URL of the downscaled image, or the original URL when that fails."""
+    try:
+        data, mime = await prepare_vision_image(image_url, provider)
+    except Exception as exc:
+        logger.info(f"图片预处理失败，改为直接发送原图链接: {exc}")
+        return image_url
+    encoded = await asyncio.to_thread(base64.b64encode, data)
+    return f"data:{mime};base64,{encoded.decode('ascii')}"
+
+
 async def _describe_image_with_compatible_chat(
     *,
     client,
@@ -111,14 +165,14 @@ async def describe_image_url(image_url: str) -> str:
         return await _describe_image_with_compatible_chat(
             client=get_qwen_client(),
             model=settings.qwen_vision_model,
-            image_url=image_url,
+            image_url=await _vision_image_url(image_url, "qwen"),
         )
 
     # Prefer Gemini for non-text when explicitly requested.
     if settings.image_provider == "gemini":
         if not has_gemini():
             raise NotConfiguredError("IMAGE_PROVIDER=gemini but GEMINI_API_KEY is missing.")
-        image_bytes, mime_type = await download_image_data(image_url)
+        image_bytes, mime_type = await prepare_vision_image(image_url, "gemini")
         return await describe_image_with_gemini(image_bytes, mime_type)
 
     # OpenAI route.
@@ -126,19 +180,19 @@ async def describe_image_url(image_url: str) -> str:
         return await _describe_image_with_compatible_chat(
             client=get_openai_client(),
             model=settings.vision_model,
-            image_url=image_url,
+            image_url=await _vision_image_url(image_url, "openai"),
         )
 
     if has_qwen():
         return await _describe_image_with_compatible_chat(
             client=get_qwen_client(),
             model=settings.qwen_vision_model,
-            image_url=image_url,
+            image_url=await _vision_image_url(image_url, "qwen"),
         )
 
     # Gemini fallback if OpenAI is unavailable.
     if has_gemini():
-        image_bytes, mime_type = await download_image_data(image_url)
+        image_bytes, mime_type = await prepare_vision_image(image_url, "gemini")
         return await describe_image_with_gemini(image_bytes, mime_type)
 
     raise NotConfiguredError("No multimodal provider configured.")
@@ -157,91 +211,5 @@ async def generate_image(prompt: str) -> str:
     return response.data[0].url
 
 
-def _parse_resize_value(value: str) -> Tuple[Optional[int], Optional[int]]:
-    cleaned = value.strip().lower().replace("*", "x")
-    if "x" in cleaned:
-        parts = [part for part in cleaned.split("x") if part]
-        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-            return int(parts[0]), int(parts[1])
-        return None, None
-    if cleaned.isdigit():
-        return int(cleaned), None
-    return None, None
-
-
-def _validate_pil_dimensions(image: Image.Image) -> None:
-    """Reject images that exceed configured dimension/pixel limits BEFORE loading pixel data."""
-    settings = get_settings()
-    width, height = image.size
-    if width > settings.image_max_width or height > settings.image_max_height:
-        raise ImageTooLargeError(
-            f"Image dimensions {width}x{height} exceed limit "
-            f"{settings.image_max_width}x{settings.image_max_height}"
-        )
-    pixels = width * height
-    if pixels > settings.image_max_pixels:
-        raise ImageTooLargeError(
-            f"Image pixel count {pixels} exceeds limit of {settings.image_max_pixels}"
-        )
-
-
-def _process_image_sync(image_bytes: bytes, operation: str, value: Optional[str] = None) -> bytes:
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("error", Image.DecompressionBombWarning)
-            image = Image.open(BytesIO(image_bytes))
-            # Validate dimensions from header metadata BEFORE loading pixel data
-            _validate_pil_dimensions(image)
-            image.load()
-    except ImageTooLargeError:
-        raise
-    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning) as exc:
-        logger.error(f"Invalid image payload: {exc}")
-        return b""
-    except Exception as exc:
-        logger.error(f"Failed to open image: {exc}")
-        return b""
-
-    has_alpha = image.mode in ("RGBA", "LA") or (
-        image.mode == "P" and "transparency" in image.info
-    )
-    if image.mode == "P" and "transparency" in image.info:
-        image = image.convert("RGBA")
-        has_alpha = True
-
-    op = operation.lower()
-    if op == "grayscale":
-        alpha = None
-        if has_alpha and image.mode == "RGBA":
-            alpha = image.split()[-1]
-        gray = ImageOps.grayscale(image.convert("RGB"))
-        if alpha is not None:
-            image = Image.merge("RGBA", (gray, gray, gray, alpha))
-        else:
-            image = gray.convert("RGB")
-    elif op == "blur":
-        image = image.filter(ImageFilter.GaussianBlur(radius=2))
-    elif op == "resize" and value:
-        width, height = _parse_resize_value(value)
-        if width and height:
-            image.thumbnail((width, height), Image.Resampling.LANCZOS)
-        elif width:
-            ratio = width / max(1, image.width)
-            new_height = max(1, int(image.height * ratio))
-            image = image.resize((width, new_height), Image.Resampling.LANCZOS)
-        else:
-            logger.warning(f"Resize skipped due to invalid value: {value}")
-    else:
-        logger.warning(f"Unknown image operation: {operation}")
-
-    buffer = BytesIO()
-    if has_alpha:
-        image.save(buffer, format="PNG")
-    else:
-        image = image.convert("RGB")
-        image.save(buffer, format="JPEG", quality=85)
-    return buffer.getvalue()
-
-
 async def process_image(image_bytes: bytes, operation: str, value: Optional[str] = None) -> bytes:
-    return await asyncio.to_thread(_process_image_sync, image_bytes, operation, value)
+    return await cpu_pool().run(_process_image_sync, image_bytes, operation, value)
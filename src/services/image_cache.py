@@ -0,0 +1,168 @@
+"""Shared cache of vision-provider image descriptions.
+
+Stickers, memes and re-forwarded pictures repeat constantly in QQ groups,
+and every vision call costs money and seconds.  Descriptions are cached
+under two keys:
+
+* the image's source key: the QQ ``fileid`` when the URL carries one (the
+  ``rkey`` signature rotates, the file id does not), otherwise the URL
+  without its signature parameters;
+* the image's content signature (taken from the downscaled copy prepared
+  for the provider): a difference hash plus an exact digest of the decoded
+  pixels, so the same picture forwarded under a new file id still hits but
+  two flat or simple images whose difference hashes collide never share a
+  description.
+
+Entries live in Redis with ``IMAGE_DESCRIPTION_CACHE_TTL_SECONDS`` and in a
+small in-process tier in front of it.  Concurrent requests for the same image
+share one provider call, which runs in its own task: a caller that is
+cancelled stops waiting without cancelling the others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.image import image_signature, prepared_image_bytes
+from src.services.read_cache import TTLCache
+from src.services.redis import get_redis
+
+IMAGE_DESCRIPTION_PREFIX = "image:desc:"
+# Signature/session parameters that change between deliveries of one image.
+_VOLATILE_PARAMS = frozenset({"rkey", "term", "is_origin", "vuin"})
+
+
+def image_source_key(url: str) -> str:
+    parts = urlsplit((url or "").strip())
+    query = parse_qs(parts.query)
+    file_id = (query.get("fileid") or query.get("file_id") or [""])[0]
+    if file_id:
+        identity = f"fileid:{file_id}"
+    else:
+        stable = sorted(
+            (name, value)
+            for name, values in query.items()
+            if name not in _VOLATILE_PARAMS
+            for value in values
+        )
+        identity = f"url:{parts.netloc.lower()}{parts.path}?{stable}"
+    return "src:" + hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+class ImageDescriptionCache:
+    def __init__(
+        self,
+        redis_factory: Callable[[], object] = get_redis,
+        *,
+        ttl_seconds: Optional[int] = None,
+        local_entries: int = 512,
+        fetch: Callable[[str], Awaitable[bytes]] = prepared_image_bytes,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.redis_factory = redis_factory
+        self.ttl_seconds = (
+            get_settings().image_description_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+        self.local = TTLCache(max_entries=local_entries, ttl_seconds=min(self.ttl_seconds, 3600), clock=clock)
+        self.fetch = fetch
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.source_hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    async def describe(self, url: str, describe: Callable[[str], Awaitable[str]]) -> str:
+        """Return a cached description for ``url`` or compute it with ``describe``."""
+        if not self.enabled:
+            return await describe(url)
+        source = image_source_key(url)
+        task = self._inflight.get(source)
+        if task is None:
+            task = asyncio.create_task(self._resolve(url, source, describe))
+            self._inflight[source] = task
+            task.add_done_callback(lambda done: self._settled(source, done))
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> Dict[str, float]:
+        hits = self.source_hits + self.hash_hits
+        lookups = hits + self.misses
+        return {
+            "source_hits": self.source_hits,
+            "hash_hits": self.hash_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _settled(self, source: str, task: asyncio.Task) -> None:
+        if self._inflight.get(source) is task:
+            del self._inflight[source]
+        # Mark retrieved so a failure every caller stopped waiting for is not logged.
+        if not task.cancelled():
+            task.exception()
+
+    async def _resolve(self, url: str, source: str, describe: Callable[[str], Awaitable[str]]) -> str:
+        cached = await asyncio.to_thread(self._get, source)
+        if cached is not None:
+            self.source_hits += 1
+            return cached
+        digest = await self._content_hash(url)
+        if digest is not None:
+            cached = await asyncio.to_thread(self._get, digest)
+            if cached is not None:
+                self.hash_hits += 1
+                await asyncio.to_thread(self._put, cached, source)
+                return cached
+        self.misses += 1
+        description = await describe(url)
+        if description:
+            await asyncio.to_thread(self._put, description, source, digest)
+        return description
+
+    async def _content_hash(self, url: str) -> Optional[str]:
+        try:
+            image_bytes = await self.fetch(url)
+        except Exception as exc:
+            logger.debug(f"图片描述缓存下载失败，仅按来源缓存: {exc}")
+            return None
+        signature = await asyncio.to_thread(image_signature, image_bytes)
+        return f"phash:{signature}" if signature else None
+
+    def _get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        client = self.redis_factory()
+        if client is None:
+            return None
+        try:
+            value = client.get(IMAGE_DESCRIPTION_PREFIX + key)
+        except Exception as exc:
+            logger.warning(f"图片描述缓存读取失败: {exc}")
+            return None
+        if value is not None:
+            self.local.put(key, value)
+        return value
+
+    def _put(self, description: str, *keys: Optional[str]) -> None:
+        client = self.redis_factory()
+        pipe = client.pipeline(transaction=False) if client is not None else None
+        for key in filter(None, keys):
+            self.local.put(key, description)
+            if pipe is not None:
+                pipe.set(IMAGE_DESCRIPTION_PREFIX + key, description, ex=self.ttl_seconds)
+        if pipe is None:
+            return
+        try:
+            pipe.execute()
+        except Exception as exc:
+            logger.warning(f"图片描述缓存写入失败: {exc}")
@@ -0,0 +1,225 @@
+"""CPU-bound image operations.
+
+Everything here is a plain function of bytes so it can run in the CPU worker
+processes (:mod:`src.services.process_pool`).  The module deliberately
+imports only Pillow and configuration, which keeps each worker small.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import warnings
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from nonebot.log import logger
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+from src.core.config import get_settings
+from src.core.errors import ImageTooLargeError
+
+# (short side, long side) beyond which each provider downsamples anyway.
+VISION_MAX_SIDES: Dict[str, Tuple[int, int]] = {
+    "openai": (768, 2048),
+    "qwen": (1024, 1792),
+    "gemini": (768, 1536),
+}
+VISION_JPEG_QUALITY = 85
+# Small images in a format every provider accepts are sent as they are.
+VISION_PASSTHROUGH_BYTES = 256 * 1024
+
+
+def _detect_mime(image_bytes: bytes) -> str:
+    """Detect common image types without the removed stdlib ``imghdr`` module."""
+
+    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if image_bytes.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if image_bytes.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if (
+        len(image_bytes) >= 12
+        and image_bytes.startswith(b"RIFF")
+        and image_bytes[8:12] == b"WEBP"
+    ):
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _parse_resize_value(value: str) -> Tuple[Optional[int], Optional[int]]:
+    cleaned = value.strip().lower().replace("*", "x")
+    if "x" in cleaned:
+        parts = [part for part in cleaned.split("x") if part]
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            return int(parts[0]), int(parts[1])
+        return None, None
+    if cleaned.isdigit():
+        return int(cleaned), None
+    return None, None
+
+
+def _validate_pil_dimensions(image: Image.Image) -> None:
+    """Reject images that exceed configured dimension/pixel limits BEFORE loading pixel data."""
+    settings = get_settings()
+    width, height = image.size
+    if width > settings.image_max_width or height > settings.image_max_height:
+        raise ImageTooLargeError(
+            f"Image dimensions {width}x{height} exceed limit "
+            f"{settings.image_max_width}x{settings.image_max_height}"
+        )
+    pixels = width * height
+    if pixels > settings.image_max_pixels:
+        raise ImageTooLargeError(
+            f"Image pixel count {pixels} exceeds limit of {settings.image_max_pixels}"
+        )
+
+
+def _process_image_sync(image_bytes: bytes, operation: str, value: Optional[str] = None) -> bytes:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            image = Image.open(BytesIO(image_bytes))
+            # Validate dimensions from header metadata BEFORE loading pixel data
+            _validate_pil_dimensions(image)
+            image.load()
+    except ImageTooLargeError:
+        raise
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning) as exc:
+        logger.error(f"Invalid image payload: {exc}")
+        return b""
+    except Exception as exc:
+        logger.error(f"Failed to open image: {exc}")
+        return b""
+
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    if image.mode == "P" and "transparency" in image.info:
+        image = image.convert("RGBA")
+        has_alpha = True
+
+    op = operation.lower()
+    if op == "grayscale":
+        alpha = None
+        if has_alpha and image.mode == "RGBA":
+            alpha = image.split()[-1]
+        gray = ImageOps.grayscale(image.convert("RGB"))
+        if alpha is not None:
+            image = Image.merge("RGBA", (gray, gray, gray, alpha))
+        else:
+            image = gray.convert("RGB")
+    elif op == "blur":
+        image = image.filter(ImageFilter.GaussianBlur(radius=2))
+    elif op == "resize" and value:
+        width, height = _parse_resize_value(value)
+        if width and height:
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+        elif width:
+            ratio = width / max(1, image.width)
+            new_height = max(1, int(image.height * ratio))
+            image = image.resize((width, new_height), Image.Resampling.LANCZOS)
+        else:
+            logger.warning(f"Resize skipped due to invalid value: {value}")
+    else:
+        logger.warning(f"Unknown image operation: {operation}")
+
+    buffer = BytesIO()
+    if has_alpha:
+        image.save(buffer, format="PNG")
+    else:
+        image = image.convert("RGB")
+        image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[str]:
+    """64-bit difference hash; identical for re-encoded or resized copies of an image.
+
+    JPEGs are decoded through ``draft`` at a fraction of their size, so
+    hashing a phone photo costs a few milliseconds.
+    """
+    decoded = _decode_for_hash(image_bytes)
+    return _difference_hash(decoded) if decoded is not None else None
+
+
+def image_signature(image_bytes: bytes) -> Optional[str]:
+    """Difference hash plus an exact digest of the decoded pixels.
+
+    A difference hash only sees gradients, so flat or simple images (solid
+    colours, text on a plain background) collapse onto the same value.  The
+    digest pins the key to this exact picture: the same bytes forwarded again
+    still match, while a different image with a colliding hash does not.
+    """
+    decoded = _decode_for_hash(image_bytes)
+    if decoded is None:
+        return None
+    digest = hashlib.blake2b(decoded.tobytes(), digest_size=12)
+    digest.update(f"{decoded.mode}:{decoded.size}".encode("ascii"))
+    return f"{_difference_hash(decoded)}:{digest.hexdigest()}"
+
+
+def _decode_for_hash(image_bytes: bytes) -> Optional[Image.Image]:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            image = Image.open(BytesIO(image_bytes))
+            _validate_pil_dimensions(image)
+            image.draft("RGB", (64, 64))
+            return ImageOps.exif_transpose(image).convert("RGB")
+    except Exception as exc:
+        logger.debug(f"图片感知哈希计算失败: {exc}")
+        return None
+
+
+def _difference_hash(image: Image.Image) -> str:
+    small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            bits = (bits << 1) | int(pixels[row * 9 + column] < pixels[row * 9 + column + 1])
+    return f"{bits:016x}"
+
+
+def _prepare_vision_image_sync(
+    image_bytes: bytes,
+    short_side: int,
+    long_side: int,
+    quality: int = VISION_JPEG_QUALITY,
+) -> Tuple[bytes, str]:
+    """Downscale to the provider's effective resolution and re-encode compactly.
+
+    Runs in the image worker process.  ``draft`` lets JPEGs decode directly at
+    1/2, 1/4 or 1/8 scale, so a phone photo never materializes at full size.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        image = Image.open(BytesIO(image_bytes))
+        width, height = image.size
+        scale = min(1.0, short_side / max(1, min(width, height)), long_side / max(1, max(width, height)))
+        mime = _detect_mime(image_bytes)
+        if (
+            scale >= 1.0
+            and len(image_bytes) <= VISION_PASSTHROUGH_BYTES
+            and mime in {"image/jpeg", "image/png", "image/webp"}
+        ):
+            return image_bytes, mime
+        image.draft("RGB", (max(1, round(width * scale)), max(1, round(height * scale))))
+        # Checked after draft: a JPEG is only ever decoded at its drafted size.
+        _validate_pil_dimensions(image)
+        image = ImageOps.exif_transpose(image)
+    width, height = image.size
+    scale = min(1.0, short_side / max(1, min(width, height)), long_side / max(1, max(width, height)))
+    if scale < 1.0:
+        image = image.resize(
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            Image.Resampling.LANCZOS,
+        )
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, "white")
+        image.paste(rgba, mask=rgba.split()[-1])
+    buffer = BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
@@ -4,65 +4,32 @@ import re
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 
+from src.services.keyword_matcher import CORRECTION_MARKERS, MessageFeatures, extract_features
 from src.services.search import extract_urls
 
 
-CORRECTION_MARKERS = (
-    "你确定吗",
-    "你确定？",
-    "你确定?",
-    "你刚才说错了",
-    "刚才说错了",
-    "重新查",
-    "重新搜索",
-    "再查一次",
-    "不是这个比赛",
-    "不是这场比赛",
-)
-
-
 @dataclass
 class IntentDecision:
     name: str
     args: Dict[str, str]
 
 
-def is_correction_request(text: str) -> bool:
-    clean = "".join((text or "").lower().split())
-    return any("".join(marker.lower().split()) in clean for marker in CORRECTION_MARKERS)
+def is_correction_request(text: str, features: Optional[MessageFeatures] = None) -> bool:
+    features = features or extract_features(text)
+    return features.has("correction")
 
 
-def is_dynamic_fact_query(text: str) -> bool:
-    clean = (text or "").strip()
-    fresh_tokens = (
-        "最新", "新闻", "最近", "近期", "当前", "现任", "实时", "今天", "今日",
-        "昨天", "昨日", "刚刚", "今年", "本周", "本月",
-    )
-    query_tokens = (
-        "是谁", "是什么", "多少", "哪些", "发生", "怎么样", "情况", "结果",
-        "价格", "报价", "股价", "汇率", "官网", "发布", "更新", "版本", "排名",
-        "赛程", "票房", "政策", "规定", "开放", "关闭", "什么时候", "何时",
-        "谁赢", "比分", "赛果", "战报", "战绩", "吗", "呢", "？", "?",
-    )
-    live_result_tokens = (
-        "比分", "赛果", "战报", "战绩", "比赛结果", "具体比分", "几比几", "谁赢了", "赢了吗",
-    )
-    return any(token in clean for token in live_result_tokens) or (
-        any(token in clean for token in fresh_tokens)
-        and any(token in clean for token in query_tokens)
+def is_dynamic_fact_query(text: str, features: Optional[MessageFeatures] = None) -> bool:
+    features = features or extract_features(text)
+    return features.has("search.live_result") or (
+        features.has("fact.fresh") and features.has("fact.query")
     )
 
 
-def _extract_target_lang(text: str) -> str:
-    lower = text.lower()
-    if "英文" in text or "英语" in text or "english" in lower:
-        return "EN"
-    if "日文" in text or "日语" in text or "japanese" in lower:
-        return "JA"
-    if "韩文" in text or "韩语" in text or "korean" in lower:
-        return "KO"
-    if "中文" in text or "汉语" in text or "chinese" in lower:
-        return "ZH"
+def _extract_target_lang(features: MessageFeatures) -> str:
+    for group, code in (("lang.en", "EN"), ("lang.ja", "JA"), ("lang.ko", "KO")):
+        if features.has(group):
+            return code
     return "ZH"
 
 
@@ -83,23 +50,22 @@ def decide_intents(
     has_image: bool,
     has_audio: bool,
     face_ids: Optional[List[int]] = None,
+    *,
+    features: Optional[MessageFeatures] = None,
 ) -> List[IntentDecision]:
     intents: List[IntentDecision] = []
     clean = text.strip()
-    lower = clean.lower()
+    features = features or extract_features(clean)
     urls = extract_urls(clean)
     face_ids = face_ids or []
 
     # Image understanding: default for pure-image messages.
-    if has_image and (
-        not clean
-        or any(token in clean for token in ["看图", "图里", "这张图", "图片里", "识图", "这是什么", "帮我看看"])
-    ):
+    if has_image and (not clean or features.has("image.describe")):
         intents.append(IntentDecision(name="image.describe", args={}))
 
-    if has_image and any(token in clean for token in ["灰度", "黑白", "模糊", "缩放", "resize"]):
-        operation = "grayscale" if ("灰度" in clean or "黑白" in clean) else "blur"
-        if "缩放" in clean or "resize" in lower:
+    if has_image and features.has("image.process"):
+        operation = "grayscale" if features.contains("灰度", "黑白") else "blur"
+        if features.contains("缩放", "resize"):
             operation = "resize"
         value_match = re.search(r"(\d{2,4}[xX*]\d{2,4}|\d{2,4})", clean)
         intents.append(
@@ -109,7 +75,7 @@ def decide_intents(
             )
         )
 
-    if any(token in clean for token in ["画图", "生成图片", "来一张图", "画一张", "生成一张图"]):
+    if features.has("image.generate"):
         prompt = re.sub(
             r"^(请|帮我|给我)?(画图|生成图片|来一张图|画一张|生成一张图)[:：]?",
             "",
@@ -117,43 +83,43 @@ def decide_intents(
         ).strip()
         intents.append(IntentDecision(name="image.generate", args={"prompt": prompt or clean}))
 
-    if any(token in clean for token in ["翻译", "译成", "翻成"]):
-        target_lang = _extract_target_lang(clean)
+    if features.has("language.translate"):
+        target_lang = _extract_target_lang(features)
         source = re.sub(r".*(翻译|译成|翻成)\s*", "", clean).strip() or clean
         intents.append(
             IntentDecision(name="language.translate", args={"text": source, "target_lang": target_lang})
         )
 
-    if any(token in clean for token in ["什么语言", "语种", "language detect", "识别语言"]):
+    if features.has("language.detect"):
         intents.append(IntentDecision(name="language.detect", args={"text": clean}))
 
-    if any(token in clean for token in ["念一下", "读出来", "语音播报", "转语音"]):
+    if features.has("language.tts"):
         content = re.sub(r".*(念一下|读出来|语音播报|转语音)[:：]?", "", clean).strip() or clean
         intents.append(IntentDecision(name="language.tts", args={"text": content}))
 
-    if has_audio and (not clean or any(token in clean for token in ["转文字", "语音转文字", "听写"])):
+    if has_audio and (not clean or features.has("language.stt")):
         intents.append(IntentDecision(name="language.stt", args={}))
 
-    if any(token in clean for token in ["好感度", "亲密度"]):
+    if features.has("affinity.query"):
         intents.append(IntentDecision(name="affinity.query", args={}))
 
-    if face_ids and any(token in clean for token in ["表情", "情绪", "啥意思"]):
+    if face_ids and features.has("emoji.analyze"):
         intents.append(IntentDecision(name="emoji.analyze", args={}))
 
-    if any(token in clean for token in ["记笔记", "记一下", "帮我记住", "备忘"]) and len(clean) > 4:
+    if features.has("note.add") and len(clean) > 4:
         payload = re.sub(r"^(记笔记|记一下|帮我记住|备忘)[:：]?", "", clean).strip()
         title = payload[:16] if payload else "未命名笔记"
         intents.append(IntentDecision(name="note.add", args={"title": title, "content": payload or clean}))
 
-    if any(token in clean for token in ["查笔记", "看笔记", "笔记列表", "我记了什么"]):
+    if features.has("note.query"):
         keyword = re.sub(r"^(查笔记|看笔记|笔记列表|我记了什么)[:：]?", "", clean).strip()
         intents.append(IntentDecision(name="note.query", args={"keyword": keyword}))
 
-    if any(token in clean for token in ["删笔记", "删除笔记"]):
+    if features.has("note.delete"):
         key = re.sub(r"^(删笔记|删除笔记)[:：]?", "", clean).strip()
         intents.append(IntentDecision(name="note.delete", args={"keyword": key}))
 
-    if any(token in clean for token in ["改笔记", "修改笔记", "更新笔记"]):
+    if features.has("note.update"):
         payload = re.sub(r"^(改笔记|修改笔记|更新笔记)[:：]?", "", clean).strip()
         if "->" in payload:
             left, right = payload.split("->", 1)
@@ -161,71 +127,20 @@ def decide_intents(
                 IntentDecision(name="note.update", args={"keyword": left.strip(), "content": right.strip()})
             )
 
-    if any(token in clean for token in ["地图", "在哪", "周边", "路线", "怎么去", "高德"]):
+    if features.has("map.query"):
         intents.append(IntentDecision(name="map.query", args={"text": clean}))
 
-    if any(token in clean for token in ["天气", "气温"]):
+    if features.has("weather.query"):
         intents.append(IntentDecision(name="weather.query", args={"text": clean}))
 
-    explicit_search_tokens = [
-        "搜索",
-        "查一下",
-        "查一查",
-        "查下",
-        "查查",
-        "帮我查",
-        "帮忙查",
-        "搜一下",
-        "搜一搜",
-        "搜搜",
-        "帮我搜",
-        "联网",
-        "网上",
-        "google",
-        "百度",
-    ]
-    fresh_tokens = ["最新", "新闻", "最近", "近期", "当前", "现任", "实时", "今天", "今日", "刚刚", "今年"]
-    fact_lookup_tokens = [
-        "是谁",
-        "是什么",
-        "多少",
-        "价格",
-        "报价",
-        "股价",
-        "汇率",
-        "官网",
-        "发布",
-        "更新",
-        "版本",
-        "排名",
-        "赛程",
-        "票房",
-        "政策",
-        "规定",
-        "开放",
-        "关闭",
-    ]
-    live_result_tokens = [
-        "比分",
-        "赛果",
-        "战报",
-        "战绩",
-        "比赛结果",
-        "具体比分",
-        "几比几",
-        "谁赢了",
-        "赢了吗",
-    ]
-    needs_fresh_search = is_dynamic_fact_query(clean) or (
-        any(token in clean for token in fresh_tokens)
-        and any(token in clean for token in fact_lookup_tokens)
+    needs_fresh_search = is_dynamic_fact_query(clean, features) or (
+        features.has("search.fresh") and features.has("search.fact_lookup")
     )
-    needs_live_result_search = any(token in clean for token in live_result_tokens)
-
-    explicit_search = any(token in clean for token in explicit_search_tokens) or "google" in lower
-    correction_search = is_correction_request(clean)
+    needs_live_result_search = features.has("search.live_result")
+    explicit_search = features.has("search.explicit")
+    correction_search = is_correction_request(clean, features)
 
-    if urls and any(token in clean for token in ["总结", "摘要", "链接内容", "这篇讲了什么"]):
+    if urls and features.has("search.summarize_url"):
         intents.append(IntentDecision(name="search.summarize_url", args={"url": urls[0]}))
     elif correction_search or explicit_search or needs_fresh_search or needs_live_result_search:
         query = re.sub(
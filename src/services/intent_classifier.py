@@ -0,0 +1,388 @@
+"""Local classifier tier in front of LLM routing calls.
+
+Reminder parsing, the autonomy-suggestion check and search query planning
+each spent a full LLM round-trip just to classify the message.  This module
+provides a small on-CPU model that answers those questions in milliseconds:
+hashed character n-gram TF-IDF plus the shared keyword features from
+:mod:`src.services.keyword_matcher`, fed to one softmax-regression head per
+task.  Callers ask :func:`classify_locally` first and only fall back to the
+LLM when the model is missing or less confident than
+``INTENT_CLASSIFIER_THRESHOLD``.
+
+Training data comes from two places: the labelled seed corpus in
+``eval/intent_cases.yaml`` and the reminder/autonomy verdicts the LLM tier
+records via :func:`record_teacher_label` whenever it answers.  Planner
+output is free text, so ``search_plan`` is trained from the seed corpus only.  ``mako-bot intent
+train`` fits the model and ``mako-bot intent bench`` compares it with the
+keyword router on ``eval/search_cases.yaml``.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.keyword_matcher import FEATURE_GROUPS, extract_features
+
+ROUTING_TASKS: Dict[str, Tuple[str, ...]] = {
+    # ReminderIntentParser.parse; only a confident NONE skips the LLM, the
+    # other labels still need it to extract times and content.
+    "reminder": ("NONE", "CREATE", "MODIFY", "DELETE"),
+    # autonomy.is_autonomy_suggestion
+    "autonomy": ("no", "yes"),
+    # SearchContextBuilder.plan_queries: "direct" means the message is
+    # already a standalone query and the planner can be skipped.
+    "search_plan": ("direct", "rewrite"),
+}
+
+TEACHER_LABEL_KEY = "intent:labels"
+TEACHER_LABEL_LIMIT = 20000
+MODEL_VERSION = 1
+HASH_BUCKETS = 4096
+NGRAM_RANGE = (1, 3)
+
+
+@dataclass(frozen=True)
+class LabeledText:
+    task: str
+    text: str
+    label: str
+
+
+@dataclass(frozen=True)
+class Prediction:
+    task: str
+    label: str
+    confidence: float
+
+
+def _ngram_bucket(gram: str) -> int:
+    # crc32 instead of hash(): bucket ids must survive process restarts.
+    return zlib.crc32(gram.encode("utf-8")) % HASH_BUCKETS
+
+
+def _term_counts(text: str) -> Dict[int, int]:
+    compact = "".join((text or "").lower().split())
+    counts: Dict[int, int] = {}
+    low, high = NGRAM_RANGE
+    for size in range(low, high + 1):
+        for start in range(0, max(0, len(compact) - size + 1)):
+            bucket = _ngram_bucket(compact[start : start + size])
+            counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+def _vectorize(text: str, idf: np.ndarray) -> np.ndarray:
+    vector = np.zeros(HASH_BUCKETS + len(FEATURE_GROUPS), dtype=np.float32)
+    for bucket, count in _term_counts(text).items():
+        vector[bucket] = (1.0 + math.log(count)) * idf[bucket]
+    norm = float(np.linalg.norm(vector[:HASH_BUCKETS]))
+    if norm:
+        vector[:HASH_BUCKETS] /= norm
+    vector[HASH_BUCKETS:] = extract_features(text).vector()
+    return vector
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+@dataclass
+class _Head:
+    labels: Tuple[str, ...]
+    weights: np.ndarray
+    bias: np.ndarray
+
+
+class IntentClassifier:
+    def __init__(self, idf: np.ndarray, heads: Dict[str, _Head]) -> None:
+        self.idf = idf
+        self.heads = heads
+
+    @property
+    def tasks(self) -> Tuple[str, ...]:
+        return tuple(self.heads)
+
+    @classmethod
+    def train(
+        cls,
+        examples: Iterable[LabeledText],
+        *,
+        epochs: int = 500,
+        learning_rate: float = 1.0,
+        l2: float = 1e-4,
+    ) -> "IntentClassifier":
+        rows = [item for item in examples if item.task in ROUTING_TASKS and item.label in ROUTING_TASKS[item.task]]
+        if not rows:
+            raise ValueError("没有可用于训练的标注样本")
+        document_frequency = np.zeros(HASH_BUCKETS, dtype=np.float64)
+        texts = list(dict.fromkeys(item.text for item in rows))
+        for text in texts:
+            for bucket in _term_counts(text):
+                document_frequency[bucket] += 1
+        idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0).astype(np.float32)
+
+        heads: Dict[str, _Head] = {}
+        for task, labels in ROUTING_TASKS.items():
+            task_rows = [item for item in rows if item.task == task]
+            if len({item.label for item in task_rows}) < 2:
+                continue
+            features = np.stack([_vectorize(item.text, idf) for item in task_rows])
+            targets = np.zeros((len(task_rows), len(labels)), dtype=np.float32)
+            for index, item in enumerate(task_rows):
+                targets[index, labels.index(item.label)] = 1.0
+            weights = np.zeros((features.shape[1], len(labels)), dtype=np.float32)
+            bias = np.zeros(len(labels), dtype=np.float32)
+            for _ in range(max(1, epochs)):
+                error = (_softmax(features @ weights + bias) - targets) / len(task_rows)
+                weights -= learning_rate * (features.T @ error + l2 * weights)
+                bias -= learning_rate * error.sum(axis=0)
+            heads[task] = _Head(labels, weights, bias)
+        return cls(idf, heads)
+
+    def predict(self, task: str, text: str) -> Optional[Prediction]:
+        head = self.heads.get(task)
+        if head is None:
+            return None
+        probabilities = _softmax(_vectorize(text, self.idf) @ head.weights + head.bias)
+        index = int(np.argmax(probabilities))
+        return Prediction(task, head.labels[index], float(probabilities[index]))
+
+    def to_dict(self) -> dict:
+        return {
+            "version": MODEL_VERSION,
+            "hash_buckets": HASH_BUCKETS,
+            "feature_groups": list(FEATURE_GROUPS),
+            "idf": self.idf.tolist(),
+            "heads": {
+                task: {
+                    "labels": list(head.labels),
+                    "weights": head.weights.tolist(),
+                    "bias": head.bias.tolist(),
+                }
+                for task, head in self.heads.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IntentClassifier":
+        if (
+            data.get("version") != MODEL_VERSION
+            or data.get("hash_buckets") != HASH_BUCKETS
+            or tuple(data.get("feature_groups") or ()) != FEATURE_GROUPS
+        ):
+            # Feature layout changed since training; the weights no longer line up.
+            raise ValueError("意图分类模型与当前特征布局不一致，请重新训练")
+        heads = {
+            task: _Head(
+                tuple(head["labels"]),
+                np.asarray(head["weights"], dtype=np.float32),
+                np.asarray(head["bias"], dtype=np.float32),
+            )
+            for task, head in (data.get("heads") or {}).items()
+        }
+        return cls(np.asarray(data["idf"], dtype=np.float32), heads)
+
+    def save(self, path: str | os.PathLike) -> None:
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_suffix(target.suffix + ".tmp")
+        temporary.write_text(json.dumps(self.to_dict(), separators=(",", ":")), encoding="utf-8")
+        temporary.replace(target)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> "IntentClassifier":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+_loaded: Dict[str, Tuple[float, Optional[IntentClassifier]]] = {}
+_load_lock = threading.Lock()
+
+
+def local_intent_classifier() -> Optional[IntentClassifier]:
+    """The configured model, reloaded when its file changes; ``None`` when disabled."""
+    path = get_settings().intent_classifier_path
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _load_lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            model: Optional[IntentClassifier] = IntentClassifier.load(path)
+        except Exception as exc:
+            logger.warning(f"本地意图分类模型加载失败，继续使用 LLM 判断: {exc}")
+            model = None
+        _loaded[path] = (mtime, model)
+        return model
+
+
+def classify_locally(task: str, text: str) -> Optional[str]:
+    """Return the local label when the model is confident enough, else ``None``."""
+    model = local_intent_classifier()
+    if model is None:
+        return None
+    started = time.perf_counter()
+    prediction = model.predict(task, text)
+    if prediction is None:
+        return None
+    threshold = get_settings().intent_classifier_threshold
+    logger.debug(
+        "本地意图分类 task={} label={} confidence={:.3f} elapsed_ms={:.2f}",
+        task,
+        prediction.label,
+        prediction.confidence,
+        (time.perf_counter() - started) * 1000,
+    )
+    return prediction.label if prediction.confidence >= threshold else None
+
+
+def record_teacher_label(task: str, text: str, label: str) -> None:
+    """Keep an LLM verdict as a future training example. Best effort; blocking, so run it off the loop."""
+    if task not in ROUTING_TASKS or label not in ROUTING_TASKS[task] or not text.strip():
+        return
+    try:
+        from src.services.redis import get_redis
+
+        client = get_redis()
+        if client is None:
+            return
+        row = json.dumps({"task": task, "text": text[:500], "label": label}, ensure_ascii=False)
+        pipe = client.pipeline(transaction=False)
+        pipe.lpush(TEACHER_LABEL_KEY, row)
+        pipe.ltrim(TEACHER_LABEL_KEY, 0, TEACHER_LABEL_LIMIT - 1)
+        pipe.execute()
+    except Exception as exc:
+        logger.debug(f"意图教师标签写入失败: {exc}")
+
+
+def load_teacher_labels(client, limit: int = TEACHER_LABEL_LIMIT) -> List[LabeledText]:
+    examples: List[LabeledText] = []
+    for raw in client.lrange(TEACHER_LABEL_KEY, 0, max(0, limit - 1)) or []:
+        try:
+            data = json.loads(raw)
+            examples.append(LabeledText(str(data["task"]), str(data["text"]), str(data["label"])))
+        except (TypeError, ValueError, KeyError):
+            continue
+    return examples
+
+
+def load_seed_examples(path: str | os.PathLike) -> List[LabeledText]:
+    """Read ``{examples: {task: {label: [text, ...]}}}`` from a YAML corpus."""
+    import yaml
+
+    data = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+    examples: List[LabeledText] = []
+    for task, labels in (data.get("examples") or {}).items():
+        for label, texts in (labels or {}).items():
+            examples.extend(LabeledText(str(task), str(text), str(label)) for text in texts or ())
+    return examples
+
+
+def search_plan_label(case: dict) -> str:
+    """The search_plan label an ``eval/search_cases.yaml`` case implies."""
+    expected = case.get("expected") or {}
+    if expected.get("references_resolved_from_history") or expected.get("correction_mode"):
+        return "rewrite"
+    return "direct"
+
+
+def evaluate(
+    model: IntentClassifier,
+    examples: Sequence[LabeledText],
+    *,
+    threshold: float,
+) -> Dict[str, Dict[str, float]]:
+    """Per-task accuracy, local coverage at ``threshold`` and latency."""
+    report: Dict[str, Dict[str, float]] = {}
+    for task in ROUTING_TASKS:
+        rows = [item for item in examples if item.task == task]
+        if not rows or task not in model.heads:
+            continue
+        correct = confident = confident_correct = 0
+        elapsed: List[float] = []
+        for item in rows:
+            started = time.perf_counter()
+            prediction = model.predict(task, item.text)
+            elapsed.append((time.perf_counter() - started) * 1000)
+            if prediction is None:
+                # No answer from the local tier: neither correct nor covered.
+                continue
+            hit = prediction.label == item.label
+            correct += hit
+            if prediction.confidence >= threshold:
+                confident += 1
+                confident_correct += hit
+        elapsed.sort()
+        report[task] = {
+            "cases": len(rows),
+            "accuracy": correct / len(rows),
+            "local_coverage": confident / len(rows),
+            "local_accuracy": confident_correct / confident if confident else 0.0,
+            "latency_p50_ms": elapsed[len(elapsed) // 2],
+            "latency_max_ms": elapsed[-1],
+        }
+    return report
+
+
+def benchmark_search_cases(
+    model: Optional[IntentClassifier],
+    cases: Sequence[dict],
+    *,
+    threshold: float,
+) -> List[str]:
+    """Compare the keyword router and the local tier on the search eval corpus.
+
+    Every case in ``eval/search_cases.yaml`` is a search scenario, so the
+    keyword router is scored on routing recall; the local model is scored on
+    the ``search_plan`` label implied by each case.
+    """
+    from src.services.intent import decide_intents
+
+    routed = 0
+    router_ms: List[float] = []
+    for case in cases:
+        started = time.perf_counter()
+        decisions = decide_intents(str(case.get("user") or ""), has_image=False, has_audio=False)
+        router_ms.append((time.perf_counter() - started) * 1000)
+        routed += any(item.name.startswith("search.") for item in decisions)
+    router_ms.sort()
+    lines = [
+        f"search eval cases={len(cases)}",
+        f"  keyword router   recall={routed / max(1, len(cases)):.2f} "
+        f"p50_ms={router_ms[len(router_ms) // 2] if router_ms else 0:.3f}",
+    ]
+    if model is None:
+        lines.append("  local classifier 未配置模型（INTENT_CLASSIFIER_PATH）")
+        return lines
+    examples = [
+        LabeledText("search_plan", str(case.get("user") or ""), search_plan_label(case)) for case in cases
+    ]
+    stats = evaluate(model, examples, threshold=threshold).get("search_plan")
+    if stats is None:
+        lines.append("  local classifier 模型缺少 search_plan 任务")
+        return lines
+    lines.append(
+        f"  local classifier accuracy={stats['accuracy']:.2f} "
+        f"coverage@{threshold:g}={stats['local_coverage']:.2f} "
+        f"confident_accuracy={stats['local_accuracy']:.2f} "
+        f"p50_ms={stats['latency_p50_ms']:.3f} max_ms={stats['latency_max_ms']:.3f}"
+    )
+    return lines
@@ -0,0 +1,249 @@
+"""Shared keyword features for intent and policy routing.
+
+Intent routing, the reply-plan policy, outbound dedup and the autonomy
+suggestion check all ask the same question: which of a few hundred short
+keywords occur in this message?  Instead of one ``any(token in text ...)``
+loop per keyword list, every list lives in :data:`ROUTING_LEXICON` and one
+Aho–Corasick automaton, compiled at import, finds all of them in a single
+pass.  :func:`extract_features` returns the result as a
+:class:`MessageFeatures`; the chat handler computes it once per turn and
+passes it along so later stages reuse it instead of rescanning the text.
+
+Matching runs on the lowercased text, so ASCII keywords are case-insensitive.
+Groups listed in :data:`COMPACT_GROUPS` are matched with whitespace removed,
+as their callers always compared against a whitespace-free string.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+
+TIME_GREETINGS = ("早上好", "早安", "上午好", "中午好", "下午好", "晚上好")
+
+CORRECTION_MARKERS = (
+    "你确定吗",
+    "你确定？",
+    "你确定?",
+    "你刚才说错了",
+    "刚才说错了",
+    "重新查",
+    "重新搜索",
+    "再查一次",
+    "不是这个比赛",
+    "不是这场比赛",
+)
+
+ROUTING_LEXICON: Dict[str, Tuple[str, ...]] = {
+    # intent.decide_intents
+    "image.describe": ("看图", "图里", "这张图", "图片里", "识图", "这是什么", "帮我看看"),
+    "image.process": ("灰度", "黑白", "模糊", "缩放", "resize"),
+    "image.generate": ("画图", "生成图片", "来一张图", "画一张", "生成一张图"),
+    "language.translate": ("翻译", "译成", "翻成"),
+    "language.detect": ("什么语言", "语种", "language detect", "识别语言"),
+    "language.tts": ("念一下", "读出来", "语音播报", "转语音"),
+    "language.stt": ("转文字", "语音转文字", "听写"),
+    "lang.en": ("英文", "英语", "english"),
+    "lang.ja": ("日文", "日语", "japanese"),
+    "lang.ko": ("韩文", "韩语", "korean"),
+    "lang.zh": ("中文", "汉语", "chinese"),
+    "affinity.query": ("好感度", "亲密度"),
+    "emoji.analyze": ("表情", "情绪", "啥意思"),
+    "note.add": ("记笔记", "记一下", "帮我记住", "备忘"),
+    "note.query": ("查笔记", "看笔记", "笔记列表", "我记了什么"),
+    "note.delete": ("删笔记", "删除笔记"),
+    "note.update": ("改笔记", "修改笔记", "更新笔记"),
+    "map.query": ("地图", "在哪", "周边", "路线", "怎么去", "高德"),
+    "weather.query": ("天气", "气温"),
+    "search.summarize_url": ("总结", "摘要", "链接内容", "这篇讲了什么"),
+    "search.explicit": (
+        "搜索", "查一下", "查一查", "查下", "查查", "帮我查", "帮忙查", "搜一下",
+        "搜一搜", "搜搜", "帮我搜", "联网", "网上", "google", "百度",
+    ),
+    "search.fresh": (
+        "最新", "新闻", "最近", "近期", "当前", "现任", "实时", "今天", "今日", "刚刚", "今年",
+    ),
+    "search.fact_lookup": (
+        "是谁", "是什么", "多少", "价格", "报价", "股价", "汇率", "官网", "发布", "更新",
+        "版本", "排名", "赛程", "票房", "政策", "规定", "开放", "关闭",
+    ),
+    "search.live_result": (
+        "比分", "赛果", "战报", "战绩", "比赛结果", "具体比分", "几比几", "谁赢了", "赢了吗",
+    ),
+    # intent.is_dynamic_fact_query / is_correction_request
+    "fact.fresh": (
+        "最新", "新闻", "最近", "近期", "当前", "现任", "实时", "今天", "今日",
+        "昨天", "昨日", "刚刚", "今年", "本周", "本月",
+    ),
+    "fact.query": (
+        "是谁", "是什么", "多少", "哪些", "发生", "怎么样", "情况", "结果",
+        "价格", "报价", "股价", "汇率", "官网", "发布", "更新", "版本", "排名",
+        "赛程", "票房", "政策", "规定", "开放", "关闭", "什么时候", "何时",
+        "谁赢", "比分", "赛果", "战报", "战绩", "吗", "呢", "？", "?",
+    ),
+    "correction": CORRECTION_MARKERS,
+    # chat_policy.select_reply_plan
+    "reply.deep": (
+        "为什么", "怎么做", "如何", "分析", "比较", "区别", "解释", "计划",
+        "建议", "原因", "详细", "认真说", "难过", "焦虑", "害怕", "崩溃",
+        "好累", "很累", "委屈", "生气", "失眠", "压力", "烦死", "撑不住",
+    ),
+    "reply.question": ("？", "?"),
+    # outbound_dedup.canonical_intent
+    "outbound.greeting": (*TIME_GREETINGS, "晚安", "起床", "问候"),
+    "outbound.reminder": ("提醒", "记得", "别忘"),
+    "outbound.comfort": ("难过", "辛苦", "安慰", "抱抱"),
+    "outbound.check_in": ("最近", "怎么样", "还好吗", "关心"),
+    "outbound.daily_digest": ("资讯", "新闻", "日报"),
+    # autonomy.looks_like_suggestion
+    "suggestion.keyword": (
+        "建议", "可以去", "要不要去", "如果合适", "你想不想", "你可以", "去群里",
+        "在群里", "群里", "跟他说", "跟她说", "私聊", "主动",
+    ),
+    "suggestion.target": ("群", "大家", "朋友", "好友", "同学", "他们", "她们"),
+    "suggestion.action": (
+        "说", "发", "问", "提醒", "告诉", "安慰", "关心", "问候", "晚安", "早安", "吐槽",
+    ),
+}
+
+COMPACT_GROUPS = frozenset({"correction", "reply.deep", "reply.question"})
+
+# Fixed order for :meth:`MessageFeatures.vector`.
+FEATURE_GROUPS: Tuple[str, ...] = tuple(ROUTING_LEXICON)
+
+
+class KeywordAutomaton:
+    """An Aho–Corasick automaton over a fixed keyword set."""
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(item for item in keywords if item))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        for index, keyword in enumerate(self.keywords):
+            self._insert(index, keyword)
+        self._link()
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield ``(end, keyword)`` for every occurrence; ``end`` is exclusive."""
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self.keywords
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position + 1, keywords[index]
+
+    def leftmost_longest(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield non-overlapping ``(start, end, keyword)`` matches, left to right.
+
+        Where several keywords start at the same position the longest wins;
+        scanning resumes after it.
+        """
+        longest: Dict[int, str] = {}
+        for end, keyword in self.iter_matches(text):
+            start = end - len(keyword)
+            if len(keyword) > len(longest.get(start, "")):
+                longest[start] = keyword
+        position = 0
+        for start in sorted(longest):
+            if start < position:
+                continue
+            keyword = longest[start]
+            position = start + len(keyword)
+            yield start, position, keyword
+
+    def first_ends(self, text: str) -> Dict[str, int]:
+        """Map each keyword found in ``text`` to the end of its first occurrence."""
+        found: Dict[str, int] = {}
+        for end, keyword in self.iter_matches(text):
+            found.setdefault(keyword, end)
+        return found
+
+    def _insert(self, index: int, keyword: str) -> None:
+        state = 0
+        for char in keyword:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = following
+        self._output[state] = (*self._output[state], index)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._output[following] = (*self._output[following], *self._output[self._fail[following]])
+
+
+def _keyword_groups(lexicon: Mapping[str, Tuple[str, ...]]) -> Dict[str, Tuple[str, ...]]:
+    groups: Dict[str, List[str]] = {}
+    for group, keywords in lexicon.items():
+        for keyword in keywords:
+            groups.setdefault(keyword.lower(), []).append(group)
+    return {keyword: tuple(names) for keyword, names in groups.items()}
+
+
+_KEYWORD_GROUPS = _keyword_groups(ROUTING_LEXICON)
+_AUTOMATON = KeywordAutomaton(_KEYWORD_GROUPS)
+
+
+@dataclass(frozen=True)
+class MessageFeatures:
+    """Keyword hits of one message, computed once per turn."""
+
+    text: str
+    keywords: FrozenSet[str]
+    groups: FrozenSet[str]
+    first_end: Mapping[str, int]
+
+    def has(self, *groups: str) -> bool:
+        return any(group in self.groups for group in groups)
+
+    def contains(self, *keywords: str) -> bool:
+        return any(keyword.lower() in self.keywords for keyword in keywords)
+
+    def within(self, group: str, limit: int) -> bool:
+        """Whether a keyword of ``group`` occurs entirely inside ``text[:limit]``."""
+        return any(
+            self.first_end.get(keyword.lower(), limit + 1) <= limit
+            for keyword in ROUTING_LEXICON.get(group, ())
+        )
+
+    def vector(self, groups: Tuple[str, ...] = FEATURE_GROUPS) -> Tuple[int, ...]:
+        return tuple(int(group in self.groups) for group in groups)
+
+
+def extract_features(text: Optional[str]) -> MessageFeatures:
+    value = str(text or "")
+    lower = value.lower()
+    first_end = _AUTOMATON.first_ends(lower)
+    compact = "".join(lower.split())
+    compact_hits = first_end if compact == lower else _AUTOMATON.first_ends(compact)
+    groups = {
+        group
+        for keyword in first_end
+        for group in _KEYWORD_GROUPS[keyword]
+        if group not in COMPACT_GROUPS
+    }
+    groups.update(
+        group
+        for keyword in compact_hits
+        for group in _KEYWORD_GROUPS[keyword]
+        if group in COMPACT_GROUPS
+    )
+    return MessageFeatures(value, frozenset(first_end), frozenset(groups), first_end)
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import asyncio
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Iterable
 
 from nonebot.log import logger
@@ -50,7 +51,8 @@ class KnowledgePrecipitationService:
         if not has_deepseek():
             return PrecipitationResult(skipped_reason="DEEPSEEK_API_KEY is not configured")
 
-        records = await asyncio.to_thread(self.storage.get_recent_global_records, hours)
+        now = datetime.now()
+        records = await asyncio.to_thread(self.storage.records_between, now - timedelta(hours=hours), now)
         records = sorted(records, key=lambda item: item.time)[-500:]
         if not records:
             return PrecipitationResult(skipped_reason="no recent chat records")
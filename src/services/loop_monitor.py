@@ -0,0 +1,202 @@
+"""Event-loop lag measurement and blocking-call detection.
+
+Handlers still call some synchronous code (Redis, embeddings, PIL) directly,
+and a regression there stalls every chat in the process without showing up
+anywhere.  This module makes such stalls visible and attributable:
+
+* :class:`LoopMonitor` runs a heartbeat task that sleeps ``interval`` and
+  records how late it wakes up.  The lag distribution is reported on
+  ``/readyz``.
+* With ``trace`` enabled (``LOOP_STALL_TRACE`` or ``LOG_LEVEL=DEBUG``) a
+  watchdog thread notices when the heartbeat has not run for
+  ``stall_threshold`` seconds and logs the loop thread's current stack, i.e.
+  the code that is holding the loop, while it is still holding it.
+* :func:`detect_blocking` wraps a block of test code and fails when the loop
+  was held longer than a threshold inside it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+
+_LAG_WINDOW = 240
+_MAX_STALLS = 20
+
+
+@dataclass
+class LoopStall:
+    started_at: float
+    duration: float
+    stack: str
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        *,
+        interval: float = 0.5,
+        stall_threshold: float = 0.25,
+        trace: bool = False,
+    ) -> None:
+        self.interval = max(0.001, interval)
+        self.stall_threshold = max(0.001, stall_threshold)
+        self.trace = trace
+        self._lags: Deque[float] = deque(maxlen=_LAG_WINDOW)
+        self.stalls: Deque[LoopStall] = deque(maxlen=_MAX_STALLS)
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        if self.trace:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        watchdog, self._watchdog = self._watchdog, None
+        if watchdog is not None:
+            await asyncio.to_thread(watchdog.join, 1.0)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def lagging(self) -> bool:
+        """Whether the recent p95 lag is above the stall threshold."""
+        return self.snapshot()["lag_p95_ms"] > self.stall_threshold * 1000
+
+    def snapshot(self) -> Dict[str, float]:
+        lags = sorted(self._lags)
+        return {
+            "lag_last_ms": round(self._lags[-1] * 1000, 1) if self._lags else 0.0,
+            "lag_p50_ms": _percentile_ms(lags, 0.5),
+            "lag_p95_ms": _percentile_ms(lags, 0.95),
+            "lag_max_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stall_count,
+        }
+
+    def recent_stalls(self) -> List[LoopStall]:
+        return list(self.stalls)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            self._lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.stall_threshold and not self.trace:
+                self.stall_count += 1
+                logger.warning(f"事件循环阻塞 {lag * 1000:.0f}ms")
+
+    def _watch(self) -> None:
+        # The heartbeat is due every ``interval``; anything beyond that plus the threshold is a stall.
+        limit = self.interval + self.stall_threshold
+        reported = None
+        while not self._stopped.wait(min(self.interval, self.stall_threshold) / 2):
+            beat = self._beat
+            held = time.monotonic() - beat
+            if held < limit:
+                continue
+            if reported == beat:
+                # Still the same stall: keep its duration current for the report.
+                self.stalls[-1].duration = held - self.interval
+                continue
+            reported = beat
+            self._record(held - self.interval)
+
+    def _record(self, duration: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id or -1)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        self.stall_count += 1
+        self.stalls.append(LoopStall(time.time(), duration, stack))
+        logger.warning(f"事件循环已阻塞 {duration * 1000:.0f}ms，当前调用栈:\n{stack}")
+
+
+def _percentile_ms(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+class BlockingCallError(AssertionError):
+    pass
+
+
+@asynccontextmanager
+async def detect_blocking(threshold: float = 0.05) -> AsyncIterator[LoopMonitor]:
+    """Fail with :class:`BlockingCallError` if the loop is held longer than ``threshold`` inside the block.
+
+    For tests::
+
+        async with detect_blocking(0.05):
+            await handler(event)
+    """
+    monitor = LoopMonitor(interval=threshold / 2, stall_threshold=threshold, trace=True)
+    monitor.start()
+    try:
+        yield monitor
+        # Let the heartbeat observe a stall caused by the block's last step.
+        await asyncio.sleep(monitor.interval * 2)
+    finally:
+        await monitor.stop()
+    if monitor.stalls:
+        worst = max(monitor.stalls, key=lambda stall: stall.duration)
+        raise BlockingCallError(
+            f"event loop blocked for {worst.duration * 1000:.0f}ms (threshold {threshold * 1000:.0f}ms):\n"
+            f"{worst.stack}"
+        )
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def loop_monitor() -> LoopMonitor:
+    """The process-wide monitor, configured from the ``LOOP_*`` settings."""
+    global _monitor
+    if _monitor is None:
+        settings = get_settings()
+        _monitor = LoopMonitor(
+            interval=settings.loop_lag_sample_seconds,
+            stall_threshold=settings.loop_stall_threshold_seconds,
+            trace=settings.loop_stall_trace or settings.log_level.upper() == "DEBUG",
+        )
+    return _monitor
+
+
+def loop_monitor_snapshot() -> Optional[Dict[str, float]]:
+    return _monitor.snapshot() if _monitor is not None and _monitor.running else None
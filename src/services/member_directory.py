@@ -0,0 +1,238 @@
+"""Per-group member directory for @-rendering and @-resolution.
+
+Every group reply used to fetch the full member list to turn display names
+into @ segments, and every incoming ``at`` segment cost a
+``get_group_member_info`` call.  In a 2000-member group the list alone is a
+large OneBot round-trip on the reply path.
+
+:class:`GroupMemberDirectory` loads a group's list once, keeps it for
+``GROUP_MEMBER_CACHE_TTL_SECONDS`` and patches it from member notices
+(join, leave, card change) in between.  After the TTL the stale roster keeps
+serving while one background refresh runs, so only a group's very first
+lookup waits on OneBot.  Lookups in both directions are dictionary reads.
+Notices that arrive while a list is being fetched are replayed onto the new
+roster, so a refresh never undoes a join, leave or rename it raced with.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+
+
+def member_display_name(member: dict) -> str:
+    return str(member.get("card") or member.get("nickname") or "").strip()
+
+
+class GroupRoster:
+    """Both directions of one group's name mapping.
+
+    When several members share a display name the most recently seen one
+    owns it, as the member-list comprehension this replaces did; the others
+    take over if that member leaves or renames.
+    """
+
+    def __init__(self, members: Iterable[dict] = (), *, loaded_at: float = 0.0) -> None:
+        self.loaded_at = loaded_at
+        self.version = 0
+        self.names: Dict[int, str] = {}
+        self.users: Dict[str, int] = {}
+        # Members known to have no display name, so they are not looked up again.
+        self.nameless: Set[int] = set()
+        self._holders: Dict[str, Dict[int, None]] = {}
+        for member in members:
+            try:
+                self.set(int(member["user_id"]), member_display_name(member))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def name_for(self, user_id: int) -> Optional[str]:
+        return self.names.get(user_id)
+
+    def knows(self, user_id: int) -> bool:
+        return user_id in self.names or user_id in self.nameless
+
+    def user_for(self, name: str) -> Optional[int]:
+        return self.users.get(name)
+
+    def set(self, user_id: int, name: str) -> None:
+        if self.names.get(user_id) == name:
+            return
+        self.remove(user_id)
+        if not name:
+            self.nameless.add(user_id)
+            return
+        self.names[user_id] = name
+        self._holders.setdefault(name, {})[user_id] = None
+        self.users[name] = user_id
+        self.version += 1
+
+    def remove(self, user_id: int) -> None:
+        self.nameless.discard(user_id)
+        name = self.names.pop(user_id, None)
+        if name is None:
+            return
+        holders = self._holders.get(name, {})
+        holders.pop(user_id, None)
+        if not holders:
+            self._holders.pop(name, None)
+            self.users.pop(name, None)
+        elif self.users.get(name) == user_id:
+            self.users[name] = next(reversed(holders))
+        self.version += 1
+
+
+class GroupMemberDirectory:
+    def __init__(
+        self,
+        *,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = (
+            get_settings().group_member_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+        self.clock = clock
+        self._rosters: Dict[int, GroupRoster] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        # group_id -> notices seen while its member list is being fetched.
+        self._in_flight: Dict[int, List[Tuple[Any, ...]]] = {}
+        self.loads = 0
+        self.hits = 0
+        self.notices = 0
+
+    async def roster(self, bot: Any, group_id: int) -> GroupRoster:
+        """The group's roster, loading it on first use and refreshing it in the background once stale."""
+        group_id = int(group_id)
+        roster = self._rosters.get(group_id)
+        if roster is None:
+            return await self._load(bot, group_id)
+        self.hits += 1
+        if self.clock() - roster.loaded_at > self.ttl_seconds and group_id not in self._refreshing:
+            task = asyncio.create_task(self._refresh(bot, group_id))
+            self._refreshing[group_id] = task
+            task.add_done_callback(lambda _task: self._refreshing.pop(group_id, None))
+        return roster
+
+    async def name_to_user(self, bot: Any, group_id: int) -> Dict[str, int]:
+        return (await self.roster(bot, group_id)).users
+
+    async def display_name(self, bot: Any, group_id: int, user_id: int) -> Optional[str]:
+        roster = await self.roster(bot, group_id)
+        if roster.knows(int(user_id)):
+            return roster.name_for(int(user_id))
+        # Someone the roster missed (e.g. a lost join notice): ask for just them.
+        member = await bot.get_group_member_info(group_id=int(group_id), user_id=int(user_id))
+        name = member_display_name(member)
+        self._apply(int(group_id), ("set", int(user_id), name))
+        return name or None
+
+    async def member_joined(self, bot: Any, group_id: int, user_id: int) -> None:
+        group_id = int(group_id)
+        if group_id not in self._rosters and group_id not in self._in_flight:
+            return
+        self.notices += 1
+        try:
+            member = await bot.get_group_member_info(group_id=group_id, user_id=int(user_id))
+        except Exception as exc:
+            logger.debug(f"新群成员信息获取失败，等待下次刷新: {exc}")
+            return
+        self._apply(group_id, ("set", int(user_id), member_display_name(member)))
+
+    def member_left(self, group_id: int, user_id: int, *, self_id: Optional[int] = None) -> None:
+        if self_id is not None and int(user_id) == int(self_id):
+            self.forget(group_id)
+            return
+        if self._apply(int(group_id), ("remove", int(user_id))):
+            self.notices += 1
+
+    def card_changed(self, group_id: int, user_id: int, card: str) -> None:
+        name = (card or "").strip()
+        # An emptied card falls back to the nickname, which the notice does not carry.
+        change = ("set", int(user_id), name) if name else ("stale",)
+        if self._apply(int(group_id), change):
+            self.notices += 1
+
+    def forget(self, group_id: int) -> None:
+        self._rosters.pop(int(group_id), None)
+        self._in_flight.pop(int(group_id), None)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "groups": len(self._rosters),
+            "members": sum(len(roster) for roster in self._rosters.values()),
+            "loads": self.loads,
+            "hits": self.hits,
+            "notices": self.notices,
+        }
+
+    async def _load(self, bot: Any, group_id: int) -> GroupRoster:
+        pending = self._loading.get(group_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[group_id] = future
+        try:
+            roster = await self._fetch(bot, group_id)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(roster)
+            return roster
+        finally:
+            self._loading.pop(group_id, None)
+
+    async def _refresh(self, bot: Any, group_id: int) -> None:
+        try:
+            await self._fetch(bot, group_id)
+        except Exception as exc:
+            logger.warning(f"群成员列表刷新失败，继续使用旧列表 group={group_id}: {exc}")
+
+    async def _fetch(self, bot: Any, group_id: int) -> GroupRoster:
+        started = self.clock()
+        self._in_flight[group_id] = []
+        try:
+            members = await bot.get_group_member_list(group_id=group_id)
+        finally:
+            changes = self._in_flight.pop(group_id, None)
+        fresh = GroupRoster(members, loaded_at=started)
+        # The list may predate notices that arrived while it was fetched.
+        for change in changes or ():
+            _apply_change(fresh, change)
+        previous = self._rosters.get(group_id)
+        if previous is not None:
+            fresh.version = previous.version + 1
+        self._rosters[group_id] = fresh
+        self.loads += 1
+        return fresh
+
+    def _apply(self, group_id: int, change: Tuple[Any, ...]) -> bool:
+        """Patch the current roster and any fetch in flight; whether either exists."""
+        roster = self._rosters.get(group_id)
+        if roster is not None:
+            _apply_change(roster, change)
+        pending = self._in_flight.get(group_id)
+        if pending is not None:
+            pending.append(change)
+        return roster is not None or pending is not None
+
+
+def _apply_change(roster: GroupRoster, change: Tuple[Any, ...]) -> None:
+    kind = change[0]
+    if kind == "set":
+        roster.set(change[1], change[2])
+    elif kind == "remove":
+        roster.remove(change[1])
+    else:
+        roster.loaded_at = float("-inf")
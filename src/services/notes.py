@@ -5,17 +5,25 @@ from typing import List, Optional
 
 from src.models.schemas import NoteRecord
 from src.services.storage import StorageService
+from src.services.vector_indexer import VectorIndexer
 from src.services.vector_store import VectorStore
 
 
 class NoteService:
-    def __init__(self) -> None:
-        self.storage = StorageService()
-        self.vector_store = VectorStore()
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        vector_store: Optional[VectorStore] = None,
+        indexer: Optional[VectorIndexer] = None,
+    ) -> None:
+        self.storage = storage or StorageService()
+        self.vector_store = vector_store or VectorStore()
+        # With an indexer, embedding happens in the background after the note is saved.
+        self.indexer = indexer
 
     def add_note(self, user_id: int, title: str, content: str, category: str = "default") -> NoteRecord:
         note = self.storage.add_note(user_id=user_id, title=title, content=content, category=category)
-        self.vector_store.add(f"[note:{user_id}:{note.note_id}] {title} {content}")
+        self._index(f"[note:{user_id}:{note.note_id}] {title} {content}")
         self._append_progress_event(
             "note_created",
             "笔记已创建并写入向量索引。",
@@ -59,7 +67,7 @@ class NoteService:
     def update_note(self, user_id: int, note_id_or_keyword: str, content: str) -> Optional[NoteRecord]:
         updated = self.storage.update_note(user_id, note_id_or_keyword, content)
         if updated:
-            self.vector_store.add(f"[note:{user_id}:{updated.note_id}] {updated.title} {updated.content}")
+            self._index(f"[note:{user_id}:{updated.note_id}] {updated.title} {updated.content}")
             self._append_progress_event(
                 "note_updated",
                 "笔记已更新并写入向量索引。",
@@ -82,6 +90,12 @@ class NoteService:
             )
         return updated
 
+    def _index(self, text: str) -> None:
+        if self.indexer is not None:
+            self.indexer.submit(text)
+        else:
+            self.vector_store.add(text)
+
     def _append_progress_event(self, event_type: str, summary: str, payload: dict) -> None:
         method = getattr(self.storage, "append_progress_event", None)
         if callable(method):
@@ -11,6 +11,7 @@ from zoneinfo import ZoneInfo
 
 from src.core.config import get_settings
 from src.models.schemas import OutboundMessageRecord
+from src.services.keyword_matcher import TIME_GREETINGS, extract_features
 from src.services.storage import StorageService
 
 
@@ -26,7 +27,7 @@ _STYLE_FILLERS = (
     "嘛",
 )
 LOCAL_TZ = ZoneInfo("Asia/Shanghai")
-_TIME_GREETINGS = ("早上好", "早安", "上午好", "中午好", "下午好", "晚上好")
+_TIME_GREETINGS = TIME_GREETINGS
 
 
 def align_time_greeting(text: str, now: Optional[datetime] = None) -> str:
@@ -105,19 +106,14 @@ def canonical_intent(intent: str, text: str = "") -> str:
         "news": "daily_digest",
         "digest": "daily_digest",
     }
-    opening = text[:32]
-    if any(token in opening for token in (*_TIME_GREETINGS, "晚安", "起床", "问候")):
+    features = extract_features(text)
+    if features.within("outbound.greeting", 32):
         return "greeting"
     if value and value not in {"other", "unknown", "none"}:
         return aliases.get(value, value)
-    if any(token in text for token in ("提醒", "记得", "别忘")):
-        return "reminder"
-    if any(token in text for token in ("难过", "辛苦", "安慰", "抱抱")):
-        return "comfort"
-    if any(token in text for token in ("最近", "怎么样", "还好吗", "关心")):
-        return "check_in"
-    if any(token in text for token in ("资讯", "新闻", "日报")):
-        return "daily_digest"
+    for name in ("reminder", "comfort", "check_in", "daily_digest"):
+        if features.has(f"outbound.{name}"):
+            return name
     return "other"
 
 
@@ -0,0 +1,347 @@
+"""Managed worker-process pool for CPU-heavy work.
+
+Decoding a multi-megabyte photo or stripping a large HTML page holds the GIL
+for hundreds of milliseconds and briefly needs several times the input size
+in memory.  Running that on the event loop's thread pool stalls every other
+chat turn and grows the main process towards the host's memory alarm.
+:class:`ManagedProcessPool` runs such functions in separate processes and
+keeps them on a leash:
+
+* admission control: at most ``max_workers`` tasks run and ``max_queue``
+  more wait; beyond that :class:`WorkerPoolBusyError` is raised at once
+  instead of building an unbounded backlog;
+* a per-task time limit and a per-worker resident-memory limit: a task
+  that exceeds either gets its workers killed and the caller receives
+  :class:`WorkerTaskLimitError`; other tasks caught in the same kill are
+  retried once on the fresh pool.  Workers report which task they start
+  and from which pid, so the clock starts when a task really runs (not
+  while it waits in the executor's call queue) and only the memory of the
+  worker running a task is held against it;
+* recycling: workers are spawned (not forked) and replaced after
+  ``max_tasks_per_child`` tasks so decoder buffers never accumulate.  Python
+  3.10's executor has no ``max_tasks_per_child``; there the whole executor
+  is retired after that many submissions and its workers exit once their
+  queued tasks finish;
+* metrics via :meth:`ManagedProcessPool.snapshot`.
+
+The shared pool for the bot is :func:`cpu_pool`; it is sized by the
+``CPU_POOL_*`` settings.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.core.errors import WorkerPoolBusyError, WorkerTaskLimitError
+
+T = TypeVar("T")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_LATENCY_WINDOW = 256
+# ProcessPoolExecutor(max_tasks_per_child=...) exists from Python 3.11.
+_NATIVE_RECYCLING = sys.version_info >= (3, 11)
+
+
+def worker_rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of ``pid`` from ``/proc``; ``None`` where that is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as handle:
+            fields = handle.read().split()
+    except OSError:
+        return None
+    try:
+        return int(fields[1]) * _PAGE_SIZE
+    except (IndexError, ValueError):
+        return None
+
+
+# Set in each worker by the executor's initializer; see _run_tracked.
+_worker_starts: Any = None
+
+
+def _init_worker(starts: Any) -> None:
+    global _worker_starts
+    _worker_starts = starts
+
+
+def _run_tracked(task_id: int, fn: Callable[..., T], *args: Any) -> T:
+    """Worker side: announce ``task_id`` and this pid, then run the task."""
+    if _worker_starts is not None:
+        try:
+            _worker_starts.put((task_id, os.getpid()))
+        except Exception:
+            pass
+    return fn(*args)
+
+
+class _PoolExecutor(ProcessPoolExecutor):
+    """An executor plus the bookkeeping the pool keeps per executor generation."""
+
+    def __init__(self, max_workers: int, **options: Any) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.starts_queue = context.SimpleQueue()
+        super().__init__(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.starts_queue,),
+            **options,
+        )
+        # task id -> (worker pid, monotonic time the parent saw it start).
+        self.starts: Dict[int, Tuple[int, float]] = {}
+        self.tasks = 0
+        self.killed = False
+
+    def collect_starts(self) -> None:
+        while not self.starts_queue.empty():
+            task_id, pid = self.starts_queue.get()
+            self.starts[task_id] = (pid, time.monotonic())
+
+
+class ManagedProcessPool:
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_workers: int = 1,
+        max_queue: int = 8,
+        max_tasks_per_child: int = 200,
+        task_timeout: float = 20.0,
+        memory_limit_mb: int = 0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.max_tasks_per_child = max(1, max_tasks_per_child)
+        self.task_timeout = task_timeout
+        self.memory_limit_bytes = max(0, memory_limit_mb) * 1024 * 1024
+        self.poll_interval = poll_interval
+        self._executor: Optional[_PoolExecutor] = None
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.inflight = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.memory_kills = 0
+        self.restarts = 0
+        self.recycles = 0
+        self.peak_rss_bytes = 0
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run ``fn(*args)`` in a worker process; ``fn`` and its arguments must be picklable.
+
+        Raises :class:`WorkerPoolBusyError` when the queue is full and
+        :class:`WorkerTaskLimitError` when the task breaks its time or
+        memory limit.
+        """
+        if self.inflight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise WorkerPoolBusyError(f"进程池 {self.name} 已满 ({self.inflight} 个任务在排队或执行)")
+        self.inflight += 1
+        self.submitted += 1
+        started = time.monotonic()
+        try:
+            try:
+                result = await self._attempt(fn, args)
+            except BrokenProcessPool as exc:
+                if not self._was_killed(exc):
+                    raise
+                # Collateral of a kill aimed at another task: try once more.
+                result = await self._attempt(fn, args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.inflight -= 1
+        self.completed += 1
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> Dict[str, float]:
+        latencies = sorted(self._latencies)
+        return {
+            "workers": self.max_workers,
+            "inflight": self.inflight,
+            "queued": max(0, self.inflight - self.running),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "memory_kills": self.memory_kills,
+            "restarts": self.restarts,
+            "recycles": self.recycles,
+            "latency_p50_ms": _percentile_ms(latencies, 0.5),
+            "latency_p95_ms": _percentile_ms(latencies, 0.95),
+            "peak_worker_rss_mb": round(self.peak_rss_bytes / (1024 * 1024), 1),
+        }
+
+    async def _attempt(self, fn: Callable[..., T], args: tuple) -> T:
+        executor = self._ensure_executor()
+        task_id = next(self._task_ids)
+        try:
+            future = executor.submit(_run_tracked, task_id, fn, *args)
+        except BrokenProcessPool:
+            self._reset(executor)
+            executor = self._ensure_executor()
+            future = executor.submit(_run_tracked, task_id, fn, *args)
+        try:
+            return await self._supervise(executor, task_id, future)
+        except BrokenProcessPool as exc:
+            if executor.killed:
+                exc.killed = True  # type: ignore[attr-defined]
+            else:
+                logger.warning(f"进程池 {self.name} 的工作进程异常退出，已重建进程池")
+                self._reset(executor)
+            raise
+
+    async def _supervise(self, executor: _PoolExecutor, task_id: int, future: "Future[T]") -> T:
+        waiter = asyncio.wrap_future(future)
+        started: Optional[Tuple[int, float]] = None
+        try:
+            while True:
+                done, _ = await asyncio.wait({waiter}, timeout=self.poll_interval)
+                if done:
+                    return waiter.result()
+                if started is None:
+                    executor.collect_starts()
+                    started = executor.starts.get(task_id)
+                    if started is None:
+                        # Still queued, in our backlog or the executor's call queue.
+                        continue
+                    self.running += 1
+                pid, started_at = started
+                if self.task_timeout > 0 and time.monotonic() - started_at > self.task_timeout:
+                    self.timeouts += 1
+                    self._kill(executor, "超时")
+                    raise WorkerTaskLimitError(
+                        f"进程池 {self.name} 的任务超过 {self.task_timeout:g} 秒，已终止工作进程"
+                    )
+                rss = self._worker_rss(pid)
+                if self.memory_limit_bytes and rss > self.memory_limit_bytes:
+                    self.memory_kills += 1
+                    self._kill(executor, f"内存 {rss // (1024 * 1024)}MB 超限")
+                    raise WorkerTaskLimitError(
+                        f"进程池 {self.name} 的工作进程内存超过 "
+                        f"{self.memory_limit_bytes // (1024 * 1024)}MB，已终止工作进程"
+                    )
+        finally:
+            if started is not None:
+                self.running -= 1
+            executor.collect_starts()
+            executor.starts.pop(task_id, None)
+            if not waiter.done():
+                waiter.cancel()
+
+    def _worker_rss(self, pid: int) -> int:
+        rss = worker_rss_bytes(pid) or 0
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        return rss
+
+    def _kill(self, executor: _PoolExecutor, reason: str) -> None:
+        logger.warning(f"进程池 {self.name} 的任务{reason}，终止并重建工作进程")
+        executor.killed = True
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            try:
+                process.kill()
+            except Exception:
+                pass
+        self._reset(executor)
+
+    def _was_killed(self, exc: BaseException) -> bool:
+        return bool(getattr(exc, "killed", False))
+
+    def _ensure_executor(self) -> _PoolExecutor:
+        retired: Optional[_PoolExecutor] = None
+        with self._lock:
+            if (
+                not _NATIVE_RECYCLING
+                and self._executor is not None
+                and self._executor.tasks >= self.max_tasks_per_child
+            ):
+                retired, self._executor = self._executor, None
+                self.recycles += 1
+            if self._executor is None:
+                options: Dict[str, Any] = {}
+                if _NATIVE_RECYCLING:
+                    options["max_tasks_per_child"] = self.max_tasks_per_child
+                self._executor = _PoolExecutor(self.max_workers, **options)
+            self._executor.tasks += 1
+            executor = self._executor
+        if retired is not None:
+            # Already-submitted tasks still run; the workers exit afterwards.
+            retired.shutdown(wait=False)
+        return executor
+
+    def _reset(self, broken: _PoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.restarts += 1
+        # Pending work is failed with BrokenProcessPool by the executor itself;
+        # cancelling it here would surface as a CancelledError in the callers.
+        broken.shutdown(wait=False)
+
+
+def _percentile_ms(ordered: "list[float]", fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+_cpu_pool: Optional[ManagedProcessPool] = None
+
+
+def cpu_pool() -> ManagedProcessPool:
+    """The shared pool for image decoding and HTML extraction."""
+    global _cpu_pool
+    if _cpu_pool is None:
+        settings = get_settings()
+        _cpu_pool = ManagedProcessPool(
+            "cpu",
+            max_workers=settings.cpu_pool_workers,
+            max_queue=settings.cpu_pool_max_queue,
+            max_tasks_per_child=settings.cpu_pool_max_tasks_per_worker,
+            task_timeout=settings.cpu_pool_task_timeout_seconds,
+            memory_limit_mb=settings.cpu_pool_worker_memory_mb,
+        )
+    return _cpu_pool
+
+
+def cpu_pool_snapshot() -> Optional[Dict[str, float]]:
+    return _cpu_pool.snapshot() if _cpu_pool is not None else None
+
+
+def shutdown_cpu_pool() -> None:
+    global _cpu_pool
+    if _cpu_pool is not None:
+        logger.info(f"CPU 进程池指标: {_cpu_pool.snapshot()}")
+        _cpu_pool.shutdown()
+        _cpu_pool = None
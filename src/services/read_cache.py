@@ -0,0 +1,243 @@
+"""In-process read-through cache for small, rarely changing Redis reads.
+
+Prompt assembly reads the user profile, Mako's bot profile, relationship
+memories, affinity and the autonomy goal/task hashes on every reply.  Those
+values change far less often than they are read, so :class:`StorageService`
+keeps the Redis payloads in a TTL+LRU tier and drops entries on its own
+writes.  Other processes learn about writes through the
+``cache:invalidate`` pub/sub channel; the TTL bounds staleness if a message
+is missed.
+
+Keys of the form ``"<base>|<variant>"`` (for example one entry per status and
+limit of an index read) are evicted together with ``<base>``.
+
+Other in-process state mirrored from Redis can follow the same channel by
+registering a callback with :func:`on_invalidation`.
+
+Caches are attached to a Redis client: a reconnect (new client) or a test
+double starts with an empty cache, so entries never outlive the connection
+whose invalidations they depend on.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from nonebot.log import logger
+
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+PROCESS_ORIGIN = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = 2048,
+        ttl_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._variants: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            if isinstance(key, str) and "|" in key:
+                self._variants.setdefault(key.split("|", 1)[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            dropped = self._drop(key)
+            for variant in self._variants.pop(key, ()) if isinstance(key, str) else ():
+                dropped = self._drop(variant) or dropped
+            if dropped:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._variants.clear()
+
+    def _drop(self, key: Hashable) -> bool:
+        if self._entries.pop(key, None) is None:
+            return False
+        if isinstance(key, str) and "|" in key:
+            variants = self._variants.get(key.split("|", 1)[0])
+            if variants is not None:
+                variants.discard(key)
+        return True
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_caches: "weakref.WeakKeyDictionary[Any, TTLCache]" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def read_cache_for(client: Any, settings: Any = None) -> TTLCache:
+    """Return the cache bound to ``client``, creating it on first use."""
+    with _caches_lock:
+        cache = _caches.get(client)
+        if cache is None:
+            cache = TTLCache(
+                max_entries=int(getattr(settings, "read_cache_max_entries", 2048)),
+                ttl_seconds=float(getattr(settings, "read_cache_ttl_seconds", 30.0)),
+            )
+            _caches[client] = cache
+        return cache
+
+
+_hooks: Dict[str, list] = {}
+
+
+def on_invalidation(key: str, callback: Callable[[], Any]) -> None:
+    """Call ``callback`` whenever ``key`` is invalidated, here or in another process.
+
+    Bound methods are held weakly so a hook never keeps its owner alive.
+    """
+    ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+    with _caches_lock:
+        hooks = _hooks.setdefault(key, [])
+        hooks[:] = [hook for hook in hooks if hook() is not None]
+        hooks.append(ref)
+
+
+def invalidate_local(key: str) -> None:
+    with _caches_lock:
+        caches = list(_caches.values())
+        hooks = [hook() for hook in _hooks.get(key, ())]
+    for cache in caches:
+        cache.invalidate(key)
+    for hook in hooks:
+        if hook is None:
+            continue
+        try:
+            hook()
+        except Exception as exc:
+            logger.warning(f"缓存失效回调执行失败 {key}: {exc}")
+
+
+def publish_invalidation(client: Any, key: str) -> None:
+    try:
+        client.publish(CACHE_INVALIDATION_CHANNEL, f"{PROCESS_ORIGIN}|{key}")
+    except Exception as exc:
+        logger.debug(f"缓存失效广播失败 {key}: {exc}")
+
+
+def handle_invalidation_message(data: str) -> Optional[str]:
+    """Apply an invalidation published by another process. Returns the evicted key."""
+    origin, _, key = str(data).partition("|")
+    if not key or origin == PROCESS_ORIGIN:
+        return None
+    invalidate_local(key)
+    return key
+
+
+class CacheInvalidationListener:
+    """Background pub/sub subscriber that evicts keys written by other processes."""
+
+    def __init__(self, client_factory: Callable[[], Any]) -> None:
+        self.client_factory = client_factory
+        self._pubsub = None
+        self._thread = None
+
+    def start(self) -> bool:
+        if self._thread is not None:
+            return True
+        client = self.client_factory()
+        if client is None:
+            return False
+        try:
+            self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: self._on_message})
+            self._thread = self._pubsub.run_in_thread(
+                sleep_time=1.0,
+                daemon=True,
+                exception_handler=self._on_error,
+            )
+        except Exception as exc:
+            logger.warning(f"缓存失效订阅启动失败，仅依赖 TTL: {exc}")
+            self._pubsub = None
+            self._thread = None
+            return False
+        return True
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            try:
+                self._thread.stop()
+            except Exception:
+                pass
+            self._thread = None
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    @staticmethod
+    def _on_message(message: dict) -> None:
+        handle_invalidation_message(message.get("data", ""))
+
+    @staticmethod
+    def _on_error(exc: Exception, _pubsub, _thread) -> None:
+        # The pub/sub connection reconnects on the next poll; entries written
+        # meanwhile by other processes expire through the TTL.
+        logger.warning(f"缓存失效订阅中断，将自动重连: {exc}")
+        time.sleep(1.0)
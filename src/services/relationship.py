@@ -6,6 +6,7 @@ from typing import List, Optional
 
 from src.core.config import get_settings
 from src.models.schemas import RelationshipMemory
+from src.services.due_wheel import notify_due
 from src.services.storage import StorageService
 
 
@@ -19,24 +20,37 @@ class RelationshipService:
         self.storage = storage or StorageService()
 
     def absorb_user_message(self, user_id: int, nickname: str, text: str) -> List[RelationshipMemory]:
-        text = text.strip()
-        if not text:
+        return self.absorb_user_messages(user_id, nickname, [text])
+
+    def absorb_user_messages(self, user_id: int, nickname: str, texts: List[str]) -> List[RelationshipMemory]:
+        """Extract memories from one user's recent messages; profile and audit are written once."""
+        texts = [text.strip() for text in texts if text and text.strip()]
+        if not texts:
             return []
         existing_ids = {
             memory.memory_id
             for memory in self.storage.list_relationship_memories(user_id, status="", limit=100)
         }
         created: List[RelationshipMemory] = []
-        for memory in self._extract_preferences(user_id, text):
-            created.append(memory)
-        for memory in self._extract_taboos(user_id, text):
-            created.append(memory)
-        for memory in self._extract_promises(user_id, text):
-            created.append(memory)
-        event = self._extract_event(user_id, nickname, text)
-        if event:
-            created.append(event)
-        created = [memory for memory in created if memory.memory_id not in existing_ids]
+        for text in texts:
+            for memory in self._extract_preferences(user_id, text):
+                created.append(memory)
+            for memory in self._extract_taboos(user_id, text):
+                created.append(memory)
+            for memory in self._extract_promises(user_id, text):
+                created.append(memory)
+            event = self._extract_event(user_id, nickname, text)
+            if event:
+                created.append(event)
+        # _create returns the stored memory for repeats, so de-duplicate by id
+        # across the batch as well as against what existed before.
+        unique: List[RelationshipMemory] = []
+        for memory in created:
+            if memory.memory_id in existing_ids:
+                continue
+            existing_ids.add(memory.memory_id)
+            unique.append(memory)
+        created = unique
 
         if created:
             self._sync_profile(user_id=user_id, nickname=nickname)
@@ -50,7 +64,8 @@ class RelationshipService:
                     "nickname": nickname,
                     "memory_count": len(created),
                     "memory_types": [memory.memory_type for memory in created],
-                    "text_preview": text[:160],
+                    "text_preview": texts[-1][:160],
+                    "message_count": len(texts),
                 },
             )
             self._append_thought_trace(
@@ -231,6 +246,8 @@ class RelationshipService:
             confidence=confidence,
             due_at=due_at,
         )
+        # An earlier follow-up pulls the wheel's timer forward.
+        notify_due(memory.due_at)
         return memory
 
     def _sync_note(self, memory: RelationshipMemory) -> None:
@@ -0,0 +1,161 @@
+"""Background relationship absorption.
+
+Extracting relationship memories from a message (regex extractors, profile
+and note sync, audit) used to run in front of the LLM call.  The chat handler
+now only enqueues the message; workers drain the queue, batching every
+message a user sent while their previous batch was being processed.
+
+Consistency: before a user's next turn builds its context, the handler
+awaits :meth:`RelationshipAbsorber.settle` for that user, so memories stated
+in earlier messages are stored by the time they are needed.  Settling is
+bounded by a timeout and is a no-op when the user has nothing pending.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.relationship import RelationshipService
+
+
+class RelationshipAbsorber:
+    def __init__(
+        self,
+        relationship: RelationshipService,
+        *,
+        max_pending: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        settings = get_settings()
+        self.relationship = relationship
+        self.max_pending = max(1, max_pending or settings.relationship_queue_size)
+        self.worker_count = max(1, workers or settings.relationship_queue_workers)
+        # user_id -> [(nickname, text)], in arrival order of each user's first message.
+        self._pending: "OrderedDict[int, List[Tuple[str, str]]]" = OrderedDict()
+        self._pending_count = 0
+        self._active: set[int] = set()
+        self._settled: Dict[int, asyncio.Event] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.submitted = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+
+    def submit(self, user_id: int, nickname: str, text: str) -> None:
+        """Queue a message for absorption. Never blocks; must run on the event loop."""
+        if not text or not text.strip():
+            return
+        if self._pending_count >= self.max_pending:
+            self._drop_oldest()
+        self._pending.setdefault(user_id, []).append((nickname, text))
+        self._pending_count += 1
+        self.submitted += 1
+        self._settled_event(user_id).clear()
+        self._wake()
+
+    async def settle(self, user_id: int, timeout: float = 1.0) -> bool:
+        """Wait until messages already queued for ``user_id`` are absorbed."""
+        event = self._settled.get(user_id)
+        if event is None or event.is_set():
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def start(self) -> None:
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.worker_count:
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        while self._pending:
+            await self.process_next()
+
+    async def process_next(self) -> bool:
+        """Absorb one user's queued batch. Returns ``False`` when nothing is runnable."""
+        user_id = next((item for item in self._pending if item not in self._active), None)
+        if user_id is None:
+            return False
+        batch = self._pending.pop(user_id)
+        self._pending_count -= len(batch)
+        self._active.add(user_id)
+        try:
+            await asyncio.to_thread(
+                self.relationship.absorb_user_messages,
+                user_id,
+                batch[-1][0],
+                [text for _nickname, text in batch],
+            )
+            self.batches += 1
+        except Exception as exc:
+            self.failures += 1
+            logger.warning(f"关系记忆后台吸收失败 user_id={user_id}: {exc}")
+        finally:
+            self._active.discard(user_id)
+            if user_id in self._pending:
+                # Messages arrived while this batch ran; let an idle worker take them.
+                self._wake()
+            else:
+                self._settled_event(user_id).set()
+                self._settled.pop(user_id, None)
+        return True
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "pending": self._pending_count,
+            "active_users": len(self._active),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
+
+    async def _run(self) -> None:
+        wakeup = self._wakeup_event()
+        while True:
+            wakeup.clear()
+            if not await self.process_next():
+                await wakeup.wait()
+
+    def _drop_oldest(self) -> None:
+        user_id = next(iter(self._pending))
+        batch = self._pending[user_id]
+        batch.pop(0)
+        if not batch:
+            del self._pending[user_id]
+            if user_id not in self._active:
+                self._settled_event(user_id).set()
+                self._settled.pop(user_id, None)
+        self._pending_count -= 1
+        self.dropped += 1
+
+    def _settled_event(self, user_id: int) -> asyncio.Event:
+        event = self._settled.get(user_id)
+        if event is None:
+            event = self._settled[user_id] = asyncio.Event()
+            event.set()
+        return event
+
+    def _wakeup_event(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def _wake(self) -> None:
+        self._wakeup_event().set()
@@ -16,6 +16,7 @@ from typing import Dict, List, Optional
 from nonebot.log import logger
 
 from src.models.schemas import ReminderRecord
+from src.services.intent_classifier import classify_locally, record_teacher_label
 from src.services.llm import get_deepseek_client, get_deepseek_model, has_deepseek
 from src.services.storage import StorageService
 
@@ -78,6 +79,11 @@ class ReminderIntentParser:
     async def parse(self, user_text: str, now: datetime) -> dict:
         if not has_deepseek():
             return {"intent": "NONE"}
+        # Most chat messages are not about reminders; a confident local NONE
+        # saves the round-trip. Other intents still need the LLM to extract
+        # times and content.
+        if classify_locally("reminder", user_text) == "NONE":
+            return {"intent": "NONE"}
         prompt = f"""
 请分析用户的意图，判断是创建、修改、删除提醒，还是普通聊天。
 当前时间是：{now.strftime('%Y-%m-%d %H:%M:%S')}
@@ -100,6 +106,10 @@ class ReminderIntentParser:
                 timeout=10.0,
             )
             data = extract_json_object(response.choices[0].message.content or "")
+            if data:
+                await asyncio.to_thread(
+                    record_teacher_label, "reminder", user_text, str(data.get("intent", "NONE")).upper()
+                )
             return data or {"intent": "NONE"}
         except Exception as exc:
             logger.warning(f"提醒意图解析失败: {exc}")
@@ -127,6 +137,37 @@ class ReminderBook:
             return [Reminder.from_record(item) for item in self.storage.list_reminders()]
         return [item for items in self._items.values() for item in items]
 
+    def upcoming(self, after: Optional[datetime], until: datetime) -> List[Reminder]:
+        """Reminders due in ``(after, until]``, earliest first."""
+        if self.storage is not None:
+            return [
+                Reminder.from_record(item)
+                for item in self.storage.list_reminders_between(after, until)
+            ]
+        return sorted(
+            (
+                item
+                for item in self.list_all()
+                if (after is None or item.remind_time > after) and item.remind_time <= until
+            ),
+            key=lambda item: item.remind_time,
+        )
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        if self.storage is not None:
+            return self.storage.next_reminder_after(moment)
+        later = [item.remind_time for item in self.list_all() if item.remind_time > moment]
+        return min(later) if later else None
+
+    def expire(self, before: datetime) -> List[Reminder]:
+        """Drop every reminder due at or before ``before`` in one batch."""
+        if self.storage is not None:
+            return [Reminder.from_record(item) for item in self.storage.expire_reminders(before)]
+        expired = [item for item in self.list_all() if item.remind_time <= before]
+        for item in expired:
+            self.remove(item.session_id, item.job_id)
+        return expired
+
     def add(self, session_id: str, reminder: Reminder) -> None:
         if self.storage is not None:
             self.storage.save_reminder(reminder.to_record(session_id))
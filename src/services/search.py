@@ -13,6 +13,7 @@ from nonebot.log import logger
 from src.core.config import get_settings
 from src.core.errors import NotConfiguredError, UnsafeUrlError
 from src.services.http import fetch_json, fetch_text
+from src.services.process_pool import cpu_pool
 
 
 @dataclass
@@ -160,6 +161,11 @@ async def ollama_fetch_page(url: str) -> str:
     return str(data.get("content") or "").strip()
 
 
+# Pages larger than this are stripped in the CPU worker pool; the regexes
+# backtrack heavily on big documents and would stall the event loop.
+_POOL_HTML_CHARS = 64 * 1024
+
+
 def extract_text_from_html(content: str) -> str:
     content = re.sub(r"(?is)<(script|style).*?>.*?</\1>", " ", content)
     content = re.sub(r"(?is)<.*?>", " ", content)
@@ -196,7 +202,10 @@ async def fetch_page_text(url: str, max_chars: int = 6000) -> str:
                 safe_url,
                 validate_redirect=validate_public_url,
             )
-            text = extract_text_from_html(html_text)
+            if len(html_text) > _POOL_HTML_CHARS:
+                text = await cpu_pool().run(extract_text_from_html, html_text)
+            else:
+                text = extract_text_from_html(html_text)
         except Exception as local_exc:
             logger.warning(
                 "Local page fetch failed url={} error_type={} error={}",
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import json
+import threading
 import uuid
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple, get_args
 
 from src.core.config import get_settings
 from src.models.schemas import (
@@ -13,20 +14,33 @@ from src.models.schemas import (
     AutonomyTask,
     BotProfile,
     ChatRecord,
+    GoalStatus,
     NoteRecord,
     OutboundMessageRecord,
     ReminderRecord,
     RelationshipMemory,
+    TaskStatus,
     ThoughtTrace,
 )
+from src.models.codec import (
+    chat_record_codec,
+    dumps as codec_dumps,
+    loads as codec_loads,
+    outbound_message_codec,
+    relationship_memory_codec,
+    thought_trace_codec,
+)
+from src.services.read_cache import invalidate_local, publish_invalidation, read_cache_for
 from src.services.redis import get_redis
+from src.services.storage_encoding import pack_text, resolve_compression, unpack_text
 
 
 @dataclass
 class MemoryStorage:
     histories: Dict[str, List[dict]] = field(default_factory=dict)
-    all_memory: List[str] = field(default_factory=list)
-    outbound_messages: Dict[str, List[dict]] = field(default_factory=dict)
+    global_buckets: Dict[str, List[str]] = field(default_factory=dict)
+    all_memory_seq: int = 0
+    outbound_messages: Dict[str, List[str]] = field(default_factory=dict)
     sent_news: Dict[str, float] = field(default_factory=dict)
     profiles: Dict[str, str] = field(default_factory=dict)
     notes: Dict[int, Dict[str, dict]] = field(default_factory=dict)
@@ -43,9 +57,169 @@ class MemoryStorage:
     blacklisted_groups: Dict[int, str] = field(default_factory=dict)
     daily_costs: Dict[str, float] = field(default_factory=dict)
     reminders: Dict[str, dict] = field(default_factory=dict)
+    autonomy_activity: Optional[dict] = None
 
 
 _memory = MemoryStorage()
+_memory_cost_lock = threading.Lock()
+
+# Profiles are stored with one-letter keys; readers expand them and still
+# accept the original long-key JSON.
+PROFILE_SHORT_KEYS = {"user_id": "u", "nickname": "n", "profile_text": "p", "last_updated": "t"}
+
+# The global chat log is partitioned into hourly Redis lists named
+# ``all_memory:bucket:YYYYMMDDHH``; a sorted set indexes bucket ids by the
+# bucket start timestamp so range reads and retention never scan old data.
+LEGACY_GLOBAL_KEY = "all_memory"
+GLOBAL_BUCKET_INDEX = "all_memory:buckets"
+GLOBAL_BUCKET_SECONDS = 3600
+# GLOBAL_MEMORY_MAX_RECORDS caps the whole log.  The buckets are summed when
+# one opens and every 1/GLOBAL_CAP_CHECK_FRACTION of the cap appends, so the
+# log overshoots the cap by at most that fraction between checks.
+GLOBAL_CAP_CHECK_FRACTION = 100
+
+
+# Goals and tasks keep one sorted set per status next to the payload hash,
+# scored by (priority, updated_at) so status-filtered reads fetch only the
+# requested page.
+AUTONOMY_INDEX_MARKER = "autonomy:index:v1"
+AUTONOMY_STATUSES = {"goals": get_args(GoalStatus), "tasks": get_args(TaskStatus)}
+
+# The scheduled autonomy scan's change-detection state, shared by every worker
+# so whichever one wins the scan compares against the last decision anywhere.
+AUTONOMY_ACTIVITY_KEY = "autonomy:activity"
+
+# One round trip: page through the status index, then fetch those payloads.
+_INDEXED_PAGE_SCRIPT = """
+local ids = redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #ids == 0 then return {} end
+return redis.call('HMGET', KEYS[2], unpack(ids))
+"""
+
+
+# Daily cost counters are checked and charged in one atomic step.  ARGV[2]
+# is extra budget the caller wants to pre-charge as a local lease; it is
+# capped by the headroom left under both limits.  Floats are returned as
+# strings because Lua numbers are truncated to integers on the way out.
+COST_COUNTER_TTL_SECONDS = 172800
+
+_RESERVE_COST_SCRIPT = """
+local amount = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local global_limit = tonumber(ARGV[3])
+local user_limit = tonumber(ARGV[4])
+local global_used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local user_used = tonumber(redis.call('GET', KEYS[2]) or '0')
+if global_used + amount > global_limit then return {0, 'global'} end
+if user_used + amount > user_limit then return {0, 'user'} end
+local extra = math.min(lease, global_limit - global_used - amount, user_limit - user_used - amount)
+if extra < 0 then extra = 0 end
+redis.call('INCRBYFLOAT', KEYS[1], amount + extra)
+redis.call('INCRBYFLOAT', KEYS[2], amount + extra)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return {1, tostring(extra)}
+"""
+
+
+# Every blacklist write bumps a version counter in the same transaction and
+# publishes ``BLACKLIST_CACHE_KEY`` on the invalidation channel, so
+# processes mirroring the sets can tell a missed message from no change.
+BLACKLIST_CACHE_KEY = "blacklist"
+BLACKLIST_VERSION_KEY = "blacklist:version"
+
+# Reminders are indexed by due time, session and user (sorted sets scored by
+# remind_time) so listing, expiry and restore never scan the whole hash.
+REMINDER_INDEX_MARKER = "reminders:index:v1"
+REMINDER_DUE_INDEX = "reminders:due"
+
+# unpack() stops at a few thousand values (LUAI_MAXCSTACK), so unbounded
+# ranges are fetched with one HMGET per slice of REMINDER_HMGET_CHUNK ids.
+REMINDER_HMGET_CHUNK = 1000
+
+_SCORED_PAGE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2], 'LIMIT', 0, tonumber(ARGV[3]))
+local chunk = tonumber(ARGV[4])
+local rows = {}
+for first = 1, #ids, chunk do
+  local page = redis.call('HMGET', KEYS[2], unpack(ids, first, math.min(first + chunk - 1, #ids)))
+  for i = 1, #page do rows[#rows + 1] = page[i] end
+end
+return rows
+"""
+
+
+def _cost_keys(user_id: Optional[int], at: datetime) -> tuple[str, str]:
+    day = at.strftime("%Y%m%d")
+    return f"cost:global:{day}", f"cost:user:{user_id}:{day}"
+
+
+def _reminder_index_keys(reminder: ReminderRecord) -> tuple[str, str, str]:
+    return (
+        REMINDER_DUE_INDEX,
+        f"reminders:session:{reminder.session_id}",
+        f"reminders:user:{reminder.user_id}",
+    )
+
+
+def _autonomy_index_key(kind: str, status: str) -> str:
+    return f"autonomy:{kind}:by_status:{status}"
+
+
+def _autonomy_score(priority: int, updated_at: datetime) -> float:
+    # priority dominates; millisecond timestamps stay below 1e13 and the
+    # clamp keeps the sum inside a double's exact integer range.
+    return max(-900, min(900, int(priority))) * 1e13 + int(updated_at.timestamp() * 1000)
+
+
+def _global_bucket_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _global_bucket_id(moment: datetime) -> str:
+    return moment.strftime("%Y%m%d%H")
+
+
+def _global_bucket_key(bucket_id: str) -> str:
+    return f"all_memory:bucket:{bucket_id}"
+
+
+def _parse_chat_records(rows: List[str]) -> List[ChatRecord]:
+    return chat_record_codec.decode_many(rows)
+
+
+def _int_members(values) -> Set[int]:
+    members = set()
+    for value in values or ():
+        try:
+            members.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return members
+
+
+def _unpack_or_none(raw: Optional[str]) -> Optional[str]:
+    try:
+        return unpack_text(raw)
+    except Exception:
+        return None
+
+
+def _unpack_rows(rows: List[str]) -> List[str]:
+    return [row for row in (_unpack_or_none(item) for item in rows) if row]
+
+
+def _select_records(codec, raws, *, where: Dict[str, object], order_by: str, limit: int) -> list:
+    """Filter and sort on decoded rows; build models only for the returned page."""
+    return _select_rows(codec, codec.rows(raws), where=where, order_by=order_by, limit=limit)
+
+
+def _select_rows(codec, rows, *, where: Dict[str, object], order_by: str, limit: int) -> list:
+    checks = [(codec.slots[name], value) for name, value in where.items() if value is not None and value != ""]
+    order = codec.slots[order_by]
+    rows = [row for row in rows if all(row[index] == value for index, value in checks)]
+    rows.sort(key=lambda row: row[order] or "", reverse=True)
+    return [codec.build(row) for row in rows[: max(0, limit)]]
 
 
 class StorageService:
@@ -66,6 +240,29 @@ class StorageService:
         self._redis = value
         self._redis_override = True
 
+    def _cached(self, key: str, loader):
+        """Read-through the in-process cache bound to the current Redis client."""
+        return read_cache_for(self.redis, getattr(self, "settings", None)).get_or_load(key, loader)
+
+    def _invalidate(self, *keys: str) -> None:
+        redis_client = self.redis
+        if not redis_client:
+            return
+        cache = read_cache_for(redis_client, getattr(self, "settings", None))
+        for key in keys:
+            cache.invalidate(key)
+            publish_invalidation(redis_client, key)
+
+    def _pack(self, text: str) -> str:
+        compression = getattr(self.settings, "storage_compression", "off")
+        if compression == "off":
+            return text
+        return pack_text(
+            text,
+            compression=resolve_compression(compression),
+            min_bytes=self.settings.storage_compression_min_bytes,
+        )
+
     def get_history(self, session_id: str) -> List[dict]:
         if self.redis:
             raw = self.redis.get(f"chat:history:{session_id}")
@@ -76,14 +273,14 @@ class StorageService:
                 raw = self.redis.get(session_id)
                 if raw:
                     try:
-                        history = json.loads(raw)
+                        history = codec_loads(unpack_text(raw))
                     except Exception:
                         return []
                     self.save_history(session_id, history)
                     return history
             if raw:
                 try:
-                    return json.loads(raw)
+                    return codec_loads(unpack_text(raw))
                 except Exception:
                     return []
             return []
@@ -93,27 +290,207 @@ class StorageService:
         max_items = self.settings.max_history_turns * 2
         clipped = messages[-max_items:]
         if self.redis:
-            self.redis.set(f"chat:history:{session_id}", json.dumps(clipped, ensure_ascii=False))
+            self.redis.set(f"chat:history:{session_id}", self._pack(codec_dumps(clipped)))
             return
         _memory.histories[session_id] = clipped
 
     def append_global_record(self, record: ChatRecord) -> None:
-        payload = json.dumps(record.model_dump(mode="json"), ensure_ascii=False)
+        payload = chat_record_codec.encode(record)
+        bucket_id = _global_bucket_id(record.time)
+        max_records = max(1000, self.settings.global_memory_max_records)
         if self.redis:
-            self.redis.rpush("all_memory", payload)
-            self.redis.ltrim(
-                "all_memory",
-                -max(1000, self.settings.global_memory_max_records),
-                -1,
-            )
+            self._migrate_legacy_global_records()
+            key = _global_bucket_key(bucket_id)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.rpush(key, payload)
+            pipe.ltrim(key, -max_records, -1)
+            pipe.expire(key, self._global_retention_seconds() + GLOBAL_BUCKET_SECONDS)
+            pipe.zadd(GLOBAL_BUCKET_INDEX, {bucket_id: _global_bucket_start(record.time).timestamp()})
+            # Monotonic append counter; readers can ask for "records appended
+            # since N" without scanning buckets.
+            pipe.incr("all_memory:seq")
+            results = pipe.execute()
+            length, seq = results[0], results[-1]
+        else:
+            bucket = _memory.global_buckets.setdefault(bucket_id, [])
+            bucket.append(payload)
+            del bucket[:-max_records]
+            _memory.all_memory_seq += 1
+            length, seq = len(bucket), _memory.all_memory_seq
+        if length == 1:
+            self._drop_expired_global_buckets()
+        if length == 1 or int(seq) % max(1, max_records // GLOBAL_CAP_CHECK_FRACTION) == 0:
+            self._enforce_global_cap(max_records)
+
+    def global_record_cursor(self) -> int:
+        if self.redis:
+            return int(self.redis.get("all_memory:seq") or 0)
+        return _memory.all_memory_seq
+
+    def list_global_records_since(self, cursor: int, limit: int = 200) -> tuple[int, List[ChatRecord]]:
+        """Return the current cursor and up to ``limit`` records appended after ``cursor``."""
+        current = self.global_record_cursor()
+        pending = min(max(0, current - cursor), max(1, limit))
+        if pending == 0:
+            return current, []
+        return current, _parse_chat_records(self._latest_global_rows(pending))
+
+    def records_between(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        *,
+        group_id: Optional[int] = None,
+    ) -> List[ChatRecord]:
+        """Chronological global records in ``[start, end]``, reading only the covering hour buckets."""
+        end = end or datetime.now()
+        if end < start:
+            return []
+        first_score = _global_bucket_start(start).timestamp()
+        if self.redis:
+            self._migrate_legacy_global_records()
+            bucket_ids = self.redis.zrangebyscore(GLOBAL_BUCKET_INDEX, first_score, end.timestamp())
+            pipe = self.redis.pipeline(transaction=False)
+            for bucket_id in bucket_ids:
+                pipe.lrange(_global_bucket_key(bucket_id), 0, -1)
+            rows = [row for chunk in pipe.execute() for row in chunk] if bucket_ids else []
+        else:
+            first_id, last_id = _global_bucket_id(start), _global_bucket_id(end)
+            rows = [
+                row
+                for bucket_id in sorted(_memory.global_buckets)
+                if first_id <= bucket_id <= last_id
+                for row in _memory.global_buckets[bucket_id]
+            ]
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        return [
+            record
+            for record in _parse_chat_records(rows)
+            if start_ts <= record.time.timestamp() <= end_ts
+            and (group_id is None or record.group_id == group_id)
+        ]
+
+    def _latest_global_rows(self, limit: int) -> List[str]:
+        """Newest ``limit`` raw rows in chronological order, walking buckets backwards."""
+        chunks: List[List[str]] = []
+        remaining = limit
+        if self.redis:
+            self._migrate_legacy_global_records()
+            for bucket_id in self.redis.zrevrange(GLOBAL_BUCKET_INDEX, 0, -1):
+                rows = self.redis.lrange(_global_bucket_key(bucket_id), -remaining, -1)
+                chunks.append(rows)
+                remaining -= len(rows)
+                if remaining <= 0:
+                    break
+        else:
+            for bucket_id in sorted(_memory.global_buckets, reverse=True):
+                rows = _memory.global_buckets[bucket_id][-remaining:]
+                chunks.append(rows)
+                remaining -= len(rows)
+                if remaining <= 0:
+                    break
+        return [row for chunk in reversed(chunks) for row in chunk]
+
+    def _all_global_rows(self) -> List[str]:
+        if self.redis:
+            self._migrate_legacy_global_records()
+            rows: List[str] = []
+            for bucket_id in self.redis.zrange(GLOBAL_BUCKET_INDEX, 0, -1):
+                rows.extend(self.redis.lrange(_global_bucket_key(bucket_id), 0, -1))
+            return rows
+        return [row for bucket_id in sorted(_memory.global_buckets) for row in _memory.global_buckets[bucket_id]]
+
+    def _global_retention_seconds(self) -> int:
+        return max(1, self.settings.global_memory_retention_hours) * 3600
+
+    def _drop_expired_global_buckets(self) -> None:
+        """Retention works on whole buckets; the bucket holding the cutoff is kept."""
+        cutoff = datetime.now().timestamp() - self._global_retention_seconds()
+        cutoff_score = _global_bucket_start(datetime.fromtimestamp(cutoff)).timestamp()
+        if self.redis:
+            expired = self.redis.zrangebyscore(GLOBAL_BUCKET_INDEX, "-inf", f"({cutoff_score}")
+            if expired:
+                self.redis.delete(*[_global_bucket_key(bucket_id) for bucket_id in expired])
+                self.redis.zrem(GLOBAL_BUCKET_INDEX, *expired)
+            return
+        cutoff_id = _global_bucket_id(datetime.fromtimestamp(cutoff))
+        for bucket_id in [item for item in _memory.global_buckets if item < cutoff_id]:
+            del _memory.global_buckets[bucket_id]
+
+    def _enforce_global_cap(self, max_records: int) -> None:
+        """Trim the oldest buckets until the whole log holds at most ``max_records`` rows."""
+        if self.redis:
+            bucket_ids = self.redis.zrange(GLOBAL_BUCKET_INDEX, 0, -1)
+            if not bucket_ids:
+                return
+            pipe = self.redis.pipeline(transaction=False)
+            for bucket_id in bucket_ids:
+                pipe.llen(_global_bucket_key(bucket_id))
+            lengths = [int(length or 0) for length in pipe.execute()]
+        else:
+            bucket_ids = sorted(_memory.global_buckets)
+            lengths = [len(_memory.global_buckets[bucket_id]) for bucket_id in bucket_ids]
+        excess = sum(lengths) - max_records
+        dropped: List[str] = []
+        for bucket_id, length in zip(bucket_ids, lengths):
+            if excess <= 0:
+                break
+            if length <= excess:
+                dropped.append(bucket_id)
+            elif self.redis:
+                self.redis.ltrim(_global_bucket_key(bucket_id), excess, -1)
+            else:
+                del _memory.global_buckets[bucket_id][:excess]
+            excess -= length
+        if not dropped:
+            return
+        if self.redis:
+            self.redis.delete(*[_global_bucket_key(bucket_id) for bucket_id in dropped])
+            self.redis.zrem(GLOBAL_BUCKET_INDEX, *dropped)
             return
-        _memory.all_memory.append(payload)
-        del _memory.all_memory[:-max(1000, self.settings.global_memory_max_records)]
+        for bucket_id in dropped:
+            del _memory.global_buckets[bucket_id]
+
+    def _migrate_legacy_global_records(self) -> None:
+        """Move the pre-bucket ``all_memory`` list into hourly buckets once."""
+        if getattr(self, "_legacy_global_checked", False):
+            return
+        self._legacy_global_checked = True
+        rows = self.redis.lrange(LEGACY_GLOBAL_KEY, 0, -1)
+        if not rows:
+            return
+        cutoff = datetime.now().timestamp() - self._global_retention_seconds()
+        buckets: Dict[str, List[str]] = {}
+        scores: Dict[str, float] = {}
+        for row in rows:
+            record = chat_record_codec.decode_or_none(row)
+            if record is None:
+                continue
+            if record.time.timestamp() < cutoff:
+                continue
+            bucket_id = _global_bucket_id(record.time)
+            buckets.setdefault(bucket_id, []).append(row)
+            scores[bucket_id] = _global_bucket_start(record.time).timestamp()
+        pipe = self.redis.pipeline(transaction=False)
+        for bucket_id, bucket_rows in buckets.items():
+            key = _global_bucket_key(bucket_id)
+            pipe.rpush(key, *bucket_rows)
+            pipe.expire(key, self._global_retention_seconds() + GLOBAL_BUCKET_SECONDS)
+        if scores:
+            pipe.zadd(GLOBAL_BUCKET_INDEX, scores)
+        pipe.delete(LEGACY_GLOBAL_KEY)
+        pipe.execute()
 
     def save_reminder(self, reminder: ReminderRecord) -> ReminderRecord:
         payload = json.dumps(reminder.model_dump(mode="json"), ensure_ascii=False)
         if self.redis:
-            self.redis.hset("reminders", reminder.reminder_id, payload)
+            self._ensure_reminder_indexes()
+            score = reminder.remind_time.timestamp()
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset("reminders", reminder.reminder_id, payload)
+            for index_key in _reminder_index_keys(reminder):
+                pipe.zadd(index_key, {reminder.reminder_id: score})
+            pipe.execute()
             return reminder
         _memory.reminders[reminder.reminder_id] = reminder.model_dump(mode="json")
         return reminder
@@ -132,63 +509,159 @@ class StorageService:
         user_id: Optional[int] = None,
     ) -> List[ReminderRecord]:
         if self.redis:
-            reminders: List[ReminderRecord] = []
-            for row in self.redis.hvals("reminders"):
-                try:
-                    reminders.append(ReminderRecord.model_validate_json(row))
-                except Exception:
-                    continue
+            self._ensure_reminder_indexes()
+            if user_id is not None:
+                index_key = f"reminders:user:{user_id}"
+            elif session_id is not None:
+                index_key = f"reminders:session:{session_id}"
+            else:
+                index_key = REMINDER_DUE_INDEX
+            reminders = self._indexed_reminders(index_key)
         else:
             reminders = [
                 ReminderRecord.model_validate(item) for item in _memory.reminders.values()
             ]
+            reminders.sort(key=lambda item: item.remind_time)
         if session_id is not None:
             reminders = [item for item in reminders if item.session_id == session_id]
         if user_id is not None:
             reminders = [item for item in reminders if item.user_id == user_id]
-        reminders.sort(key=lambda item: item.remind_time)
         return reminders
 
+    def list_reminders_between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        *,
+        limit: int = -1,
+    ) -> List[ReminderRecord]:
+        """Reminders with ``start < remind_time <= end``, earliest first."""
+        if self.redis:
+            self._ensure_reminder_indexes()
+            return self._indexed_reminders(
+                REMINDER_DUE_INDEX,
+                low=f"({start.timestamp()}" if start else "-inf",
+                high=str(end.timestamp()) if end else "+inf",
+                limit=limit,
+            )
+        reminders = [
+            item
+            for item in (ReminderRecord.model_validate(data) for data in _memory.reminders.values())
+            if (start is None or item.remind_time > start) and (end is None or item.remind_time <= end)
+        ]
+        reminders.sort(key=lambda item: item.remind_time)
+        return reminders if limit < 0 else reminders[:limit]
+
+    def next_reminder_after(self, moment: datetime) -> Optional[datetime]:
+        if self.redis:
+            self._ensure_reminder_indexes()
+            head = self.redis.zrangebyscore(
+                REMINDER_DUE_INDEX, f"({moment.timestamp()}", "+inf", start=0, num=1, withscores=True
+            )
+            return datetime.fromtimestamp(float(head[0][1])) if head else None
+        later = self.list_reminders_between(moment, limit=1)
+        return later[0].remind_time if later else None
+
+    def expire_reminders(self, before: datetime, *, batch_size: int = 500) -> List[ReminderRecord]:
+        """Delete every reminder due at or before ``before``; one pipeline per batch."""
+        expired: List[ReminderRecord] = []
+        while True:
+            batch = self.list_reminders_between(None, before, limit=batch_size)
+            if not batch:
+                return expired
+            if self.redis:
+                pipe = self.redis.pipeline(transaction=True)
+                self._queue_reminder_delete(pipe, batch)
+                pipe.execute()
+            else:
+                for item in batch:
+                    _memory.reminders.pop(item.reminder_id, None)
+            expired.extend(batch)
+            if len(batch) < batch_size:
+                return expired
+
     def delete_reminder(self, reminder_id: str) -> bool:
         if self.redis:
-            return bool(self.redis.hdel("reminders", reminder_id))
+            existing = self.get_reminder(reminder_id)
+            if existing is None:
+                return bool(self.redis.hdel("reminders", reminder_id))
+            pipe = self.redis.pipeline(transaction=True)
+            self._queue_reminder_delete(pipe, [existing])
+            return bool(pipe.execute()[0])
         return _memory.reminders.pop(reminder_id, None) is not None
 
-    def list_global_records(self, limit: int = 100) -> List[ChatRecord]:
-        rows: List[str]
-        if self.redis:
-            rows = self.redis.lrange("all_memory", -limit, -1) if limit > 0 else self.redis.lrange("all_memory", 0, -1)
-        else:
-            rows = _memory.all_memory[-limit:] if limit > 0 else _memory.all_memory
-        records: List[ChatRecord] = []
-        for item in rows:
+    @staticmethod
+    def _queue_reminder_delete(pipe, reminders: List[ReminderRecord]) -> None:
+        pipe.hdel("reminders", *[item.reminder_id for item in reminders])
+        for item in reminders:
+            for index_key in _reminder_index_keys(item):
+                pipe.zrem(index_key, item.reminder_id)
+
+    def _indexed_reminders(
+        self,
+        index_key: str,
+        *,
+        low: str = "-inf",
+        high: str = "+inf",
+        limit: int = -1,
+    ) -> List[ReminderRecord]:
+        rows = self.redis.eval(
+            _SCORED_PAGE_SCRIPT, 2, index_key, "reminders", low, high, limit, REMINDER_HMGET_CHUNK
+        )
+        reminders: List[ReminderRecord] = []
+        for row in rows:
+            if not row:
+                continue
             try:
-                records.append(ChatRecord.model_validate_json(item))
+                reminders.append(ReminderRecord.model_validate_json(row))
             except Exception:
                 continue
-        records.sort(key=lambda x: x.time, reverse=True)
-        return records
+        return reminders
 
-    def get_recent_global_records(self, hours: int = 24) -> List[ChatRecord]:
-        threshold = datetime.now().timestamp() - hours * 3600
-        rows: List[str]
-        if self.redis:
-            rows = self.redis.lrange("all_memory", 0, -1)
-        else:
-            rows = _memory.all_memory
-        records: List[ChatRecord] = []
-        for item in rows:
+    def _ensure_reminder_indexes(self) -> None:
+        if getattr(self, "_reminders_indexed", False):
+            return
+        self._reminders_indexed = True
+        if not self.redis.exists(REMINDER_INDEX_MARKER):
+            self.rebuild_reminder_indexes()
+
+    def rebuild_reminder_indexes(self) -> int:
+        """Recreate the due/session/user reminder indexes from the ``reminders`` hash."""
+        indexes: Dict[str, Dict[str, float]] = {}
+        for row in self.redis.hvals("reminders"):
             try:
-                record = ChatRecord.model_validate_json(item)
+                reminder = ReminderRecord.model_validate_json(row)
             except Exception:
                 continue
-            if record.time.timestamp() >= threshold:
-                records.append(record)
+            for index_key in _reminder_index_keys(reminder):
+                indexes.setdefault(index_key, {})[reminder.reminder_id] = reminder.remind_time.timestamp()
+        stale = [
+            key
+            for pattern in ("reminders:session:*", "reminders:user:*")
+            for key in self.redis.scan_iter(match=pattern, count=500)
+        ]
+        pipe = self.redis.pipeline(transaction=True)
+        for key in [REMINDER_DUE_INDEX, *stale]:
+            pipe.delete(key)
+        for index_key, members in indexes.items():
+            pipe.zadd(index_key, members)
+        pipe.set(REMINDER_INDEX_MARKER, 1)
+        pipe.execute()
+        return len(indexes.get(REMINDER_DUE_INDEX, {}))
+
+    def list_global_records(self, limit: int = 100) -> List[ChatRecord]:
+        rows = self._latest_global_rows(limit) if limit > 0 else self._all_global_rows()
+        records = _parse_chat_records(rows)
+        records.sort(key=lambda x: x.time, reverse=True)
         return records
 
+    def get_recent_global_records(self, hours: int = 24) -> List[ChatRecord]:
+        now = datetime.now()
+        return self.records_between(now - timedelta(hours=hours), now)
+
     def record_outbound_message(self, record: OutboundMessageRecord) -> OutboundMessageRecord:
         key = f"outbound:ledger:{record.target_type}:{record.target_id}"
-        payload = json.dumps(record.model_dump(mode="json"), ensure_ascii=False)
+        payload = outbound_message_codec.encode(record)
         max_records = max(20, self.settings.outbound_dedup_max_records)
         if self.redis:
             self.redis.rpush(key, payload)
@@ -200,7 +673,7 @@ class StorageService:
             self.redis.expire(key, max(86400, retention_hours * 7200))
             return record
         rows = _memory.outbound_messages.setdefault(key, [])
-        rows.append(record.model_dump(mode="json"))
+        rows.append(payload)
         del rows[:-max_records]
         return record
 
@@ -218,18 +691,11 @@ class StorageService:
         if self.redis:
             rows = self.redis.lrange(key, -limit, -1)
         else:
-            rows = [
-                json.dumps(item, ensure_ascii=False)
-                for item in _memory.outbound_messages.get(key, [])[-limit:]
-            ]
+            rows = _memory.outbound_messages.get(key, [])[-limit:]
         current = now or datetime.now()
         threshold = current.timestamp() - max(1, hours or self.settings.outbound_dedup_hours) * 3600
         records: List[OutboundMessageRecord] = []
-        for row in rows:
-            try:
-                record = OutboundMessageRecord.model_validate_json(row)
-            except Exception:
-                continue
+        for record in outbound_message_codec.decode_many(rows):
             if record.created_at.timestamp() >= threshold:
                 records.append(record)
         records.sort(key=lambda item: item.created_at, reverse=True)
@@ -253,25 +719,32 @@ class StorageService:
     def get_profile(self, user_id: int) -> Optional[dict]:
         key = f"user_profile:{user_id}"
         if self.redis:
-            raw = self.redis.get(key)
+            raw = self._cached(key, lambda: self.redis.get(key))
             return self._parse_profile_payload(raw, key=key) if raw else None
         raw = _memory.profiles.get(key)
         return self._parse_profile_payload(raw, key=key) if raw else None
 
     def set_profile(self, user_id: int, nickname: str, profile_text: str) -> None:
         key = f"user_profile:{user_id}"
-        value = {
-            "user_id": user_id,
-            "nickname": nickname,
-            "profile_text": profile_text,
-            "last_updated": datetime.now().isoformat(),
-        }
-        raw = json.dumps(value, ensure_ascii=False)
+        raw = self._encode_profile(user_id, nickname, profile_text, datetime.now().isoformat())
         if self.redis:
             self.redis.set(key, raw)
+            self._invalidate(key)
             return
         _memory.profiles[key] = raw
 
+    def _encode_profile(self, user_id, nickname: str, profile_text: str, last_updated: str) -> str:
+        return self._pack(
+            codec_dumps(
+                {
+                    PROFILE_SHORT_KEYS["user_id"]: user_id,
+                    PROFILE_SHORT_KEYS["nickname"]: nickname,
+                    PROFILE_SHORT_KEYS["profile_text"]: profile_text,
+                    PROFILE_SHORT_KEYS["last_updated"]: last_updated,
+                }
+            )
+        )
+
     def list_profiles(self) -> List[dict]:
         if self.redis:
             keys = self.redis.keys("user_profile:*")
@@ -291,11 +764,18 @@ class StorageService:
     @staticmethod
     def _parse_profile_payload(raw: str, *, key: str = "") -> Optional[dict]:
         try:
+            raw = unpack_text(raw)
             parsed = json.loads(raw)
         except Exception:
             parsed = {"profile_text": raw}
         if not isinstance(parsed, dict):
             parsed = {"profile_text": str(parsed)}
+        if PROFILE_SHORT_KEYS["profile_text"] in parsed:
+            parsed = {
+                name: parsed[short]
+                for name, short in PROFILE_SHORT_KEYS.items()
+                if short in parsed
+            }
         if "user_id" not in parsed and key.startswith("user_profile:"):
             try:
                 parsed["user_id"] = int(key.split(":", 1)[1])
@@ -312,6 +792,7 @@ class StorageService:
         if self.redis:
             self.redis.hset("bot_profiles", profile.profile_id, payload)
             self.redis.set(f"bot_profile:{profile.profile_id}", payload)
+            self._invalidate(f"bot_profile:{profile.profile_id}")
             return profile
         _memory.bot_profiles[profile.profile_id] = profile.model_dump(mode="json")
         return profile
@@ -339,7 +820,10 @@ class StorageService:
 
     def get_bot_profile(self, profile_id: str) -> Optional[BotProfile]:
         if self.redis:
-            raw = self.redis.get(f"bot_profile:{profile_id}") or self.redis.hget("bot_profiles", profile_id)
+            raw = self._cached(
+                f"bot_profile:{profile_id}",
+                lambda: self.redis.get(f"bot_profile:{profile_id}") or self.redis.hget("bot_profiles", profile_id),
+            )
             if not raw:
                 return None
             try:
@@ -379,7 +863,7 @@ class StorageService:
         initial = self.settings.affinity_initial
         key = f"affinity:{user_id}"
         if self.redis:
-            value = self.redis.get(key)
+            value = self._cached(key, lambda: self.redis.get(key))
             return int(value) if value is not None else initial
         return _memory.affinity.get(user_id, initial)
 
@@ -393,10 +877,13 @@ class StorageService:
             consumed = int(self.redis.get(f"affinity:daily:{day_key}") or 0)
             remain = max(0, daily_cap - consumed)
             effective = max(-remain, min(remain, delta))
-            score = self.get_affinity(user_id)
+            # Read-modify-write goes to Redis directly, never through the cache.
+            stored = self.redis.get(f"affinity:{user_id}")
+            score = int(stored) if stored is not None else self.settings.affinity_initial
             new_score = max(min_score, min(max_score, score + effective))
             self.redis.set(f"affinity:{user_id}", new_score)
             self.redis.set(f"affinity:daily:{day_key}", consumed + abs(effective), ex=172800)
+            self._invalidate(f"affinity:{user_id}")
             return new_score
 
         consumed = _memory.affinity_daily.get(day_key, 0)
@@ -559,11 +1046,12 @@ class StorageService:
             due_at=due_at,
         )
         key = f"relationship:{user_id}"
-        payload = json.dumps(memory.model_dump(mode="json"), ensure_ascii=False)
+        payload = relationship_memory_codec.encode(memory)
         if self.redis:
             self.redis.hset(key, memory.memory_id, payload)
             if due_at:
                 self.redis.zadd("relationship:followups", {f"{user_id}:{memory.memory_id}": due_at.timestamp()})
+            self._invalidate(key)
             return memory
 
         _memory.relationship_memories.setdefault(user_id, {})[memory.memory_id] = memory.model_dump(mode="json")
@@ -579,38 +1067,23 @@ class StorageService:
         status: str = "active",
         limit: int = 20,
     ) -> List[RelationshipMemory]:
-        rows: List[str]
         if self.redis:
-            rows = self.redis.hvals(f"relationship:{user_id}")
+            key = f"relationship:{user_id}"
+            rows = self._cached(key, lambda: tuple(relationship_memory_codec.rows(self.redis.hvals(key))))
         else:
-            rows = [
-                json.dumps(item, ensure_ascii=False)
-                for item in _memory.relationship_memories.get(user_id, {}).values()
-            ]
-        memories: List[RelationshipMemory] = []
-        for row in rows:
-            try:
-                mem = RelationshipMemory.model_validate_json(row)
-            except Exception:
-                continue
-            if memory_type and mem.memory_type != memory_type:
-                continue
-            if status and mem.status != status:
-                continue
-            memories.append(mem)
-        memories.sort(key=lambda x: x.created_at, reverse=True)
-        return memories[:limit]
+            rows = relationship_memory_codec.rows(_memory.relationship_memories.get(user_id, {}).values())
+        return _select_rows(
+            relationship_memory_codec,
+            rows,
+            where={"memory_type": memory_type, "status": status},
+            order_by="created_at",
+            limit=limit,
+        )
 
     def get_relationship_memory(self, user_id: int, memory_id: str) -> Optional[RelationshipMemory]:
         key = f"relationship:{user_id}"
         if self.redis:
-            raw = self.redis.hget(key, memory_id)
-            if not raw:
-                return None
-            try:
-                return RelationshipMemory.model_validate_json(raw)
-            except Exception:
-                return None
+            return relationship_memory_codec.decode_or_none(self.redis.hget(key, memory_id))
         data = _memory.relationship_memories.get(user_id, {}).get(memory_id)
         return RelationshipMemory.model_validate(data) if data else None
 
@@ -626,9 +1099,10 @@ class StorageService:
         memory.content = content.strip()
         memory.updated_at = datetime.now()
         key = f"relationship:{user_id}"
-        payload = json.dumps(memory.model_dump(mode="json"), ensure_ascii=False)
+        payload = relationship_memory_codec.encode(memory)
         if self.redis:
             self.redis.hset(key, memory_id, payload)
+            self._invalidate(key)
             return memory
         _memory.relationship_memories.setdefault(user_id, {})[memory_id] = memory.model_dump(mode="json")
         return memory
@@ -640,6 +1114,7 @@ class StorageService:
         if self.redis:
             deleted = bool(self.redis.hdel(key, memory_id))
             self.redis.zrem("relationship:followups", f"{user_id}:{memory_id}")
+            self._invalidate(key)
             return deleted
         deleted = _memory.relationship_memories.get(user_id, {}).pop(memory_id, None) is not None
         _memory.relationship_followups.pop(memory_id, None)
@@ -648,18 +1123,15 @@ class StorageService:
     def mark_relationship_done(self, user_id: int, memory_id: str) -> bool:
         key = f"relationship:{user_id}"
         if self.redis:
-            raw = self.redis.hget(key, memory_id)
-            if not raw:
-                return False
-            try:
-                mem = RelationshipMemory.model_validate_json(raw)
-            except Exception:
+            mem = relationship_memory_codec.decode_or_none(self.redis.hget(key, memory_id))
+            if mem is None:
                 return False
             mem.status = "done"
             mem.last_used_at = datetime.now()
             mem.updated_at = datetime.now()
-            self.redis.hset(key, memory_id, json.dumps(mem.model_dump(mode="json"), ensure_ascii=False))
+            self.redis.hset(key, memory_id, relationship_memory_codec.encode(mem))
             self.redis.zrem("relationship:followups", f"{user_id}:{memory_id}")
+            self._invalidate(key)
             return True
 
         data = _memory.relationship_memories.get(user_id, {}).get(memory_id)
@@ -678,7 +1150,7 @@ class StorageService:
         status: Optional[str] = None,
         limit: int = 200,
     ) -> List[RelationshipMemory]:
-        rows: List[str] = []
+        rows: List[str | dict] = []
         if self.redis:
             for key in self.redis.keys("relationship:*"):
                 if key == "relationship:followups":
@@ -686,24 +1158,18 @@ class StorageService:
                 rows.extend(self.redis.hvals(key))
         else:
             for user_memories in _memory.relationship_memories.values():
-                rows.extend(json.dumps(item, ensure_ascii=False) for item in user_memories.values())
-
-        memories: List[RelationshipMemory] = []
-        for row in rows:
-            try:
-                mem = RelationshipMemory.model_validate_json(row)
-            except Exception:
-                continue
-            if memory_type and mem.memory_type != memory_type:
-                continue
-            if status and mem.status != status:
-                continue
-            memories.append(mem)
-        memories.sort(key=lambda x: x.created_at, reverse=True)
-        return memories[:limit]
+                rows.extend(user_memories.values())
+
+        return _select_records(
+            relationship_memory_codec,
+            rows,
+            where={"memory_type": memory_type, "status": status},
+            order_by="created_at",
+            limit=limit,
+        )
 
     def save_thought_trace(self, trace: ThoughtTrace) -> ThoughtTrace:
-        payload = json.dumps(trace.model_dump(mode="json"), ensure_ascii=False)
+        payload = self._pack(thought_trace_codec.encode(trace))
         if self.redis:
             self.redis.hset("thought_traces", trace.trace_id, payload)
             return trace
@@ -752,6 +1218,9 @@ class StorageService:
         return self.save_thought_trace(trace)
 
     def append_thought_trace(self, payload: dict) -> ThoughtTrace:
+        return self.save_thought_trace(self._build_thought_trace(payload))
+
+    def _build_thought_trace(self, payload: dict) -> ThoughtTrace:
         created_at = self._parse_datetime(payload.get("created_at"))
         trace_kind = self._normalize_trace_kind(str(payload.get("trace_kind") or payload.get("trace_type") or "chat"))
         trace_payload = payload.get("payload") if isinstance(payload.get("payload"), dict) else {}
@@ -781,7 +1250,7 @@ class StorageService:
             related_task_id=payload.get("related_task_id") or payload.get("task_id"),
             created_at=created_at or datetime.now(),
         )
-        return self.save_thought_trace(trace)
+        return trace
 
     @staticmethod
     def _derive_trace_fields(source: str, trace_type: str, summary: str, payload: dict) -> dict[str, str]:
@@ -880,13 +1349,7 @@ class StorageService:
 
     def get_thought_trace(self, trace_id: str) -> Optional[ThoughtTrace]:
         if self.redis:
-            raw = self.redis.hget("thought_traces", trace_id)
-            if not raw:
-                return None
-            try:
-                return ThoughtTrace.model_validate_json(raw)
-            except Exception:
-                return None
+            return thought_trace_codec.decode_or_none(_unpack_or_none(self.redis.hget("thought_traces", trace_id)))
         data = _memory.thought_traces.get(trace_id)
         return ThoughtTrace.model_validate(data) if data else None
 
@@ -897,30 +1360,24 @@ class StorageService:
         user_id: Optional[int] = None,
         limit: int = 100,
     ) -> List[ThoughtTrace]:
-        rows: List[str]
+        rows: List[str | dict]
         if self.redis:
-            rows = self.redis.hvals("thought_traces")
+            rows = _unpack_rows(self.redis.hvals("thought_traces"))
         else:
-            rows = [json.dumps(item, ensure_ascii=False) for item in _memory.thought_traces.values()]
-        traces: List[ThoughtTrace] = []
-        for row in rows:
-            try:
-                trace = ThoughtTrace.model_validate_json(row)
-            except Exception:
-                continue
-            if trace_kind and trace.trace_kind != trace_kind:
-                continue
-            if user_id is not None and trace.user_id != user_id:
-                continue
-            traces.append(trace)
-        traces.sort(key=lambda x: x.created_at, reverse=True)
-        return traces[:limit]
+            rows = list(_memory.thought_traces.values())
+        return _select_records(
+            thought_trace_codec,
+            rows,
+            where={"trace_kind": trace_kind, "user_id": user_id},
+            order_by="created_at",
+            limit=limit,
+        )
 
     def save_autonomy_goal(self, goal: AutonomyGoal) -> AutonomyGoal:
         goal.updated_at = datetime.now()
         payload = json.dumps(goal.model_dump(mode="json"), ensure_ascii=False)
         if self.redis:
-            self.redis.hset("autonomy:goals", goal.goal_id, payload)
+            self._write_autonomy_item("goals", goal.goal_id, goal.status, goal.priority, goal.updated_at, payload)
             return goal
         _memory.autonomy_goals[goal.goal_id] = goal.model_dump(mode="json")
         return goal
@@ -961,7 +1418,7 @@ class StorageService:
     def list_autonomy_goals(self, *, status: Optional[str] = None, limit: int = 100) -> List[AutonomyGoal]:
         rows: List[str]
         if self.redis:
-            rows = self.redis.hvals("autonomy:goals")
+            rows = self._autonomy_rows("goals", status, limit)
         else:
             rows = [json.dumps(item, ensure_ascii=False) for item in _memory.autonomy_goals.values()]
         goals: List[AutonomyGoal] = []
@@ -980,7 +1437,7 @@ class StorageService:
         task.updated_at = datetime.now()
         payload = json.dumps(task.model_dump(mode="json"), ensure_ascii=False)
         if self.redis:
-            self.redis.hset("autonomy:tasks", task.task_id, payload)
+            self._write_autonomy_item("tasks", task.task_id, task.status, task.priority, task.updated_at, payload)
             return task
         _memory.autonomy_tasks[task.task_id] = task.model_dump(mode="json")
         return task
@@ -1027,7 +1484,7 @@ class StorageService:
     ) -> List[AutonomyTask]:
         rows: List[str]
         if self.redis:
-            rows = self.redis.hvals("autonomy:tasks")
+            rows = self._autonomy_rows("tasks", status if not goal_id else None, limit)
         else:
             rows = [json.dumps(item, ensure_ascii=False) for item in _memory.autonomy_tasks.values()]
         tasks: List[AutonomyTask] = []
@@ -1044,6 +1501,90 @@ class StorageService:
         tasks.sort(key=lambda x: (x.priority, x.updated_at), reverse=True)
         return tasks[:limit]
 
+    def _write_autonomy_item(
+        self,
+        kind: str,
+        item_id: str,
+        status: str,
+        priority: int,
+        updated_at: datetime,
+        payload: str,
+    ) -> None:
+        self._ensure_autonomy_indexes()
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(f"autonomy:{kind}", item_id, payload)
+        for other in AUTONOMY_STATUSES[kind]:
+            if other != status:
+                pipe.zrem(_autonomy_index_key(kind, other), item_id)
+        pipe.zadd(_autonomy_index_key(kind, status), {item_id: _autonomy_score(priority, updated_at)})
+        pipe.execute()
+        self._invalidate(f"autonomy:{kind}")
+
+    def _autonomy_rows(self, kind: str, status: Optional[str], limit: int) -> tuple:
+        hash_key = f"autonomy:{kind}"
+        if not status or status not in AUTONOMY_STATUSES[kind]:
+            return self._cached(hash_key, lambda: tuple(self.redis.hvals(hash_key)))
+        self._ensure_autonomy_indexes()
+        index_key = _autonomy_index_key(kind, status)
+        return self._cached(
+            f"{hash_key}|{status}|{limit}",
+            lambda: tuple(
+                row
+                for row in self.redis.eval(_INDEXED_PAGE_SCRIPT, 2, index_key, hash_key, max(1, limit))
+                if row
+            ),
+        )
+
+    def _ensure_autonomy_indexes(self) -> None:
+        """Build the status indexes once for goals/tasks written before they existed."""
+        if getattr(self, "_autonomy_indexed", False):
+            return
+        self._autonomy_indexed = True
+        if not self.redis.exists(AUTONOMY_INDEX_MARKER):
+            self.rebuild_autonomy_indexes()
+
+    def rebuild_autonomy_indexes(self) -> int:
+        """Recreate every goal/task status index from the payload hashes."""
+        models = {"goals": (AutonomyGoal, "goal_id"), "tasks": (AutonomyTask, "task_id")}
+        pipe = self.redis.pipeline(transaction=True)
+        indexed = 0
+        for kind, (model, id_field) in models.items():
+            scores: Dict[str, Dict[str, float]] = {}
+            for row in self.redis.hvals(f"autonomy:{kind}"):
+                try:
+                    item = model.model_validate_json(row)
+                except Exception:
+                    continue
+                scores.setdefault(item.status, {})[getattr(item, id_field)] = _autonomy_score(
+                    item.priority, item.updated_at
+                )
+            for status in AUTONOMY_STATUSES[kind]:
+                pipe.delete(_autonomy_index_key(kind, status))
+                if scores.get(status):
+                    pipe.zadd(_autonomy_index_key(kind, status), scores[status])
+                    indexed += len(scores[status])
+        pipe.set(AUTONOMY_INDEX_MARKER, 1)
+        pipe.execute()
+        self._invalidate("autonomy:goals", "autonomy:tasks")
+        return indexed
+
+    def get_autonomy_activity(self) -> Optional[dict]:
+        if self.redis:
+            raw = self.redis.get(AUTONOMY_ACTIVITY_KEY)
+            if not raw:
+                return None
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return None
+        return dict(_memory.autonomy_activity) if _memory.autonomy_activity else None
+
+    def save_autonomy_activity(self, state: dict) -> None:
+        if self.redis:
+            self.redis.set(AUTONOMY_ACTIVITY_KEY, json.dumps(state, ensure_ascii=False))
+            return
+        _memory.autonomy_activity = dict(state)
+
     def save_autonomy_progress_event(self, event: AutonomyProgressEvent) -> AutonomyProgressEvent:
         payload = json.dumps(event.model_dump(mode="json"), ensure_ascii=False)
         if self.redis:
@@ -1088,6 +1629,9 @@ class StorageService:
         return self.save_autonomy_progress_event(event)
 
     def append_progress_event(self, payload: dict) -> AutonomyProgressEvent:
+        return self.save_autonomy_progress_event(self._build_progress_event(payload))
+
+    def _build_progress_event(self, payload: dict) -> AutonomyProgressEvent:
         event_type = str(payload.get("event_type") or payload.get("event_kind") or "note")
         event_kind = self._normalize_progress_event_kind(event_type)
         created_at = self._parse_datetime(payload.get("created_at"))
@@ -1102,7 +1646,39 @@ class StorageService:
             task_id=payload.get("task_id"),
             created_at=created_at or datetime.now(),
         )
-        return self.save_autonomy_progress_event(event)
+        return event
+
+    def append_audit_batch(self, entries: List[tuple[str, dict]]) -> int:
+        """Materialize ``(method_name, payload)`` audit entries with one pipeline round trip."""
+        traces: List[ThoughtTrace] = []
+        events: List[AutonomyProgressEvent] = []
+        for method_name, payload in entries:
+            try:
+                if method_name == "append_thought_trace":
+                    traces.append(self._build_thought_trace(payload))
+                elif method_name == "append_progress_event":
+                    events.append(self._build_progress_event(payload))
+            except Exception:
+                continue
+        if not traces and not events:
+            return 0
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            for trace in traces:
+                pipe.hset("thought_traces", trace.trace_id, self._pack(thought_trace_codec.encode(trace)))
+            for event in events:
+                pipe.hset(
+                    "autonomy:progress_events",
+                    event.event_id,
+                    json.dumps(event.model_dump(mode="json"), ensure_ascii=False),
+                )
+            pipe.execute()
+        else:
+            for trace in traces:
+                _memory.thought_traces[trace.trace_id] = trace.model_dump(mode="json")
+            for event in events:
+                _memory.autonomy_progress_events[event.event_id] = event.model_dump(mode="json")
+        return len(traces) + len(events)
 
     def list_autonomy_progress_events(
         self,
@@ -1194,6 +1770,15 @@ class StorageService:
             return "tool"
         return "chat"
 
+    def next_followup_due(self) -> Optional[datetime]:
+        """Due time of the earliest pending follow-up, or ``None`` when there is none."""
+        if self.redis:
+            head = self.redis.zrange("relationship:followups", 0, 0, withscores=True)
+            return datetime.fromtimestamp(float(head[0][1])) if head else None
+        if not _memory.relationship_followups:
+            return None
+        return datetime.fromtimestamp(min(ts for _user_id, ts in _memory.relationship_followups.values()))
+
     def list_due_followups(self, now: Optional[datetime] = None, limit: int = 20) -> List[RelationshipMemory]:
         now = now or datetime.now()
         if self.redis:
@@ -1208,14 +1793,8 @@ class StorageService:
                 except ValueError:
                     continue
                 memory_id = parts[1]
-                raw = self.redis.hget(f"relationship:{user_id}", memory_id)
-                if not raw:
-                    continue
-                try:
-                    mem = RelationshipMemory.model_validate_json(raw)
-                except Exception:
-                    continue
-                if mem.status == "active":
+                mem = relationship_memory_codec.decode_or_none(self.redis.hget(f"relationship:{user_id}", memory_id))
+                if mem is not None and mem.status == "active":
                     result.append(mem)
             return result
 
@@ -1245,56 +1824,125 @@ class StorageService:
             return bool(self.redis.sismember("blacklist:groups", group_id))
         return group_id in _memory.blacklisted_groups
 
+    def get_blacklist_snapshot(self) -> Tuple[int, Set[int], Set[int]]:
+        """Version, blocked users and blocked groups, read in one transaction."""
+        if self.redis:
+            pipe = self.redis.pipeline()
+            pipe.get(BLACKLIST_VERSION_KEY)
+            pipe.smembers("blacklist:users")
+            pipe.smembers("blacklist:groups")
+            version, users, groups = pipe.execute()
+            return int(version or 0), _int_members(users), _int_members(groups)
+        return 0, set(_memory.blacklisted_users), set(_memory.blacklisted_groups)
+
+    def get_blacklist_version(self) -> int:
+        if self.redis:
+            return int(self.redis.get(BLACKLIST_VERSION_KEY) or 0)
+        return 0
+
     def add_user_blacklist(self, user_id: int, reason: str = "") -> None:
         if self.redis:
-            self.redis.sadd("blacklist:users", user_id)
-            if reason:
-                self.redis.hset("blacklist:user:reason", user_id, reason)
+            self._write_blacklist("sadd", "blacklist:users", "blacklist:user:reason", user_id, reason)
             return
         _memory.blacklisted_users[user_id] = reason
 
     def remove_user_blacklist(self, user_id: int) -> None:
         if self.redis:
-            self.redis.srem("blacklist:users", user_id)
-            self.redis.hdel("blacklist:user:reason", user_id)
+            self._write_blacklist("srem", "blacklist:users", "blacklist:user:reason", user_id)
             return
         _memory.blacklisted_users.pop(user_id, None)
 
     def add_group_blacklist(self, group_id: int, reason: str = "") -> None:
         if self.redis:
-            self.redis.sadd("blacklist:groups", group_id)
-            if reason:
-                self.redis.hset("blacklist:group:reason", group_id, reason)
+            self._write_blacklist("sadd", "blacklist:groups", "blacklist:group:reason", group_id, reason)
             return
         _memory.blacklisted_groups[group_id] = reason
 
     def remove_group_blacklist(self, group_id: int) -> None:
         if self.redis:
-            self.redis.srem("blacklist:groups", group_id)
-            self.redis.hdel("blacklist:group:reason", group_id)
+            self._write_blacklist("srem", "blacklist:groups", "blacklist:group:reason", group_id)
             return
         _memory.blacklisted_groups.pop(group_id, None)
 
+    def _write_blacklist(self, op: str, members_key: str, reason_key: str, member: int, reason: str = "") -> None:
+        redis_client = self.redis
+        pipe = redis_client.pipeline()
+        getattr(pipe, op)(members_key, member)
+        if op == "srem":
+            pipe.hdel(reason_key, member)
+        elif reason:
+            pipe.hset(reason_key, member, reason)
+        pipe.incr(BLACKLIST_VERSION_KEY)
+        pipe.execute()
+        invalidate_local(BLACKLIST_CACHE_KEY)
+        publish_invalidation(redis_client, BLACKLIST_CACHE_KEY)
+
     def consume_cost(self, user_id: int, amount: float, *, at: Optional[datetime] = None) -> None:
         if amount <= 0:
             return
-        at = at or datetime.now()
-        day = at.strftime("%Y%m%d")
-        g_key = f"cost:global:{day}"
-        u_key = f"cost:user:{user_id}:{day}"
-        if self.redis:
-            self.redis.incrbyfloat(g_key, amount)
-            self.redis.incrbyfloat(u_key, amount)
-            self.redis.expire(g_key, 172800)
-            self.redis.expire(u_key, 172800)
+        self.adjust_cost(user_id, amount, at=at)
+
+    def adjust_cost(self, user_id: int, delta: float, *, at: Optional[datetime] = None) -> None:
+        """Add ``delta`` (possibly negative) to the global and user counters of ``at``'s day."""
+        if not delta:
+            return
+        g_key, u_key = _cost_keys(user_id, at or datetime.now())
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in (g_key, u_key):
+                pipe.incrbyfloat(key, delta)
+                pipe.expire(key, COST_COUNTER_TTL_SECONDS)
+            pipe.execute()
             return
-        _memory.daily_costs[g_key] = _memory.daily_costs.get(g_key, 0.0) + amount
-        _memory.daily_costs[u_key] = _memory.daily_costs.get(u_key, 0.0) + amount
+        with _memory_cost_lock:
+            for key in (g_key, u_key):
+                _memory.daily_costs[key] = _memory.daily_costs.get(key, 0.0) + delta
+
+    def reserve_cost(
+        self,
+        user_id: int,
+        amount: float,
+        *,
+        lease: float,
+        global_limit: float,
+        user_limit: float,
+        at: Optional[datetime] = None,
+    ) -> tuple[bool, str, float]:
+        """Atomically check both daily limits and charge ``amount`` plus up to ``lease``.
+
+        Returns ``(allowed, exhausted_scope, granted_lease)``.
+        """
+        g_key, u_key = _cost_keys(user_id, at or datetime.now())
+        if self.redis:
+            allowed, detail = self.redis.eval(
+                _RESERVE_COST_SCRIPT,
+                2,
+                g_key,
+                u_key,
+                repr(float(amount)),
+                repr(float(max(0.0, lease))),
+                repr(float(global_limit)),
+                repr(float(user_limit)),
+                COST_COUNTER_TTL_SECONDS,
+            )
+            if not int(allowed):
+                return False, str(detail), 0.0
+            return True, "", float(detail)
+        with _memory_cost_lock:
+            global_used = _memory.daily_costs.get(g_key, 0.0)
+            user_used = _memory.daily_costs.get(u_key, 0.0)
+            if global_used + amount > global_limit:
+                return False, "global", 0.0
+            if user_used + amount > user_limit:
+                return False, "user", 0.0
+            extra = max(0.0, min(lease, global_limit - global_used - amount, user_limit - user_used - amount))
+            _memory.daily_costs[g_key] = global_used + amount + extra
+            _memory.daily_costs[u_key] = user_used + amount + extra
+            return True, "", extra
 
     def get_daily_cost(self, user_id: Optional[int] = None, *, at: Optional[datetime] = None) -> float:
-        at = at or datetime.now()
-        day = at.strftime("%Y%m%d")
-        key = f"cost:global:{day}" if user_id is None else f"cost:user:{user_id}:{day}"
+        g_key, u_key = _cost_keys(user_id, at or datetime.now())
+        key = g_key if user_id is None else u_key
         if self.redis:
             value = self.redis.get(key)
             return float(value) if value is not None else 0.0
@@ -0,0 +1,69 @@
+"""Size-aware text packing for large Redis values.
+
+Values at or above the configured size are compressed (zstd when the
+``zstandard`` package is installed, zlib otherwise) and stored as
+``<marker><base85 payload>``.  The Redis client runs with
+``decode_responses=True``, so payloads must stay ``str``.  The marker starts
+with an ESC character, which never begins a JSON document or normal chat text,
+so readers can tell packed and plain values apart without extra metadata.
+"""
+
+from __future__ import annotations
+
+import base64
+import zlib
+from typing import Optional
+
+try:  # optional; zlib is always available
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the installed extras
+    zstandard = None
+
+ZSTD_MARK = "\x1bz1:"
+ZLIB_MARK = "\x1bd1:"
+COMPRESSION_CHOICES = ("auto", "zstd", "zlib", "off")
+
+
+def resolve_compression(name: str) -> str:
+    name = (name or "auto").strip().lower()
+    if name not in COMPRESSION_CHOICES:
+        raise ValueError(f"Unknown storage compression: {name}")
+    if name == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if name == "zstd" and zstandard is None:
+        raise ValueError("STORAGE_COMPRESSION=zstd requires the zstandard package")
+    return name
+
+
+def is_packed(raw: object) -> bool:
+    return isinstance(raw, str) and raw.startswith("\x1b")
+
+
+def pack_text(text: str, *, compression: str, min_bytes: int) -> str:
+    """Compress ``text`` when it is large enough and compression actually pays off."""
+    if compression == "off" or len(text) < min_bytes // 3:
+        return text
+    data = text.encode("utf-8")
+    if len(data) < min_bytes:
+        return text
+    if compression == "zstd":
+        marker = ZSTD_MARK
+        compressed = zstandard.ZstdCompressor(level=3).compress(data)
+    else:
+        marker = ZLIB_MARK
+        compressed = zlib.compress(data, 6)
+    packed = marker + base64.b85encode(compressed).decode("ascii")
+    return packed if len(packed.encode("ascii")) < len(data) else text
+
+
+def unpack_text(raw: Optional[str]) -> Optional[str]:
+    if not raw or not is_packed(raw):
+        return raw
+    if raw.startswith(ZLIB_MARK):
+        return zlib.decompress(base64.b85decode(raw[len(ZLIB_MARK) :])).decode("utf-8")
+    if raw.startswith(ZSTD_MARK):
+        if zstandard is None:
+            raise RuntimeError("zstd-packed value found but the zstandard package is not installed")
+        payload = base64.b85decode(raw[len(ZSTD_MARK) :])
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    return raw
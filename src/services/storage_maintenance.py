@@ -0,0 +1,231 @@
+"""Offline storage maintenance: encoding migration and Redis memory report."""
+
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.core.errors import NotConfiguredError
+from src.models.codec import (
+    dumps as codec_dumps,
+    loads as codec_loads,
+    outbound_message_codec,
+    relationship_memory_codec,
+    thought_trace_codec,
+)
+from src.services.storage import LEGACY_GLOBAL_KEY, StorageService
+from src.services.storage_encoding import unpack_text
+
+_ID_SEGMENT = re.compile(r"^[0-9a-f]{8,}$|^\d+$")
+
+
+def key_family(key: str) -> str:
+    """Collapse ``relationship:123`` / ``mako:memory:abcd...`` to a family name."""
+    parts = key.split(":")
+    family: List[str] = []
+    for part in parts:
+        if _ID_SEGMENT.match(part):
+            family.append("*")
+            break
+        family.append(part)
+    return ":".join(family)
+
+
+@dataclass
+class MigrationReport:
+    dry_run: bool
+    rewritten: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    skipped: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def lines(self) -> List[str]:
+        mode = "dry-run" if self.dry_run else "applied"
+        lines = [f"storage migrate ({mode})"]
+        for name in sorted(set(self.rewritten) | set(self.skipped)):
+            lines.append(f"  {name:<24} rewritten={self.rewritten[name]:<8} unchanged={self.skipped[name]}")
+        return lines
+
+
+@dataclass
+class KeyFamilyUsage:
+    keys: int = 0
+    sampled: int = 0
+    sampled_bytes: int = 0
+    encodings: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def estimated_bytes(self) -> int:
+        if not self.sampled:
+            return 0
+        return int(self.sampled_bytes / self.sampled * self.keys)
+
+
+class StorageMaintenance:
+    def __init__(self, storage: Optional[StorageService] = None) -> None:
+        self.storage = storage or StorageService()
+
+    @property
+    def redis(self):
+        client = self.storage.redis
+        if not client:
+            raise NotConfiguredError("Redis is not available; storage maintenance needs a live connection.")
+        return client
+
+    def migrate(self, *, dry_run: bool = False) -> MigrationReport:
+        """Rewrite stored values into the current compact/compressed encodings."""
+        report = MigrationReport(dry_run=dry_run)
+        redis_client = self.redis
+
+        legacy_rows = int(redis_client.llen(LEGACY_GLOBAL_KEY) or 0)
+        if legacy_rows:
+            report.rewritten["all_memory"] += legacy_rows
+            if not dry_run:
+                self.storage._legacy_global_checked = False
+                self.storage._migrate_legacy_global_records()
+
+        for key in redis_client.scan_iter(match="chat:history:*", count=500):
+            raw = redis_client.get(key)
+            if not raw:
+                continue
+            encoded = self.storage._pack(codec_dumps(codec_loads(unpack_text(raw))))
+            self._record(report, "chat:history", key, raw, encoded, redis_client.set, dry_run)
+
+        for key in redis_client.scan_iter(match="user_profile:*", count=500):
+            raw = redis_client.get(key)
+            profile = self.storage._parse_profile_payload(raw, key=key) if raw else None
+            if not profile:
+                continue
+            encoded = self.storage._encode_profile(
+                profile.get("user_id"),
+                str(profile.get("nickname") or ""),
+                str(profile.get("profile_text") or ""),
+                str(profile.get("last_updated") or ""),
+            )
+            self._record(report, "user_profile", key, raw, encoded, redis_client.set, dry_run)
+
+        for key in redis_client.scan_iter(match="relationship:*", count=500):
+            if key == "relationship:followups":
+                continue
+            self._rewrite_hash(
+                report,
+                "relationship",
+                key,
+                lambda raw: relationship_memory_codec.encode(relationship_memory_codec.decode(raw)),
+                dry_run,
+            )
+
+        self._rewrite_hash(
+            report,
+            "thought_traces",
+            "thought_traces",
+            lambda raw: self.storage._pack(thought_trace_codec.encode(thought_trace_codec.decode(unpack_text(raw)))),
+            dry_run,
+        )
+
+        # Status indexes are derived data: rebuilding them is always safe.
+        indexed = sum(int(redis_client.hlen(f"autonomy:{kind}") or 0) for kind in ("goals", "tasks"))
+        if indexed:
+            report.rewritten["autonomy:index"] += indexed
+            if not dry_run:
+                self.storage.rebuild_autonomy_indexes()
+
+        reminders = int(redis_client.hlen("reminders") or 0)
+        if reminders:
+            report.rewritten["reminders:index"] += reminders
+            if not dry_run:
+                self.storage.rebuild_reminder_indexes()
+
+        for key in redis_client.scan_iter(match="outbound:ledger:*", count=500):
+            rows = redis_client.lrange(key, 0, -1)
+            encoded_rows: List[str] = []
+            for row in rows:
+                record = outbound_message_codec.decode_or_none(row)
+                encoded_rows.append(outbound_message_codec.encode(record) if record else row)
+            if encoded_rows == rows:
+                report.skipped["outbound:ledger"] += 1
+                continue
+            report.rewritten["outbound:ledger"] += 1
+            if dry_run:
+                continue
+            ttl = redis_client.ttl(key)
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.rpush(key, *encoded_rows)
+            if ttl and ttl > 0:
+                pipe.expire(key, ttl)
+            pipe.execute()
+        return report
+
+    def memory_report(self, *, sample: int = 200) -> List[str]:
+        """Approximate memory per key family using ``MEMORY USAGE`` on a sample of keys."""
+        redis_client = self.redis
+        families: Dict[str, KeyFamilyUsage] = defaultdict(KeyFamilyUsage)
+        for key in redis_client.scan_iter(count=1000):
+            usage = families[key_family(key)]
+            usage.keys += 1
+            if usage.sampled >= sample:
+                continue
+            try:
+                usage.sampled_bytes += int(redis_client.memory_usage(key, samples=0) or 0)
+                usage.encodings[str(redis_client.object("encoding", key))] += 1
+                usage.sampled += 1
+            except Exception:
+                continue
+
+        info = redis_client.info("memory")
+        lines = [
+            f"used_memory={info.get('used_memory_human', '?')} "
+            f"peak={info.get('used_memory_peak_human', '?')} "
+            f"fragmentation={info.get('mem_fragmentation_ratio', '?')}",
+            f"{'family':<32}{'keys':>8}{'est. bytes':>14}  encodings",
+        ]
+        ordered = sorted(families.items(), key=lambda item: item[1].estimated_bytes, reverse=True)
+        for name, usage in ordered:
+            encodings = ", ".join(f"{encoding}={count}" for encoding, count in sorted(usage.encodings.items()))
+            lines.append(f"{name:<32}{usage.keys:>8}{usage.estimated_bytes:>14}  {encodings}")
+        lines.extend(self._listpack_hints(redis_client))
+        return lines
+
+    def _listpack_hints(self, redis_client) -> List[str]:
+        try:
+            config = redis_client.config_get("hash-max-listpack-*")
+        except Exception:
+            return []
+        value_limit = int(config.get("hash-max-listpack-value", 0) or 0)
+        if value_limit >= 512:
+            return []
+        return [
+            f"hint: hash-max-listpack-value={value_limit}; per-user hashes (relationship:*, notes:*) "
+            "hold rows of a few hundred bytes and fall back to hashtable encoding. "
+            "Raise it to 1024 (see deploy/docker-compose.yml)."
+        ]
+
+    def _rewrite_hash(self, report: MigrationReport, family: str, key: str, encode, dry_run: bool) -> None:
+        redis_client = self.redis
+        updates: Dict[str, str] = {}
+        for field_name, raw in redis_client.hscan_iter(key, count=500):
+            try:
+                encoded = encode(raw)
+            except Exception:
+                report.skipped[family] += 1
+                continue
+            if encoded == raw:
+                report.skipped[family] += 1
+                continue
+            updates[field_name] = encoded
+            report.rewritten[family] += 1
+            if len(updates) >= 500 and not dry_run:
+                redis_client.hset(key, mapping=updates)
+                updates = {}
+        if updates and not dry_run:
+            redis_client.hset(key, mapping=updates)
+
+    @staticmethod
+    def _record(report: MigrationReport, family: str, key: str, raw: str, encoded: str, write, dry_run: bool) -> None:
+        if encoded == raw:
+            report.skipped[family] += 1
+            return
+        report.rewritten[family] += 1
+        if not dry_run:
+            write(key, encoded)
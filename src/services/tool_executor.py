@@ -58,12 +58,43 @@ class ToolExecutionResult:
         return ""
 
 
+@dataclass
+class ToolRequestContext:
+    """State owned by one chat request rather than the shared executor."""
+
+    temp_files: List[Path] = field(default_factory=list)
+
+    def track_temp_file(self, path: Path) -> None:
+        self.temp_files.append(path)
+
+    def cleanup_temp_files(self) -> None:
+        """Remove all tracked temporary files. Call after messages are sent."""
+        for path in self.temp_files:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self.temp_files.clear()
+
+
 class ToolExecutor:
-    def __init__(self) -> None:
+    """Runs tool decisions; one instance is shared by all requests.
+
+    Anything that belongs to a single request (temporary files) lives in the
+    :class:`ToolRequestContext` passed to :meth:`run`.
+    """
+
+    def __init__(
+        self,
+        *,
+        note_service: Optional[NoteService] = None,
+        affinity_service: Optional[AffinityService] = None,
+        governance: Optional[GovernanceService] = None,
+    ) -> None:
         self.settings = get_settings()
-        self.note_service = NoteService()
-        self.affinity_service = AffinityService()
-        self.governance = GovernanceService()
+        self.note_service = note_service or NoteService()
+        self.affinity_service = affinity_service or AffinityService()
+        self.governance = governance or GovernanceService()
         self._enabled_names = set(self.settings.parse_name_list(self.settings.tool_enable_list))
         self._disabled_names = set(self.settings.parse_name_list(self.settings.tool_disable_list))
         self._concurrent_safe_tools = {
@@ -76,19 +107,6 @@ class ToolExecutor:
             "search.summarize_url",
             "map.query",
         }
-        self._temp_files: List[Path] = []
-
-    def _track_temp_file(self, path: Path) -> None:
-        self._temp_files.append(path)
-
-    def cleanup_temp_files(self) -> None:
-        """Remove all tracked temporary files. Call after messages are sent."""
-        for path in self._temp_files:
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
-        self._temp_files.clear()
 
     def _is_enabled(self, tool_name: str) -> bool:
         if tool_name in self._disabled_names:
@@ -135,6 +153,7 @@ class ToolExecutor:
         message_type: str,
         group_id: Optional[int] = None,
         is_group_admin: bool = False,
+        request: ToolRequestContext,
     ) -> ToolExecutionResult:
         result = ToolExecutionResult()
         unique_decisions = self._dedupe_decisions(decisions)
@@ -164,6 +183,7 @@ class ToolExecutor:
                         message_type=message_type,
                         group_id=group_id,
                         is_group_admin=is_group_admin,
+                        request=request,
                     )
 
             partial_results = await asyncio.gather(*[_run_with_sem(d) for d in concurrent], return_exceptions=True)
@@ -184,6 +204,7 @@ class ToolExecutor:
                 message_type=message_type,
                 group_id=group_id,
                 is_group_admin=is_group_admin,
+                request=request,
             )
             result.merge(partial)
         return result
@@ -200,6 +221,7 @@ class ToolExecutor:
         message_type: str,
         group_id: Optional[int],
         is_group_admin: bool,
+        request: ToolRequestContext,
     ) -> ToolExecutionResult:
         local = ToolExecutionResult()
 
@@ -224,7 +246,7 @@ class ToolExecutor:
             return local
 
         estimated_cost = self.governance.estimate_tool_cost(decision.name)
-        budget = self.governance.can_consume_cost(user_id, estimated_cost)
+        budget = self.governance.reserve_cost(user_id, estimated_cost)
         if not budget.allowed:
             local.diagnostic_lines.append(f"[{decision.name}] skipped: {budget.reason}.")
             return local
@@ -232,12 +254,10 @@ class ToolExecutor:
         started = time.perf_counter()
         try:
             handled = await asyncio.wait_for(
-                self._run_one(decision, local, user_id, text, image_urls, audio_urls, face_ids),
+                self._run_one(decision, local, request, user_id, text, image_urls, audio_urls, face_ids),
                 timeout=self.settings.tool_timeout_seconds,
             )
             local.handled = handled
-            if handled:
-                self.governance.consume_cost(user_id, estimated_cost)
         except NotConfiguredError as exc:
             local.diagnostic_lines.append(f"[{decision.name}] 未配置: {exc}")
         except asyncio.TimeoutError:
@@ -248,6 +268,8 @@ class ToolExecutor:
             logger.exception(f"Tool execution failed: {decision.name}, {exc}")
             local.diagnostic_lines.append(f"[{decision.name}] 调用失败: {exc}")
         finally:
+            # Only tools that actually ran are charged; the estimate is released otherwise.
+            self.governance.settle_cost(budget, estimated_cost if local.handled else 0.0)
             elapsed_ms = (time.perf_counter() - started) * 1000
             logger.info(f"tool={decision.name} elapsed_ms={elapsed_ms:.1f}")
         return local
@@ -256,6 +278,7 @@ class ToolExecutor:
         self,
         decision: IntentDecision,
         result: ToolExecutionResult,
+        request: ToolRequestContext,
         user_id: int,
         text: str,
         image_urls: List[str],
@@ -288,7 +311,7 @@ class ToolExecutor:
                 f.write(out)
                 path = Path(f.name)
             # Track temp file for deferred cleanup after the message is sent
-            self._track_temp_file(path)
+            request.track_temp_file(path)
             result.fact_lines.append(
                 f"图片处理完成，操作={args.get('operation')} 参数={args.get('value', '')}".strip()
             )
@@ -310,7 +333,7 @@ class ToolExecutor:
             with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as f:
                 f.write(audio)
                 path = Path(f.name)
-            self._track_temp_file(path)
+            request.track_temp_file(path)
             result.fact_lines.append("已将文本转换成语音。")
             result.extra_messages.append(MessageSegment.record(file=str(path)))
             return True
@@ -322,20 +345,22 @@ class ToolExecutor:
             return True
 
         if name == "affinity.query":
-            score = self.affinity_service.get_score(user_id)
+            score = await asyncio.to_thread(self.affinity_service.get_score, user_id)
             level = self.affinity_service.level(score)
             result.fact_lines.append(f"当前好感度: {score} ({level})")
             return True
 
         if name == "emoji.analyze":
             analysis = analyze_emoji(face_ids, text)
-            score = self.affinity_service.adjust(user_id, analysis.affinity_delta)
+            score = await asyncio.to_thread(self.affinity_service.adjust, user_id, analysis.affinity_delta)
             labels = "、".join(analysis.labels) if analysis.labels else "无明显特征"
             result.fact_lines.append(f"表情识别: {labels}，情绪={analysis.sentiment}，好感度={score}")
             return True
 
         if name == "note.add":
-            note = self.note_service.add_note(
+            # Saved off the event loop; embedding is queued to the background indexer.
+            note = await asyncio.to_thread(
+                self.note_service.add_note,
                 user_id=user_id,
                 title=args.get("title", "未命名笔记"),
                 content=args.get("content", text),
@@ -345,9 +370,10 @@ class ToolExecutor:
 
         if name == "note.query":
             keyword = args.get("keyword", "")
-            notes = (
-                self.note_service.search_notes(user_id, keyword) if keyword else self.note_service.list_notes(user_id)
-            )
+            if keyword:
+                notes = await asyncio.to_thread(self.note_service.search_notes, user_id, keyword)
+            else:
+                notes = await asyncio.to_thread(self.note_service.list_notes, user_id)
             if not notes:
                 result.fact_lines.append("笔记查询: 没有匹配内容。")
                 return True
@@ -357,12 +383,17 @@ class ToolExecutor:
             return True
 
         if name == "note.delete":
-            ok = self.note_service.delete_note(user_id, args.get("keyword", ""))
+            ok = await asyncio.to_thread(self.note_service.delete_note, user_id, args.get("keyword", ""))
             result.fact_lines.append("笔记删除成功。" if ok else "笔记删除失败: 未找到目标。")
             return True
 
         if name == "note.update":
-            updated = self.note_service.update_note(user_id, args.get("keyword", ""), args.get("content", ""))
+            updated = await asyncio.to_thread(
+                self.note_service.update_note,
+                user_id,
+                args.get("keyword", ""),
+                args.get("content", ""),
+            )
             if updated:
                 result.fact_lines.append(f"笔记更新成功: {updated.note_id}《{updated.title}》")
             else:
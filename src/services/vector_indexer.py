@@ -0,0 +1,176 @@
+"""Background vector indexing for notes.
+
+Saving a note used to embed it with the SentenceTransformer model right on
+the event loop, so a "记一下" froze every other chat in the process for the
+length of an ``encode`` call.  Writers now only :meth:`VectorIndexer.submit`
+the text; a single worker drains the queue in batches (one ``encode`` call
+and one Redis pipeline per batch) in a thread.
+
+A failed batch is retried with exponential backoff up to ``max_attempts``;
+after that its texts are dropped with a warning, the note itself is already
+stored and only its semantic recall is lost.  The queue is bounded and drops
+the oldest text when full.  :meth:`submit` is thread-safe so synchronous
+service code running under ``asyncio.to_thread`` can call it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from nonebot.log import logger
+
+from src.core.config import get_settings
+from src.services.vector_store import VectorStore
+
+
+class VectorIndexer:
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        *,
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+    ) -> None:
+        settings = get_settings()
+        self.vector_store = vector_store
+        self.batch_size = max(1, batch_size or settings.vector_index_batch_size)
+        self.max_pending = max(1, max_pending or settings.vector_index_queue_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        # text -> attempts so far; a text queued twice is indexed once.
+        self._pending: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.indexed = 0
+        self.retries = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def submit(self, text: str) -> None:
+        """Queue ``text`` for indexing. Never blocks; safe from any thread."""
+        if not text or not text.strip():
+            return
+        with self._lock:
+            if text not in self._pending and len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending.setdefault(text, 0)
+            self.submitted += 1
+        self._wake()
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        self._wake()
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Give queued texts one last try so a restart loses as little as possible.
+        while self.pending_count():
+            if not await self.process_next(retry=False):
+                break
+
+    async def join(self, timeout: float = 5.0) -> bool:
+        """Wait until the queue is empty; for tests and orderly shutdown."""
+        if self._idle is None:
+            return not self.pending_count()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    async def process_next(self, *, retry: bool = True) -> bool:
+        """Index one batch. Returns ``False`` when the queue is empty or the batch failed."""
+        with self._lock:
+            batch = [self._pending.popitem(last=False) for _ in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return False
+        texts = [text for text, _attempts in batch]
+        try:
+            await asyncio.to_thread(self.vector_store.add_many, texts)
+        except Exception as exc:
+            self._requeue(batch, exc, retry=retry)
+            return False
+        self.batches += 1
+        self.indexed += len(texts)
+        return True
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending_count(),
+            "submitted": self.submitted,
+            "indexed": self.indexed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped": self.dropped,
+        }
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None and self._idle is not None
+        failures = 0
+        while True:
+            if not self.pending_count():
+                self._idle.set()
+                self._wakeup.clear()
+                # Re-check: a submit from another thread may have landed in between.
+                if not self.pending_count():
+                    await self._wakeup.wait()
+                continue
+            self._idle.clear()
+            if await self.process_next():
+                failures = 0
+                continue
+            failures += 1
+            await asyncio.sleep(self.retry_delay * 2 ** min(failures - 1, 5))
+
+    def _requeue(self, batch: List[tuple], exc: Exception, *, retry: bool) -> None:
+        kept = 0
+        with self._lock:
+            for text, attempts in batch:
+                if retry and attempts + 1 < self.max_attempts:
+                    self._pending.setdefault(text, attempts + 1)
+                    self._pending.move_to_end(text, last=False)
+                    kept += 1
+                else:
+                    self.dropped += 1
+        self.retries += kept
+        logger.warning(
+            f"向量索引批次写入失败，{kept} 条稍后重试，{len(batch) - kept} 条已放弃: {exc}"
+        )
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            wakeup.set()
+        else:
+            loop.call_soon_threadsafe(wakeup.set)
@@ -1,25 +1,40 @@
 from __future__ import annotations
 
 import hashlib
-from functools import lru_cache
-from typing import List
+import threading
+from typing import TYPE_CHECKING, List, Optional, Sequence
 
 import numpy as np
 from nonebot.log import logger
 from redis.commands.search.field import TextField, VectorField
 from redis.commands.search.index_definition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
-from sentence_transformers import SentenceTransformer
 
 from src.core.config import get_settings
+from src.core.lazy import lazy_module
 from src.services.redis import get_redis
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
-@lru_cache
-def get_embedding_model() -> SentenceTransformer:
-    settings = get_settings()
-    logger.info(f"Loading embedding model: {settings.embedding_model}")
-    return SentenceTransformer(settings.embedding_model)
+# Importing sentence_transformers loads torch (seconds); defer it to first use or warm-up.
+sentence_transformers = lazy_module("sentence_transformers")
+
+_embedding_model: Optional["SentenceTransformer"] = None
+_embedding_model_lock = threading.Lock()
+
+
+def get_embedding_model() -> "SentenceTransformer":
+    global _embedding_model
+    model = _embedding_model
+    if model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                settings = get_settings()
+                logger.info(f"Loading embedding model: {settings.embedding_model}")
+                _embedding_model = sentence_transformers.SentenceTransformer(settings.embedding_model)
+            model = _embedding_model
+    return model
 
 
 class VectorStore:
@@ -67,14 +82,25 @@ class VectorStore:
             logger.success(f"Vector index {self.index_name} created.")
 
     def add(self, text: str) -> None:
-        if not self.redis:
-            return
+        self.add_many([text])
+
+    def add_many(self, texts: Sequence[str]) -> int:
+        """Embed ``texts`` in one model call and store them in one pipeline."""
+        redis_client = self.redis
+        if not redis_client or not texts:
+            return 0
         self.ensure_index()
-        item_id = hashlib.md5(text.encode("utf-8")).hexdigest()
-        key = f"{self.prefix}{item_id}"
-        vector = get_embedding_model().encode(text).astype(np.float32).tobytes()
-        self.redis.hset(key, mapping={"point_text": text, "vector": vector})
-        logger.success(f"Stored memory point: {text[:50]}")
+        vectors = get_embedding_model().encode(list(texts)).astype(np.float32)
+        pipe = redis_client.pipeline(transaction=False)
+        for text, vector in zip(texts, vectors):
+            item_id = hashlib.md5(text.encode("utf-8")).hexdigest()
+            pipe.hset(f"{self.prefix}{item_id}", mapping={"point_text": text, "vector": vector.tobytes()})
+        pipe.execute()
+        if len(texts) == 1:
+            logger.success(f"Stored memory point: {texts[0][:50]}")
+        else:
+            logger.success(f"Stored {len(texts)} memory points")
+        return len(texts)
 
     def search(self, query_text: str, top_k: int = 3, score_threshold: float = 0.4) -> List[str]:
         if not self.redis:
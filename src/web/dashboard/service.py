@@ -233,7 +233,7 @@ TASK_EVIDENCE_OVERRIDES = {
     "memory-06": "chat、autonomy、notes、relationship 都通过 append_thought_trace 写入可审计摘要入口。",
     "memory-07": "chat、autonomy、notes、relationship 都通过 append_progress_event 写入 AutonomyProgressEvent。",
     "memory-09": "StorageService.list_profiles 兼容 Redis 旧 key user_profile:*，不会只看新模型。",
-    "perception-01": "autonomy.make_decision 使用 StorageService.get_recent_global_records 读取近期群聊上下文。",
+    "perception-01": "autonomy.make_decision 使用 StorageService.records_between 按小时分桶读取近期群聊上下文。",
     "perception-02": "同一 all_memory 全局记录包含 private/group 场景，autonomy 在决策前统一格式化。",
     "perception-06": "extract_target_hint、apply_target_hint 会把显式 QQ 号判定为私聊或群聊目标。",
     "perception-07": "owner 未指明目标时，决策 prompt 会要求只在白名单群/私聊名单中自行判断或 ask_owner。",
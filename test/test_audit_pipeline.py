@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+
+from src.services.audit_pipeline import AUDIT_STREAM_KEY, AuditPipeline
+from src.services.chat_audit import ChatAudit
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeStreamRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple, dict]] = []
+
+    def xadd(self, *args, **kwargs) -> "FakePipeline":
+        self.calls.append(("xadd", args, kwargs))
+        return self
+
+    def execute(self) -> list:
+        if self.redis.fail_writes:
+            raise ConnectionError("stream down")
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeStreamRedis:
+    def __init__(self, *, fail_writes: bool = False) -> None:
+        self.fail_writes = fail_writes
+        self.entries: list[tuple[str, dict]] = []
+        self.delivered = 0
+        self.acked: list[str] = []
+        self.maxlen = None
+        # message id -> consumer it was delivered to, until acknowledged.
+        self.pending: dict[str, str] = {}
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def xadd(self, key: str, fields: dict, maxlen=None, approximate=False) -> str:
+        assert key == AUDIT_STREAM_KEY
+        self.maxlen = maxlen
+        message_id = f"{len(self.entries) + 1}-0"
+        self.entries.append((message_id, fields))
+        return message_id
+
+    def xgroup_create(self, *args, **kwargs) -> None:
+        return None
+
+    def xreadgroup(self, group, consumer, streams, count=None):
+        if streams[AUDIT_STREAM_KEY] == "0":
+            return []
+        batch = self.entries[self.delivered : self.delivered + count]
+        self.delivered += len(batch)
+        self.pending.update((message_id, consumer) for message_id, _fields in batch)
+        return [(AUDIT_STREAM_KEY, batch)] if batch else []
+
+    def xautoclaim(self, key, group, consumer, min_idle_time=0, start_id="0-0", count=None):
+        # Everything pending counts as idle here.
+        fields = dict(self.entries)
+        claimed = [message_id for message_id in sorted(self.pending) if message_id >= start_id][:count]
+        for message_id in claimed:
+            self.pending[message_id] = consumer
+        rest = [message_id for message_id in sorted(self.pending) if message_id > (claimed or ["0"])[-1]]
+        return [rest[0] if rest else "0-0", [(message_id, fields[message_id]) for message_id in claimed], []]
+
+    def xack(self, key, group, *ids) -> int:
+        self.acked.extend(ids)
+        for message_id in ids:
+            self.pending.pop(message_id, None)
+        return len(ids)
+
+
+class FakeStorage:
+    def __init__(self, redis=None) -> None:
+        self.redis = redis
+        self.batches: list[list[tuple[str, dict]]] = []
+
+    def append_audit_batch(self, entries):
+        self.batches.append(list(entries))
+        return len(entries)
+
+    def append_progress_event(self, _payload):
+        raise AssertionError("chat audit must not write synchronously")
+
+
+def test_emit_is_bounded_and_keeps_newest_entries() -> None:
+    pipeline = AuditPipeline(FakeStorage(), buffer_size=2, batch_size=10)  # type: ignore[arg-type]
+    for index in range(3):
+        pipeline.emit("append_progress_event", {"index": index})
+
+    assert pipeline.snapshot()["dropped"] == 1
+    pipeline.drain()
+    assert [payload["index"] for _method, payload in pipeline.storage.batches[0]] == [1, 2]
+
+
+def test_chat_audit_only_enqueues_when_a_pipeline_is_attached() -> None:
+    storage = FakeStorage()
+    pipeline = AuditPipeline(storage, batch_size=10)  # type: ignore[arg-type]
+    audit = ChatAudit(storage, pipeline=pipeline)  # type: ignore[arg-type]
+
+    audit.progress("message_received", "收到消息", {"user_id": 1})
+    audit.thought("reply_generated", "生成回复", {"user_id": 1})
+
+    assert pipeline.pending == 2
+    assert storage.batches == []
+
+
+def test_entries_flow_through_the_stream_and_are_materialized_in_batches() -> None:
+    redis = FakeStreamRedis()
+    storage = FakeStorage(redis)
+    pipeline = AuditPipeline(storage, batch_size=2, stream_maxlen=100)  # type: ignore[arg-type]
+    for index in range(3):
+        pipeline.emit("append_thought_trace", {"index": index})
+
+    pipeline.drain()
+
+    assert redis.maxlen == 100
+    assert [len(batch) for batch in storage.batches] == [2, 1]
+    assert redis.acked == ["1-0", "2-0", "3-0"]
+    assert pipeline.snapshot()["materialized"] == 3
+
+
+def test_stream_failure_drops_audit_without_raising() -> None:
+    storage = FakeStorage(FakeStreamRedis(fail_writes=True))
+    pipeline = AuditPipeline(storage, batch_size=10)  # type: ignore[arg-type]
+    pipeline.emit("append_progress_event", {"index": 1})
+
+    assert pipeline.drain() == 0
+    snapshot = pipeline.snapshot()
+    assert snapshot["dropped"] == 1
+    assert snapshot["failures"] == 1
+
+
+def test_entries_left_pending_by_a_dead_consumer_are_claimed() -> None:
+    redis = FakeStreamRedis()
+    for index in range(3):
+        redis.xadd(AUDIT_STREAM_KEY, {"method": "append_progress_event", "payload": json.dumps({"index": index})})
+    # A previous process read all three and died before acknowledging them.
+    redis.xreadgroup("audit-materializer", "old-host-1", {AUDIT_STREAM_KEY: ">"}, count=10)
+    storage = FakeStorage(redis)
+    pipeline = AuditPipeline(storage, batch_size=2, claim_idle_seconds=60)  # type: ignore[arg-type]
+
+    assert pipeline.drain() == 3
+    assert [payload["index"] for batch in storage.batches for _method, payload in batch] == [0, 1, 2]
+    assert redis.pending == {}
+    assert pipeline.snapshot()["claimed"] == 3
+
+    # The next drain within the idle window does not scan again.
+    redis.xadd(AUDIT_STREAM_KEY, {"method": "append_progress_event", "payload": json.dumps({"index": 3})})
+    redis.xreadgroup("audit-materializer", "old-host-1", {AUDIT_STREAM_KEY: ">"}, count=10)
+    pipeline.drain()
+    assert list(redis.pending) == ["4-0"]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from src.models.schemas import AutonomyGoal, ChatRecord, RelationshipMemory
+from src.services.autonomy_activity import AutonomyActivityTracker
+
+
+class FakeStorage:
+    def __init__(self) -> None:
+        self.records: list[ChatRecord] = []
+        self.goals: list[AutonomyGoal] = []
+        self.due: list[RelationshipMemory] = []
+        self.activity: dict | None = None
+
+    def list_global_records_since(self, cursor: int, limit: int = 200):
+        return len(self.records), self.records[cursor:][-limit:]
+
+    def list_autonomy_goals(self, *, status=None, limit=100):
+        return self.goals[:limit]
+
+    def list_autonomy_tasks(self, *, goal_id=None, status=None, limit=100):
+        return []
+
+    def list_due_followups(self, now=None, limit=20):
+        return self.due[:limit]
+
+    def get_autonomy_activity(self):
+        return dict(self.activity) if self.activity else None
+
+    def save_autonomy_activity(self, state: dict) -> None:
+        self.activity = dict(state)
+
+
+def user_record(content: str, role: str = "user") -> ChatRecord:
+    return ChatRecord(role=role, content=content, user_id=7, group_id=42)
+
+
+def settle(tracker: AutonomyActivityTracker, relevant=lambda _record: True):
+    check = tracker.check(relevant)
+    tracker.commit(check.snapshot)
+    return check
+
+
+def test_first_scan_runs_then_idle_scan_is_skipped() -> None:
+    tracker = AutonomyActivityTracker(FakeStorage())  # type: ignore[arg-type]
+    assert settle(tracker).reason == "first_scan"
+
+    idle = tracker.check()
+    assert idle.changed is False
+    assert idle.reason == "no_change"
+
+
+def test_only_relevant_new_records_count_as_activity() -> None:
+    storage = FakeStorage()
+    tracker = AutonomyActivityTracker(storage)  # type: ignore[arg-type]
+    settle(tracker)
+
+    storage.records.append(user_record("茉子发言", role="assistant"))
+    only_self = tracker.check(lambda record: record.role == "user")
+    assert only_self.changed is False
+
+    storage.records.append(user_record("有人在吗"))
+    activity = tracker.check(lambda record: record.role == "user")
+    assert activity.changed is True
+    assert activity.reason == "new_activity"
+    assert activity.new_record_count == 1
+
+
+def test_goal_change_and_new_due_commitment_wake_the_decider() -> None:
+    storage = FakeStorage()
+    tracker = AutonomyActivityTracker(storage)  # type: ignore[arg-type]
+    settle(tracker)
+
+    storage.goals.append(AutonomyGoal(goal_id="g1", title="陪伴"))
+    assert settle(tracker).reason == "goal_changed"
+
+    storage.due.append(
+        RelationshipMemory(
+            memory_id="m1",
+            user_id=7,
+            memory_type="promise",
+            content="提醒复习",
+            due_at=datetime.now(),
+        )
+    )
+    assert settle(tracker).reason == "commitment_due"
+    assert tracker.check().changed is False
+
+
+def test_idle_timeout_forces_a_periodic_decision() -> None:
+    now = [1000.0]
+    tracker = AutonomyActivityTracker(
+        FakeStorage(), max_idle_seconds=600, clock=lambda: now[0]  # type: ignore[arg-type]
+    )
+    settle(tracker)
+    now[0] += 599
+    assert tracker.check().changed is False
+    now[0] += 1
+    assert tracker.check().reason == "idle_timeout"
+
+
+def test_memory_storage_cursor_survives_trimming() -> None:
+    from src.services import storage as storage_module
+    from src.services.storage import StorageService
+
+    service = StorageService()
+    service.redis = None
+    storage_module._memory.global_buckets.clear()
+    storage_module._memory.all_memory_seq = 0
+
+    service.append_global_record(user_record("第一条"))
+    cursor = service.global_record_cursor()
+    service.append_global_record(user_record("第二条"))
+    service.append_global_record(user_record("第三条"))
+
+    current, records = service.list_global_records_since(cursor)
+    assert current == cursor + 2
+    assert [record.content for record in records] == ["第二条", "第三条"]
+    assert service.list_global_records_since(current)[1] == []
+
+
+def test_workers_share_the_last_decision() -> None:
+    storage = FakeStorage()
+    first = AutonomyActivityTracker(storage)  # type: ignore[arg-type]
+    second = AutonomyActivityTracker(storage)  # type: ignore[arg-type]
+    settle(first)
+
+    assert second.check().reason == "no_change"
+
+    storage.records.append(user_record("有人在吗"))
+    assert settle(second).reason == "new_activity"
+    assert first.check().reason == "no_change"
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.models.schemas import AutonomyGoal, AutonomyTask
+from src.services.storage import AUTONOMY_INDEX_MARKER, StorageService
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeIndexRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class FakeIndexRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.hval_reads = 0
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def exists(self, key: str) -> int:
+        return int(key in self.values)
+
+    def set(self, key: str, value) -> None:
+        self.values[key] = str(value)
+
+    def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+        self.zsets.pop(key, None)
+
+    def hset(self, key: str, field: str, value: str) -> None:
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hvals(self, key: str) -> list[str]:
+        self.hval_reads += 1
+        return list(self.hashes.get(key, {}).values())
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> None:
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key: str, *members: str) -> None:
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def eval(self, script: str, numkeys: int, index_key: str, hash_key: str, limit: int) -> list:
+        ranked = sorted(self.zsets.get(index_key, {}).items(), key=lambda item: item[1], reverse=True)
+        return [self.hashes.get(hash_key, {}).get(member) for member, _score in ranked[:limit]]
+
+    def publish(self, *args) -> int:
+        return 0
+
+
+def make_service(redis: FakeIndexRedis) -> StorageService:
+    service = object.__new__(StorageService)
+    service.redis = redis
+    service.settings = SimpleNamespace(read_cache_ttl_seconds=0)
+    return service
+
+
+def test_status_reads_use_the_index_order_and_skip_full_scans() -> None:
+    redis = FakeIndexRedis()
+    service = make_service(redis)
+    low = service.add_autonomy_task("整理笔记", priority=1)
+    high = service.add_autonomy_task("回复朋友", priority=5)
+    middle = service.add_autonomy_task("看新闻", priority=3)
+    service.add_autonomy_task("写周报", status="doing")
+    reads = redis.hval_reads
+
+    todo = service.list_autonomy_tasks(status="todo", limit=2)
+
+    assert [task.task_id for task in todo] == [high.task_id, middle.task_id]
+    assert low.task_id in redis.zsets["autonomy:tasks:by_status:todo"]
+    assert redis.hval_reads == reads
+
+
+def test_status_change_moves_the_item_between_indexes() -> None:
+    redis = FakeIndexRedis()
+    service = make_service(redis)
+    goal = service.add_autonomy_goal("学会做饭")
+    goal.status = "paused"
+    service.save_autonomy_goal(goal)
+
+    assert goal.goal_id not in redis.zsets["autonomy:goals:by_status:active"]
+    assert service.list_autonomy_goals(status="active") == []
+    assert [item.goal_id for item in service.list_autonomy_goals(status="paused")] == [goal.goal_id]
+
+
+def test_existing_hashes_are_indexed_on_first_use() -> None:
+    redis = FakeIndexRedis()
+    goal = AutonomyGoal(goal_id="g1", title="旧目标", updated_at=datetime.now() - timedelta(days=1))
+    task = AutonomyTask(task_id="t1", title="旧任务", status="doing")
+    redis.hset("autonomy:goals", "g1", json.dumps(goal.model_dump(mode="json")))
+    redis.hset("autonomy:tasks", "t1", json.dumps(task.model_dump(mode="json")))
+
+    service = make_service(redis)
+
+    assert [item.goal_id for item in service.list_autonomy_goals(status="active")] == ["g1"]
+    assert [item.task_id for item in service.list_autonomy_tasks(status="doing")] == ["t1"]
+    assert redis.exists(AUTONOMY_INDEX_MARKER)
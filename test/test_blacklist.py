@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from src.services.governance import GovernanceService
+from src.services.read_cache import PROCESS_ORIGIN, handle_invalidation_message
+from src.services.storage import BLACKLIST_CACHE_KEY, BLACKLIST_VERSION_KEY, StorageService
+
+
+class SetPipeline:
+    def __init__(self, redis: "SetRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args):
+            self.calls.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        self.redis.round_trips += 1
+        return [getattr(self.redis, name)(*args, _piped=True) for name, args in self.calls]
+
+
+class SetRedis:
+    def __init__(self) -> None:
+        self.sets: dict[str, set[str]] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.values: dict[str, str] = {}
+        self.published: list[tuple[str, str]] = []
+        self.round_trips = 0
+
+    def _count(self, piped: bool) -> None:
+        if not piped:
+            self.round_trips += 1
+
+    def pipeline(self, transaction: bool = True) -> SetPipeline:
+        return SetPipeline(self)
+
+    def get(self, key: str, _piped: bool = False):
+        self._count(_piped)
+        return self.values.get(key)
+
+    def incr(self, key: str, _piped: bool = False) -> int:
+        self._count(_piped)
+        value = int(self.values.get(key, 0)) + 1
+        self.values[key] = str(value)
+        return value
+
+    def sadd(self, key: str, member, _piped: bool = False) -> int:
+        self._count(_piped)
+        self.sets.setdefault(key, set()).add(str(member))
+        return 1
+
+    def srem(self, key: str, member, _piped: bool = False) -> int:
+        self._count(_piped)
+        self.sets.get(key, set()).discard(str(member))
+        return 1
+
+    def smembers(self, key: str, _piped: bool = False) -> set[str]:
+        self._count(_piped)
+        return set(self.sets.get(key, set()))
+
+    def sismember(self, key: str, member, _piped: bool = False) -> bool:
+        self._count(_piped)
+        return str(member) in self.sets.get(key, set())
+
+    def hset(self, key: str, field, value, _piped: bool = False) -> None:
+        self._count(_piped)
+        self.hashes.setdefault(key, {})[str(field)] = value
+
+    def hdel(self, key: str, field, _piped: bool = False) -> None:
+        self._count(_piped)
+        self.hashes.get(key, {}).pop(str(field), None)
+
+    def publish(self, channel: str, message: str) -> None:
+        self.published.append((channel, message))
+
+
+def _governance(redis: SetRedis) -> tuple[GovernanceService, StorageService]:
+    storage = StorageService()
+    storage.redis = redis
+    governance = GovernanceService(storage=storage)
+    governance.settings.redis_required = True
+    return governance, storage
+
+
+def test_admission_checks_are_answered_locally_after_first_load() -> None:
+    redis = SetRedis()
+    redis.sets["blacklist:users"] = {"7"}
+    redis.sets["blacklist:groups"] = {"70"}
+    governance, _storage = _governance(redis)
+
+    assert governance.can_chat(7).reason == "user is blacklisted"
+    loaded = redis.round_trips
+    for _ in range(50):
+        assert governance.can_chat(8, 80).allowed is True
+    assert governance.can_chat(8, 70).reason == "group is blacklisted"
+
+    assert loaded == 1
+    assert redis.round_trips == loaded
+
+
+def test_block_and_unblock_refresh_the_local_mirror_and_publish() -> None:
+    redis = SetRedis()
+    governance, storage = _governance(redis)
+    assert governance.can_chat(9).allowed is True
+
+    storage.add_user_blacklist(9, reason="manual_admin_block")
+    assert governance.can_chat(9).allowed is False
+    assert redis.values[BLACKLIST_VERSION_KEY] == "1"
+    assert redis.published[-1][1].endswith(f"|{BLACKLIST_CACHE_KEY}")
+
+    storage.remove_user_blacklist(9)
+    assert governance.can_chat(9).allowed is True
+    assert governance.blacklist.snapshot()["version"] == 2
+
+
+def test_other_process_invalidation_reloads_the_snapshot() -> None:
+    redis = SetRedis()
+    governance, _storage = _governance(redis)
+    assert governance.can_chat(5).allowed is True
+
+    # Another process wrote directly and published.
+    redis.sets["blacklist:users"] = {"5"}
+    redis.values[BLACKLIST_VERSION_KEY] = "3"
+    assert governance.can_chat(5).allowed is True
+    assert handle_invalidation_message(f"other-host|{BLACKLIST_CACHE_KEY}") == BLACKLIST_CACHE_KEY
+    assert governance.can_chat(5).allowed is False
+
+    # Our own echo is ignored.
+    assert handle_invalidation_message(f"{PROCESS_ORIGIN}|{BLACKLIST_CACHE_KEY}") is None
+
+
+def test_poll_catches_a_missed_invalidation_by_version() -> None:
+    redis = SetRedis()
+    governance, _storage = _governance(redis)
+    assert governance.can_chat(6).allowed is True
+
+    redis.sets["blacklist:users"] = {"6"}
+    governance.blacklist.poll()
+    assert governance.can_chat(6).allowed is True
+
+    redis.values[BLACKLIST_VERSION_KEY] = "1"
+    governance.blacklist.poll()
+    assert governance.can_chat(6).allowed is False
+
+
+def test_failed_reload_keeps_serving_the_previous_snapshot() -> None:
+    redis = SetRedis()
+    redis.sets["blacklist:users"] = {"4"}
+    governance, storage = _governance(redis)
+    assert governance.can_chat(4).allowed is False
+
+    def broken():
+        raise ConnectionError("down")
+
+    storage.get_blacklist_snapshot = broken
+    governance.blacklist.invalidate()
+    assert governance.can_chat(4).allowed is False
+    assert governance.blacklist.snapshot()["failures"] == 1
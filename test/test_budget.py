@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from src.services.budget import CostBudget
+from src.services.storage import StorageService
+
+DAY = datetime(2026, 1, 2, 12, 0)
+
+
+def budget_settings(**overrides):
+    values = dict(
+        cost_control_enabled=True,
+        daily_cost_limit_global=1.0,
+        daily_cost_limit_user=0.1,
+        budget_local_lease=0.0,
+        budget_lease_max_outstanding=1.0,
+        budget_lease_idle_seconds=60.0,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def memory_storage() -> StorageService:
+    storage = StorageService()
+    storage.redis = None
+    return storage
+
+
+def make_budget(monkeypatch, storage, clock=None, **overrides) -> CostBudget:
+    monkeypatch.setattr("src.services.budget.get_settings", lambda: budget_settings(**overrides))
+    if clock is None:
+        return CostBudget(storage)
+    return CostBudget(storage, clock=clock)
+
+
+class ScriptRedis:
+    """Answers the reserve script from a canned reply and records pipelined writes."""
+
+    def __init__(self, reply) -> None:
+        self.reply = reply
+        self.evals: list[tuple] = []
+        self.writes: list[tuple] = []
+
+    def eval(self, script, numkeys, *args):
+        self.evals.append(args)
+        return self.reply
+
+    def pipeline(self, transaction: bool = True):
+        redis = self
+
+        class Pipe:
+            def incrbyfloat(self, key, amount):
+                redis.writes.append((key, amount))
+
+            def expire(self, key, seconds):
+                pass
+
+            def execute(self):
+                return []
+
+        return Pipe()
+
+
+def test_reservations_never_overshoot_the_user_limit(monkeypatch) -> None:
+    storage = memory_storage()
+    budget = make_budget(monkeypatch, storage)
+
+    held = [budget.reserve(9101, 0.03, now=DAY) for _ in range(4)]
+
+    assert [item.allowed for item in held] == [True, True, True, False]
+    assert held[-1].reason == "user daily budget exhausted"
+    budget.settle(held[0], 0.01)
+    budget.release(held[1])
+    budget.release(held[1])
+    assert round(storage.get_daily_cost(9101, at=DAY), 6) == 0.04
+
+
+def test_lease_serves_small_reservations_locally(monkeypatch) -> None:
+    storage = memory_storage()
+    budget = make_budget(monkeypatch, storage, budget_local_lease=0.05)
+
+    first = budget.reserve(9102, 0.01, now=DAY)
+    later = [budget.reserve(9102, 0.01, now=DAY) for _ in range(5)]
+
+    assert first.allowed and all(item.allowed for item in later)
+    assert budget.snapshot()["remote_reservations"] == 1
+    assert budget.snapshot()["local_reservations"] == 5
+    assert round(storage.get_daily_cost(9102, at=DAY), 6) == 0.06
+
+    for item in [first, *later]:
+        budget.settle(item, 0.005)
+    budget.flush()
+    assert round(storage.get_daily_cost(9102, at=DAY), 6) == 0.03
+
+
+def test_redis_reservation_is_one_script_call(monkeypatch) -> None:
+    storage = StorageService()
+    redis = ScriptRedis([1, "0.02"])
+    storage.redis = redis
+    budget = make_budget(monkeypatch, storage, budget_local_lease=0.02)
+
+    reservation = budget.reserve(7, 0.01, now=DAY)
+    budget.reserve(7, 0.01, now=DAY)
+
+    assert reservation.allowed and len(redis.evals) == 1
+    assert redis.evals[0][:2] == ("cost:global:20260102", "cost:user:7:20260102")
+    assert redis.writes == []
+
+    redis.reply = [0, "global"]
+    denied = budget.reserve(8, 0.01, now=DAY)
+    assert not denied.allowed and denied.reason == "global daily budget exhausted"
+
+
+def test_leases_held_by_many_users_cannot_exhaust_the_global_limit(monkeypatch) -> None:
+    storage = memory_storage()
+    budget = make_budget(
+        monkeypatch,
+        storage,
+        daily_cost_limit_global=3.0,
+        daily_cost_limit_user=0.3,
+        budget_local_lease=0.02,
+        budget_lease_max_outstanding=0.2,
+    )
+
+    day = datetime(2026, 1, 3, 12, 0)
+    for user_id in range(1, 144):
+        budget.settle(budget.reserve(user_id, 0.001, now=day), 0.001)
+
+    assert budget.reserve(144, 0.001, now=day).allowed
+    assert budget.snapshot()["local_credit"] <= 0.2 + 1e-9
+    assert round(storage.get_daily_cost(None, at=day), 6) <= round(0.144 + 0.2, 6)
+
+
+def test_idle_users_hand_their_credit_back(monkeypatch) -> None:
+    storage = memory_storage()
+    clock = {"now": 0.0}
+    budget = make_budget(
+        monkeypatch, storage, clock=lambda: clock["now"], budget_local_lease=0.05
+    )
+    budget.settle(budget.reserve(9103, 0.01, now=DAY), 0.01)
+    clock["now"] = 30
+    budget.settle(budget.reserve(9104, 0.01, now=DAY), 0.01)
+
+    clock["now"] = 70
+    assert budget.return_idle() == 1
+    assert round(storage.get_daily_cost(9103, at=DAY), 6) == 0.01
+    assert round(storage.get_daily_cost(9104, at=DAY), 6) == 0.06
+    assert budget.snapshot()["idle_returns"] == 1
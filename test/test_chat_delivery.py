@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from src.plugins.chat_delivery import render_group_text
+from src.plugins.chat_delivery import MentionRenderer, render_group_text
+from src.services.member_directory import GroupRoster
 
 
 def test_render_group_text_prefers_longest_display_name() -> None:
@@ -15,3 +16,28 @@ def test_render_group_text_without_member_name_is_plain_text() -> None:
     assert all(segment.type == "text" for segment in message)
     assert str(message) == "普通回复"
 
+
+
+def test_render_group_text_merges_plain_runs() -> None:
+    message = render_group_text("你好小明，明天见小红", {"小明": 1, "小红": 2, "明天": 3})
+
+    assert [segment.type for segment in message] == ["text", "at", "text", "at", "text", "at"]
+    assert message[0].data["text"] == "你好" and message[2].data["text"] == "，"
+    assert message[3].data["qq"] == "3" and message[4].data["text"] == "见"
+
+
+def test_mention_renderer_rebuilds_only_when_the_roster_changes() -> None:
+    renderer = MentionRenderer()
+    roster = GroupRoster([{"user_id": 1, "card": "小明"}])
+
+    first = renderer.render(10, roster, "小明小红")
+    automaton = renderer._automata[10][2]
+    renderer.render(10, roster, "小明")
+    assert renderer._automata[10][2] is automaton
+
+    roster.set(2, "小红")
+    second = renderer.render(10, roster, "小明小红")
+
+    assert renderer._automata[10][2] is not automaton
+    assert [segment.type for segment in first] == ["at", "text"]
+    assert [segment.data.get("qq") for segment in second] == ["1", "2"]
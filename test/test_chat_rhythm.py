@@ -1,22 +1,71 @@
 from __future__ import annotations
 
+import asyncio
+import time
+
+import pytest
+
 from src.core.config import Settings
 from src.services.chat_rhythm import ChatRhythmService
+from src.services.loop_monitor import detect_blocking
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        if self.redis.fail:
+            raise ConnectionError("redis down")
+        self.redis.round_trips += 1
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
 
 
 class FakeRedis:
     def __init__(self) -> None:
-        self.values: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.round_trips = 0
+        self.fail = False
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def hset(self, key: str, mapping: dict[str, str]) -> None:
+        self.hashes.setdefault(key, {}).update(mapping)
 
-    def get(self, key: str):
-        return self.values.get(key)
+    def hgetall(self, key: str) -> dict[str, str]:
+        self.round_trips += 1
+        return dict(self.hashes.get(key, {}))
 
-    def set(self, key: str, value: str) -> None:
-        self.values[key] = value
+    def hdel(self, key: str, *fields: str) -> None:
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
 
     def expire(self, key: str, seconds: int) -> None:
         return None
 
+    def zadd(self, key: str, mapping: dict[str, float]) -> None:
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrangebyscore(self, key: str, low, high: float, start: int = 0, num: int = -1) -> list[str]:
+        members = sorted(
+            (score, member) for member, score in self.zsets.get(key, {}).items() if score <= high
+        )
+        return [member for _score, member in members[start : start + num if num >= 0 else None]]
+
+    def zrem(self, key: str, *members: str) -> None:
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
 
 class FakeStorage:
     def __init__(self, redis=None) -> None:
@@ -88,11 +137,13 @@ def test_human_interruption_clears_active_cooldown() -> None:
 def test_cooldown_state_is_shared_through_redis() -> None:
     redis = FakeRedis()
     settings = make_settings()
-    first = ChatRhythmService(FakeStorage(redis), settings=settings)
+    first = ChatRhythmService(FakeStorage(redis), settings=settings, clock=lambda: 1)
     first.admit("group_4", message_type="group", sender_id=99, now=0)
     first.mark_sent("group_4", sender_id=99, boundary=True, now=1)
+    assert first.flush() == 1
 
-    restarted = ChatRhythmService(FakeStorage(redis), settings=settings)
+    restarted = ChatRhythmService(FakeStorage(redis), settings=settings, clock=lambda: 2)
+    assert restarted.restore() == 1
     decision = restarted.admit("group_4", message_type="group", sender_id=99, now=2)
     assert not decision.allowed
 
@@ -123,3 +174,90 @@ def test_private_chat_is_not_subject_to_group_loop_control() -> None:
     decision = service.admit("private_99", message_type="private", sender_id=99, now=1)
     assert decision.allowed
     assert not decision.boundary
+
+
+def test_decisions_touch_redis_only_on_flush() -> None:
+    redis = FakeRedis()
+    service = ChatRhythmService(FakeStorage(redis), settings=make_settings(), clock=lambda: 10)
+    for second in range(10):
+        service.admit(f"group_{second % 3}", message_type="group", sender_id=42, now=second)
+        service.mark_sent(f"group_{second % 3}", sender_id=42, now=second + 0.5)
+
+    assert redis.round_trips == 0
+    assert service.flush() == 3
+    assert redis.round_trips == 1
+    assert set(redis.hashes["chat:rhythm"]) == {"group_0", "group_1", "group_2"}
+    assert service.flush() == 0
+
+
+def test_failed_flush_keeps_sessions_dirty_until_it_succeeds() -> None:
+    redis = FakeRedis()
+    service = ChatRhythmService(FakeStorage(redis), settings=make_settings(), clock=lambda: 0)
+    service.admit("group_6", message_type="group", sender_id=42, now=0)
+
+    redis.fail = True
+    assert service.flush() == 0
+    assert service.snapshot()["dirty"] == 1
+
+    redis.fail = False
+    assert service.flush() == 1
+    assert "group_6" in redis.hashes["chat:rhythm"]
+
+
+def test_restore_prunes_sessions_idle_past_any_cooldown() -> None:
+    redis = FakeRedis()
+    settings = make_settings()
+    writer = ChatRhythmService(FakeStorage(redis), settings=settings, clock=lambda: 0)
+    writer.admit("group_old", message_type="group", sender_id=42, now=0)
+    writer.admit("group_new", message_type="group", sender_id=42, now=5000)
+    writer.flush()
+
+    restarted = ChatRhythmService(FakeStorage(redis), settings=settings, clock=lambda: 5001)
+    assert restarted.restore() == 1
+    assert set(redis.hashes["chat:rhythm"]) == {"group_new"}
+
+
+def test_lru_evicts_idle_sessions_but_still_flushes_them() -> None:
+    redis = FakeRedis()
+    service = ChatRhythmService(
+        FakeStorage(redis), settings=make_settings(CHAT_RHYTHM_MAX_SESSIONS=2)
+    )
+    for index in range(3):
+        service.admit(f"group_{index}", message_type="group", sender_id=42, now=index)
+
+    assert service.snapshot()["sessions"] == 2
+    assert service.flush() == 3
+
+
+@pytest.mark.asyncio
+async def test_rhythm_decisions_never_wait_on_redis() -> None:
+    class SlowRedis(FakeRedis):
+        def pipeline(self, transaction: bool = True) -> FakePipeline:
+            time.sleep(0.2)
+            return super().pipeline(transaction)
+
+    service = ChatRhythmService(FakeStorage(SlowRedis()), settings=make_settings())
+    async with detect_blocking(0.05):
+        for second in range(20):
+            service.admit("group_7", message_type="group", sender_id=42, now=second)
+            service.mark_sent("group_7", sender_id=42, now=second + 0.5)
+            await asyncio.sleep(0)
+        await service.flush_async()
+
+
+def test_flush_prunes_sessions_idle_past_any_cooldown() -> None:
+    redis = FakeRedis()
+    clock = {"now": 0.0}
+    service = ChatRhythmService(
+        FakeStorage(redis), settings=make_settings(), clock=lambda: clock["now"]
+    )
+    service.admit("group_quiet", message_type="group", sender_id=42, now=0)
+    service.flush()
+
+    clock["now"] = 5000
+    service.admit("group_busy", message_type="group", sender_id=42, now=5000)
+    service.flush()
+
+    assert set(redis.hashes["chat:rhythm"]) == {"group_busy"}
+    assert set(redis.zsets["chat:rhythm:active"]) == {"group_busy"}
+    assert service.snapshot()["pruned"] == 1
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+
+from src.services.chat_context import ImageRateLimiter
+from src.services.cluster import (
+    ACQUIRED,
+    HELD,
+    ClusterCoordinator,
+    HashRing,
+    _CLAIM_SCRIPT,
+    _RELEASE_SCRIPT,
+)
+from src.services.due_wheel import DueWheel
+from src.services.loop_monitor import detect_blocking
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ClusterPipeline:
+    def __init__(self, redis: "ClusterRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args):
+            self.calls.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        self.redis.round_trips += 1
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class ClusterRedis:
+    """Strings with expiry, one sorted set and the two coordination scripts."""
+
+    def __init__(self, clock: Clock) -> None:
+        self.clock = clock
+        self.values: dict[str, tuple[str, float]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True) -> ClusterPipeline:
+        return ClusterPipeline(self)
+
+    def _get(self, key: str):
+        entry = self.values.get(key)
+        if entry is None or entry[1] <= self.clock():
+            self.values.pop(key, None)
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: str, nx: bool = False, px: int = 0):
+        self.round_trips += 1
+        if nx and self._get(key) is not None:
+            return None
+        self.values[key] = (value, self.clock() + px / 1000)
+        return True
+
+    def eval(self, script: str, numkeys: int, *keys_and_args):
+        self.round_trips += 1
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        key = keys[0]
+        current = self._get(key)
+        if script == _CLAIM_SCRIPT:
+            owner, ttl_ms, now = args
+            if current is not None and current != owner:
+                alive_until = self.zsets.get(keys[1], {}).get(current)
+                if alive_until is not None and alive_until > float(now):
+                    return -max(int((self.values[key][1] - self.clock()) * 1000), 1)
+                current = None
+            self.values[key] = (owner, self.clock() + int(ttl_ms) / 1000)
+            return 1 if current is not None else 2
+        if script == _RELEASE_SCRIPT:
+            if current == args[0]:
+                self.values.pop(key, None)
+                return 1
+            return 0
+        raise AssertionError("unexpected script")
+
+    def zadd(self, key: str, mapping: dict) -> None:
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key: str, _low, high: float) -> None:
+        zset = self.zsets.get(key, {})
+        for member in [member for member, score in zset.items() if score <= high]:
+            zset.pop(member)
+
+    def zrange(self, key: str, _start: int, _stop: int) -> list[str]:
+        return sorted(self.zsets.get(key, {}))
+
+    def zrem(self, key: str, member: str) -> None:
+        self.zsets.get(key, {}).pop(member, None)
+
+    def expire(self, key: str, seconds: int) -> None:
+        return None
+
+
+def _workers(redis: ClusterRedis, clock: Clock, *names: str) -> list[ClusterCoordinator]:
+    async def sleep(seconds: float) -> None:
+        clock.now += seconds
+
+    workers = [
+        ClusterCoordinator(
+            enabled=True,
+            worker_id=name,
+            redis_factory=lambda: redis,
+            lease_seconds=30,
+            heartbeat_seconds=5,
+            clock=clock,
+            sleep=sleep,
+        )
+        for name in names
+    ]
+    for _ in range(2):
+        for worker in workers:
+            worker.heartbeat()
+    return workers
+
+
+def _handlers(workers: list[ClusterCoordinator], session_id: str) -> list[str]:
+    claims = [asyncio.run(worker.claim_session(session_id)) for worker in workers]
+    return [worker.worker_id for worker, claim in zip(workers, claims) if claim is not None]
+
+
+def test_ring_spreads_sessions_and_moves_only_the_leaving_workers_share() -> None:
+    sessions = [f"group_{index}" for index in range(2000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b"])
+
+    owners = [before.owner(session) for session in sessions]
+    assert min(owners.count(node) for node in "abc") > 400
+    moved = [session for session, owner in zip(sessions, owners) if after.owner(session) != owner]
+    assert moved and all(before.owner(session) == "c" for session in moved)
+
+
+def test_each_session_is_handled_by_exactly_one_worker() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    workers = _workers(redis, clock, "w1", "w2", "w3")
+
+    handled = {worker.worker_id: 0 for worker in workers}
+    for index in range(60):
+        owners = _handlers(workers, f"group_{index}")
+        assert len(owners) == 1
+        handled[owners[0]] += 1
+    assert all(count > 0 for count in handled.values())
+
+
+def test_held_sessions_skip_redis_until_the_lease_needs_renewal() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    (worker,) = _workers(redis, clock, "solo")
+
+    assert asyncio.run(worker.claim_session("group_1")) == ACQUIRED
+    trips = redis.round_trips
+    for _ in range(20):
+        assert asyncio.run(worker.claim_session("group_1")) == HELD
+    assert redis.round_trips == trips
+
+    clock.now += 20
+    assert asyncio.run(worker.claim_session("group_1")) == HELD
+    assert redis.round_trips == trips + 1
+    assert worker.snapshot()["renewals"] == 1
+
+
+def test_leaving_worker_hands_its_sessions_over_at_once() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    first, second = _workers(redis, clock, "w1", "w2")
+    session = next(f"group_{index}" for index in range(100) if second.owner_of(f"group_{index}") == "w2")
+    assert _handlers([first, second], session) == ["w2"]
+
+    second.leave()
+    first.heartbeat()
+    assert first.ring.nodes == ("w1",)
+    assert asyncio.run(first.claim_session(session)) == ACQUIRED
+
+
+def test_new_owner_waits_for_the_previous_lease_to_lapse() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    (first,) = _workers(redis, clock, "w1")
+    sessions = [f"group_{index}" for index in range(40)]
+    for session in sessions:
+        asyncio.run(first.claim_session(session))
+
+    second = _workers(redis, clock, "w2")[0]
+    first.heartbeat()
+    moved = next(session for session in sessions if second.owner_of(session) == "w2")
+
+    # w1 drains the session on its lease; w2 is refused until the lease lapses.
+    assert _handlers([first, second], moved) == ["w1"]
+    clock.now += 29.5
+    for worker in (first, second, first):
+        worker.heartbeat()
+    # w1 stops trusting its lease a moment before Redis drops it; w2 holds the
+    # message until then instead of dropping it.
+    assert _handlers([first, second], moved) == ["w2"]
+    assert clock.now > 1030
+    clock.now += 1
+    assert _handlers([first, second], moved) == ["w2"]
+    snapshot = second.snapshot()
+    assert snapshot["rejections"] == 2 and snapshot["handover_waits"] == 1
+
+
+def test_crashed_workers_leases_are_void_once_its_heartbeat_lapses() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    first, second = _workers(redis, clock, "w1", "w2")
+    session = next(f"group_{index}" for index in range(100) if first.owner_of(f"group_{index}") == "w1")
+    assert _handlers([first, second], session) == ["w1"]
+
+    # w1 dies without releasing anything; w2 keeps heartbeating.
+    clock.now += first.worker_ttl + 1
+    second.heartbeat()
+    assert second.ring.nodes == ("w2",)
+    assert asyncio.run(second.claim_session(session)) == ACQUIRED
+    assert second.snapshot()["handover_waits"] == 0
+
+
+def test_job_locks_run_each_firing_once_across_workers() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    workers = _workers(redis, clock, "w1", "w2")
+
+    winners = [asyncio.run(worker.acquire_job("daily_digest", 3600)) for worker in workers]
+    assert winners.count(True) == 1
+    clock.now += 3601
+    assert asyncio.run(workers[1].acquire_job("daily_digest", 3600)) is True
+
+
+def test_disabled_cluster_keeps_local_job_spacing() -> None:
+    clock = Clock()
+    worker = ClusterCoordinator(enabled=False, worker_id="solo", redis_factory=lambda: None, clock=clock)
+
+    assert asyncio.run(worker.claim_session("group_1")) == HELD
+    assert asyncio.run(worker.acquire_job("autonomy_scan", 60)) is True
+    assert asyncio.run(worker.acquire_job("autonomy_scan", 60)) is False
+    clock.now += 61
+    assert asyncio.run(worker.acquire_job("autonomy_scan", 60)) is True
+
+
+def test_without_redis_jobs_run_on_the_ring_owner_of_their_name() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    workers = _workers(redis, clock, "w1", "w2")
+    for worker in workers:
+        worker.redis_factory = lambda: None
+
+    winners = [worker.worker_id for worker in workers if asyncio.run(worker.acquire_job("digest", 60))]
+    assert winners == [workers[0].ring.owner("digest")]
+
+
+def test_image_rate_limit_is_shared_between_workers() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    first, second = _workers(redis, clock, "w1", "w2")
+    group_worker = ImageRateLimiter(30, shared=first)
+    private_worker = ImageRateLimiter(30, shared=second)
+
+    assert asyncio.run(group_worker.allow_async(7, now=clock.now)) is True
+    assert asyncio.run(private_worker.allow_async(7, now=clock.now)) is False
+    clock.now += 31
+    assert asyncio.run(private_worker.allow_async(7, now=clock.now)) is True
+
+
+def test_shared_image_rate_limit_does_not_block_the_loop() -> None:
+    class SlowRedis(ClusterRedis):
+        def set(self, *args, **kwargs):
+            time.sleep(0.2)
+            return super().set(*args, **kwargs)
+
+    clock = Clock()
+    redis = SlowRedis(clock)
+    (worker,) = _workers(redis, clock, "w1")
+    limiter = ImageRateLimiter(30, shared=worker)
+
+    async def scenario() -> bool:
+        async with detect_blocking(0.05):
+            return await limiter.allow_async(7, now=clock.now)
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_due_wheel_runs_due_work_on_one_worker() -> None:
+    clock = Clock()
+    redis = ClusterRedis(clock)
+    runs: list[str] = []
+
+    async def scenario() -> None:
+        wheels = []
+        for worker in _workers(redis, clock, "w1", "w2"):
+            wheel = DueWheel(job_id="test_wheel")
+            wheel.coordinator = worker
+
+            async def run_due(_now, name=worker.worker_id) -> None:
+                runs.append(name)
+                await asyncio.sleep(0.01)
+
+            wheel.register("source", lambda: datetime(2000, 1, 1), run_due)
+            wheels.append(wheel)
+        await asyncio.gather(*(wheel.fire() for wheel in wheels))
+
+    asyncio.run(scenario())
+    assert len(runs) == 1
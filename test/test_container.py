@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.core import container
+from src.core.container import AppServices, get_services, reset_services
+from src.services import tool_executor
+from src.services.governance import AccessDecision
+from src.services.intent import IntentDecision
+from src.services.tool_executor import ToolExecutor, ToolRequestContext
+
+
+class OpenGovernance:
+    def tool_allowed(self, name: str, **kwargs) -> AccessDecision:
+        return AccessDecision(True)
+
+    def estimate_tool_cost(self, name: str) -> float:
+        return 0.0
+
+    def reserve_cost(self, user_id: int, cost: float) -> AccessDecision:
+        return AccessDecision(True)
+
+    def settle_cost(self, reservation: AccessDecision, actual: float) -> None:
+        return None
+
+
+def test_services_share_one_storage_and_executor() -> None:
+    services = AppServices.build()
+
+    assert services.governance.storage is services.storage
+    assert services.notes.storage is services.storage
+    assert services.notes.vector_store is services.vector_store
+    assert services.affinity.storage is services.storage
+    assert services.tools.governance is services.governance
+    assert services.tools.note_service is services.notes
+
+
+def test_get_services_builds_once(monkeypatch) -> None:
+    built: list[object] = []
+
+    def build() -> object:
+        built.append(object())
+        return built[-1]
+
+    monkeypatch.setattr(container.AppServices, "build", staticmethod(build))
+    reset_services()
+    try:
+        assert get_services() is get_services()
+        assert len(built) == 1
+    finally:
+        reset_services()
+
+
+def test_temp_files_belong_to_their_request(monkeypatch) -> None:
+    async def text_to_speech(text: str) -> bytes:
+        await asyncio.sleep(0)
+        return text.encode("utf-8")
+
+    monkeypatch.setattr(tool_executor, "text_to_speech", text_to_speech)
+    services = AppServices.build()
+    executor = ToolExecutor(
+        note_service=services.notes,
+        affinity_service=services.affinity,
+        governance=OpenGovernance(),  # type: ignore[arg-type]
+    )
+    first, second = ToolRequestContext(), ToolRequestContext()
+
+    async def speak(request: ToolRequestContext, text: str):
+        return await executor.run(
+            [IntentDecision(name="language.tts", args={"text": text})],
+            1,
+            text,
+            [],
+            [],
+            [],
+            message_type="private",
+            request=request,
+        )
+
+    async def scenario() -> None:
+        await asyncio.gather(speak(first, "早上好"), speak(second, "晚安"))
+
+    asyncio.run(scenario())
+    assert len(first.temp_files) == 1 and len(second.temp_files) == 1
+    assert first.temp_files[0].read_bytes() == "早上好".encode("utf-8")
+
+    first.cleanup_temp_files()
+    assert second.temp_files[0].exists()
+    second.cleanup_temp_files()
+    assert second.temp_files == []
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+from src.services.due_wheel import DUE_WHEEL_JOB_ID, DueWheel
+
+
+class FakeScheduler:
+    def __init__(self) -> None:
+        self.jobs: dict[str, dict] = {}
+        self.added = 0
+
+    def add_job(self, func, trigger, *, run_date, id, replace_existing, **kwargs) -> None:
+        assert trigger == "date" and replace_existing
+        self.jobs[id] = {"func": func, "run_date": run_date}
+        self.added += 1
+
+    def remove_job(self, job_id: str) -> None:
+        del self.jobs[job_id]
+
+
+NOW = datetime(2026, 5, 1, 12, 0)
+
+
+class FakeQueue:
+    def __init__(self, *due: datetime, deliverable: bool = True) -> None:
+        self.due = sorted(due)
+        self.deliverable = deliverable
+        self.runs = 0
+
+    def next_due(self):
+        return self.due[0] if self.due else None
+
+    async def run_due(self, now: datetime) -> None:
+        self.runs += 1
+        if self.deliverable:
+            self.due = [item for item in self.due if item > now]
+
+
+def make_wheel(queue: FakeQueue) -> tuple[DueWheel, FakeScheduler]:
+    wheel = DueWheel(retry_seconds=600, clock=lambda: NOW)
+    wheel.register("followups", queue.next_due, queue.run_due)
+    scheduler = FakeScheduler()
+    wheel.attach(scheduler)
+    return wheel, scheduler
+
+
+def test_only_one_job_is_armed_for_the_earliest_item() -> None:
+    queue = FakeQueue(NOW + timedelta(hours=2))
+    wheel, scheduler = make_wheel(queue)
+
+    wheel.notify(NOW + timedelta(hours=3))
+    assert scheduler.added == 1
+    wheel.notify(NOW + timedelta(minutes=5))
+
+    assert list(scheduler.jobs) == [DUE_WHEEL_JOB_ID]
+    assert scheduler.jobs[DUE_WHEEL_JOB_ID]["run_date"] == NOW + timedelta(minutes=5)
+
+
+def test_firing_runs_due_work_and_rearms_for_the_next_item() -> None:
+    queue = FakeQueue(NOW - timedelta(seconds=1), NOW + timedelta(hours=1))
+    wheel, scheduler = make_wheel(queue)
+
+    asyncio.run(wheel.fire())
+
+    assert queue.runs == 1
+    assert scheduler.jobs[DUE_WHEEL_JOB_ID]["run_date"] == NOW + timedelta(hours=1)
+
+
+def test_undeliverable_items_are_retried_later_instead_of_spinning() -> None:
+    queue = FakeQueue(NOW - timedelta(minutes=1), deliverable=False)
+    wheel, scheduler = make_wheel(queue)
+
+    asyncio.run(wheel.fire())
+
+    assert scheduler.jobs[DUE_WHEEL_JOB_ID]["run_date"] == NOW + timedelta(seconds=600)
+
+
+def test_wheel_disarms_when_nothing_is_pending() -> None:
+    queue = FakeQueue(NOW - timedelta(seconds=1))
+    wheel, scheduler = make_wheel(queue)
+
+    asyncio.run(wheel.fire())
+
+    assert scheduler.jobs == {}
+    assert wheel.armed_at is None
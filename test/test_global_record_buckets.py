@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.models.schemas import ChatRecord
+from src.services.storage import StorageService
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **_kwargs):
+            self.calls.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.lists: dict[str, list[str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.values: dict[str, int] = {}
+        self.lrange_keys: list[str] = []
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def rpush(self, key: str, *values: str) -> int:
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    def ltrim(self, key: str, start: int, end: int) -> None:
+        self.lists[key] = self.lists.get(key, [])[start:]
+
+    def llen(self, key: str) -> int:
+        return len(self.lists.get(key, []))
+
+    def lrange(self, key: str, start: int, end: int) -> list[str]:
+        self.lrange_keys.append(key)
+        rows = self.lists.get(key, [])
+        return rows[start:] if end == -1 else rows[start : end + 1]
+
+    def expire(self, key: str, seconds: int) -> None:
+        return None
+
+    def incr(self, key: str) -> int:
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def get(self, key: str):
+        return self.values.get(key)
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> None:
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def _sorted(self, key: str) -> list[tuple[str, float]]:
+        return sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+
+    def zrange(self, key: str, start: int, end: int) -> list[str]:
+        return [member for member, _score in self._sorted(key)]
+
+    def zrevrange(self, key: str, start: int, end: int) -> list[str]:
+        return [member for member, _score in reversed(self._sorted(key))]
+
+    def zrangebyscore(self, key: str, low, high) -> list[str]:
+        low = float("-inf") if low == "-inf" else float(low)
+        exclusive = isinstance(high, str) and high.startswith("(")
+        high = float(high[1:]) if exclusive else float(high)
+        return [
+            member
+            for member, score in self._sorted(key)
+            if low <= score and (score < high if exclusive else score <= high)
+        ]
+
+    def zrem(self, key: str, *members: str) -> None:
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.lists.pop(key, None)
+
+
+def make_service(redis: FakeRedis) -> StorageService:
+    service = object.__new__(StorageService)
+    service.redis = redis
+    service.settings = SimpleNamespace(global_memory_max_records=1000, global_memory_retention_hours=24)
+    return service
+
+
+def record(content: str, at: datetime, group_id: int = 42) -> ChatRecord:
+    return ChatRecord(role="user", content=content, user_id=7, group_id=group_id, time=at)
+
+
+def test_range_reads_only_touch_covering_buckets() -> None:
+    redis = FakeRedis()
+    service = make_service(redis)
+    now = datetime.now().replace(minute=30)
+    service.append_global_record(record("三小时前", now - timedelta(hours=3)))
+    service.append_global_record(record("一小时前", now - timedelta(hours=1)))
+    service.append_global_record(record("别的群", now - timedelta(minutes=5), group_id=43))
+    service.append_global_record(record("刚刚", now - timedelta(minutes=1)))
+
+    redis.lrange_keys.clear()
+    records = service.records_between(now - timedelta(minutes=90), now)
+    assert [item.content for item in records] == ["一小时前", "别的群", "刚刚"]
+    assert len(set(redis.lrange_keys)) <= 2
+
+    filtered = service.records_between(now - timedelta(hours=4), now, group_id=43)
+    assert [item.content for item in filtered] == ["别的群"]
+
+
+def test_retention_drops_whole_expired_buckets() -> None:
+    redis = FakeRedis()
+    service = make_service(redis)
+    now = datetime.now()
+    service.append_global_record(record("过期", now - timedelta(hours=30)))
+    service.append_global_record(record("保留", now))
+
+    assert not any(key.endswith((now - timedelta(hours=30)).strftime("%Y%m%d%H")) for key in redis.lists)
+    assert [item.content for item in service.list_global_records(limit=10)] == ["保留"]
+
+
+def test_legacy_list_is_migrated_into_buckets() -> None:
+    redis = FakeRedis()
+    now = datetime.now()
+    redis.lists["all_memory"] = [
+        json.dumps(record("旧记录", now - timedelta(hours=2)).model_dump(mode="json")),
+        "not json",
+    ]
+    service = make_service(redis)
+
+    records = service.get_recent_global_records(hours=3)
+    assert [item.content for item in records] == ["旧记录"]
+    assert "all_memory" not in redis.lists
+
+
+def test_cursor_reads_walk_back_across_buckets() -> None:
+    redis = FakeRedis()
+    service = make_service(redis)
+    now = datetime.now()
+    service.append_global_record(record("上个小时", now - timedelta(hours=1)))
+    cursor = service.global_record_cursor() - 1
+    service.append_global_record(record("这个小时", now))
+
+    current, records = service.list_global_records_since(cursor)
+    assert current == cursor + 2
+    assert [item.content for item in records] == ["上个小时", "这个小时"]
+
+
+def test_max_records_caps_the_whole_log_across_buckets() -> None:
+    redis = FakeRedis()
+    service = make_service(redis)
+    now = datetime.now()
+    for hours_ago in (4, 3, 2, 1):
+        for index in range(400):
+            service.append_global_record(record(f"{hours_ago}-{index}", now - timedelta(hours=hours_ago)))
+
+    sizes = {key: len(rows) for key, rows in redis.lists.items()}
+    assert sum(sizes.values()) <= 1000 + 1000 // 100
+    oldest, trimmed = ((now - timedelta(hours=hours)).strftime("%Y%m%d%H") for hours in (4, 3))
+    assert f"all_memory:bucket:{oldest}" not in redis.lists
+    assert oldest not in redis.zsets["all_memory:buckets"]
+    assert sizes[f"all_memory:bucket:{trimmed}"] < 400
+    assert service.list_global_records(limit=1)[0].content == "1-399"
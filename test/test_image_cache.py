@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from src.services.image import image_signature, perceptual_hash
+from src.services.image_cache import IMAGE_DESCRIPTION_PREFIX, ImageDescriptionCache, image_source_key
+
+
+def sticker(size: int, fmt: str) -> bytes:
+    image = Image.new("RGB", (size, size), "white")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size // 4, size // 4, size * 3 // 4, size * 3 // 4), fill="orange")
+    draw.rectangle((0, 0, size // 3, size // 5), fill="navy")
+    buffer = BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple] = []
+
+    def set(self, key: str, value: str, ex: int) -> None:
+        self.calls.append((key, value, ex))
+
+    def execute(self) -> None:
+        for key, value, ex in self.calls:
+            self.redis.values[key] = value
+            self.redis.ttls[key] = ex
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+
+    def get(self, key: str):
+        return self.values.get(key)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+
+def make_cache(redis: FakeRedis, images: dict[str, bytes]) -> ImageDescriptionCache:
+    async def fetch(url: str) -> bytes:
+        return images[url]
+
+    return ImageDescriptionCache(lambda: redis, ttl_seconds=600, fetch=fetch)
+
+
+def test_source_key_ignores_rotating_signatures() -> None:
+    first = "https://multimedia.nt.qq.com.cn/download?appid=1407&fileid=ABC&rkey=one"
+    second = "https://multimedia.nt.qq.com.cn/download?appid=1407&fileid=ABC&rkey=two"
+
+    assert image_source_key(first) == image_source_key(second)
+    assert image_source_key("https://a.example/x.png?id=1") != image_source_key("https://a.example/x.png?id=2")
+
+
+def test_perceptual_hash_survives_resizing_and_reencoding() -> None:
+    assert perceptual_hash(sticker(256, "PNG")) == perceptual_hash(sticker(600, "JPEG"))
+    assert perceptual_hash(b"not an image") is None
+
+
+def flat(colour: str) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (200, 200), colour).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_signature_separates_images_whose_difference_hashes_collide() -> None:
+    assert perceptual_hash(flat("red")) == perceptual_hash(flat("blue"))
+    assert image_signature(flat("red")) != image_signature(flat("blue"))
+    assert image_signature(sticker(256, "PNG")) == image_signature(sticker(256, "PNG"))
+    assert image_signature(b"not an image") is None
+
+
+def test_flat_images_do_not_share_descriptions() -> None:
+    redis = FakeRedis()
+    red = "https://multimedia.nt.qq.com.cn/download?fileid=R"
+    blue = "https://multimedia.nt.qq.com.cn/download?fileid=B"
+    cache = make_cache(redis, {red: flat("red"), blue: flat("blue")})
+
+    async def describe(url: str) -> str:
+        return "红色" if url == red else "蓝色"
+
+    async def scenario() -> list[str]:
+        return [await cache.describe(url, describe) for url in (red, blue)]
+
+    assert asyncio.run(scenario()) == ["红色", "蓝色"]
+    assert cache.snapshot()["hash_hits"] == 0
+
+
+def test_repeated_images_resolve_from_cache() -> None:
+    redis = FakeRedis()
+    original = "https://multimedia.nt.qq.com.cn/download?fileid=A&rkey=1"
+    resigned = "https://multimedia.nt.qq.com.cn/download?fileid=A&rkey=2"
+    forwarded = "https://multimedia.nt.qq.com.cn/download?fileid=B&rkey=3"
+    cache = make_cache(
+        redis,
+        {original: sticker(256, "PNG"), forwarded: sticker(256, "PNG")},
+    )
+    calls: list[str] = []
+
+    async def describe(url: str) -> str:
+        calls.append(url)
+        return "一只橙色的圆形表情"
+
+    async def scenario() -> list[str]:
+        return [await cache.describe(url, describe) for url in (original, resigned, forwarded)]
+
+    assert asyncio.run(scenario()) == ["一只橙色的圆形表情"] * 3
+    assert calls == [original]
+    assert cache.snapshot() == {"source_hits": 1, "hash_hits": 1, "misses": 1, "hit_rate": 0.6667}
+    assert set(redis.ttls.values()) == {600}
+    assert IMAGE_DESCRIPTION_PREFIX + image_source_key(forwarded) in redis.values
+
+
+def test_concurrent_requests_share_one_provider_call() -> None:
+    redis = FakeRedis()
+    url = "https://multimedia.nt.qq.com.cn/download?fileid=A"
+    cache = make_cache(redis, {url: sticker(128, "PNG")})
+    calls = 0
+
+    async def describe(_url: str) -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "表情包"
+
+    async def scenario() -> list[str]:
+        return await asyncio.gather(*(cache.describe(url, describe) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == ["表情包"] * 3
+    assert calls == 1
+
+
+def test_cancelled_caller_does_not_cancel_others_waiting_on_the_same_image() -> None:
+    redis = FakeRedis()
+    url = "https://multimedia.nt.qq.com.cn/download?fileid=A"
+    cache = make_cache(redis, {url: sticker(128, "PNG")})
+
+    async def describe(_url: str) -> str:
+        await asyncio.sleep(0.05)
+        return "表情包"
+
+    async def scenario() -> str:
+        first = asyncio.create_task(cache.describe(url, describe))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.describe(url, describe))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "表情包"
+    assert cache.snapshot()["misses"] == 1
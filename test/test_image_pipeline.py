@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.services import image
+from src.services.image import _prepare_vision_image_sync
+from src.services.process_pool import ManagedProcessPool
+
+
+def photo(width: int, height: int, fmt: str = "JPEG", mode: str = "RGB") -> bytes:
+    picture = Image.new(mode, (width, height), (200, 120, 40) if mode == "RGB" else (200, 120, 40, 128))
+    buffer = BytesIO()
+    picture.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def size_of(data: bytes) -> tuple[int, int]:
+    return Image.open(BytesIO(data)).size
+
+
+def test_large_photos_are_downscaled_to_the_provider_resolution() -> None:
+    data, mime = _prepare_vision_image_sync(photo(4000, 3000), 768, 2048)
+
+    assert mime == "image/jpeg"
+    assert size_of(data) == (1024, 768)
+
+
+def test_tall_screenshots_keep_their_long_side_within_limits() -> None:
+    data, _mime = _prepare_vision_image_sync(photo(1080, 4000, "PNG"), 768, 2048)
+
+    assert size_of(data) == (553, 2048)
+
+
+def test_small_images_pass_through_and_alpha_is_flattened() -> None:
+    small = photo(200, 100, "PNG")
+    assert _prepare_vision_image_sync(small, 768, 2048) == (small, "image/png")
+
+    data, mime = _prepare_vision_image_sync(photo(2000, 2000, "PNG", "RGBA"), 768, 2048)
+    assert mime == "image/jpeg"
+    assert Image.open(BytesIO(data)).mode == "RGB"
+
+
+def test_pool_runs_work_in_a_worker_process() -> None:
+    pool = ManagedProcessPool("test", max_workers=1, max_queue=1)
+
+    async def scenario() -> tuple[bytes, str]:
+        return await pool.run(_prepare_vision_image_sync, photo(3000, 2000), 768, 2048)
+
+    try:
+        data, _mime = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert size_of(data) == (1152, 768)
+    assert pool.snapshot()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_describe_sends_an_inline_downscaled_image(monkeypatch) -> None:
+    sent: list[str] = []
+
+    async def download(url: str, max_size=None):
+        return photo(4000, 3000), "image/jpeg"
+
+    class InlinePool:
+        async def run(self, fn, *args):
+            return fn(*args)
+
+    async def compatible_chat(*, client, model, image_url, prompt=""):
+        sent.append(image_url)
+        return "一张橙色的照片"
+
+    monkeypatch.setattr(image, "download_image_data", download)
+    monkeypatch.setattr(image, "cpu_pool", lambda: InlinePool())
+    monkeypatch.setattr(image, "_describe_image_with_compatible_chat", compatible_chat)
+    monkeypatch.setattr(image, "has_openai", lambda: True)
+    monkeypatch.setattr(image, "get_openai_client", lambda: None)
+    image._prepared.clear()
+
+    assert await image.describe_image_url("https://example.com/a.jpg") == "一张橙色的照片"
+    assert sent[0].startswith("data:image/jpeg;base64,")
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+from src.services import intent_classifier, reminder
+from src.services.intent_classifier import (
+    IntentClassifier,
+    LabeledText,
+    benchmark_search_cases,
+    evaluate,
+    load_seed_examples,
+    search_plan_label,
+)
+
+ROOT = Path(__file__).parents[1]
+
+
+@pytest.fixture(scope="module")
+def model() -> IntentClassifier:
+    return IntentClassifier.train(load_seed_examples(ROOT / "eval" / "intent_cases.yaml"))
+
+
+def test_seed_model_separates_chat_from_reminder_requests(model: IntentClassifier) -> None:
+    chat = model.predict("reminder", "今天天气真好")
+    create = model.predict("reminder", "明天九点提醒我开会")
+
+    assert chat is not None and chat.label == "NONE" and chat.confidence >= 0.9
+    assert create is not None and create.label == "CREATE"
+    assert model.predict("autonomy", "你去群里跟大家说声早安吧").label == "yes"
+    assert model.predict("unknown", "随便") is None
+
+
+def test_model_round_trips_through_json(model: IntentClassifier, tmp_path: Path) -> None:
+    path = tmp_path / "intent.json"
+    model.save(path)
+    loaded = IntentClassifier.load(path)
+
+    for text in ("取消开会的提醒", "哈哈哈"):
+        assert loaded.predict("reminder", text) == model.predict("reminder", text)
+
+
+def test_training_skips_tasks_with_a_single_label() -> None:
+    model = IntentClassifier.train(
+        [
+            LabeledText("autonomy", "去群里说晚安", "yes"),
+            LabeledText("autonomy", "讲个笑话", "no"),
+            LabeledText("reminder", "你好", "NONE"),
+        ]
+    )
+
+    assert model.tasks == ("autonomy",)
+
+
+def test_confident_local_none_skips_the_reminder_llm(monkeypatch, model, tmp_path) -> None:
+    path = tmp_path / "intent.json"
+    model.save(path)
+    settings = SimpleNamespace(intent_classifier_path=str(path), intent_classifier_threshold=0.9)
+    monkeypatch.setattr(intent_classifier, "get_settings", lambda: settings)
+    monkeypatch.setattr(reminder, "has_deepseek", lambda: True)
+
+    def no_llm():
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(reminder, "get_deepseek_client", no_llm)
+
+    result = asyncio.run(reminder.ReminderIntentParser().parse("今天天气真好", None))  # type: ignore[arg-type]
+
+    assert result == {"intent": "NONE"}
+
+
+def test_benchmark_reports_router_and_classifier(model: IntentClassifier) -> None:
+    corpus = yaml.safe_load((ROOT / "eval" / "search_cases.yaml").read_text(encoding="utf-8"))
+    cases = corpus["cases"]
+
+    lines = benchmark_search_cases(model, cases, threshold=0.9)
+
+    assert lines[0] == f"search eval cases={len(cases)}"
+    assert "keyword router" in lines[1] and "local classifier" in lines[2]
+    assert {search_plan_label(case) for case in cases} == {"direct", "rewrite"}
+
+
+def test_evaluation_counts_unanswered_cases_as_misses(model: IntentClassifier, monkeypatch) -> None:
+    examples = [LabeledText("reminder", "明天九点提醒我开会", "CREATE")] * 2
+    answers = iter([None, model.predict("reminder", "明天九点提醒我开会")])
+    monkeypatch.setattr(model, "predict", lambda task, text: next(answers))
+
+    stats = evaluate(model, examples, threshold=0.0)["reminder"]
+
+    assert stats["cases"] == 2
+    assert stats["accuracy"] == 0.5 and stats["local_coverage"] == 0.5
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.services import chat_context
+from src.services.chat_context import SearchContextBuilder
+from src.services.intent import IntentDecision
+from src.services.keyword_matcher import (
+    FEATURE_GROUPS,
+    ROUTING_LEXICON,
+    KeywordAutomaton,
+    extract_features,
+)
+
+
+def naive_first_ends(keywords: tuple[str, ...], text: str) -> dict[str, int]:
+    return {
+        keyword: text.index(keyword) + len(keyword)
+        for keyword in keywords
+        if keyword in text
+    }
+
+
+def test_automaton_finds_overlapping_and_nested_keywords() -> None:
+    keywords = ("he", "she", "his", "hers", "比分", "具体比分", "比赛结果")
+    automaton = KeywordAutomaton(keywords)
+
+    for text in ("ushers", "ahishers", "具体比分和比赛结果", "", "无关内容"):
+        assert automaton.first_ends(text) == naive_first_ends(keywords, text)
+
+
+def test_features_match_every_lexicon_group_like_substring_checks() -> None:
+    for group, keywords in ROUTING_LEXICON.items():
+        for keyword in keywords:
+            features = extract_features(f"随便说说{keyword}吧")
+            assert features.has(group), (group, keyword)
+
+
+def test_ascii_keywords_are_case_insensitive_and_compact_groups_ignore_spaces() -> None:
+    features = extract_features("用 Google 搜一下，你 确 定 吗")
+
+    assert features.has("search.explicit")
+    assert features.has("correction")
+    assert not extract_features("你 确 定 吗").has("fact.fresh")
+
+
+def test_within_limits_keywords_to_the_opening() -> None:
+    late = "今天的天气和路况我们都看了一遍，出门前记得带伞，回来以后也别太累了，最后说一声早安"
+
+    assert extract_features("早安，记得吃饭").within("outbound.greeting", 32)
+    assert not extract_features(late).within("outbound.greeting", 32)
+
+
+def test_vector_has_one_slot_per_group() -> None:
+    vector = extract_features("帮我查一下上海天气").vector()
+
+    assert len(vector) == len(FEATURE_GROUPS)
+    assert vector[FEATURE_GROUPS.index("weather.query")] == 1
+    assert vector[FEATURE_GROUPS.index("note.add")] == 0
+
+
+def test_search_builder_reuses_decisions_from_the_turn(monkeypatch) -> None:
+    def fail(*args, **kwargs):
+        raise AssertionError("decide_intents should not run twice per turn")
+
+    monkeypatch.setattr(chat_context, "decide_intents", fail)
+    builder = SearchContextBuilder()
+    features = extract_features("我现在有点难过")
+
+    outcome = asyncio.run(
+        builder.build(
+            "我现在有点难过",
+            decisions=[IntentDecision(name="affinity.query", args={})],
+            features=features,
+        )
+    )
+
+    assert outcome.required is False
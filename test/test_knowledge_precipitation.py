@@ -14,7 +14,7 @@ class FakeStorage:
         self.profile = None
         self.saved = None
 
-    def get_recent_global_records(self, _hours: int):
+    def records_between(self, _start, _end=None, *, group_id=None):
         return [
             ChatRecord(
                 role="user",
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from src.services.loop_monitor import BlockingCallError, LoopMonitor, detect_blocking
+
+
+def _hold_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_detect_blocking_fails_with_the_blocking_stack() -> None:
+    with pytest.raises(BlockingCallError) as excinfo:
+        async with detect_blocking(0.05):
+            await asyncio.sleep(0)
+            _hold_the_loop(0.2)
+
+    assert "_hold_the_loop" in str(excinfo.value)
+
+
+@pytest.mark.asyncio
+async def test_detect_blocking_passes_cooperative_code() -> None:
+    async with detect_blocking(0.05) as monitor:
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(_hold_the_loop, 0.1)
+
+    assert monitor.recent_stalls() == []
+
+
+@pytest.mark.asyncio
+async def test_monitor_reports_lag_without_tracing() -> None:
+    monitor = LoopMonitor(interval=0.02, stall_threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        _hold_the_loop(0.15)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    snapshot = monitor.snapshot()
+    assert snapshot["lag_max_ms"] >= 100
+    assert snapshot["stalls"] == 1
+    assert monitor.recent_stalls() == []
+    assert not monitor.running
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.services.member_directory import GroupMemberDirectory, GroupRoster
+
+
+class FakeBot:
+    def __init__(self, members: list[dict]) -> None:
+        self.members = list(members)
+        self.list_calls = 0
+        self.info_calls: list[int] = []
+        # When set, list calls return the members as of the call and wait for it.
+        self.release: asyncio.Event | None = None
+
+    async def get_group_member_list(self, *, group_id: int) -> list[dict]:
+        self.list_calls += 1
+        members = [dict(member) for member in self.members]
+        if self.release is not None:
+            await self.release.wait()
+        await asyncio.sleep(0)
+        return members
+
+    async def get_group_member_info(self, *, group_id: int, user_id: int) -> dict:
+        self.info_calls.append(user_id)
+        for member in self.members:
+            if member["user_id"] == user_id:
+                return dict(member)
+        return {"user_id": user_id, "nickname": ""}
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+MEMBERS = [
+    {"user_id": 1, "card": "", "nickname": "小明"},
+    {"user_id": 2, "card": "小红", "nickname": "red"},
+]
+
+
+def test_roster_serves_both_directions_and_repairs_shared_names() -> None:
+    roster = GroupRoster(MEMBERS + [{"user_id": 3, "card": "小明", "nickname": "x"}])
+
+    assert roster.user_for("小红") == 2 and roster.name_for(1) == "小明"
+    assert roster.user_for("小明") == 3
+    roster.remove(3)
+    assert roster.user_for("小明") == 1
+    roster.set(1, "大明")
+    assert "小明" not in roster.users and roster.user_for("大明") == 1
+
+
+def test_directory_loads_once_and_follows_notices() -> None:
+    bot = FakeBot(MEMBERS)
+    directory = GroupMemberDirectory(ttl_seconds=60)
+
+    async def scenario() -> None:
+        first, second = await asyncio.gather(
+            directory.name_to_user(bot, 10),
+            directory.name_to_user(bot, 10),
+        )
+        assert first is second and first == {"小明": 1, "小红": 2}
+
+        bot.members.append({"user_id": 4, "card": "新人", "nickname": "new"})
+        await directory.member_joined(bot, 10, 4)
+        directory.member_left(10, 2)
+        directory.card_changed(10, 1, "明哥")
+
+        assert await directory.name_to_user(bot, 10) == {"明哥": 1, "新人": 4}
+        assert await directory.display_name(bot, 10, 4) == "新人"
+
+    asyncio.run(scenario())
+    assert bot.list_calls == 1
+    assert directory.snapshot()["notices"] == 3
+
+
+def test_stale_roster_is_served_while_it_refreshes() -> None:
+    bot = FakeBot(MEMBERS)
+    clock = Clock()
+    directory = GroupMemberDirectory(ttl_seconds=60, clock=clock)
+
+    async def scenario() -> dict:
+        await directory.roster(bot, 10)
+        bot.members = [{"user_id": 5, "card": "小刚", "nickname": ""}]
+        clock.now = 120
+        stale = dict(await directory.name_to_user(bot, 10))
+        await asyncio.sleep(0.01)
+        assert await directory.name_to_user(bot, 10) == {"小刚": 5}
+        return stale
+
+    assert asyncio.run(scenario()) == {"小明": 1, "小红": 2}
+    assert bot.list_calls == 2
+
+
+def test_bot_leaving_a_group_drops_its_roster() -> None:
+    bot = FakeBot(MEMBERS)
+    directory = GroupMemberDirectory(ttl_seconds=60)
+
+    asyncio.run(directory.roster(bot, 10))
+    directory.member_left(10, 99, self_id=99)
+
+    assert directory.snapshot()["groups"] == 0
+
+
+def test_notices_during_a_refresh_survive_the_swap() -> None:
+    bot = FakeBot(MEMBERS)
+    clock = Clock()
+    directory = GroupMemberDirectory(ttl_seconds=60, clock=clock)
+
+    async def scenario() -> dict:
+        await directory.roster(bot, 10)
+        bot.release = asyncio.Event()
+        clock.now = 120
+        await directory.roster(bot, 10)
+        await asyncio.sleep(0)
+        # The refresh has fetched the old list; these notices arrive before it lands.
+        bot.members.append({"user_id": 4, "card": "新人", "nickname": "new"})
+        await directory.member_joined(bot, 10, 4)
+        directory.member_left(10, 2)
+        directory.card_changed(10, 1, "明哥")
+        bot.release.set()
+        await asyncio.sleep(0.01)
+        return await directory.name_to_user(bot, 10)
+
+    assert asyncio.run(scenario()) == {"明哥": 1, "新人": 4}
+    assert bot.list_calls == 2
+
+
+def test_members_without_a_display_name_are_looked_up_once() -> None:
+    bot = FakeBot(MEMBERS)
+    directory = GroupMemberDirectory(ttl_seconds=60)
+
+    async def scenario() -> list:
+        return [await directory.display_name(bot, 10, 8) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [None, None, None]
+    assert bot.info_calls == [8]
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.core.errors import WorkerPoolBusyError, WorkerTaskLimitError
+from src.services import process_pool
+from src.services.process_pool import ManagedProcessPool
+
+
+def hold_memory(megabytes: int, seconds: float) -> int:
+    block = b"x" * (megabytes * 1024 * 1024)
+    time.sleep(seconds)
+    return len(block)
+
+
+def test_work_beyond_the_queue_is_rejected() -> None:
+    pool = ManagedProcessPool("test", max_workers=1, max_queue=0)
+
+    async def scenario() -> None:
+        running = asyncio.create_task(pool.run(time.sleep, 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(WorkerPoolBusyError):
+            await pool.run(time.sleep, 0)
+        await running
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    snapshot = pool.snapshot()
+    assert snapshot["rejected"] == 1 and snapshot["completed"] == 1
+    assert snapshot["latency_p50_ms"] >= 500
+
+
+def test_slow_task_is_killed_and_the_pool_recovers() -> None:
+    pool = ManagedProcessPool("test", max_workers=2, max_queue=2, task_timeout=1.0)
+
+    async def scenario() -> list:
+        return await asyncio.gather(
+            pool.run(time.sleep, 30),
+            pool.run(time.sleep, 0.2),
+            return_exceptions=True,
+        )
+
+    try:
+        stuck, neighbour = asyncio.run(scenario())
+        assert isinstance(stuck, WorkerTaskLimitError)
+        assert neighbour is None
+        assert asyncio.run(pool.run(abs, -3)) == 3
+    finally:
+        pool.shutdown()
+    snapshot = pool.snapshot()
+    assert snapshot["timeouts"] == 1 and snapshot["restarts"] == 1
+    assert snapshot["inflight"] == 0
+
+
+def test_worker_over_its_memory_limit_is_killed() -> None:
+    pool = ManagedProcessPool("test", max_workers=1, max_queue=0, memory_limit_mb=200)
+
+    try:
+        with pytest.raises(WorkerTaskLimitError):
+            asyncio.run(pool.run(hold_memory, 400, 10))
+    finally:
+        pool.shutdown()
+    snapshot = pool.snapshot()
+    assert snapshot["memory_kills"] == 1
+    assert snapshot["peak_worker_rss_mb"] > 200
+
+
+def test_workers_are_recycled_without_native_max_tasks_per_child(monkeypatch) -> None:
+    monkeypatch.setattr(process_pool, "_NATIVE_RECYCLING", False)
+    pool = ManagedProcessPool("test", max_workers=1, max_queue=0, max_tasks_per_child=2)
+
+    try:
+        pids = [asyncio.run(pool.run(os.getpid)) for _ in range(4)]
+    finally:
+        pool.shutdown()
+    assert pids[0] == pids[1] and pids[2] == pids[3]
+    assert pids[1] != pids[2]
+    assert pool.snapshot()["recycles"] == 1
+
+
+def test_time_limit_starts_when_a_worker_picks_the_task_up() -> None:
+    pool = ManagedProcessPool("test", max_workers=1, max_queue=2, task_timeout=1.0)
+
+    async def scenario() -> list:
+        # The second task sits in the executor's call queue for ~0.7s before it runs.
+        return await asyncio.gather(pool.run(time.sleep, 0.7), pool.run(time.sleep, 0.7))
+
+    try:
+        assert asyncio.run(scenario()) == [None, None]
+    finally:
+        pool.shutdown()
+    assert pool.snapshot()["timeouts"] == 0
+
+
+def test_memory_limit_blames_the_task_whose_worker_grew() -> None:
+    pool = ManagedProcessPool("test", max_workers=2, max_queue=0, memory_limit_mb=200)
+
+    async def scenario() -> list:
+        return await asyncio.gather(
+            pool.run(time.sleep, 1.0),
+            pool.run(hold_memory, 400, 10),
+            return_exceptions=True,
+        )
+
+    try:
+        innocent, hog = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert innocent is None
+    assert isinstance(hog, WorkerTaskLimitError)
+    assert pool.snapshot()["memory_kills"] == 1
+
+
+def test_workers_spawned_from_bot_py_do_not_boot_the_bot() -> None:
+    root = Path(__file__).resolve().parents[1]
+    probe = (
+        "len(__import__('nonebot.plugin', fromlist=['get_loaded_plugins']).get_loaded_plugins()),"
+        " sorted(name for name in __import__('sys').modules"
+        " if name in ('src.app', 'src.core.container') or name.startswith('src.plugins'))"
+    )
+    script = "\n".join(
+        [
+            "import asyncio, sys",
+            # As under ``python bot.py``: spawn re-imports the parent's main file in each worker.
+            f"sys.modules['__main__'].__file__ = {str(root / 'bot.py')!r}",
+            "from src.services.process_pool import ManagedProcessPool",
+            "pool = ManagedProcessPool('probe', max_workers=1)",
+            f"print(asyncio.run(pool.run(eval, {probe!r})))",
+            "pool.shutdown()",
+        ]
+    )
+    env = os.environ.copy()
+    env.update({"REDIS_REQUIRED": "false", "LLM_REQUIRED": "false"})
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=root,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=90,
+        check=False,
+    )
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    assert completed.stdout.strip().splitlines()[-1] == "(0, [])"
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from src.services.mako_context import MakoRuntimeContext
+from src.services.read_cache import (
+    CACHE_INVALIDATION_CHANNEL,
+    PROCESS_ORIGIN,
+    TTLCache,
+    handle_invalidation_message,
+    read_cache_for,
+)
+from src.services.storage import StorageService
+
+
+class CountingPipeline:
+    def __init__(self, redis: "CountingRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args):
+            self.calls.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class CountingRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.reads = 0
+        self.published: list[tuple[str, str]] = []
+
+    def pipeline(self, transaction: bool = True) -> CountingPipeline:
+        return CountingPipeline(self)
+
+    def exists(self, key: str) -> int:
+        self.reads += 1
+        return int(key in self.values)
+
+    def get(self, key: str):
+        self.reads += 1
+        return self.values.get(key)
+
+    def set(self, key: str, value, ex=None) -> None:
+        self.values[key] = str(value)
+
+    def hget(self, key: str, field: str):
+        self.reads += 1
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key: str, field: str, value: str) -> None:
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hvals(self, key: str) -> list[str]:
+        self.reads += 1
+        return list(self.hashes.get(key, {}).values())
+
+    def delete(self, key: str) -> None:
+        self.zsets.pop(key, None)
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> None:
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key: str, *members: str) -> None:
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def eval(self, script: str, numkeys: int, index_key: str, hash_key: str, limit: int) -> list:
+        self.reads += 1
+        ranked = sorted(self.zsets.get(index_key, {}).items(), key=lambda item: item[1], reverse=True)
+        return [self.hashes.get(hash_key, {}).get(member) for member, _score in ranked[:limit]]
+
+    def publish(self, channel: str, message: str) -> int:
+        self.published.append((channel, message))
+        return 0
+
+
+def make_service() -> StorageService:
+    service = object.__new__(StorageService)
+    service.redis = CountingRedis()
+    service.settings = SimpleNamespace(
+        affinity_initial=50,
+        affinity_min=0,
+        affinity_max=100,
+        affinity_daily_cap=10,
+        read_cache_ttl_seconds=30.0,
+        read_cache_max_entries=128,
+        storage_compression="off",
+    )
+    return service
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used() -> None:
+    now = [0.0]
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.snapshot()["hits"] == 2
+
+
+def test_cached_none_counts_as_a_hit() -> None:
+    cache = TTLCache(ttl_seconds=10)
+    loads = []
+    assert cache.get_or_load("missing", lambda: loads.append(1)) is None
+    assert cache.get_or_load("missing", lambda: loads.append(1)) is None
+    assert loads == [1]
+
+
+def test_prompt_context_is_served_from_cache_after_first_build() -> None:
+    service = make_service()
+    service.set_profile(7, "小明", "喜欢猫")
+    service.add_relationship_memory(7, "preference", "喜欢乌龙茶")
+    service.add_autonomy_goal("整理手账")
+    runtime = MakoRuntimeContext(service)
+    runtime.get_profile()  # seeds the default bot profile
+
+    runtime.build_for_user(7)
+    service.get_profile(7)
+    reads = service.redis.reads
+    runtime.build_for_user(7)
+    service.get_profile(7)
+
+    assert service.redis.reads == reads
+
+
+def test_writes_invalidate_and_broadcast() -> None:
+    service = make_service()
+    service.add_relationship_memory(7, "preference", "喜欢乌龙茶")
+    assert len(service.list_relationship_memories(7)) == 1
+    assert service.get_affinity(7) == 50
+
+    service.add_relationship_memory(7, "taboo", "别叫我小名")
+    assert service.adjust_affinity(7, 5) == 55
+
+    assert len(service.list_relationship_memories(7)) == 2
+    assert service.get_affinity(7) == 55
+    channels = {channel for channel, _message in service.redis.published}
+    assert channels == {CACHE_INVALIDATION_CHANNEL}
+
+
+def test_remote_invalidation_evicts_but_own_messages_are_ignored() -> None:
+    service = make_service()
+    service.redis.values["affinity:7"] = "60"
+    assert service.get_affinity(7) == 60
+    service.redis.values["affinity:7"] = "70"
+
+    assert handle_invalidation_message(f"{PROCESS_ORIGIN}|affinity:7") is None
+    assert service.get_affinity(7) == 60
+    assert handle_invalidation_message("other-host-1|affinity:7") == "affinity:7"
+    assert service.get_affinity(7) == 70
+    assert read_cache_for(service.redis).snapshot()["invalidations"] == 1
+
+
+def test_invalidating_a_base_key_drops_its_variants() -> None:
+    cache = TTLCache(ttl_seconds=10)
+    cache.put("autonomy:goals", ("all",))
+    cache.put("autonomy:goals|active|6", ("page",))
+    cache.put("autonomy:tasks|todo|6", ("other",))
+
+    cache.invalidate("autonomy:goals")
+
+    assert cache.get("autonomy:goals|active|6") is None
+    assert cache.get("autonomy:tasks|todo|6") == ("other",)
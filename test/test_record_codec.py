@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+
+from src.models.codec import chat_record_codec, relationship_memory_codec, thought_trace_codec
+from src.models.schemas import ChatRecord, RelationshipMemory, ThoughtTrace
+from src.services.storage import StorageService
+
+
+class FakeHashRedis:
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    def hset(self, key: str, field: str, value: str) -> None:
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hget(self, key: str, field: str):
+        return self.hashes.get(key, {}).get(field)
+
+    def hvals(self, key: str) -> list[str]:
+        return list(self.hashes.get(key, {}).values())
+
+    def zrem(self, key: str, *members: str) -> None:
+        return None
+
+
+def test_compact_rows_round_trip_without_changing_the_model() -> None:
+    trace = ThoughtTrace(trace_id="t1", summary="回复", payload={"ids": [1, 2], "note": None}, user_id=7)
+    encoded = thought_trace_codec.encode(trace)
+
+    assert encoded.startswith("[1,")
+    decoded = thought_trace_codec.decode(encoded)
+    assert decoded == trace
+    assert decoded.model_dump_json() == trace.model_dump_json()
+
+
+def test_legacy_json_objects_are_still_readable() -> None:
+    record = ChatRecord(role="user", content="旧格式", user_id=1, group_id=2)
+    assert chat_record_codec.decode(record.model_dump_json()) == record
+    assert chat_record_codec.decode(record.model_dump(mode="json")) == record
+
+
+def test_short_rows_decode_with_model_defaults() -> None:
+    row = json.dumps([1, "m1", 7, "event", "旧事件", "chat", "active", 0.7, "2026-01-01T08:00:00"])
+    memory = relationship_memory_codec.decode(row)
+    assert memory.created_at == datetime(2026, 1, 1, 8, 0)
+    assert memory.due_at is None
+    assert memory.last_used_at is None
+
+
+def test_unknown_row_versions_are_skipped() -> None:
+    assert chat_record_codec.decode_or_none('[99,"user","x"]') is None
+    assert chat_record_codec.decode_many(['[99,"user","x"]', "not json", ""]) == []
+
+
+def test_storage_lists_mixed_legacy_and_compact_relationship_rows() -> None:
+    service = object.__new__(StorageService)
+    service.redis = FakeHashRedis()
+    legacy = RelationshipMemory(
+        memory_id="old",
+        user_id=7,
+        memory_type="preference",
+        content="喜欢乌龙茶",
+        created_at=datetime.now() - timedelta(days=1),
+    )
+    service.redis.hset("relationship:7", "old", json.dumps(legacy.model_dump(mode="json"), ensure_ascii=False))
+    fresh = service.add_relationship_memory(7, "preference", "喜欢绿茶")
+    service.add_relationship_memory(7, "taboo", "别叫我小名")
+
+    preferences = service.list_relationship_memories(7, memory_type="preference")
+    assert [memory.memory_id for memory in preferences] == [fresh.memory_id, "old"]
+    assert service.redis.hget("relationship:7", fresh.memory_id).startswith("[1,")
+
+    assert service.mark_relationship_done(7, "old") is True
+    assert service.redis.hget("relationship:7", "old").startswith("[1,")
+    assert service.get_relationship_memory(7, "old").status == "done"
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from src.services.relationship_queue import RelationshipAbsorber
+
+
+class FakeRelationship:
+    def __init__(self) -> None:
+        self.batches: list[tuple[int, str, list[str]]] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def absorb_user_messages(self, user_id: int, nickname: str, texts: list[str]):
+        self.release.wait(timeout=2)
+        self.batches.append((user_id, nickname, list(texts)))
+        return []
+
+
+def test_messages_queued_for_one_user_are_absorbed_as_one_batch() -> None:
+    async def scenario() -> FakeRelationship:
+        relationship = FakeRelationship()
+        absorber = RelationshipAbsorber(relationship, max_pending=10, workers=1)  # type: ignore[arg-type]
+        absorber.submit(1, "小明", "我喜欢猫")
+        absorber.submit(2, "小红", "别叫我小名")
+        absorber.submit(1, "明明", "我喜欢乌龙茶")
+        while await absorber.process_next():
+            pass
+        return relationship
+
+    relationship = asyncio.run(scenario())
+    assert relationship.batches == [
+        (1, "明明", ["我喜欢猫", "我喜欢乌龙茶"]),
+        (2, "小红", ["别叫我小名"]),
+    ]
+
+
+def test_settle_waits_for_the_users_pending_messages() -> None:
+    async def scenario() -> tuple[bool, bool, FakeRelationship]:
+        relationship = FakeRelationship()
+        absorber = RelationshipAbsorber(relationship, max_pending=10, workers=1)  # type: ignore[arg-type]
+        absorber.start()
+        relationship.release.clear()
+        absorber.submit(1, "小明", "我喜欢猫")
+        await asyncio.sleep(0)
+        timed_out = await absorber.settle(1, timeout=0.05)
+        relationship.release.set()
+        settled = await absorber.settle(1, timeout=2)
+        await absorber.stop()
+        return timed_out, settled, relationship
+
+    timed_out, settled, relationship = asyncio.run(scenario())
+    assert timed_out is False
+    assert settled is True
+    assert relationship.batches == [(1, "小明", ["我喜欢猫"])]
+
+
+def test_queue_is_bounded_and_drops_the_oldest_message() -> None:
+    async def scenario() -> tuple[RelationshipAbsorber, FakeRelationship]:
+        relationship = FakeRelationship()
+        absorber = RelationshipAbsorber(relationship, max_pending=2, workers=1)  # type: ignore[arg-type]
+        for index in range(3):
+            absorber.submit(1, "小明", f"消息{index}")
+        assert await absorber.settle(2) is True
+        await absorber.stop()
+        return absorber, relationship
+
+    absorber, relationship = asyncio.run(scenario())
+    assert absorber.snapshot()["dropped"] == 1
+    assert relationship.batches == [(1, "小明", ["消息1", "消息2"])]
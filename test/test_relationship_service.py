@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import src.services.relationship as relationship_module
 from src.services.relationship import RelationshipService
 from src.services.storage import StorageService
 
@@ -55,3 +56,16 @@ def test_transient_instruction_is_not_saved_as_a_taboo() -> None:
     created = service.absorb_user_message(user_id, "小李", "不要搜索，直接解释这段代码")
 
     assert [memory for memory in created if memory.memory_type == "taboo"] == []
+
+
+def test_promise_with_a_due_time_pulls_the_due_wheel_forward(monkeypatch) -> None:
+    storage = StorageService()
+    storage.redis = None
+    service = RelationshipService(storage=storage)
+    notified = []
+    monkeypatch.setattr(relationship_module, "notify_due", notified.append)
+
+    created = service.absorb_user_message(910004, "小周", "明天提醒我交报告")
+
+    assert [memory.memory_type for memory in created] == ["promise"]
+    assert notified == [created[0].due_at]
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from src.models.schemas import ReminderRecord
 from src.services.reminder import Reminder, ReminderBook
@@ -61,3 +61,139 @@ def test_group_reminder_listing_is_scoped_to_the_owner() -> None:
 
     assert book.list("group_1", user_id=2) == [first]
     assert book.list("group_1", user_id=3) == [second]
+
+
+class FakeReminderPipeline:
+    def __init__(self, redis: "FakeReminderRedis") -> None:
+        self.redis = redis
+        self.calls: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args):
+            self.calls.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        self.redis.pipelines += 1
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class FakeReminderRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.pipelines = 0
+        self.hmgets = 0
+
+    def pipeline(self, transaction: bool = True) -> FakeReminderPipeline:
+        return FakeReminderPipeline(self)
+
+    def exists(self, key: str) -> int:
+        return int(key in self.values)
+
+    def set(self, key: str, value) -> None:
+        self.values[key] = str(value)
+
+    def delete(self, key: str) -> None:
+        self.zsets.pop(key, None)
+
+    def scan_iter(self, match: str = "*", count: int = 0):
+        prefix = match.rstrip("*")
+        return iter([key for key in self.zsets if key.startswith(prefix)])
+
+    def hset(self, key: str, field: str, value: str) -> None:
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hget(self, key: str, field: str):
+        return self.hashes.get(key, {}).get(field)
+
+    def hdel(self, key: str, *fields: str) -> int:
+        return sum(self.hashes.get(key, {}).pop(field, None) is not None for field in fields)
+
+    def hvals(self, key: str) -> list[str]:
+        raise AssertionError("reminder reads must go through the indexes")
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> None:
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key: str, *members: str) -> None:
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def zrangebyscore(self, key, low, high, start=0, num=None, withscores=False):
+        ranked = self._range(key, low, high)[start : start + num if num else None]
+        return ranked if withscores else [member for member, _score in ranked]
+
+    def eval(self, script, numkeys, index_key, hash_key, low, high, limit, chunk) -> list:
+        ranked = self._range(index_key, low, high)
+        if limit >= 0:
+            ranked = ranked[:limit]
+        rows = []
+        # Like the script: one HMGET per slice, each well under Lua's unpack() limit.
+        assert 0 < chunk <= 4000
+        for first in range(0, len(ranked), chunk):
+            self.hmgets += 1
+            page = ranked[first : first + chunk]
+            rows.extend(self.hashes.get(hash_key, {}).get(member) for member, _score in page)
+        return rows
+
+    def _range(self, key: str, low: str, high: str) -> list[tuple[str, float]]:
+        def accepts(score: float) -> bool:
+            if low != "-inf":
+                bound = float(low.lstrip("("))
+                if score < bound or (low.startswith("(") and score == bound):
+                    return False
+            return high == "+inf" or score <= float(high)
+
+        return sorted(
+            ((member, score) for member, score in self.zsets.get(key, {}).items() if accepts(score)),
+            key=lambda item: item[1],
+        )
+
+
+def make_indexed_storage():
+    from src.services.storage import REMINDER_INDEX_MARKER, StorageService
+
+    service = object.__new__(StorageService)
+    service.redis = FakeReminderRedis()
+    service.redis.set(REMINDER_INDEX_MARKER, 1)
+    return service
+
+
+def test_indexed_reminders_list_by_owner_and_expire_in_one_pipeline() -> None:
+    storage = make_indexed_storage()
+    book = ReminderBook(storage=storage)
+    past = Reminder("job-0", "昨天的事", datetime(2026, 7, 11, 9, 0), "group_1", 2, 1)
+    first = Reminder("job-1", "喝水", datetime(2026, 7, 12, 9, 0), "group_1", 2, 1)
+    other = Reminder("job-2", "开会", datetime(2026, 7, 12, 10, 0), "group_2", 3, 2)
+    later = Reminder("job-3", "交报告", datetime(2026, 7, 20, 9, 0), "group_1", 2, 1)
+    for item in (later, other, past, first):
+        book.add(item.session_id, item)
+
+    assert book.list("group_1", user_id=2) == [past, first, later]
+    assert book.list("group_2") == [other]
+
+    pipelines = storage.redis.pipelines
+    assert book.expire(datetime(2026, 7, 12, 0, 0)) == [past]
+    assert storage.redis.pipelines == pipelines + 1
+    assert "job-0" not in storage.redis.zsets["reminders:user:2"]
+
+    horizon = book.upcoming(None, datetime(2026, 7, 13, 0, 0))
+    assert horizon == [first, other]
+    assert book.upcoming(datetime(2026, 7, 13, 0, 0), datetime(2026, 7, 21, 0, 0)) == [later]
+    assert book.next_after(datetime(2026, 7, 13, 0, 0)) == later.remind_time
+
+
+def test_unbounded_listing_fetches_payloads_in_slices() -> None:
+    storage = make_indexed_storage()
+    book = ReminderBook(storage=storage)
+    start = datetime(2026, 7, 12, 9, 0)
+    for index in range(2500):
+        item = Reminder(f"job-{index}", "喝水", start + timedelta(minutes=index), "group_1", 2, 1)
+        book.add(item.session_id, item)
+
+    assert len(book.list("group_1")) == 2500
+    assert storage.redis.hmgets == 3
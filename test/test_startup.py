@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from src.core.lazy import lazy_module, warm_up
+from src.core.startup_profile import format_report, package_totals, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       300 |        420 |   json
+import time:      2000 |       2000 |     torch._C
+import time:      5000 |       7000 |   torch
+import time:       100 |       7520 | sentence_transformers
+"""
+
+
+def test_parse_importtime_keeps_names_depth_and_times() -> None:
+    timings = parse_importtime(IMPORTTIME)
+
+    assert [timing.module for timing in timings] == ["_json", "json", "torch._C", "torch", "sentence_transformers"]
+    assert [timing.depth for timing in timings] == [2, 1, 2, 1, 0]
+    assert timings[-1].cumulative_us == 7520
+    assert package_totals(timings)["torch"] == 7000
+
+
+def test_report_ranks_slowest_imports_and_flags_the_target() -> None:
+    lines = format_report(parse_importtime(IMPORTTIME), boot_seconds=6.5, target_seconds=5.0, top=2)
+
+    assert lines[0] == "startup boot=6.50s target=5.00s (over target)"
+    packages = lines[lines.index("slowest packages (self time):") + 1 :][:2]
+    assert packages[0].endswith("torch")
+    modules = lines[lines.index("slowest modules (cumulative):") + 1 :]
+    assert [line.split()[-1] for line in modules] == ["sentence_transformers", "torch"]
+
+
+def test_lazy_module_imports_on_first_attribute_access() -> None:
+    module = lazy_module("colorsys")
+    assert lazy_module("colorsys") is module
+
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert module.loaded
+
+
+def test_warm_up_runs_the_loader_in_the_background() -> None:
+    loaded = []
+    warm_up("test", lambda: loaded.append(True)).join(5)
+    assert loaded == [True]
+
+    # A failing loader is only logged.
+    warm_up("broken", lambda: 1 / 0).join(5)
+
+
+def test_application_boot_does_not_import_the_embedding_stack() -> None:
+    root = Path(__file__).resolve().parents[1]
+    env = os.environ.copy()
+    env.update(
+        {
+            "AUTONOMY_ENABLED": "false",
+            "PROACTIVE_ENABLED": "false",
+            "REDIS_REQUIRED": "false",
+            "LLM_REQUIRED": "false",
+        }
+    )
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, bot; print(sorted({'torch', 'sentence_transformers'} & set(sys.modules)))",
+        ],
+        cwd=root,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=90,
+        check=False,
+    )
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    assert completed.stdout.strip().splitlines()[-1] == "[]"
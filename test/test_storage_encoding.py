@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+from types import SimpleNamespace
+
+from src.models.codec import thought_trace_codec
+from src.models.schemas import ThoughtTrace
+from src.services.storage import StorageService
+from src.services.storage_encoding import ZLIB_MARK, is_packed, pack_text, unpack_text
+from src.services.storage_maintenance import StorageMaintenance, key_family
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    def get(self, key: str):
+        return self.values.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self.values[key] = value
+
+    def llen(self, key: str) -> int:
+        return 0
+
+    def hlen(self, key: str) -> int:
+        return len(self.hashes.get(key, {}))
+
+    def keys(self, pattern: str = "*") -> list[str]:
+        return [key for key in list(self.values) + list(self.hashes) if fnmatch.fnmatch(key, pattern)]
+
+    def scan_iter(self, match: str = "*", count: int = 0):
+        return iter(self.keys(match))
+
+    def hset(self, key: str, field: str | None = None, value: str | None = None, mapping=None) -> None:
+        bucket = self.hashes.setdefault(key, {})
+        if mapping:
+            bucket.update(mapping)
+        if field is not None:
+            bucket[field] = value
+
+    def hget(self, key: str, field: str):
+        return self.hashes.get(key, {}).get(field)
+
+    def hvals(self, key: str) -> list[str]:
+        return list(self.hashes.get(key, {}).values())
+
+    def hscan_iter(self, key: str, count: int = 0):
+        return iter(list(self.hashes.get(key, {}).items()))
+
+
+def make_service(compression: str = "zlib") -> StorageService:
+    service = object.__new__(StorageService)
+    service.redis = FakeRedis()
+    service.settings = SimpleNamespace(
+        max_history_turns=50,
+        storage_compression=compression,
+        storage_compression_min_bytes=256,
+    )
+    return service
+
+
+def test_large_text_is_packed_and_small_text_is_left_alone() -> None:
+    large = json.dumps([{"role": "user", "content": "今天的天气真不错" * 80}], ensure_ascii=False)
+    packed = pack_text(large, compression="zlib", min_bytes=256)
+
+    assert packed.startswith(ZLIB_MARK)
+    assert unpack_text(packed) == large
+    assert pack_text("短消息", compression="zlib", min_bytes=256) == "短消息"
+    assert unpack_text("[1,\"plain\"]") == "[1,\"plain\"]"
+
+
+def test_history_and_traces_round_trip_through_compression() -> None:
+    service = make_service()
+    history = [{"role": "user", "content": "一段很长的聊天内容" * 60}]
+    service.save_history("group_1", history)
+    trace = ThoughtTrace(trace_id="t1", summary="总结" * 200)
+    service.save_thought_trace(trace)
+
+    assert is_packed(service.redis.values["chat:history:group_1"])
+    assert service.get_history("group_1") == history
+    assert is_packed(service.redis.hget("thought_traces", "t1"))
+    assert service.get_thought_trace("t1") == trace
+    assert [item.trace_id for item in service.list_thought_traces()] == ["t1"]
+
+
+def test_profiles_use_short_keys_and_legacy_profiles_still_parse() -> None:
+    service = make_service(compression="off")
+    service.set_profile(7, "小明", "喜欢猫")
+    stored = json.loads(service.redis.values["user_profile:7"])
+    assert set(stored) == {"u", "n", "p", "t"}
+
+    service.redis.set(
+        "user_profile:8",
+        json.dumps({"user_id": 8, "nickname": "小红", "profile_text": "喜欢狗", "last_updated": "2026-01-01"}),
+    )
+    profiles = {profile["user_id"]: profile for profile in service.list_profiles()}
+    assert profiles[7]["profile_text"] == "喜欢猫"
+    assert profiles[8]["nickname"] == "小红"
+
+
+def test_migrate_rewrites_legacy_values_and_dry_run_only_counts() -> None:
+    service = make_service()
+    service.redis.set("chat:history:group_1", json.dumps([{"role": "user", "content": "旧历史" * 200}]))
+    service.redis.set(
+        "user_profile:8",
+        json.dumps({"user_id": 8, "nickname": "小红", "profile_text": "喜欢狗", "last_updated": "2026-01-01"}),
+    )
+    trace = ThoughtTrace(trace_id="t1", summary="旧格式")
+    service.redis.hset("thought_traces", "t1", trace.model_dump_json())
+    maintenance = StorageMaintenance(service)
+
+    preview = maintenance.migrate(dry_run=True)
+    assert preview.rewritten["chat:history"] == 1
+    assert not is_packed(service.redis.values["chat:history:group_1"])
+
+    report = maintenance.migrate()
+    assert report.rewritten == {"chat:history": 1, "user_profile": 1, "thought_traces": 1}
+    assert is_packed(service.redis.values["chat:history:group_1"])
+    assert json.loads(service.redis.values["user_profile:8"])["t"] == "2026-01-01"
+    assert service.redis.hget("thought_traces", "t1") == thought_trace_codec.encode(trace)
+    assert maintenance.migrate().rewritten == {}
+
+
+def test_key_family_collapses_ids() -> None:
+    assert key_family("relationship:123") == "relationship:*"
+    assert key_family("all_memory:bucket:2026010108") == "all_memory:bucket:*"
+    assert key_family("thought_traces") == "thought_traces"
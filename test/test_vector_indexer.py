@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from src.models.schemas import NoteRecord
+from src.services.notes import NoteService
+from src.services.vector_indexer import VectorIndexer
+
+
+class FakeVectorStore:
+    def __init__(self, failures: int = 0) -> None:
+        self.failures = failures
+        self.batches: list[list[str]] = []
+        self.threads: set[str] = set()
+
+    def add_many(self, texts):
+        self.threads.add(threading.current_thread().name)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("redis down")
+        self.batches.append(list(texts))
+        return len(texts)
+
+    def add(self, text: str) -> None:
+        raise AssertionError("notes must not embed inline when an indexer is wired")
+
+
+class FakeStorage:
+    def __init__(self) -> None:
+        self.notes: list[tuple] = []
+
+    def add_note(self, *, user_id: int, title: str, content: str, category: str):
+        note = NoteRecord(note_id=f"n{len(self.notes) + 1}", user_id=user_id, title=title, content=content)
+        self.notes.append((user_id, title))
+        return note
+
+
+def test_texts_are_indexed_in_batches_off_the_loop() -> None:
+    store = FakeVectorStore()
+    indexer = VectorIndexer(store, batch_size=3, max_pending=100)  # type: ignore[arg-type]
+
+    async def scenario() -> None:
+        for number in range(7):
+            indexer.submit(f"note {number}")
+        indexer.submit("note 0")
+        indexer.start()
+        assert await indexer.join()
+        await indexer.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in store.batches] == [3, 3, 1]
+    assert threading.main_thread().name not in store.threads
+    assert indexer.snapshot()["indexed"] == 7
+
+
+def test_failed_batches_are_retried_then_dropped() -> None:
+    store = FakeVectorStore(failures=1)
+    indexer = VectorIndexer(store, batch_size=4, max_pending=10, retry_delay=0.01)  # type: ignore[arg-type]
+
+    async def scenario() -> None:
+        indexer.start()
+        indexer.submit("记一下：周五交报告")
+        assert await indexer.join()
+        store.failures = 5
+        indexer.submit("another")
+        await asyncio.sleep(0.2)
+        await indexer.stop()
+
+    asyncio.run(scenario())
+    assert store.batches == [["记一下：周五交报告"]]
+    snapshot = indexer.snapshot()
+    assert snapshot["retries"] == 3 and snapshot["dropped"] == 1 and snapshot["pending"] == 0
+
+
+def test_note_service_queues_embedding_from_worker_threads() -> None:
+    store = FakeVectorStore()
+    indexer = VectorIndexer(store, batch_size=8, max_pending=10)  # type: ignore[arg-type]
+    notes = NoteService(storage=FakeStorage(), vector_store=store, indexer=indexer)  # type: ignore[arg-type]
+
+    async def scenario() -> None:
+        indexer.start()
+        note = await asyncio.to_thread(notes.add_note, 1, "报告", "周五交")
+        assert note.note_id == "n1"
+        assert await indexer.join()
+        await indexer.stop()
+
+    asyncio.run(scenario())
+    assert store.batches == [["[note:1:n1] 报告 周五交"]]